@@ -18,6 +18,88 @@ DIFY_QNA_WORKFLOW_API_KEY = os.getenv("DIFY_QNA_WORKFLOW_API_KEY", "")
 # 简述自己的身世工作流API密钥
 DIFY_MONOLOGUE_WORKFLOW_API_KEY = os.getenv("DIFY_MONOLOGUE_WORKFLOW_API_KEY", "")
 
+# Dify HTTP 连接池配置
+# 所有 Dify 调用共享同一个连接池，复用 TCP/TLS 连接 (keep-alive)
+DIFY_HTTP_MAX_CONNECTIONS = int(os.getenv("DIFY_HTTP_MAX_CONNECTIONS", "100"))
+# 空闲 keep-alive 连接数上限与过期时间（仅异步 httpx 客户端；同步 requests 连接池保留所有空闲连接）
+DIFY_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DIFY_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+DIFY_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("DIFY_HTTP_KEEPALIVE_EXPIRY", "60"))
+# 单次 Dify 请求超时时间（秒）
+DIFY_HTTP_TIMEOUT = float(os.getenv("DIFY_HTTP_TIMEOUT", "30"))
+# 流式响应解析上限：单个 SSE 事件的最大字符数，以及累计回答文本的最大字符数
+DIFY_STREAM_MAX_EVENT_CHARS = int(os.getenv("DIFY_STREAM_MAX_EVENT_CHARS", "1048576"))
+DIFY_STREAM_MAX_RESPONSE_CHARS = int(os.getenv("DIFY_STREAM_MAX_RESPONSE_CHARS", "65536"))
+# 每个工作流允许同时进行的最大请求数
+DIFY_QNA_MAX_CONCURRENCY = int(os.getenv("DIFY_QNA_MAX_CONCURRENCY", "16"))
+DIFY_MONOLOGUE_MAX_CONCURRENCY = int(os.getenv("DIFY_MONOLOGUE_MAX_CONCURRENCY", "8"))
+# 熔断：同一工作流连续失败达到阈值后熔断，期间请求直接失败；冷却后放行试探请求
+DIFY_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("DIFY_CIRCUIT_FAILURE_THRESHOLD", "5"))
+DIFY_CIRCUIT_RECOVERY_SECONDS = float(os.getenv("DIFY_CIRCUIT_RECOVERY_SECONDS", "30"))
+DIFY_CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv("DIFY_CIRCUIT_HALF_OPEN_MAX_CALLS", "1"))
+# 重试预算：滑动窗口内重试次数不超过 首次请求数 × 比例 + 每秒保底次数 × 窗口长度
+DIFY_RETRY_BUDGET_RATIO = float(os.getenv("DIFY_RETRY_BUDGET_RATIO", "0.2"))
+DIFY_RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("DIFY_RETRY_BUDGET_MIN_PER_SECOND", "0.5"))
+DIFY_RETRY_BUDGET_WINDOW_SECONDS = float(os.getenv("DIFY_RETRY_BUDGET_WINDOW_SECONDS", "10"))
+# 重试退避（带随机抖动的指数退避）的基数与上限（秒）
+DIFY_RETRY_BACKOFF_BASE_SECONDS = float(os.getenv("DIFY_RETRY_BACKOFF_BASE_SECONDS", "0.5"))
+DIFY_RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("DIFY_RETRY_BACKOFF_MAX_SECONDS", "8"))
+# 对冲请求（默认关闭）：问答请求（流式、异步与同步 /action 路径）在对冲延迟内未产出首个片段时，再发一个相同请求，取先返回者
+DIFY_QNA_HEDGING_ENABLED = os.getenv("DIFY_QNA_HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+# 对冲延迟取近期首片段耗时的该百分位，并不低于最小延迟；样本不足时使用默认延迟
+DIFY_HEDGE_PERCENTILE = float(os.getenv("DIFY_HEDGE_PERCENTILE", "95"))
+DIFY_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("DIFY_HEDGE_MIN_DELAY_SECONDS", "1"))
+DIFY_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("DIFY_HEDGE_DEFAULT_DELAY_SECONDS", "3"))
+DIFY_HEDGE_MIN_SAMPLES = int(os.getenv("DIFY_HEDGE_MIN_SAMPLES", "20"))
+DIFY_HEDGE_SAMPLE_WINDOW = int(os.getenv("DIFY_HEDGE_SAMPLE_WINDOW", "200"))
+# 对冲请求数上限：不超过滑动窗口内请求数的该比例
+DIFY_HEDGE_MAX_RATE = float(os.getenv("DIFY_HEDGE_MAX_RATE", "0.1"))
+DIFY_HEDGE_BUDGET_WINDOW_SECONDS = float(os.getenv("DIFY_HEDGE_BUDGET_WINDOW_SECONDS", "60"))
+
+# 角色独白缓存（默认关闭）
+# 独白只取决于剧本、角色、幕数和模型，同一剧本的不同对局可以复用
+MONOLOGUE_CACHE_ENABLED = os.getenv("MONOLOGUE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+MONOLOGUE_CACHE_SIZE = int(os.getenv("MONOLOGUE_CACHE_SIZE", "1024"))
+MONOLOGUE_CACHE_TTL_SECONDS = float(os.getenv("MONOLOGUE_CACHE_TTL_SECONDS", "86400"))
+# 独白工作流版本号，修改 Dify 工作流提示词后递增，使旧缓存失效
+DIFY_MONOLOGUE_WORKFLOW_VERSION = os.getenv("DIFY_MONOLOGUE_WORKFLOW_VERSION", "1")
+
+# 问答答案缓存（默认关闭）
+# 不同对局中向同一角色提出的相同/相近问题复用答案
+QNA_CACHE_ENABLED = os.getenv("QNA_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+QNA_CACHE_SIZE = int(os.getenv("QNA_CACHE_SIZE", "4096"))
+QNA_CACHE_TTL_SECONDS = float(os.getenv("QNA_CACHE_TTL_SECONDS", "86400"))
+# 相似度后端："hash"（规范化文本精确匹配）或 "embedding"（本地向量 + NumPy 余弦相似度）
+QNA_CACHE_BACKEND = os.getenv("QNA_CACHE_BACKEND", "hash")
+# embedding 后端判定为同一问题的最低余弦相似度
+QNA_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("QNA_CACHE_SIMILARITY_THRESHOLD", "0.85"))
+# 不使用问答缓存的剧本ID，逗号分隔
+QNA_CACHE_DISABLED_SCRIPTS = [
+    script_id.strip() for script_id in os.getenv("QNA_CACHE_DISABLED_SCRIPTS", "").split(",") if script_id.strip()
+]
+# 查询并回答工作流版本号，修改 Dify 工作流提示词后递增，使旧缓存失效
+DIFY_QNA_WORKFLOW_VERSION = os.getenv("DIFY_QNA_WORKFLOW_VERSION", "1")
+
+# 问答历史上下文：从对局问答记录与公共日志中按与被提问角色的相关度挑选，作为工作流 history 输入
+QNA_CONTEXT_ENABLED = os.getenv("QNA_CONTEXT_ENABLED", "true").lower() in ("1", "true", "yes")
+# 上下文 token 预算（安装 tiktoken 时精确计数，否则按中文字符数估算）
+QNA_CONTEXT_TOKEN_BUDGET = int(os.getenv("QNA_CONTEXT_TOKEN_BUDGET", "400"))
+# history 变量的最大字符数，须与 Dify 工作流中该变量的长度限制一致
+DIFY_QNA_HISTORY_MAX_CHARS = int(os.getenv("DIFY_QNA_HISTORY_MAX_CHARS", "256"))
+# 单条上下文的最大字符数（过长的回答或日志会被截短）
+QNA_CONTEXT_MAX_ENTRY_CHARS = int(os.getenv("QNA_CONTEXT_MAX_ENTRY_CHARS", "120"))
+# 每个会话每个角色保留的候选条目数，以及保留上下文缓冲区的会话数
+QNA_CONTEXT_MAX_ENTRIES_PER_CHARACTER = int(os.getenv("QNA_CONTEXT_MAX_ENTRIES_PER_CHARACTER", "200"))
+QNA_CONTEXT_MAX_SESSIONS = int(os.getenv("QNA_CONTEXT_MAX_SESSIONS", "1024"))
+
+# 角色问答滚动摘要：每幕结束后在后台把各角色已结束幕次的问答压缩为摘要，问答上下文改用“摘要 + 最近几轮问答”
+QNA_SUMMARY_ENABLED = os.getenv("QNA_SUMMARY_ENABLED", "true").lower() in ("1", "true", "yes")
+# 摘要的最大字符数（应明显小于 DIFY_QNA_HISTORY_MAX_CHARS，为最近的问答留出空间）
+QNA_SUMMARY_MAX_CHARS = int(os.getenv("QNA_SUMMARY_MAX_CHARS", "120"))
+# 有摘要时附带的该角色最近问答条数（摘要之后的问答）
+QNA_SUMMARY_RECENT_EXCHANGES = int(os.getenv("QNA_SUMMARY_RECENT_EXCHANGES", "4"))
+# 后台生成摘要的线程数
+QNA_SUMMARY_MAX_WORKERS = int(os.getenv("QNA_SUMMARY_MAX_WORKERS", "2"))
+
 # LangChain 配置
 # LangSmith API key for tracing (optional)
 LANGSMITH_API_KEY = os.getenv("LANGSMITH_API_KEY", "")
@@ -30,7 +112,56 @@ MAX_QNA_PER_CHARACTER_PER_ACT = int(os.getenv("MAX_QNA_PER_CHARACTER_PER_ACT", "
 MAX_ACTS = int(os.getenv("MAX_ACTS", "3"))
 # Game session timeout in minutes
 GAME_SESSION_TIMEOUT_MINUTES = int(os.getenv("GAME_SESSION_TIMEOUT_MINUTES", "120"))
+# In-process GameState cache: maximum number of sessions kept (0 disables the cache)
+GAME_STATE_CACHE_SIZE = int(os.getenv("GAME_STATE_CACHE_SIZE", "256"))
+# Seconds a cached GameState stays valid before it is reloaded from the database
+GAME_STATE_CACHE_TTL_SECONDS = float(os.getenv("GAME_STATE_CACHE_TTL_SECONDS", "300"))
+# Game state store: "sqlalchemy" (the database), "memory" (process-local dict, for tests and
+# benchmarks) or "append_log" (one append-only log file per session, single worker process)
+GAME_STATE_BACKEND = os.getenv("GAME_STATE_BACKEND", "sqlalchemy").lower()
+# Directory of the append_log backend's session files
+GAME_STATE_LOG_DIR = os.getenv("GAME_STATE_LOG_DIR", "./game_state_logs")
+# Records after which an append_log session file is rewritten as a single record (0 disables)
+GAME_STATE_LOG_COMPACT_RECORDS = int(os.getenv("GAME_STATE_LOG_COMPACT_RECORDS", "256"))
+# Wait for every append_log save to reach the disk (fsync)
+GAME_STATE_LOG_FSYNC = os.getenv("GAME_STATE_LOG_FSYNC", "false").lower() in ("1", "true", "yes")
+# Times an action's state mutation is re-applied after a concurrent save (version conflict)
+GAME_STATE_SAVE_MAX_RETRIES = int(os.getenv("GAME_STATE_SAVE_MAX_RETRIES", "3"))
+# Seconds an action waits for earlier actions of the same session before giving up
+SESSION_ACTION_WAIT_TIMEOUT_SECONDS = float(os.getenv("SESSION_ACTION_WAIT_TIMEOUT_SECONDS", "60"))
+# Upper bound in seconds on the AI (Dify) part of a single action, retries included
+DIFY_ACTION_TIMEOUT_SECONDS = float(os.getenv("DIFY_ACTION_TIMEOUT_SECONDS", "45"))
+# Generate every character's monologue in parallel as soon as an act starts
+MONOLOGUE_PREFETCH_ENABLED = os.getenv("MONOLOGUE_PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+# Maximum number of prefetched monologues kept across all sessions
+MONOLOGUE_PREFETCH_MAX_ENTRIES = int(os.getenv("MONOLOGUE_PREFETCH_MAX_ENTRIES", "512"))
+# Maximum number of actions accepted in one batch action request
+BATCH_ACTION_MAX_SIZE = int(os.getenv("BATCH_ACTION_MAX_SIZE", "10"))
+# Push a compact event to the session's WebSocket/SSE subscribers after every committed state change
+GAME_EVENTS_ENABLED = os.getenv("GAME_EVENTS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Undelivered events kept per subscriber; a slower subscriber gets a single "resync" event instead
+GAME_EVENTS_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("GAME_EVENTS_SUBSCRIBER_QUEUE_SIZE", "64"))
+# Seconds without events after which a keep-alive ping is sent to subscribers
+GAME_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("GAME_EVENTS_HEARTBEAT_SECONDS", "25"))
 
 # 数据库配置
 # SQLite 数据库连接字符串，数据库文件存储在项目根目录
-DATABASE_URL = "sqlite:///./game_database.db"
\ No newline at end of file
+DATABASE_URL = "sqlite:///./game_database.db"
+# 异步数据库连接字符串（同一数据库文件，使用 aiosqlite 驱动），供 async 路由使用
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+# SQLite 使用 WAL 日志模式：读操作不再被写操作阻塞，写事务提交更快
+SQLITE_WAL_ENABLED = os.getenv("SQLITE_WAL_ENABLED", "true").lower() in ("1", "true", "yes")
+# SQLite 同步级别（OFF / NORMAL / FULL / EXTRA）；WAL 模式下 NORMAL 不会损坏数据库，只可能丢失最后几次提交
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+# 数据库被锁时等待的毫秒数，超时后才报 "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# 内存映射读取的字节数上限（0 表示不使用 mmap）
+SQLITE_MMAP_SIZE_BYTES = int(os.getenv("SQLITE_MMAP_SIZE_BYTES", str(256 * 1024 * 1024)))
+# 每个连接的页缓存大小（KiB）
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+# 连接池常驻连接数
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+# 连接池在常驻连接之外最多临时创建的连接数
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
+# 从连接池获取连接的最长等待秒数
+DATABASE_POOL_TIMEOUT_SECONDS = float(os.getenv("DATABASE_POOL_TIMEOUT_SECONDS", "30"))
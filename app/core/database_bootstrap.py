@@ -0,0 +1,169 @@
+"""
+数据库引擎初始化
+
+默认的 SQLite 连接使用回滚日志（DELETE 模式）：写事务持有整个数据库的锁，
+多个线程并发保存游戏状态时互相排队，状态查询也会被正在进行的写操作阻塞。
+本模块统一创建同步 / 异步引擎，并在每个新连接上设置：
+- journal_mode=WAL：读写互不阻塞，提交只需追加 WAL 文件
+- synchronous：WAL 模式下默认 NORMAL，提交时不再每次 fsync
+- busy_timeout：写锁冲突时等待而不是立即报 "database is locked"
+- mmap_size / cache_size：减少读取时的系统调用与重复解析页
+
+连接池按数据库类型选择：文件数据库使用 QueuePool（异步为 AsyncAdaptedQueuePool），
+连接与其 PRAGMA 设置可以复用；内存数据库使用 StaticPool，所有线程共享同一个连接，
+否则每个连接看到的都是一个新的空数据库。
+"""
+
+import logging
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+
+from app.core.config import (
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_TIMEOUT_SECONDS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE_BYTES,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_WAL_ENABLED,
+)
+from app.core.json_backend import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+_SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def is_sqlite_url(url: str) -> bool:
+    """是否为 SQLite 连接字符串（包括 aiosqlite 驱动）"""
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_memory_database(url: str) -> bool:
+    """是否为 SQLite 内存数据库"""
+    parsed = make_url(url)
+    return parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory"
+
+
+def sqlite_pragmas(in_memory: bool = False) -> Dict[str, Any]:
+    """
+    根据配置生成每个连接要执行的 PRAGMA
+
+    Args:
+        in_memory: 是否为内存数据库（内存数据库不支持 WAL 与 mmap）
+
+    Returns:
+        Dict[str, Any]: PRAGMA 名称到取值的映射（按执行顺序）
+    """
+    synchronous = SQLITE_SYNCHRONOUS if SQLITE_SYNCHRONOUS in _SYNCHRONOUS_LEVELS else "NORMAL"
+    pragmas: Dict[str, Any] = {"busy_timeout": max(SQLITE_BUSY_TIMEOUT_MS, 0)}
+    if SQLITE_WAL_ENABLED and not in_memory:
+        pragmas["journal_mode"] = "WAL"
+    pragmas["synchronous"] = synchronous
+    # 负数表示以 KiB 为单位
+    pragmas["cache_size"] = -max(SQLITE_CACHE_SIZE_KB, 0)
+    if not in_memory:
+        pragmas["mmap_size"] = max(SQLITE_MMAP_SIZE_BYTES, 0)
+    return pragmas
+
+
+def install_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]) -> None:
+    """
+    在引擎创建的每个新连接上执行 PRAGMA
+
+    Args:
+        engine: 同步引擎（异步引擎传入其 sync_engine）
+        pragmas: 要执行的 PRAGMA
+    """
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _pool_options(url: str, queue_pool_class) -> Dict[str, Any]:
+    if is_memory_database(url):
+        return {"poolclass": StaticPool}
+    return {
+        "poolclass": queue_pool_class,
+        "pool_size": DATABASE_POOL_SIZE,
+        "max_overflow": DATABASE_MAX_OVERFLOW,
+        "pool_timeout": DATABASE_POOL_TIMEOUT_SECONDS,
+    }
+
+
+def create_database_engine(url: str) -> Engine:
+    """
+    创建同步数据库引擎
+
+    Args:
+        url: 数据库连接字符串
+
+    Returns:
+        Engine: 配置好连接池与 PRAGMA 的引擎
+    """
+    if not is_sqlite_url(url):
+        return create_engine(url, json_serializer=dumps, json_deserializer=loads)
+
+    engine = create_engine(
+        url,
+        # 允许连接在线程池的不同线程间使用；timeout 与 busy_timeout 保持一致
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        json_serializer=dumps,
+        json_deserializer=loads,
+        **_pool_options(url, QueuePool),
+    )
+    install_sqlite_pragmas(engine, sqlite_pragmas(is_memory_database(url)))
+    return engine
+
+
+def create_async_database_engine(url: str) -> AsyncEngine:
+    """
+    创建异步数据库引擎
+
+    Args:
+        url: 异步数据库连接字符串（如 sqlite+aiosqlite://）
+
+    Returns:
+        AsyncEngine: 配置好连接池与 PRAGMA 的异步引擎
+    """
+    if not is_sqlite_url(url):
+        return create_async_engine(url, json_serializer=dumps, json_deserializer=loads)
+
+    engine = create_async_engine(
+        url,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        json_serializer=dumps,
+        json_deserializer=loads,
+        **_pool_options(url, AsyncAdaptedQueuePool),
+    )
+    install_sqlite_pragmas(engine.sync_engine, sqlite_pragmas(is_memory_database(url)))
+    return engine
+
+
+def database_stats(engine: Engine) -> Dict[str, Any]:
+    """
+    返回引擎的连接池状态与 PRAGMA 配置（用于运行指标）
+
+    Args:
+        engine: 同步引擎
+
+    Returns:
+        Dict[str, Any]: 连接池类型、连接池状态与 PRAGMA 配置
+    """
+    stats: Dict[str, Any] = {
+        "pool_class": type(engine.pool).__name__,
+        "pool_status": engine.pool.status(),
+    }
+    if is_sqlite_url(str(engine.url)):
+        stats["sqlite_pragmas"] = sqlite_pragmas(is_memory_database(str(engine.url)))
+    return stats
@@ -0,0 +1,41 @@
+"""
+JSON 编解码后端
+
+优先使用 orjson（C 实现，速度约为标准库的数倍），未安装时回退到标准库 json。
+数据库 JSON 列与游戏状态编解码共用此模块。
+
+orjson 默认拒绝非字符串的字典键，这里开启 OPT_NON_STR_KEYS，使其与标准库一致地
+把 int 等键转换为字符串，两种实现对同一数据的结果相同。
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+# 与 json.dumps 一致：允许 int / float / bool / None 等非字符串键
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def dumps(obj: Any) -> str:
+    """将对象序列化为 JSON 字符串"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """将对象序列化为 UTF-8 编码的 JSON 字节串"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """将 JSON 字符串或字节串反序列化为对象"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
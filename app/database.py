@@ -1,19 +1,27 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.core.config import DATABASE_URL
+from app.core.config import DATABASE_URL, ASYNC_DATABASE_URL
+from app.core.database_bootstrap import create_async_database_engine, create_database_engine
 
 # 创建数据库引擎
-# connect_args 参数解决 SQLite 多线程访问问题
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# SQLite 连接使用 WAL 等 PRAGMA 与合适的连接池，见 app.core.database_bootstrap
+# JSON 列使用更快的 orjson 后端
+engine = create_database_engine(DATABASE_URL)
 
 # 创建数据库会话工厂
 # autocommit=False: 手动控制事务提交
 # autoflush=False: 手动控制数据刷新到数据库
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步数据库引擎（aiosqlite），与同步引擎访问同一个数据库
+# 供 async def 路由使用，避免数据库 I/O 占用线程池
+async_engine = create_async_database_engine(ASYNC_DATABASE_URL)
+
+# 异步会话工厂
+# expire_on_commit=False: 提交后对象仍可访问，避免在协程外触发延迟加载
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # 创建数据库模型基类
 Base = declarative_base()
 
@@ -26,4 +34,13 @@ def get_db():
     try:
         yield db  # 返回数据库会话
     finally:
-        db.close()  # 请求结束后关闭会话
\ No newline at end of file
+        db.close()  # 请求结束后关闭会话
+
+
+async def get_async_db():
+    """
+    获取异步数据库会话的依赖注入函数
+    用于 async def 路由，每个请求使用独立的 AsyncSession
+    """
+    async with AsyncSessionLocal() as db:
+        yield db  # 返回异步数据库会话，请求结束后自动关闭
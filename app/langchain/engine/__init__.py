@@ -3,12 +3,13 @@ LangGraph-based game engine for murder mystery orchestration.
 
 This module provides:
 - GameEngine: Main orchestration class
+- get_game_engine: Per-request engine factory sharing the compiled graph and tools
 - Game phase nodes and transitions
 - State graph definition and execution
 """
 
-from .game_engine import GameEngine
+from .game_engine import GameEngine, get_game_engine
 from .nodes import GamePhaseNodes
 from .graph import create_game_graph
 
-__all__ = ["GameEngine", "GamePhaseNodes", "create_game_graph"]
+__all__ = ["GameEngine", "get_game_engine", "GamePhaseNodes", "create_game_graph"]
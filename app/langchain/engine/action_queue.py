@@ -0,0 +1,239 @@
+"""
+Per-session action serialization for the game engine.
+
+This module provides the SessionActionQueue class that runs the actions of one
+game session strictly one at a time, in arrival order, while actions of
+different sessions run in parallel. Overlapping requests for a session
+(double-clicks, AI players, reconnects) wait in a FIFO instead of racing.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+from app.core.config import SESSION_ACTION_WAIT_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ActionQueueTimeout(Exception):
+    """Raised when an action waited too long for its session's turn."""
+    pass
+
+
+class _SessionLane:
+    """FIFO mutex for a single session."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.busy = False
+        self.waiters: Deque[threading.Event] = deque()
+        # Holder plus waiters; guarded by the queue's registry lock
+        self.depth = 0
+
+
+class _AsyncClaim:
+    """Hands a lane acquired off the event loop to its awaiting task, unless that task gave up."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lane: Optional[_SessionLane] = None
+        self.abandoned = False
+
+
+class SessionActionQueue:
+    """
+    Serializes actions per session, in arrival order.
+
+    Each session gets its own lane; lanes never share a lock, so one busy
+    session does not delay the others. The registry lock is only held for
+    lane bookkeeping, never while an action waits or runs. Ownership is
+    handed directly from the finishing action to the oldest waiter, which
+    guarantees FIFO order. Lanes are dropped once idle.
+    """
+
+    def __init__(self, wait_timeout: float = SESSION_ACTION_WAIT_TIMEOUT_SECONDS):
+        """
+        Initialize the queue.
+
+        Args:
+            wait_timeout: Default maximum seconds an action waits for its turn
+        """
+        self.wait_timeout = wait_timeout
+        self._lanes: Dict[str, _SessionLane] = {}
+        self._registry_lock = threading.Lock()
+        self.total_actions = 0
+        self.queued_actions = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.peak_depth = 0
+
+    def _checkout(self, session_id: str) -> _SessionLane:
+        with self._registry_lock:
+            lane = self._lanes.get(session_id)
+            if lane is None:
+                lane = _SessionLane()
+                self._lanes[session_id] = lane
+            lane.depth += 1
+            self.peak_depth = max(self.peak_depth, lane.depth)
+            return lane
+
+    def _checkin(self, session_id: str, lane: _SessionLane) -> None:
+        with self._registry_lock:
+            lane.depth -= 1
+            if lane.depth == 0 and self._lanes.get(session_id) is lane:
+                del self._lanes[session_id]
+
+    def _wait_turn(self, session_id: str, lane: _SessionLane, timeout: float) -> float:
+        """Block until the lane is ours; returns the seconds waited."""
+        with lane.lock:
+            if not lane.busy:
+                lane.busy = True
+                return 0.0
+            turn = threading.Event()
+            lane.waiters.append(turn)
+
+        started = time.monotonic()
+        if not turn.wait(timeout):
+            with lane.lock:
+                # The lane may have been handed to us right as the wait expired
+                if not turn.is_set():
+                    lane.waiters.remove(turn)
+                    raise ActionQueueTimeout(
+                        f"Timed out after {timeout:.1f}s waiting for session {session_id}"
+                    )
+        return time.monotonic() - started
+
+    def _release(self, lane: _SessionLane) -> None:
+        with lane.lock:
+            if lane.waiters:
+                # Hand over directly so no newcomer can jump the queue
+                lane.waiters.popleft().set()
+            else:
+                lane.busy = False
+
+    def _acquire(self, session_id: str, timeout: Optional[float]) -> _SessionLane:
+        lane = self._checkout(session_id)
+        try:
+            waited = self._wait_turn(session_id, lane, self.wait_timeout if timeout is None else timeout)
+        except ActionQueueTimeout:
+            self._checkin(session_id, lane)
+            with self._registry_lock:
+                self.timeouts += 1
+            logger.warning(f"Action for session {session_id} timed out in queue")
+            raise
+
+        with self._registry_lock:
+            self.total_actions += 1
+            if waited > 0:
+                self.queued_actions += 1
+                self.total_wait_seconds += waited
+        return lane
+
+    def _acquire_claim(self, session_id: str, timeout: Optional[float], claim: _AsyncClaim) -> _SessionLane:
+        lane = self._acquire(session_id, timeout)
+        with claim.lock:
+            if not claim.abandoned:
+                claim.lane = lane
+                return lane
+        # The awaiting task was cancelled while we waited; pass the turn on
+        self._finish(session_id, lane)
+        return lane
+
+    def _abandon_claim(self, session_id: str, claim: _AsyncClaim) -> None:
+        with claim.lock:
+            claim.abandoned = True
+            lane, claim.lane = claim.lane, None
+        if lane is not None:
+            # Acquired just before the cancellation reached the task
+            self._finish(session_id, lane)
+
+    def _finish(self, session_id: str, lane: _SessionLane) -> None:
+        self._release(lane)
+        self._checkin(session_id, lane)
+
+    @contextmanager
+    def session_turn(self, session_id: str, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Run the enclosed block as the session's only active action.
+
+        Args:
+            session_id: Game session ID
+            timeout: Maximum seconds to wait for the turn (defaults to wait_timeout)
+
+        Raises:
+            ActionQueueTimeout: If the turn did not come in time
+        """
+        lane = self._acquire(session_id, timeout)
+        try:
+            yield
+        finally:
+            self._finish(session_id, lane)
+
+    @asynccontextmanager
+    async def asession_turn(self, session_id: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Async variant of session_turn; waiting happens off the event loop.
+
+        Cancelling a waiting task (e.g. a disconnected stream client) is
+        safe: the waiting thread keeps its place in the queue and passes the
+        turn on as soon as it gets it.
+
+        Args:
+            session_id: Game session ID
+            timeout: Maximum seconds to wait for the turn (defaults to wait_timeout)
+
+        Raises:
+            ActionQueueTimeout: If the turn did not come in time
+        """
+        claim = _AsyncClaim()
+        try:
+            lane = await asyncio.to_thread(self._acquire_claim, session_id, timeout, claim)
+        except asyncio.CancelledError:
+            self._abandon_claim(session_id, claim)
+            raise
+        try:
+            yield
+        finally:
+            self._finish(session_id, lane)
+
+    def depth(self, session_id: str) -> int:
+        """Number of actions running or waiting for a session."""
+        with self._registry_lock:
+            lane = self._lanes.get(session_id)
+            return lane.depth if lane else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depths and wait counters."""
+        with self._registry_lock:
+            depths = [lane.depth for lane in self._lanes.values()]
+            return {
+                "active_sessions": len(depths),
+                "queued_actions_now": sum(depth - 1 for depth in depths),
+                "max_depth_now": max(depths, default=0),
+                "peak_depth": self.peak_depth,
+                "total_actions": self.total_actions,
+                "queued_actions": self.queued_actions,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (
+                    self.total_wait_seconds / self.queued_actions * 1000 if self.queued_actions else 0.0
+                ),
+            }
+
+
+_session_action_queue: Optional[SessionActionQueue] = None
+_session_action_queue_lock = threading.Lock()
+
+
+def get_session_action_queue() -> SessionActionQueue:
+    """Return the process-wide session action queue."""
+    global _session_action_queue
+    if _session_action_queue is None:
+        with _session_action_queue_lock:
+            if _session_action_queue is None:
+                _session_action_queue = SessionActionQueue()
+    return _session_action_queue
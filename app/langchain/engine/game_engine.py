@@ -6,18 +6,36 @@ for the murder mystery game, managing state, orchestrating AI tools, and
 handling the game flow through LangGraph.
 """
 
+import asyncio
 import logging
+import threading
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, AsyncIterator, Callable, Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.langchain.state.models import GameState, PlayerState, CharacterState, GamePhase, PlayerRole
-from app.langchain.state.manager import StateManager
+from app.langchain.state.models import GameState, PlayerState, CharacterState, GamePhase, PlayerRole, QnAEntry
+from app.langchain.state.manager import StateManager, StateConflictError
 from app.langchain.tools.dify_tools import DifyMonologueTool, DifyQnATool
 from app.langchain.engine.graph import create_game_graph, GameGraphState
+from app.langchain.engine.action_queue import ActionQueueTimeout, get_session_action_queue
+from app.langchain.engine.monologue_prefetch import get_monologue_prefetcher
+from app.langchain.engine.qna_context import get_qna_context_builder
+from app.langchain.engine.qna_summary import get_summary_refresher
 from app.models.database_models import Script
-from app.database import get_db
+from app.services.dify_service import is_fallback_response
+from app.services.game_events import get_game_event_bus
+from app.database import SessionLocal, get_db
+from app.core.config import (
+    GAME_STATE_SAVE_MAX_RETRIES,
+    DIFY_ACTION_TIMEOUT_SECONDS,
+    BATCH_ACTION_MAX_SIZE,
+    DIFY_QNA_MAX_CONCURRENCY,
+    DIFY_MONOLOGUE_MAX_CONCURRENCY,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +45,103 @@ class GameEngineError(Exception):
     pass
 
 
+class EngineComponents:
+    """
+    Request-independent parts of the game engine.
+
+    Holds the compiled LangGraph workflow and the Dify tool instances, which
+    are stateless and can be shared by every GameEngine in the process.
+    """
+
+    def __init__(self, graph: Any, monologue_tool: DifyMonologueTool, qna_tool: DifyQnATool):
+        self.graph = graph
+        self.monologue_tool = monologue_tool
+        self.qna_tool = qna_tool
+
+    @classmethod
+    def build(cls) -> "EngineComponents":
+        """Build and compile the game graph and create the Dify tools."""
+        return cls(
+            graph=create_game_graph().compile(),
+            monologue_tool=DifyMonologueTool(),
+            qna_tool=DifyQnATool()
+        )
+
+
+_shared_components: Optional[EngineComponents] = None
+_shared_components_lock = threading.Lock()
+
+
+def get_engine_components() -> EngineComponents:
+    """Return the process-wide engine components, building them on first use."""
+    global _shared_components
+    if _shared_components is None:
+        with _shared_components_lock:
+            if _shared_components is None:
+                _shared_components = EngineComponents.build()
+                logger.info("Game engine components built")
+    return _shared_components
+
+
+# Error returned when an action could not get its turn on a busy session
+SESSION_BUSY_ERROR = "Game session is busy, please retry"
+
+_ai_call_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_ai_call_executor() -> ThreadPoolExecutor:
+    """Return the worker pool used for deadline-bounded blocking Dify calls."""
+    global _ai_call_executor
+    if _ai_call_executor is None:
+        with _shared_components_lock:
+            if _ai_call_executor is None:
+                _ai_call_executor = ThreadPoolExecutor(
+                    max_workers=DIFY_QNA_MAX_CONCURRENCY + DIFY_MONOLOGUE_MAX_CONCURRENCY,
+                    thread_name_prefix="dify-call"
+                )
+    return _ai_call_executor
+
+
+async def _iterate_with_deadline(chunks: AsyncIterator[str], timeout: float) -> AsyncIterator[str]:
+    """Re-yield ``chunks`` until exhausted; raise asyncio.TimeoutError once ``timeout`` seconds pass."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    """Yield an already generated text as one chunk."""
+    yield text
+
+
+def get_game_engine(
+    db_session: Optional[Session] = None,
+    async_db_session: Optional[AsyncSession] = None
+) -> "GameEngine":
+    """
+    Create a GameEngine bound to a database session using the shared components.
+
+    This is what request handlers should use: only the lightweight
+    per-request state (DB session, StateManager) is created per call.
+
+    Args:
+        db_session: Database session for state persistence
+        async_db_session: Async database session, for ``async def`` handlers
+
+    Returns:
+        GameEngine instance
+    """
+    return GameEngine(db_session, components=get_engine_components(), async_db_session=async_db_session)
+
+
 class GameEngine:
     """
     Main game engine for murder mystery orchestration.
@@ -35,20 +150,35 @@ class GameEngine:
     AI tool invocation, and player interactions through a LangGraph workflow.
     """
     
-    def __init__(self, db_session: Optional[Session] = None):
+    def __init__(
+        self,
+        db_session: Optional[Session] = None,
+        components: Optional[EngineComponents] = None,
+        async_db_session: Optional[AsyncSession] = None
+    ):
         """
         Initialize the game engine.
         
         Args:
             db_session: Optional database session for state persistence
+            components: Optional shared graph and tools (see get_game_engine).
+                A private set is built when omitted.
+            async_db_session: Optional async database session used by the
+                ``a``-prefixed read methods
         """
         self.db_session = db_session
-        self.state_manager = StateManager(db_session)
-        self.graph = create_game_graph()
-        self.monologue_tool = DifyMonologueTool()
-        self.qna_tool = DifyQnATool()
+        self.state_manager = StateManager(db_session, async_db_session=async_db_session)
+        components = components or EngineComponents.build()
+        self.graph = components.graph
+        self.monologue_tool = components.monologue_tool
+        self.qna_tool = components.qna_tool
+        self.action_queue = get_session_action_queue()
+        self.monologue_prefetcher = get_monologue_prefetcher()
+        self.qna_context_builder = get_qna_context_builder()
+        self.summary_refresher = get_summary_refresher()
+        self.event_bus = get_game_event_bus()
         
-        logger.info("GameEngine initialized")
+        logger.debug("GameEngine initialized")
     
     def start_new_game(self, script_id: str, user_id: Optional[str] = None, ai_characters: Optional[List[Dict[str, str]]] = None) -> GameState:
         """
@@ -104,6 +234,9 @@ class GameEngine:
             )
             
             logger.info(f"Game {game_id} started successfully")
+
+            # Act 1 monologues are generated while players are still joining
+            self._prefetch_monologues(game_state, game_state.current_act, user_id or "system")
             return game_state
             
         except Exception as e:
@@ -131,7 +264,40 @@ class GameEngine:
         except Exception as e:
             logger.error(f"Failed to load game for session {session_id}: {e}")
             return None
+
+    async def aload_game(self, session_id: str, expected_version: Optional[int] = None) -> Optional[GameState]:
+        """
+        Async version of load_game, using the async database session.
+
+        ``expected_version`` is the stored version when the caller just read
+        it; a cached state at another version is not used.
+        """
+        try:
+            game_state = await self.state_manager.aload_game_state(session_id, expected_version)
+            if game_state:
+                logger.info(f"Loaded game {game_state.game_id}")
+            else:
+                logger.warning(f"Game not found for session {session_id}")
+            return game_state
+
+        except Exception as e:
+            logger.error(f"Failed to load game for session {session_id}: {e}")
+            return None
     
+    def delete_game(self, session_id: str) -> bool:
+        """
+        Delete a game session and the per-session data kept in memory for it.
+
+        Args:
+            session_id: Session ID to delete
+
+        Returns:
+            True if the session was deleted, False otherwise
+        """
+        deleted = self.state_manager.delete_game_state(session_id)
+        self._release_session(session_id)
+        return deleted
+
     def add_player(self, session_id: str, player_id: str, character_id: Optional[str] = None) -> bool:
         """
         Add a player to the game.
@@ -144,30 +310,41 @@ class GameEngine:
         Returns:
             True if successful, False otherwise
         """
+        try:
+            with self.action_queue.session_turn(session_id):
+                return self._add_player_in_turn(session_id, player_id, character_id)
+        except ActionQueueTimeout:
+            logger.warning(f"Session {session_id} busy, could not add player {player_id}")
+            return False
+
+    def _add_player_in_turn(self, session_id: str, player_id: str, character_id: Optional[str]) -> bool:
+        """Add a player while holding the session's turn."""
         try:
             game_state = self.load_game(session_id)
             if not game_state:
                 return False
             
-            # Create player state
-            player_state = PlayerState(
-                player_id=player_id,
-                character_id=character_id
-            )
-            
-            # Add to game state
-            game_state.players[player_id] = player_state
-            game_state.turn_order.append(player_id)
-            
-            # Add log entry
-            game_state.add_public_log_entry(
-                "player_joined",
-                f"玩家 {player_id} 加入游戏",
-                related_player_id=player_id
-            )
+            def add(state: GameState) -> Dict[str, Any]:
+                # Create player state
+                player_state = PlayerState(
+                    player_id=player_id,
+                    character_id=character_id
+                )
+                
+                # Add to game state
+                state.players[player_id] = player_state
+                state.turn_order.append(player_id)
+                
+                # Add log entry
+                state.add_public_log_entry(
+                    "player_joined",
+                    f"玩家 {player_id} 加入游戏",
+                    related_player_id=player_id
+                )
+                return {"success": True}
             
             # Save updated state
-            success = self.state_manager.save_game_state(game_state)
+            success = "error" not in self._commit_action(session_id, game_state, add)
             if success:
                 logger.info(f"Player {player_id} added to game {game_state.game_id}")
             
@@ -188,6 +365,18 @@ class GameEngine:
         Returns:
             Result dictionary with response and updated state info
         """
+        try:
+            # One action per session at a time, in arrival order
+            with self.action_queue.session_turn(session_id):
+                return self._process_action_in_turn(session_id, action)
+        except ActionQueueTimeout:
+            return {"error": SESSION_BUSY_ERROR}
+        except Exception as e:
+            logger.error(f"Failed to process action for session {session_id}: {e}")
+            return {"error": f"Failed to process action: {e}"}
+
+    def _process_action_in_turn(self, session_id: str, action: Dict[str, Any]) -> Dict[str, Any]:
+        """Process an action while holding the session's turn."""
         try:
             # Load current game state
             game_state = self.load_game(session_id)
@@ -196,161 +385,726 @@ class GameEngine:
             
             logger.info(f"Processing action for game {game_state.game_id}: {action.get('action_type', 'unknown')}")
             
-            # Prepare graph state
-            graph_state = GameGraphState({
-                "game_state": game_state,
-                "messages": [],
-                "current_action": action,
-                "error_message": "",
-                "next_phase": game_state.current_phase
-            })
-            
-            # Process action based on type
+            # Process action based on type. AI actions call Dify exactly once
+            # here; only the resulting state mutation is retried on conflicts.
             action_type = action.get("action_type")
             
             if action_type == "monologue":
-                result = self._process_monologue_action(graph_state, action)
+                generated = self._generate_monologue(game_state, action)
+                if "error" in generated:
+                    return generated
+                mutate = lambda state: self._apply_monologue_result(
+                    state, action.get("character_id"), generated["text"]
+                )
             elif action_type == "qna":
-                result = self._process_qna_action(graph_state, action)
-            elif action_type == "mission_submit":
-                result = self._process_mission_action(graph_state, action)
-            elif action_type == "advance_phase":
-                result = self._process_phase_advance(graph_state, action)
-            elif action_type == "advance_act":
-                result = self._process_act_advance(graph_state, action)
-            elif action_type == "final_choice":
-                result = self._process_final_choice(graph_state, action)
+                generated = self._generate_qna_answer(game_state, action)
+                if "error" in generated:
+                    return generated
+                mutate = lambda state: self._apply_validated_qna_result(state, action, generated["text"])
+            elif action_type in self._STATE_ACTION_HANDLERS:
+                handler = getattr(self, self._STATE_ACTION_HANDLERS[action_type])
+                mutate = lambda state: handler(self._build_graph_state(state, action), action)
             else:
-                result = {"error": f"Unknown action type: {action_type}"}
-            
-            # Save updated game state
-            if "error" not in result:
-                self.state_manager.save_game_state(graph_state["game_state"])
+                return {"error": f"Unknown action type: {action_type}"}
             
+            # Apply and save the updated game state
+            result = self._commit_action(session_id, game_state, mutate)
+            if action_type == "advance_act" and result.get("success"):
+                self._prefetch_monologues(game_state, result["new_act"], action.get("user_id", "system"))
+                self._schedule_summary_refresh(session_id, result["new_act"] - 1)
             return result
             
         except Exception as e:
             logger.error(f"Failed to process action for session {session_id}: {e}")
             return {"error": f"Failed to process action: {e}"}
     
-    def _process_monologue_action(self, graph_state: GameGraphState, action: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a character monologue action."""
+    def process_actions_batch(self, session_id: str, actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Process several monologue / Q&A actions with one load and one save.
+
+        All actions are validated up front (Q&A limits are counted across the
+        whole batch), their Dify calls run concurrently, and every generated
+        result is applied in a single state save.
+
+        Args:
+            session_id: Game session ID
+            actions: Action dictionaries, each with action_type "monologue" or "qna"
+
+        Returns:
+            ``{"success", "results", "succeeded", "failed", "current_phase"}``
+            where ``results`` holds one result or error dictionary per action,
+            in request order; or an error dictionary for the whole batch
+        """
+        if not actions:
+            return {"error": "Batch contains no actions"}
+        if len(actions) > BATCH_ACTION_MAX_SIZE:
+            return {"error": f"Batch contains {len(actions)} actions, the maximum is {BATCH_ACTION_MAX_SIZE}"}
+
         try:
-            character_id = action.get("character_id")
-            if not character_id:
-                return {"error": "Character ID required for monologue"}
-            
-            game_state = graph_state["game_state"]
+            with self.action_queue.session_turn(session_id):
+                return self._process_actions_batch_in_turn(session_id, actions)
+        except ActionQueueTimeout:
+            return {"error": SESSION_BUSY_ERROR}
+        except Exception as e:
+            logger.error(f"Failed to process action batch for session {session_id}: {e}")
+            return {"error": f"Failed to process actions: {e}"}
 
-            # Determine model name: use character's bound model or fallback to action/default
-            model_name = action.get("model_name", "gpt-3.5-turbo")
-            if character_id in game_state.characters:
-                character = game_state.characters[character_id]
-                if character.model_name:
-                    model_name = character.model_name
+    def _process_actions_batch_in_turn(self, session_id: str, actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Process an action batch while holding the session's turn."""
+        game_state = self.load_game(session_id)
+        if not game_state:
+            return {"error": "Game session not found"}
 
-            # Generate monologue using Dify tool
-            monologue_raw_text = self.monologue_tool._run(
+        logger.info(f"Processing batch of {len(actions)} actions for game {game_state.game_id}")
+
+        # Validate everything before the first Dify call
+        results: List[Optional[Dict[str, Any]]] = [None] * len(actions)
+        planned_qna: Dict[str, int] = {}
+        futures: Dict[int, Future] = {}
+        deadline = time.monotonic() + DIFY_ACTION_TIMEOUT_SECONDS
+        for index, action in enumerate(actions):
+            error = self._validate_batch_action(game_state, action, planned_qna)
+            if error:
+                results[index] = {"error": error}
+            else:
+                # History is built here, not on the worker threads that share game_state
+                context = None
+                if action.get("action_type") == "qna":
+                    context = self._build_qna_context(game_state, action.get("character_id"), action.get("question"))
+                futures[index] = _get_ai_call_executor().submit(
+                    self._generate_batch_text, game_state, action, context, deadline
+                )
+
+        # The whole batch shares one deadline
+        _, pending = wait(futures.values(), timeout=max(deadline - time.monotonic(), 0))
+        generated: Dict[int, str] = {}
+        for index, future in futures.items():
+            if future in pending:
+                future.cancel()
+                results[index] = {"error": f"AI response timed out after {DIFY_ACTION_TIMEOUT_SECONDS:.0f}s"}
+            elif future.exception() is not None:
+                results[index] = {"error": f"Failed to generate response: {future.exception()}"}
+            else:
+                generated[index] = future.result()
+
+        current_phase = game_state.current_phase
+        if generated:
+            def mutate(state: GameState) -> Dict[str, Any]:
+                applied = {}
+                for index, text in generated.items():
+                    action = actions[index]
+                    if action.get("action_type") == "qna":
+                        applied[index] = self._apply_validated_qna_result(state, action, text)
+                    else:
+                        applied[index] = self._apply_monologue_result(state, action.get("character_id"), text)
+                return {"applied": applied, "current_phase": state.current_phase}
+
+            committed = self._commit_action(session_id, game_state, mutate)
+            if "error" in committed:
+                for index in generated:
+                    results[index] = {"error": committed["error"]}
+            else:
+                for index, result in committed["applied"].items():
+                    results[index] = result
+                current_phase = committed["current_phase"]
+
+        succeeded = sum(1 for result in results if "error" not in result)
+        return {
+            "success": succeeded > 0,
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "current_phase": current_phase
+        }
+
+    # Action types that can be combined in one batch
+    _BATCH_ACTION_TYPES = ("monologue", "qna")
+
+    def _validate_batch_action(
+        self,
+        game_state: GameState,
+        action: Dict[str, Any],
+        planned_qna: Dict[str, int]
+    ) -> Optional[str]:
+        """
+        Validate one batch action; return an error message or None.
+
+        ``planned_qna`` counts the questions per character already accepted
+        in this batch, so that several questions to one character cannot
+        exceed the per-act limit together.
+        """
+        action_type = action.get("action_type")
+        if action_type not in self._BATCH_ACTION_TYPES:
+            return f"Action type not supported in a batch: {action_type}"
+
+        character_id = action.get("character_id")
+        if action_type == "monologue":
+            return None if character_id else "Character ID required for monologue"
+
+        error = self._validate_qna_action(game_state, action)
+        if error:
+            return error
+
+        asked = game_state.get_qna_count_for_character_act(character_id, game_state.current_act)
+        if asked + planned_qna.get(character_id, 0) >= game_state.max_qna_per_character_per_act:
+            return f"已达到角色 {character_id} 在第{game_state.current_act}幕的提问上限"
+        planned_qna[character_id] = planned_qna.get(character_id, 0) + 1
+        return None
+
+    def _generate_batch_text(self, game_state: GameState, action: Dict[str, Any],
+                             context: Optional[Dict[str, Any]] = None,
+                             deadline: Optional[float] = None) -> str:
+        """Blocking Dify call for one validated batch action (runs on the AI call pool)."""
+        character_id = action.get("character_id")
+        model_name = self._resolve_model_name(game_state, character_id, action)
+        user_id = action.get("user_id", "system")
+
+        if action.get("action_type") == "qna":
+            return self.qna_tool._run(
                 char_id=character_id,
                 act_num=game_state.current_act,
+                query=action.get("question"),
                 model_name=model_name,
-                user_id=action.get("user_id", "system")
+                user_id=user_id,
+                script_id=game_state.script_id,
+                deadline=deadline,
+                **(context or {})
             )
 
-            # 智能分段处理
-            sentences = [s.strip() for s in monologue_raw_text.split('\n\n') if s.strip()]
+        prefetched = self._take_prefetched_monologue(game_state, character_id, model_name)
+        if prefetched is not None:
+            return prefetched
+        return self.monologue_tool._run(
+            char_id=character_id,
+            act_num=game_state.current_act,
+            model_name=model_name,
+            user_id=user_id,
+            script_id=game_state.script_id,
+            deadline=deadline
+        )
 
-            # 移除AI常见的结束语
-            if sentences and "我的话已经说完了" in sentences[-1]:
-                sentences.pop()
+    # Action types that only mutate state, mapped to their handler methods
+    _STATE_ACTION_HANDLERS = {
+        "mission_submit": "_process_mission_action",
+        "advance_phase": "_process_phase_advance",
+        "advance_act": "_process_act_advance",
+        "final_choice": "_process_final_choice",
+    }
 
-            # 如果没有有效句子，使用原始文本作为单个句子
-            if not sentences:
-                sentences = [monologue_raw_text.strip()]
+    def _build_graph_state(self, game_state: GameState, action: Dict[str, Any]) -> GameGraphState:
+        """Wrap a game state for the action handlers."""
+        return GameGraphState({
+            "game_state": game_state,
+            "messages": [],
+            "current_action": action,
+            "error_message": "",
+            "next_phase": game_state.current_phase
+        })
 
-            # Add to public log (使用原始文本)
-            game_state.add_public_log_entry(
-                "monologue",
-                f"【{character_id}】{monologue_raw_text}",
-                related_character_id=character_id
-            )
+    def _commit_action(
+        self,
+        session_id: str,
+        game_state: GameState,
+        mutate: Callable[[GameState], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Apply a state mutation and save it, retrying on concurrent updates.
 
-            return {
-                "success": True,
-                "monologue_sentences": sentences,  # 替换原来的 "monologue" 字段
-                "character_id": character_id,
-                "current_phase": game_state.current_phase
+        ``mutate`` must be a pure state change (no AI calls): when the save
+        loses a version race, the state is reloaded and ``mutate`` is applied
+        again to the fresh state.
+
+        Args:
+            session_id: Game session ID
+            game_state: Freshly loaded game state
+            mutate: Callable applying the action and returning its result
+
+        Returns:
+            The action result, or an error dictionary
+        """
+        for attempt in range(GAME_STATE_SAVE_MAX_RETRIES + 1):
+            result = mutate(game_state)
+            if "error" in result:
+                return result
+
+            # The entries this commit adds, for the push event (only when someone listens)
+            new_entries = game_state.unsaved_history() if self.event_bus.has_subscribers(session_id) else None
+            try:
+                if not self.state_manager.save_game_state(game_state):
+                    return {"error": "Failed to save game state"}
+                if new_entries is not None:
+                    self._publish_commit(game_state, new_entries)
+                if game_state.current_phase == GamePhase.COMPLETED:
+                    self._release_session(session_id)
+                return result
+            except StateConflictError:
+                logger.info(f"Concurrent update on session {session_id}, retrying (attempt {attempt + 1})")
+                game_state = self.load_game(session_id)
+                if not game_state:
+                    return {"error": "Game session not found"}
+
+        logger.warning(f"Giving up on session {session_id} after {GAME_STATE_SAVE_MAX_RETRIES} conflicting saves")
+        return {"error": "Game session is busy, please retry"}
+
+    def _release_session(self, session_id: str) -> None:
+        """Drop the prefetched monologues and Q&A context buffers of a finished or deleted game."""
+        self.monologue_prefetcher.discard_session(session_id)
+        self.qna_context_builder.discard_session(session_id)
+
+    def _publish_commit(self, game_state: GameState, new_entries: Dict[str, list]) -> None:
+        """Push a compact event describing a committed state change to the session's subscribers."""
+        try:
+            event: Dict[str, Any] = {
+                "type": "commit",
+                "session_id": game_state.session_id,
+                "version": game_state.version,
+                "current_act": game_state.current_act,
+                "current_phase": getattr(game_state.current_phase, "value", game_state.current_phase),
             }
-            
+            for field, entries in new_entries.items():
+                if entries:
+                    event[field] = [entry.model_dump(mode="json") for entry in entries]
+            self.event_bus.publish(game_state.session_id, event)
         except Exception as e:
-            logger.error(f"Failed to process monologue action: {e}")
-            return {"error": f"Failed to generate monologue: {e}"}
-    
-    def _process_qna_action(self, graph_state: GameGraphState, action: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a Q&A action."""
+            # Subscribers can always fall back to polling the status endpoint
+            logger.warning(f"Failed to publish commit event for session {game_state.session_id}: {e}")
+
+    def _call_ai_tool(self, tool_run: Callable[..., str], **kwargs) -> str:
+        """
+        Run a blocking Dify tool call with an overall deadline.
+
+        The call runs on a shared worker pool so that a slow LLM cannot hold
+        the request (and the session's turn) longer than DIFY_ACTION_TIMEOUT_SECONDS.
+        The deadline is also passed to the tool, so a call that is given up on
+        stops waiting and retrying and frees its pool thread.
+
+        Raises:
+            GameEngineError: If the deadline passes
+        """
+        deadline = time.monotonic() + DIFY_ACTION_TIMEOUT_SECONDS
+        future = _get_ai_call_executor().submit(tool_run, deadline=deadline, **kwargs)
+        try:
+            return future.result(timeout=DIFY_ACTION_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            future.cancel()
+            raise GameEngineError(f"AI response timed out after {DIFY_ACTION_TIMEOUT_SECONDS:.0f}s")
+
+    def _generate_monologue(self, game_state: GameState, action: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate a character monologue; returns ``{"text": ...}`` or an error."""
         try:
             character_id = action.get("character_id")
-            question = action.get("question")
-            questioner_id = action.get("questioner_id")
+            if not character_id:
+                return {"error": "Character ID required for monologue"}
             
-            if not all([character_id, question, questioner_id]):
-                return {"error": "Character ID, question, and questioner ID required for Q&A"}
+            model_name = self._resolve_model_name(game_state, character_id, action)
+
+            prefetched = self._take_prefetched_monologue(game_state, character_id, model_name)
+            if prefetched is not None:
+                return {"text": prefetched}
+
+            # Generate monologue using Dify tool
+            monologue_raw_text = self._call_ai_tool(
+                self.monologue_tool._run,
+                char_id=character_id,
+                act_num=game_state.current_act,
+                model_name=model_name,
+                user_id=action.get("user_id", "system"),
+                script_id=game_state.script_id
+            )
+
+            return {"text": monologue_raw_text}
             
-            game_state = graph_state["game_state"]
+        except Exception as e:
+            logger.error(f"Failed to process monologue action: {e}")
+            return {"error": f"Failed to generate monologue: {e}"}
+
+    def _prefetch_monologues(self, game_state: GameState, act_num: int, user_id: str) -> None:
+        """Start generating every character's monologue for an act in the background."""
+        try:
+            characters = {
+                character_id: self._resolve_model_name(game_state, character_id, {})
+                for character_id in game_state.characters
+            }
+            self.monologue_prefetcher.prefetch(
+                game_state.session_id,
+                act_num,
+                characters,
+                self.monologue_tool._run,
+                user_id=user_id,
+                script_id=game_state.script_id
+            )
+        except Exception as e:
+            # Prefetching is an optimization; the monologue actions still work without it
+            logger.warning(f"Failed to prefetch monologues for session {game_state.session_id}: {e}")
+
+    def _take_prefetched_monologue(self, game_state: GameState, character_id: str, model_name: str) -> Optional[str]:
+        """Return the prefetched monologue for a character, waiting for it if still generating."""
+        future = self.monologue_prefetcher.take(
+            game_state.session_id, game_state.current_act, character_id, model_name
+        )
+        if future is None:
+            return None
+        try:
+            text = future.result(timeout=DIFY_ACTION_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(f"Prefetched monologue for {character_id} unavailable, generating it now: {e!r}")
+            return None
+        if is_fallback_response(text):
+            # The background call failed; a fresh attempt may still succeed
+            return None
+        return text
+
+    async def _atake_prefetched_monologue(self, game_state: GameState, character_id: str, model_name: str) -> Optional[str]:
+        """Async variant of _take_prefetched_monologue that does not block the event loop."""
+        future = self.monologue_prefetcher.take(
+            game_state.session_id, game_state.current_act, character_id, model_name
+        )
+        if future is None:
+            return None
+        try:
+            text = await asyncio.wait_for(asyncio.wrap_future(future), timeout=DIFY_ACTION_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(f"Prefetched monologue for {character_id} unavailable, generating it now: {e!r}")
+            return None
+        if is_fallback_response(text):
+            # The background call failed; a fresh attempt may still succeed
+            return None
+        return text
 
-            # Check if Q&A is allowed for this character in current act
-            if not game_state.can_ask_question(character_id, game_state.current_act):
-                return {"error": f"已达到角色 {character_id} 在第{game_state.current_act}幕的提问上限"}
+    def _apply_monologue_result(self, game_state: GameState, character_id: str, monologue_raw_text: str) -> Dict[str, Any]:
+        """Record a generated monologue in the game state and build the action result."""
+        # 智能分段处理
+        sentences = [s.strip() for s in monologue_raw_text.split('\n\n') if s.strip()]
 
-            # Determine model name: use character's bound model or fallback to action/default
-            model_name = action.get("model_name", "gpt-3.5-turbo")
-            if character_id in game_state.characters:
-                character = game_state.characters[character_id]
-                if character.model_name:
-                    model_name = character.model_name
+        # 移除AI常见的结束语
+        if sentences and "我的话已经说完了" in sentences[-1]:
+            sentences.pop()
+
+        # 如果没有有效句子，使用原始文本作为单个句子
+        if not sentences:
+            sentences = [monologue_raw_text.strip()]
+
+        # Add to public log (使用原始文本)
+        game_state.add_public_log_entry(
+            "monologue",
+            f"【{character_id}】{monologue_raw_text}",
+            related_character_id=character_id
+        )
+
+        return {
+            "success": True,
+            "monologue_sentences": sentences,  # 替换原来的 "monologue" 字段
+            "character_id": character_id,
+            "current_phase": game_state.current_phase
+        }
+    
+    def _generate_qna_answer(self, game_state: GameState, action: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate a character's answer; returns ``{"text": ...}`` or an error."""
+        try:
+            error = self._validate_qna_action(game_state, action)
+            if error:
+                return {"error": error}
+
+            character_id = action.get("character_id")
+            model_name = self._resolve_model_name(game_state, character_id, action)
 
             # Generate answer using Dify tool
-            answer = self.qna_tool._run(
+            answer = self._call_ai_tool(
+                self.qna_tool._run,
                 char_id=character_id,
                 act_num=game_state.current_act,
-                query=question,
+                query=action.get("question"),
                 model_name=model_name,
-                user_id=action.get("user_id", "system")
+                user_id=action.get("user_id", "system"),
+                script_id=game_state.script_id,
+                **self._build_qna_context(game_state, character_id, action.get("question"))
             )
             
-            # Add Q&A entry to game state
-            qna_entry = game_state.add_qna_entry(
-                questioner_id=questioner_id,
-                target_character_id=character_id,
-                question=question,
-                answer=answer,
-                is_public=action.get("is_public", True)
-            )
-            
-            # Add to public log if public
-            if qna_entry.is_public:
-                game_state.add_public_log_entry(
-                    "qna",
-                    f"【问】{question}\n【{character_id}答】{answer}",
-                    related_player_id=questioner_id,
-                    related_character_id=character_id
-                )
-            
-            return {
-                "success": True,
-                "question": question,
-                "answer": answer,
-                "character_id": character_id,
-                "questioner_id": questioner_id,
-                "qna_id": qna_entry.id,
-                "remaining_questions": game_state.max_qna_per_character_per_act - game_state.get_qna_count_for_character_act(character_id, game_state.current_act),
-                "current_phase": game_state.current_phase
-            }
+            return {"text": answer}
             
         except Exception as e:
             logger.error(f"Failed to process Q&A action: {e}")
             return {"error": f"Failed to process Q&A: {e}"}
+
+    def _build_qna_context(self, game_state: GameState, character_id: str, question: str) -> Dict[str, Any]:
+        """
+        Token-budgeted game history for a question, as Q&A tool arguments.
+
+        The history is None when there is none or building fails. Answers
+        stay cacheable when the history holds nothing about the character.
+        """
+        try:
+            history, about_character = self.qna_context_builder.build_context(
+                game_state, character_id, question or ""
+            )
+        except Exception as e:
+            logger.warning(f"Failed to build Q&A history for character {character_id}: {e}")
+            return {"history": None, "history_cacheable": False}
+        return {"history": history, "history_cacheable": not about_character}
+
+    def _schedule_summary_refresh(self, session_id: str, through_act: int) -> None:
+        """Fold the Q&A of the acts up to ``through_act`` into the character summaries in the background."""
+        try:
+            self.summary_refresher.schedule(session_id, through_act, self._refresh_character_summaries)
+        except Exception as e:
+            # Summaries only shrink the Q&A context; questions still work without them
+            logger.warning(f"Failed to schedule Q&A summary refresh for session {session_id}: {e}")
+
+    def _refresh_character_summaries(self, session_id: str, through_act: int) -> int:
+        """Background job: update the summaries using a database session of its own."""
+        db = SessionLocal()
+        try:
+            engine = GameEngine(db, components=EngineComponents(self.graph, self.monologue_tool, self.qna_tool))
+            return engine._update_character_summaries(session_id, through_act)
+        finally:
+            db.close()
+
+    def _update_character_summaries(self, session_id: str, through_act: int) -> int:
+        """
+        Fold each character's Q&A of the acts up to ``through_act`` into its rolling summary.
+
+        The summaries are computed from a snapshot without holding the
+        session's turn; only the resulting field updates are committed, as a
+        regular state change retried on concurrent updates.
+
+        Args:
+            session_id: Game session ID
+            through_act: Last finished act
+
+        Returns:
+            Number of characters whose summary was updated
+        """
+        game_state = self.load_game(session_id)
+        if not game_state:
+            return 0
+        summaries = self._build_character_summaries(game_state, through_act)
+        if not summaries:
+            return 0
+
+        def mutate(state: GameState) -> Dict[str, Any]:
+            updated = 0
+            for character_id, summary in summaries.items():
+                character = state.characters.get(character_id)
+                if character is not None and character.qna_summary_act < through_act:
+                    character.qna_summary = summary
+                    character.qna_summary_act = through_act
+                    updated += 1
+            if not updated:
+                # Another refresh got there first; nothing to save
+                return {"error": "Q&A summaries already up to date"}
+            return {"success": True, "updated": updated}
+
+        with self.action_queue.session_turn(session_id):
+            game_state = self.load_game(session_id)
+            if not game_state:
+                return 0
+            result = self._commit_action(session_id, game_state, mutate)
+        if "error" in result:
+            logger.info(f"Q&A summaries of session {session_id} not updated: {result['error']}")
+            return 0
+        logger.info(f"Updated Q&A summaries of {result['updated']} characters in session {session_id} through act {through_act}")
+        return result["updated"]
+
+    def _build_character_summaries(self, game_state: GameState, through_act: int) -> Dict[str, str]:
+        """New summaries of the characters with unsummarized Q&A in the acts up to ``through_act``."""
+        pending: Dict[str, List[QnAEntry]] = {}
+        for entry in game_state.qna_history:
+            character = game_state.characters.get(entry.target_character_id)
+            if character is not None and character.qna_summary_act < entry.act_number <= through_act:
+                pending.setdefault(entry.target_character_id, []).append(entry)
+
+        return {
+            character_id: self.summary_refresher.summarize(
+                character_id, game_state.characters[character_id].qna_summary, entries
+            )
+            for character_id, entries in pending.items()
+        }
+
+    def _validate_qna_action(self, game_state: GameState, action: Dict[str, Any]) -> Optional[str]:
+        """Check Q&A action fields and limits; return an error message or None."""
+        character_id = action.get("character_id")
+        question = action.get("question")
+        questioner_id = action.get("questioner_id")
+
+        if not all([character_id, question, questioner_id]):
+            return "Character ID, question, and questioner ID required for Q&A"
+
+        # Check if Q&A is allowed for this character in current act
+        if not game_state.can_ask_question(character_id, game_state.current_act):
+            return f"已达到角色 {character_id} 在第{game_state.current_act}幕的提问上限"
+
+        return None
+
+    def _apply_qna_result(self, game_state: GameState, action: Dict[str, Any], answer: str) -> Dict[str, Any]:
+        """Record a generated answer in the game state and build the action result."""
+        character_id = action.get("character_id")
+        question = action.get("question")
+        questioner_id = action.get("questioner_id")
+
+        # Add Q&A entry to game state
+        qna_entry = game_state.add_qna_entry(
+            questioner_id=questioner_id,
+            target_character_id=character_id,
+            question=question,
+            answer=answer,
+            is_public=action.get("is_public", True)
+        )
+
+        # Add to public log if public
+        if qna_entry.is_public:
+            game_state.add_public_log_entry(
+                "qna",
+                f"【问】{question}\n【{character_id}答】{answer}",
+                related_player_id=questioner_id,
+                related_character_id=character_id
+            )
+
+        return {
+            "success": True,
+            "question": question,
+            "answer": answer,
+            "character_id": character_id,
+            "questioner_id": questioner_id,
+            "qna_id": qna_entry.id,
+            "remaining_questions": game_state.max_qna_per_character_per_act - game_state.get_qna_count_for_character_act(character_id, game_state.current_act),
+            "current_phase": game_state.current_phase
+        }
+
+    def _apply_validated_qna_result(self, game_state: GameState, action: Dict[str, Any], answer: str) -> Dict[str, Any]:
+        """Re-check the Q&A limits against the current state, then record the answer."""
+        error = self._validate_qna_action(game_state, action)
+        if error:
+            return {"error": error}
+        return self._apply_qna_result(game_state, action, answer)
+
+    def _resolve_model_name(self, game_state: GameState, character_id: str, action: Dict[str, Any]) -> str:
+        """Use the character's bound model, falling back to the action/default model."""
+        model_name = action.get("model_name", "gpt-3.5-turbo")
+        if character_id in game_state.characters:
+            character = game_state.characters[character_id]
+            if character.model_name:
+                model_name = character.model_name
+        return model_name
+
+    async def astream_action(self, session_id: str, action: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a monologue or Q&A action, streaming the AI text as it arrives.
+
+        Yields ``{"event": "chunk", "text": ...}`` for every text chunk, then a
+        single ``{"event": "done", "result": ...}`` once the full answer has
+        been recorded and saved, or ``{"event": "error", "error": ...}``.
+
+        Args:
+            session_id: Game session ID
+            action: Action dictionary containing action details
+
+        Yields:
+            Stream event dictionaries
+        """
+        action_type = action.get("action_type")
+        if action_type not in ("monologue", "qna"):
+            yield {"event": "error", "error": f"Streaming not supported for action type: {action_type}"}
+            return
+
+        try:
+            async with self.action_queue.asession_turn(session_id):
+                async for event in self._astream_action_in_turn(session_id, action):
+                    yield event
+        except ActionQueueTimeout:
+            yield {"event": "error", "error": SESSION_BUSY_ERROR}
+
+    async def _astream_action_in_turn(self, session_id: str, action: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a monologue or Q&A action while holding the session's turn.
+
+        The state manager works on a blocking database session, so loading,
+        building the Q&A history and committing run on worker threads to keep
+        the event loop free for other requests and streams.
+        """
+        action_type = action.get("action_type")
+        game_state = await asyncio.to_thread(self.load_game, session_id)
+        if not game_state:
+            yield {"event": "error", "error": "Game session not found"}
+            return
+
+        character_id = action.get("character_id")
+        if action_type == "qna":
+            error = self._validate_qna_action(game_state, action)
+        else:
+            error = None if character_id else "Character ID required for monologue"
+        if error:
+            yield {"event": "error", "error": error}
+            return
+
+        logger.info(f"Streaming {action_type} action for game {game_state.game_id}")
+
+        model_name = self._resolve_model_name(game_state, character_id, action)
+        user_id = action.get("user_id", "system")
+        if action_type == "qna":
+            # Building the history may load it from the database
+            context = await asyncio.to_thread(
+                self._build_qna_context, game_state, character_id, action.get("question")
+            )
+            chunks = self.qna_tool.astream_chunks(
+                char_id=character_id,
+                act_num=game_state.current_act,
+                query=action.get("question"),
+                model_name=model_name,
+                user_id=user_id,
+                script_id=game_state.script_id,
+                **context
+            )
+        else:
+            prefetched = await self._atake_prefetched_monologue(game_state, character_id, model_name)
+            if prefetched is not None:
+                chunks = _single_chunk(prefetched)
+            else:
+                chunks = self.monologue_tool.astream_chunks(
+                    char_id=character_id,
+                    act_num=game_state.current_act,
+                    model_name=model_name,
+                    user_id=user_id,
+                    script_id=game_state.script_id
+                )
+
+        parts = []
+        try:
+            async for chunk in _iterate_with_deadline(chunks, DIFY_ACTION_TIMEOUT_SECONDS):
+                parts.append(chunk)
+                yield {"event": "chunk", "text": chunk}
+        except asyncio.TimeoutError:
+            yield {"event": "error", "error": f"AI response timed out after {DIFY_ACTION_TIMEOUT_SECONDS:.0f}s"}
+            return
+        text = ''.join(parts).strip()
+
+        try:
+            if action_type == "qna":
+                mutate = lambda state: self._apply_validated_qna_result(state, action, text)
+            else:
+                mutate = lambda state: self._apply_monologue_result(state, character_id, text)
+
+            result = await asyncio.to_thread(self._commit_streamed_action, session_id, game_state, mutate)
+            if "error" in result:
+                yield {"event": "error", "error": result["error"]}
+                return
+
+            yield {"event": "done", "result": result}
+
+        except Exception as e:
+            logger.error(f"Failed to finish streamed action for session {session_id}: {e}")
+            yield {"event": "error", "error": f"Failed to process action: {e}"}
     
+    def _commit_streamed_action(
+        self,
+        session_id: str,
+        game_state: GameState,
+        mutate: Callable[[GameState], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Commit a streamed action (blocking; runs on a worker thread)."""
+        # Reload so that actions committed while streaming are not overwritten
+        game_state = self.load_game(session_id) or game_state
+        return self._commit_action(session_id, game_state, mutate)
+
     def _process_mission_action(self, graph_state: GameGraphState, action: Dict[str, Any]) -> Dict[str, Any]:
         """Process a mission submission action."""
         try:
@@ -555,21 +1309,41 @@ class GameEngine:
         """
         try:
             summary = self.state_manager.get_game_state_summary(session_id)
-            if summary:
+            # Summaries read from the materialized columns already carry the
+            # turn and history counts; only older rows need the full state
+            if summary and "public_log_count" not in summary:
                 game_state = self.load_game(session_id)
                 if game_state:
-                    summary.update({
-                        "turn_order": game_state.turn_order,
-                        "current_turn_index": game_state.current_turn_index,
-                        "public_log_count": len(game_state.public_log),
-                        "qna_count": len(game_state.qna_history),
-                        "mission_count": len(game_state.mission_submissions)
-                    })
+                    summary.update(self._summary_fields_from_state(game_state))
             return summary
         except Exception as e:
             logger.error(f"Failed to get game status for session {session_id}: {e}")
             return None
 
+    async def aget_game_status(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Async version of get_game_status, using the async database session."""
+        try:
+            summary = await self.state_manager.aget_game_state_summary(session_id)
+            if summary and "public_log_count" not in summary:
+                game_state = await self.aload_game(session_id)
+                if game_state:
+                    summary.update(self._summary_fields_from_state(game_state))
+            return summary
+        except Exception as e:
+            logger.error(f"Failed to get game status for session {session_id}: {e}")
+            return None
+
+    @staticmethod
+    def _summary_fields_from_state(game_state: GameState) -> Dict[str, Any]:
+        """Summary fields that rows saved before the summary columns existed lack."""
+        return {
+            "turn_order": game_state.turn_order,
+            "current_turn_index": game_state.current_turn_index,
+            "public_log_count": len(game_state.public_log),
+            "qna_count": len(game_state.qna_history),
+            "mission_count": len(game_state.mission_submissions)
+        }
+
     def _initialize_ai_characters(self, game_state: GameState, ai_characters: List[Dict[str, str]]) -> None:
         """Initialize AI characters with model bindings and create virtual players."""
         try:
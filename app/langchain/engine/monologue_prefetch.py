@@ -0,0 +1,186 @@
+"""
+Parallel monologue prefetching for the game engine.
+
+When an act begins, every character delivers a monologue, and the frontend
+requests them one at a time. This module provides the MonologuePrefetcher
+class that starts generating all of them concurrently as soon as the act
+starts, so the monologue phase costs roughly one generation instead of one
+per character. A later ``monologue`` action picks up the prefetched result,
+waiting for it if the generation is still in flight.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import (
+    MONOLOGUE_PREFETCH_ENABLED,
+    MONOLOGUE_PREFETCH_MAX_ENTRIES,
+    DIFY_MONOLOGUE_MAX_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+# (session_id, act_num, char_id, model_name)
+PrefetchKey = Tuple[str, int, str, str]
+
+
+class MonologuePrefetcher:
+    """
+    Per-session store of in-flight and finished monologue generations.
+
+    Generations run on a dedicated worker pool sized to the monologue
+    workflow's concurrency limit, so prefetching never starves the pool used
+    by interactive actions. Each result is handed out once; entries of a
+    previous act are dropped when a session starts a new act, and the store
+    is bounded so abandoned sessions cannot grow it without limit.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = MONOLOGUE_PREFETCH_ENABLED,
+        max_entries: int = MONOLOGUE_PREFETCH_MAX_ENTRIES,
+        max_workers: int = DIFY_MONOLOGUE_MAX_CONCURRENCY,
+    ):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            enabled: Whether prefetching is performed at all
+            max_entries: Maximum number of prefetched monologues kept
+            max_workers: Maximum number of concurrent generations
+        """
+        self.enabled = enabled and max_entries > 0
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self._entries: "OrderedDict[PrefetchKey, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.scheduled = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="monologue-prefetch"
+            )
+        return self._executor
+
+    def _discard(self, key: PrefetchKey) -> None:
+        future = self._entries.pop(key, None)
+        if future is not None:
+            future.cancel()
+            self.discarded += 1
+
+    def prefetch(
+        self,
+        session_id: str,
+        act_num: int,
+        characters: Dict[str, str],
+        generate: Callable[..., str],
+        **kwargs: Any
+    ) -> int:
+        """
+        Start generating the monologues of an act for several characters.
+
+        Entries the session still holds for other acts are dropped.
+
+        Args:
+            session_id: Game session ID
+            act_num: Act whose monologues are generated
+            characters: Character ID -> model name
+            generate: Blocking generator called as
+                ``generate(char_id=..., act_num=..., model_name=..., **kwargs)``
+            **kwargs: Extra arguments passed to ``generate``
+
+        Returns:
+            Number of generations scheduled
+        """
+        if not self.enabled or not characters:
+            return 0
+
+        scheduled = 0
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id and key[1] != act_num]:
+                self._discard(key)
+
+            executor = self._get_executor()
+            for char_id, model_name in characters.items():
+                key = (session_id, act_num, char_id, model_name)
+                if key in self._entries:
+                    continue
+                self._entries[key] = executor.submit(
+                    generate, char_id=char_id, act_num=act_num, model_name=model_name, **kwargs
+                )
+                scheduled += 1
+
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+            self.scheduled += scheduled
+
+        logger.info(f"Prefetching {scheduled} monologues for session {session_id}, act {act_num}")
+        return scheduled
+
+    def take(self, session_id: str, act_num: int, char_id: str, model_name: str) -> Optional[Future]:
+        """
+        Hand out the prefetched generation for a character, if any.
+
+        Args:
+            session_id: Game session ID
+            act_num: Current act
+            char_id: Character ID
+            model_name: Model the action will use
+
+        Returns:
+            Future resolving to the monologue text, or None
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            future = self._entries.pop((session_id, act_num, char_id, model_name), None)
+            if future is None or future.cancelled():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return future
+
+    def discard_session(self, session_id: str) -> None:
+        """Drop every prefetched monologue of a session."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id]:
+                self._discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return prefetch counters and occupancy."""
+        with self._lock:
+            pending = sum(1 for future in self._entries.values() if not future.done())
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "pending": pending,
+                "max_entries": self.max_entries,
+                "scheduled": self.scheduled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "discarded": self.discarded,
+            }
+
+
+_monologue_prefetcher: Optional[MonologuePrefetcher] = None
+_monologue_prefetcher_lock = threading.Lock()
+
+
+def get_monologue_prefetcher() -> MonologuePrefetcher:
+    """Return the process-wide monologue prefetcher."""
+    global _monologue_prefetcher
+    if _monologue_prefetcher is None:
+        with _monologue_prefetcher_lock:
+            if _monologue_prefetcher is None:
+                _monologue_prefetcher = MonologuePrefetcher()
+    return _monologue_prefetcher
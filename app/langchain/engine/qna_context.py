@@ -0,0 +1,430 @@
+"""
+Token-budgeted Q&A history context for the game engine.
+
+The Q&A workflow receives a ``history`` input describing what has happened
+in the game so far. This module provides the QnAContextBuilder class that
+assembles it from ``GameState.qna_history`` and ``GameState.public_log``:
+entries are ranked by relevance to the questioned character (its own Q&A
+and monologues first, then entries mentioning it, then other public events),
+by recency and by overlap with the question, and the best ones are packed
+into a configurable token and character budget.
+
+Once a character has a rolling summary of its earlier Q&A (see
+qna_summary), the context starts with that summary and only the character's
+most recent exchanges after it are candidates, so the context stays the same
+size in long games.
+
+Entries are converted, measured and indexed once, when they first appear in
+a session's history, and kept in per-character buffers; building a context
+only scores the buffered entries.
+"""
+
+import functools
+import logging
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.config import (
+    QNA_CONTEXT_ENABLED,
+    QNA_CONTEXT_TOKEN_BUDGET,
+    DIFY_QNA_HISTORY_MAX_CHARS,
+    QNA_CONTEXT_MAX_ENTRY_CHARS,
+    QNA_CONTEXT_MAX_ENTRIES_PER_CHARACTER,
+    QNA_CONTEXT_MAX_SESSIONS,
+    QNA_SUMMARY_RECENT_EXCHANGES,
+)
+from app.langchain.state.models import GameState, PublicLogEntry, QnAEntry
+from app.services.qna_cache import normalize_question
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; token counts are estimated without it
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# CJK ideographs, kana, hangul and full-width forms: roughly one token each
+_CJK_PATTERN = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+# Public log entries that duplicate qna_history
+_SKIPPED_LOG_TYPES = frozenset({"qna"})
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:  # e.g. the encoding file cannot be downloaded
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Uses tiktoken's cl100k_base encoding when it is installed. Otherwise CJK
+    characters count one token each and other text one token per four
+    characters, which slightly overestimates typical Chinese prompts.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + -(-(len(text) - cjk) // 4)
+
+
+def _terms(text: str) -> Set[str]:
+    """Character bigrams of the normalized text, used for question overlap."""
+    normalized = normalize_question(text)
+    return {normalized[i:i + 2] for i in range(len(normalized) - 1)}
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars - 1] + "…"
+
+
+class _ContextEntry:
+    """A history entry rendered and measured for context building."""
+
+    __slots__ = ("position", "act", "owner", "is_qna", "mentions", "text", "tokens", "terms")
+
+    def __init__(self, position: Tuple[float, int], act: int, owner: Optional[str], is_qna: bool,
+                 mentions: Set[str], text: str, terms: Set[str]):
+        self.position = position
+        self.act = act
+        self.owner = owner
+        self.is_qna = is_qna
+        self.mentions = mentions
+        self.text = text
+        self.tokens = count_tokens(text)
+        self.terms = terms
+
+
+class _SessionBuffer:
+    """Incrementally maintained context entries of one session."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # Entries about a character (its own Q&A, public or private, and its log entries)
+        self.direct: Dict[str, Deque[_ContextEntry]] = {}
+        # Every public entry
+        self.shared: Deque[_ContextEntry] = deque(maxlen=max_entries)
+        self.sequence = 0
+        self.qna_seen = 0
+        self.qna_last_id: Optional[str] = None
+        self.log_seen = 0
+        self.log_last_id: Optional[str] = None
+
+    def is_stale(self, qna_history: List[QnAEntry], public_log: List[PublicLogEntry]) -> bool:
+        """Whether the history no longer extends what was ingested (e.g. another game state)."""
+        if self.qna_seen > len(qna_history) or self.log_seen > len(public_log):
+            return True
+        if self.qna_seen and qna_history[self.qna_seen - 1].id != self.qna_last_id:
+            return True
+        return bool(self.log_seen and public_log[self.log_seen - 1].id != self.log_last_id)
+
+    def add(self, entry: _ContextEntry, public: bool) -> None:
+        if entry.owner:
+            bucket = self.direct.get(entry.owner)
+            if bucket is None:
+                bucket = self.direct[entry.owner] = deque(maxlen=self.max_entries)
+            bucket.append(entry)
+        if public:
+            self.shared.append(entry)
+
+    def candidates(self, character_id: str, summary_act: int = 0,
+                   recent_exchanges: int = 0) -> List[_ContextEntry]:
+        """
+        Entries visible to a character: its own plus other public ones.
+
+        When the character's Q&A up to ``summary_act`` is summarized, those
+        exchanges are left out and only the newest ``recent_exchanges`` of
+        the later ones are kept.
+        """
+        entries = list(self.direct.get(character_id, ()))
+        if summary_act:
+            recent = [entry for entry in entries if entry.is_qna and entry.act > summary_act]
+            if recent_exchanges > 0:
+                recent = recent[-recent_exchanges:]
+            entries = [entry for entry in entries if not entry.is_qna] + recent
+        entries.extend(entry for entry in self.shared if entry.owner != character_id)
+        return entries
+
+
+class QnAContextBuilder:
+    """
+    Builds the history context of a Q&A call under a token budget.
+
+    Each entry scores a relevance weight (3 for the questioned character's
+    own entries, 2 for entries mentioning it, 1 otherwise) plus a recency
+    bonus halving every ``RECENCY_HALF_LIFE`` newer entries, a bonus for the
+    current act and a bonus for bigram overlap with the question. Entries
+    are packed greedily by score while both the token budget and the
+    character limit hold (one token and one character per separating
+    newline), then emitted in chronological order. A character's rolling
+    summary, when present, always comes first and takes at most half of
+    both budgets.
+    """
+
+    RELEVANCE_OWN = 3.0
+    RELEVANCE_MENTION = 2.0
+    RELEVANCE_OTHER = 1.0
+    RECENCY_HALF_LIFE = 8
+    CURRENT_ACT_BONUS = 0.5
+    QUESTION_OVERLAP_WEIGHT = 2.0
+
+    def __init__(
+        self,
+        enabled: bool = QNA_CONTEXT_ENABLED,
+        token_budget: int = QNA_CONTEXT_TOKEN_BUDGET,
+        max_chars: int = DIFY_QNA_HISTORY_MAX_CHARS,
+        max_entry_chars: int = QNA_CONTEXT_MAX_ENTRY_CHARS,
+        max_entries_per_character: int = QNA_CONTEXT_MAX_ENTRIES_PER_CHARACTER,
+        max_sessions: int = QNA_CONTEXT_MAX_SESSIONS,
+        recent_exchanges: int = QNA_SUMMARY_RECENT_EXCHANGES,
+    ):
+        """
+        Initialize the builder.
+
+        Args:
+            enabled: Whether contexts are built at all
+            token_budget: Maximum tokens of a context
+            max_chars: Maximum characters of a context (the Dify input limit)
+            max_entry_chars: Entries longer than this are shortened
+            max_entries_per_character: Candidate entries kept per character
+            max_sessions: Sessions whose buffers are kept (least recently used are dropped)
+            recent_exchanges: Own exchanges kept after the character's summary
+        """
+        self.enabled = enabled and token_budget > 0 and max_chars > 0
+        self.token_budget = token_budget
+        self.max_chars = max_chars
+        self.max_entry_chars = max_entry_chars
+        self.max_entries_per_character = max_entries_per_character
+        self.max_sessions = max_sessions
+        self.recent_exchanges = recent_exchanges
+        self._sessions: "OrderedDict[str, _SessionBuffer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.rebuilds = 0
+
+    def build(self, game_state: GameState, character_id: str, question: str = "") -> Optional[str]:
+        """
+        Build the history context for a question to a character.
+
+        Args:
+            game_state: Current game state (its history is ingested incrementally)
+            character_id: Character being questioned
+            question: The question, used to favour related entries
+
+        Returns:
+            The context text, or None when there is nothing to include
+        """
+        return self.build_context(game_state, character_id, question)[0]
+
+    def build_context(self, game_state: GameState, character_id: str,
+                      question: str = "") -> Tuple[Optional[str], bool]:
+        """
+        Build the history context and tell whether it is about the character.
+
+        A context is about the character when it holds the character's
+        summary, its own entries or entries mentioning it. Other contexts
+        only carry general public events (players joining, other characters'
+        monologues), so answers given with them can still be shared through
+        the Q&A answer cache.
+
+        Args:
+            game_state: Current game state (its history is ingested incrementally)
+            character_id: Character being questioned
+            question: The question, used to favour related entries
+
+        Returns:
+            ``(context text or None, whether it is about the character)``
+        """
+        if not self.enabled or not character_id:
+            return None, False
+
+        # Loading deferred history may hit the database; do it outside the lock
+        qna_history = game_state.qna_history
+        public_log = game_state.public_log
+
+        character = game_state.characters.get(character_id)
+        summary = self._summary_text(character.qna_summary) if character is not None else None
+        summary_act = character.qna_summary_act if summary else 0
+
+        with self._lock:
+            buffer = self._sync(game_state, qna_history, public_log)
+            candidates = buffer.candidates(character_id, summary_act, self.recent_exchanges)
+            self.builds += 1
+
+        parts: List[str] = []
+        about_character = bool(summary)
+        tokens_left = self.token_budget
+        chars_left = self.max_chars
+        if summary:
+            parts.append(summary)
+            # Reserve the newline separating the summary from the entries
+            tokens_left -= count_tokens(summary) + 1
+            chars_left -= len(summary) + 1
+
+        if candidates:
+            selected = self._select(candidates, character_id, question, game_state.current_act,
+                                    tokens_left, chars_left)
+            selected.sort(key=lambda entry: entry.position)
+            parts.extend(entry.text for entry in selected)
+            about_character = about_character or any(
+                entry.owner == character_id or character_id in entry.mentions for entry in selected
+            )
+        return "\n".join(parts) or None, about_character
+
+    def discard_session(self, session_id: str) -> None:
+        """Drop the buffered entries of a session."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return builder counters and limits."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sessions": len(self._sessions),
+                "builds": self.builds,
+                "rebuilds": self.rebuilds,
+                "token_budget": self.token_budget,
+                "max_chars": self.max_chars,
+                "tokenizer": "tiktoken" if _get_encoding() is not None else "estimate",
+            }
+
+    def _summary_text(self, summary: str) -> Optional[str]:
+        """The summary line, within half of both budgets; None when there is none or it cannot fit."""
+        if not summary:
+            return None
+        text = _clip(f"[前情摘要]{summary}", self.max_chars // 2)
+        if count_tokens(text) > self.token_budget // 2:
+            return None
+        return text
+
+    def _sync(self, game_state: GameState, qna_history: List[QnAEntry],
+              public_log: List[PublicLogEntry]) -> _SessionBuffer:
+        """Ingest history entries added since the last call (caller holds the lock)."""
+        session_id = game_state.session_id
+
+        buffer = self._sessions.get(session_id)
+        if buffer is not None and buffer.is_stale(qna_history, public_log):
+            self.rebuilds += 1
+            buffer = None
+        if buffer is None:
+            buffer = _SessionBuffer(self.max_entries_per_character)
+            self._sessions[session_id] = buffer
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+
+        new_qna = qna_history[buffer.qna_seen:]
+        new_log = public_log[buffer.log_seen:]
+        if not new_qna and not new_log:
+            return buffer
+
+        characters = {
+            character_id: character.name for character_id, character in game_state.characters.items()
+        }
+        for entry in new_qna:
+            buffer.add(self._from_qna(buffer, entry, game_state, characters), entry.is_public)
+        for entry in new_log:
+            if entry.entry_type not in _SKIPPED_LOG_TYPES:
+                buffer.add(self._from_log(buffer, entry, characters), public=True)
+
+        buffer.qna_seen = len(qna_history)
+        buffer.qna_last_id = qna_history[-1].id if qna_history else None
+        buffer.log_seen = len(public_log)
+        buffer.log_last_id = public_log[-1].id if public_log else None
+        return buffer
+
+    def _position(self, buffer: _SessionBuffer, timestamp) -> Tuple[float, int]:
+        buffer.sequence += 1
+        return (timestamp.timestamp(), buffer.sequence)
+
+    @staticmethod
+    def _mentions(raw: str, characters: Dict[str, str]) -> Set[str]:
+        return {
+            character_id for character_id, name in characters.items()
+            if character_id in raw or (name and name in raw)
+        }
+
+    def _from_qna(self, buffer: _SessionBuffer, entry: QnAEntry, game_state: GameState,
+                  characters: Dict[str, str]) -> _ContextEntry:
+        questioner = game_state.players.get(entry.questioner_id)
+        asker = (questioner.character_id if questioner else None) or entry.questioner_id
+        target = entry.target_character_id
+        raw = f"{entry.question} {entry.answer}"
+        text = _clip(f"[第{entry.act_number}幕]{asker}问{target}：{entry.question} 答：{entry.answer}",
+                     self.max_entry_chars)
+        return _ContextEntry(
+            self._position(buffer, entry.timestamp), entry.act_number, target, True,
+            self._mentions(raw, characters), text, _terms(raw)
+        )
+
+    def _from_log(self, buffer: _SessionBuffer, entry: PublicLogEntry,
+                  characters: Dict[str, str]) -> _ContextEntry:
+        text = _clip(f"[第{entry.act_number}幕]{entry.content}", self.max_entry_chars)
+        return _ContextEntry(
+            self._position(buffer, entry.timestamp), entry.act_number, entry.related_character_id, False,
+            self._mentions(entry.content, characters), text, _terms(entry.content)
+        )
+
+    def _select(self, candidates: List[_ContextEntry], character_id: str, question: str,
+                current_act: int, tokens_left: int, chars_left: int) -> List[_ContextEntry]:
+        """Pick the highest-scoring entries that fit the remaining budgets."""
+        question_terms = _terms(question) if question else set()
+        newest_first = sorted(candidates, key=lambda entry: entry.position, reverse=True)
+
+        scored = []
+        for rank, entry in enumerate(newest_first):
+            if entry.owner == character_id:
+                score = self.RELEVANCE_OWN
+            elif character_id in entry.mentions:
+                score = self.RELEVANCE_MENTION
+            else:
+                score = self.RELEVANCE_OTHER
+            score += 0.5 ** (rank / self.RECENCY_HALF_LIFE)
+            if entry.act == current_act:
+                score += self.CURRENT_ACT_BONUS
+            if question_terms:
+                score += self.QUESTION_OVERLAP_WEIGHT * len(question_terms & entry.terms) / len(question_terms)
+            scored.append((score, rank, entry))
+        # Ties go to the newer entry
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        selected: List[_ContextEntry] = []
+        for _, _, entry in scored:
+            separator = 1 if selected else 0
+            tokens = entry.tokens + separator
+            chars = len(entry.text) + separator
+            if tokens <= tokens_left and chars <= chars_left:
+                selected.append(entry)
+                tokens_left -= tokens
+                chars_left -= chars
+                if tokens_left <= 1 or chars_left <= 1:
+                    break
+        return selected
+
+
+_qna_context_builder: Optional[QnAContextBuilder] = None
+_qna_context_builder_lock = threading.Lock()
+
+
+def get_qna_context_builder() -> QnAContextBuilder:
+    """Return the process-wide Q&A context builder."""
+    global _qna_context_builder
+    if _qna_context_builder is None:
+        with _qna_context_builder_lock:
+            if _qna_context_builder is None:
+                _qna_context_builder = QnAContextBuilder()
+    return _qna_context_builder
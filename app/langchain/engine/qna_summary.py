@@ -0,0 +1,218 @@
+"""
+Rolling per-character Q&A summaries for the game engine.
+
+A character's Q&A history grows with every question. When an act ends, the
+SummaryRefresher compresses each character's Q&A of the finished acts into
+a short rolling summary stored in ``CharacterState.qna_summary``; the Q&A
+context then uses that summary plus the few exchanges that came after it,
+so the prompt stays the same size however long the game runs.
+
+Summaries are produced by a pluggable summarizer, called as
+``summarizer(character_id, previous_summary, entries)``. The default
+ExtractiveSummarizer needs no LLM call: it keeps each exchange's question
+and the first sentence of its answer, one line per act, and shortens the
+new material (then drops the oldest lines) to fit ``QNA_SUMMARY_MAX_CHARS``.
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import (
+    QNA_SUMMARY_ENABLED,
+    QNA_SUMMARY_MAX_CHARS,
+    QNA_SUMMARY_MAX_WORKERS,
+)
+from app.langchain.state.models import QnAEntry
+
+logger = logging.getLogger(__name__)
+
+# summarizer(character_id, previous_summary, entries) -> new summary
+Summarizer = Callable[[str, str, List[QnAEntry]], str]
+
+_SENTENCE_END = re.compile(r"[。！？!?；;]")
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    """Collapse whitespace and cut the text to ``max_chars`` with an ellipsis."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max(max_chars - 1, 0)] + "…"
+
+
+def _first_sentence(text: str) -> str:
+    text = " ".join(text.split())
+    match = _SENTENCE_END.search(text)
+    return text[:match.end()] if match else text
+
+
+class ExtractiveSummarizer:
+    """
+    Summarizes Q&A exchanges by extraction, without an LLM call.
+
+    Each new act becomes one line such as ``第1幕：问昨晚在哪答在书房。；...``.
+    The lines are rebuilt with progressively shorter questions and answers
+    (``ITEM_CHAR_LEVELS``) until the summary fits; if even the shortest form
+    is too long, the oldest lines are dropped.
+    """
+
+    ITEM_CHAR_LEVELS = (48, 32, 20, 12)
+
+    def __init__(self, max_chars: int = QNA_SUMMARY_MAX_CHARS):
+        """
+        Initialize the summarizer.
+
+        Args:
+            max_chars: Maximum length of a summary in characters
+        """
+        self.max_chars = max_chars
+
+    def __call__(self, character_id: str, previous: str, entries: List[QnAEntry]) -> str:
+        """
+        Fold new exchanges into a previous summary.
+
+        Args:
+            character_id: Character whose Q&A is summarized
+            previous: The character's current summary (may be empty)
+            entries: New Q&A entries, oldest first
+
+        Returns:
+            The new summary, at most ``max_chars`` characters
+        """
+        by_act: Dict[int, List[QnAEntry]] = {}
+        for entry in entries:
+            by_act.setdefault(entry.act_number, []).append(entry)
+        previous_lines = [line for line in previous.split("\n") if line] if previous else []
+
+        lines = previous_lines
+        for item_chars in self.ITEM_CHAR_LEVELS:
+            lines = previous_lines + [
+                self._act_line(act, act_entries, item_chars) for act, act_entries in sorted(by_act.items())
+            ]
+            if len("\n".join(lines)) <= self.max_chars:
+                return "\n".join(lines)
+
+        while len(lines) > 1 and len("\n".join(lines)) > self.max_chars:
+            lines.pop(0)
+        summary = "\n".join(lines)
+        if len(summary) > self.max_chars:
+            summary = summary[:max(self.max_chars - 1, 0)] + "…"
+        return summary
+
+    @staticmethod
+    def _act_line(act: int, entries: List[QnAEntry], item_chars: int) -> str:
+        items = [
+            f"问{_shorten(entry.question, item_chars // 2)}答{_shorten(_first_sentence(entry.answer), item_chars)}"
+            for entry in entries
+        ]
+        return f"第{act}幕：" + "；".join(items)
+
+
+class SummaryRefresher:
+    """
+    Runs rolling summary refreshes in the background.
+
+    Jobs run on a small dedicated worker pool, so summarizing never delays
+    the action that ended the act nor starves the pool used for Dify calls.
+    A failed refresh is logged and counted; the Q&A context then keeps
+    using the unsummarized history.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = QNA_SUMMARY_ENABLED,
+        max_workers: int = QNA_SUMMARY_MAX_WORKERS,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        """
+        Initialize the refresher.
+
+        Args:
+            enabled: Whether summaries are refreshed at all
+            max_workers: Maximum number of concurrent refresh jobs
+            summarizer: Summary function; defaults to an ExtractiveSummarizer
+        """
+        self.enabled = enabled and max_workers > 0
+        self.max_workers = max_workers
+        self.summarizer = summarizer or ExtractiveSummarizer()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+        self.characters_updated = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="qna-summary"
+            )
+        return self._executor
+
+    def summarize(self, character_id: str, previous: str, entries: List[QnAEntry]) -> str:
+        """Fold new Q&A entries into a character's previous summary."""
+        return self.summarizer(character_id, previous, entries)
+
+    def schedule(self, session_id: str, through_act: int, job: Callable[[str, int], int]) -> Optional[Future]:
+        """
+        Start refreshing a session's summaries in the background.
+
+        Args:
+            session_id: Game session ID
+            through_act: Last finished act to fold into the summaries
+            job: Blocking refresh called as ``job(session_id, through_act)``,
+                returning the number of characters updated
+
+        Returns:
+            Future of the job, or None when nothing was scheduled
+        """
+        if not self.enabled or through_act < 1:
+            return None
+        with self._lock:
+            future = self._get_executor().submit(self._run, job, session_id, through_act)
+            self.scheduled += 1
+        logger.info(f"Scheduled Q&A summary refresh for session {session_id} through act {through_act}")
+        return future
+
+    def _run(self, job: Callable[[str, int], int], session_id: str, through_act: int) -> int:
+        try:
+            updated = job(session_id, through_act)
+        except Exception as e:
+            logger.warning(f"Q&A summary refresh failed for session {session_id}: {e}")
+            with self._lock:
+                self.failed += 1
+            return 0
+        with self._lock:
+            self.completed += 1
+            self.characters_updated += updated
+        return updated
+
+    def stats(self) -> Dict[str, Any]:
+        """Return refresh counters."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "scheduled": self.scheduled,
+                "pending": self.scheduled - self.completed - self.failed,
+                "completed": self.completed,
+                "failed": self.failed,
+                "characters_updated": self.characters_updated,
+            }
+
+
+_summary_refresher: Optional[SummaryRefresher] = None
+_summary_refresher_lock = threading.Lock()
+
+
+def get_summary_refresher() -> SummaryRefresher:
+    """Return the process-wide Q&A summary refresher."""
+    global _summary_refresher
+    if _summary_refresher is None:
+        with _summary_refresher_lock:
+            if _summary_refresher is None:
+                _summary_refresher = SummaryRefresher()
+    return _summary_refresher
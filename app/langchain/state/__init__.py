@@ -6,9 +6,17 @@ This module provides:
 - PlayerState: Individual player state tracking
 - CharacterState: Character-specific data
 - StateManager: State persistence and retrieval
+- StateConflictError: Raised when a save loses a concurrent-update race
+- GameStateCache: In-process LRU/TTL cache of live game states
+- StateBackend: Storage interface behind StateManager (see ``backends``)
 """
 
 from .models import GameState, PlayerState, CharacterState, GamePhase
-from .manager import StateManager
+from .manager import StateManager, StateConflictError
+from .cache import GameStateCache, get_game_state_cache
+from .backends import StateBackend, get_state_backend
 
-__all__ = ["GameState", "PlayerState", "CharacterState", "GamePhase", "StateManager"]
+__all__ = [
+    "GameState", "PlayerState", "CharacterState", "GamePhase", "StateManager", "StateConflictError",
+    "GameStateCache", "get_game_state_cache", "StateBackend", "get_state_backend",
+]
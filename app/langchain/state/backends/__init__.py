@@ -0,0 +1,67 @@
+"""
+Pluggable storage backends for StateManager.
+
+This package provides:
+- StateBackend: The storage interface used by StateManager
+- SQLAlchemyStateBackend: The application database (default)
+- InMemoryStateBackend: A process-local dictionary for tests and benchmarks
+- AppendLogStateBackend: One append-only, memory-mapped log file per session
+
+The backend is chosen with ``GAME_STATE_BACKEND``.
+"""
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import GAME_STATE_BACKEND
+from .append_log import AppendLogStateBackend
+from .base import StateBackend, StateConflictError
+from .memory import InMemoryStateBackend
+from .sql import SQLAlchemyStateBackend
+
+logger = logging.getLogger(__name__)
+
+# Backends that hold their own data and are shared by every StateManager of the process
+_SHARED_BACKENDS = {
+    "memory": InMemoryStateBackend,
+    "append_log": AppendLogStateBackend,
+}
+
+_shared_backends: Dict[str, StateBackend] = {}
+_shared_backends_lock = threading.Lock()
+
+
+def get_state_backend(db_session: Optional[Session] = None, name: str = GAME_STATE_BACKEND) -> StateBackend:
+    """
+    Return the configured game state backend.
+
+    Args:
+        db_session: Database session for the SQLAlchemy backend (ignored by the others)
+        name: Backend name; defaults to ``GAME_STATE_BACKEND``
+
+    Returns:
+        A SQLAlchemyStateBackend bound to ``db_session``, or the process-wide
+        instance of a shared backend
+    """
+    backend_class = _SHARED_BACKENDS.get(name)
+    if backend_class is None:
+        if name != SQLAlchemyStateBackend.name:
+            logger.warning(f"Unknown GAME_STATE_BACKEND {name!r}; using the database")
+        return SQLAlchemyStateBackend(db_session)
+
+    backend = _shared_backends.get(name)
+    if backend is None:
+        with _shared_backends_lock:
+            backend = _shared_backends.get(name)
+            if backend is None:
+                backend = _shared_backends[name] = backend_class()
+    return backend
+
+
+__all__ = [
+    "StateBackend", "StateConflictError", "SQLAlchemyStateBackend", "InMemoryStateBackend",
+    "AppendLogStateBackend", "get_state_backend",
+]
@@ -0,0 +1,347 @@
+"""
+Append-log storage backend (one file per session).
+
+Every save appends one record to ``<GAME_STATE_LOG_DIR>/<session>.log``:
+a ``<length, crc32>`` header followed by a JSON payload holding the new
+version, the snapshot and only the history entries created since the last
+save, so a save costs O(new entries) with no database round trip. Files are
+read through ``mmap``; a torn record at the end of a file (crash during a
+write) fails its checksum and is discarded.
+
+An in-memory index keeps each session's version, latest snapshot and
+history counts, so versions and summaries never touch the disk. The history
+itself is read from the file, lazily, when a loaded state first needs it.
+Once a file holds ``GAME_STATE_LOG_COMPACT_RECORDS`` records it is
+rewritten as a single record.
+
+The index is per-process: run a single worker process with this backend.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from app.core.config import GAME_STATE_LOG_COMPACT_RECORDS, GAME_STATE_LOG_DIR, GAME_STATE_LOG_FSYNC
+from app.core.json_backend import dumps_bytes, loads
+from ..codec import decode_game_state, encode_game_state, field_adapter
+from ..models import GameState, HISTORY_FIELDS, MissionSubmission, PublicLogEntry, QnAEntry
+from .base import (
+    StateBackend,
+    StateConflictError,
+    filter_summaries,
+    new_history_entries,
+    persisted_counts_after_save,
+    summary_from_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+# payload length, crc32 of the payload
+_HEADER = struct.Struct("<II")
+_SUFFIX = ".log"
+_ENTRY_MODELS = {
+    "public_log": PublicLogEntry,
+    "qna_history": QnAEntry,
+    "mission_submissions": MissionSubmission,
+}
+
+
+class _LogIndex:
+    """What the backend keeps in memory about one session file."""
+
+    def __init__(self):
+        self.snapshot: Dict[str, Any] = {}
+        self.history_counts: Dict[str, int] = {field: 0 for field in HISTORY_FIELDS}
+        self.version = 0
+        self.created_at: Optional[datetime] = None
+        self.updated_at: Optional[datetime] = None
+        self.records = 0
+        # Bytes of valid records; anything after it is a torn write
+        self.length = 0
+
+    def apply(self, payload: Dict[str, Any], end: int) -> None:
+        self.snapshot = payload["snapshot"]
+        self.version = payload["version"]
+        self.updated_at = datetime.fromisoformat(payload["time"])
+        if self.created_at is None:
+            self.created_at = datetime.fromisoformat(payload.get("created", payload["time"]))
+        for field, entries in payload.get("history", {}).items():
+            self.history_counts[field] += len(entries)
+        self.records += 1
+        self.length = end
+
+    def summary(self, session_id: str) -> Dict[str, Any]:
+        return summary_from_snapshot(
+            session_id, self.snapshot, self.history_counts, self.created_at, self.updated_at
+        )
+
+
+def _encode_record(payload: Dict[str, Any]) -> bytes:
+    data = dumps_bytes(payload)
+    return _HEADER.pack(len(data), zlib.crc32(data)) + data
+
+
+def _read_records(path: str) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Yield ``(payload, end offset)`` for each valid record, stopping at the first torn one."""
+    try:
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                offset = 0
+                while offset + _HEADER.size <= size:
+                    length, crc = _HEADER.unpack_from(view, offset)
+                    start = offset + _HEADER.size
+                    end = start + length
+                    if end > size:
+                        break
+                    data = view[start:end]
+                    if zlib.crc32(data) != crc:
+                        break
+                    yield loads(data), end
+                    offset = end
+    except FileNotFoundError:
+        return
+
+
+class AppendLogStateBackend(StateBackend):
+    """
+    Game state store made of one append-only log file per session.
+
+    Operations on one session are serialized by a per-session lock;
+    different sessions never wait for each other.
+    """
+
+    name = "append_log"
+
+    def __init__(
+        self,
+        directory: str = GAME_STATE_LOG_DIR,
+        compact_records: int = GAME_STATE_LOG_COMPACT_RECORDS,
+        fsync: bool = GAME_STATE_LOG_FSYNC,
+    ):
+        """
+        Initialize the backend.
+
+        Args:
+            directory: Directory holding the session log files (created if missing)
+            compact_records: Rewrite a file as one record once it has this many (0 disables)
+            fsync: Whether every save waits for the data to reach the disk
+        """
+        self.directory = directory
+        self.compact_records = compact_records
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._indexes: Dict[str, _LogIndex] = {}
+        self._session_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._all_indexed = False
+        self.saves = 0
+        self.conflicts = 0
+        self.compactions = 0
+        self.torn_records = 0
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, quote(session_id, safe="") + _SUFFIX)
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._session_locks.get(session_id)
+            if lock is None:
+                lock = self._session_locks[session_id] = threading.Lock()
+            return lock
+
+    def _get_index(self, session_id: str) -> Optional[_LogIndex]:
+        """Return a session's index, building it from its file on first use (session lock held)."""
+        with self._lock:
+            index = self._indexes.get(session_id)
+        if index is not None:
+            return index
+
+        path = self._path(session_id)
+        if not os.path.exists(path):
+            return None
+        index = _LogIndex()
+        for payload, end in _read_records(path):
+            index.apply(payload, end)
+        if index.records == 0:
+            return None
+        if os.path.getsize(path) > index.length:
+            self.torn_records += 1
+            logger.warning(f"Discarding torn record at the end of {path}")
+        with self._lock:
+            self._indexes[session_id] = index
+        return index
+
+    def _append(self, session_id: str, index: Optional[_LogIndex], payload: Dict[str, Any]) -> int:
+        """Append a record and return the new valid length of the file."""
+        record = _encode_record(payload)
+        with open(self._path(session_id), "ab") as file:
+            valid_length = index.length if index is not None else 0
+            if file.tell() != valid_length:
+                # Drop a torn record left by an earlier crash
+                file.truncate(valid_length)
+            file.write(record)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        return valid_length + len(record)
+
+    def _read_history(self, session_id: str) -> Dict[str, list]:
+        with self._session_lock(session_id):
+            collections: Dict[str, list] = {field: [] for field in HISTORY_FIELDS}
+            for payload, _ in _read_records(self._path(session_id)):
+                for field, entries in payload.get("history", {}).items():
+                    model = _ENTRY_MODELS[field]
+                    collections[field].extend(model.model_validate(entry) for entry in entries)
+        return collections
+
+    def _compact(self, session_id: str, index: _LogIndex) -> None:
+        """Rewrite a session file as a single record (session lock held)."""
+        history: Dict[str, list] = {field: [] for field in HISTORY_FIELDS}
+        for payload, _ in _read_records(self._path(session_id)):
+            for field, entries in payload.get("history", {}).items():
+                history[field].extend(entries)
+
+        record = _encode_record({
+            "version": index.version,
+            "time": index.updated_at.isoformat(),
+            "created": index.created_at.isoformat(),
+            "snapshot": index.snapshot,
+            "history": {field: entries for field, entries in history.items() if entries},
+        })
+        temp_path = self._path(session_id) + ".compact"
+        with open(temp_path, "wb") as file:
+            file.write(record)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(temp_path, self._path(session_id))
+        index.records = 1
+        index.length = len(record)
+        self.compactions += 1
+        logger.info(f"Compacted state log of session {session_id}")
+
+    def save(self, game_state: GameState) -> None:
+        session_id = game_state.session_id
+        snapshot = encode_game_state(game_state)
+        new_entries = {
+            field: [entry.model_dump(mode="json") for entry in entries]
+            for field, entries in new_history_entries(game_state).items() if entries
+        }
+
+        with self._session_lock(session_id):
+            index = self._get_index(session_id)
+            stored_version = index.version if index is not None else None
+            if stored_version is not None and game_state._version is not None \
+                    and stored_version != game_state._version:
+                self.conflicts += 1
+                raise StateConflictError(
+                    f"Session {session_id} is at version {stored_version}, "
+                    f"state was loaded at version {game_state._version}"
+                )
+
+            now = datetime.now(timezone.utc)
+            payload = {"version": (stored_version or 0) + 1, "time": now.isoformat(), "snapshot": snapshot}
+            if new_entries:
+                payload["history"] = new_entries
+            end = self._append(session_id, index, payload)
+
+            if index is None:
+                index = _LogIndex()
+                with self._lock:
+                    self._indexes[session_id] = index
+            index.apply(payload, end)
+            self.saves += 1
+            if self.compact_records and index.records >= self.compact_records:
+                self._compact(session_id, index)
+
+        game_state._persisted_history_counts = persisted_counts_after_save(game_state)
+        game_state._version = payload["version"]
+
+    def load(self, session_id: str) -> Optional[GameState]:
+        with self._session_lock(session_id):
+            index = self._get_index(session_id)
+            if index is None:
+                return None
+            snapshot = index.snapshot
+            version = index.version
+
+        game_state = decode_game_state(snapshot)
+        game_state.defer_history(lambda: self._read_history(session_id))
+        game_state._version = version
+        return game_state
+
+    def delete(self, session_id: str) -> bool:
+        with self._session_lock(session_id):
+            existed = self._get_index(session_id) is not None
+            with self._lock:
+                self._indexes.pop(session_id, None)
+            try:
+                os.remove(self._path(session_id))
+            except FileNotFoundError:
+                pass
+        return existed
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        encoded = {field: field_adapter(field).dump_python(value, mode="json") for field, value in fields.items()}
+        with self._session_lock(session_id):
+            index = self._get_index(session_id)
+            if index is None:
+                return None
+            payload = {
+                "version": index.version + 1,
+                "time": datetime.now(timezone.utc).isoformat(),
+                "snapshot": {**index.snapshot, **encoded},
+            }
+            index.apply(payload, self._append(session_id, index, payload))
+            return index.version
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        with self._session_lock(session_id):
+            index = self._get_index(session_id)
+            return index.version if index is not None else None
+
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._session_lock(session_id):
+            index = self._get_index(session_id)
+            return index.summary(session_id) if index is not None else None
+
+    def list_sessions(
+        self,
+        phase: Optional[str] = None,
+        act: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        if not self._all_indexed:
+            # Sessions written before this process started
+            for name in os.listdir(self.directory):
+                if name.endswith(_SUFFIX):
+                    session_id = unquote(name[:-len(_SUFFIX)])
+                    with self._session_lock(session_id):
+                        self._get_index(session_id)
+            self._all_indexed = True
+
+        with self._lock:
+            summaries = [index.summary(session_id) for session_id, index in self._indexes.items()]
+        return filter_summaries(summaries, phase, act, limit, offset)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "directory": self.directory,
+                "sessions": len(self._indexes),
+                "saves": self.saves,
+                "conflicts": self.conflicts,
+                "compactions": self.compactions,
+                "torn_records": self.torn_records,
+            }
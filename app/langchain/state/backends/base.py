@@ -0,0 +1,182 @@
+"""
+Storage backend interface for StateManager.
+
+A StateBackend stores game state snapshots, their append-only history
+collections and a version number per session. StateManager owns caching,
+validation and error handling; a backend only has to implement the storage
+operations below with the same semantics:
+
+- ``save`` is a compare-and-swap on the session version and appends only
+  the history entries created since the last save
+- ``load`` returns a state whose ``version`` is the stored version (its
+  history may be deferred)
+- ``get_version`` / ``get_summary`` / ``list_sessions`` never decode the
+  whole state
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from ..models import GameState, HISTORY_FIELDS
+
+
+class StateConflictError(Exception):
+    """Raised when a save loses a race with a concurrent save of the same session."""
+    pass
+
+
+# GameState collections whose sizes are part of a session summary
+SUMMARY_COUNT_FIELDS = {
+    "players": "player_count",
+    "characters": "character_count",
+    "public_log": "public_log_count",
+    "qna_history": "qna_count",
+    "mission_submissions": "mission_count",
+}
+
+
+def as_iso(value: Optional[datetime]) -> Optional[str]:
+    """Format a stored timestamp; naive timestamps are UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+
+def summary_from_snapshot(
+    session_id: str,
+    snapshot: Dict[str, Any],
+    history_counts: Dict[str, int],
+    created_at: Optional[datetime],
+    updated_at: Optional[datetime],
+) -> Dict[str, Any]:
+    """
+    Build a session summary from an encoded snapshot.
+
+    Args:
+        session_id: The session ID
+        snapshot: Snapshot produced by encode_game_state
+        history_counts: Stored entry counts per history collection
+        created_at: When the session was first saved
+        updated_at: When the session was last saved
+
+    Returns:
+        Summary dictionary with the same keys as the SQLAlchemy backend's
+    """
+    return {
+        'session_id': session_id,
+        'game_id': snapshot.get('game_id'),
+        'script_id': snapshot.get('script_id'),
+        'current_act': snapshot.get('current_act'),
+        'current_phase': snapshot.get('current_phase'),
+        'max_acts': snapshot.get('max_acts'),
+        'current_turn_index': snapshot.get('current_turn_index'),
+        'turn_order': snapshot.get('turn_order') or [],
+        'player_count': len(snapshot.get('players') or {}),
+        'character_count': len(snapshot.get('characters') or {}),
+        'public_log_count': history_counts.get('public_log', 0),
+        'qna_count': history_counts.get('qna_history', 0),
+        'mission_count': history_counts.get('mission_submissions', 0),
+        'created_at': as_iso(created_at),
+        'updated_at': as_iso(updated_at)
+    }
+
+
+def filter_summaries(
+    summaries: List[Dict[str, Any]],
+    phase: Optional[str],
+    act: Optional[int],
+    limit: int,
+    offset: int
+) -> List[Dict[str, Any]]:
+    """Apply list_sessions filtering, newest first, and paging to summaries."""
+    selected = [
+        summary for summary in summaries
+        if (phase is None or summary['current_phase'] == phase)
+        and (act is None or summary['current_act'] == act)
+    ]
+    selected.sort(key=lambda summary: summary['updated_at'] or "", reverse=True)
+    return selected[offset:offset + limit]
+
+
+def new_history_entries(game_state: GameState) -> Dict[str, list]:
+    """
+    History entries to append on save, keyed by collection.
+
+    Returns an empty dict when the history was never loaded: any append
+    would have loaded it first.
+    """
+    if not game_state.history_loaded:
+        return {}
+    return game_state.unsaved_history()
+
+
+def persisted_counts_after_save(game_state: GameState) -> Dict[str, int]:
+    """Persisted entry counts per history collection once a save succeeds."""
+    if not game_state.history_loaded:
+        return dict(game_state._persisted_history_counts)
+    return {field: len(game_state.__dict__[field]) for field in HISTORY_FIELDS}
+
+
+class StateBackend:
+    """
+    Interface of a game state store.
+
+    Methods raise on storage errors (StateManager logs them and reports
+    failure); ``save`` raises StateConflictError when the state was loaded
+    at an outdated version.
+    """
+
+    name = "base"
+
+    def save(self, game_state: GameState) -> None:
+        """
+        Store a state and append its new history entries.
+
+        On success ``game_state._version`` and ``_persisted_history_counts``
+        are updated to the stored values.
+
+        Raises:
+            StateConflictError: If the stored version differs from ``game_state.version``
+        """
+        raise NotImplementedError
+
+    def load(self, session_id: str) -> Optional[GameState]:
+        """Return the stored state of a session, or None if there is none."""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session; returns False when it did not exist."""
+        raise NotImplementedError
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        """
+        Overwrite validated snapshot fields in place (history fields excluded).
+
+        Returns:
+            The new version, or None when the session has no stored state
+        """
+        raise NotImplementedError
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """Return the stored version of a session, or None if it does not exist."""
+        raise NotImplementedError
+
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return a session summary, or None if it does not exist."""
+        raise NotImplementedError
+
+    def list_sessions(
+        self,
+        phase: Optional[str] = None,
+        act: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Return session summaries, most recently updated first."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Return backend counters."""
+        return {"backend": self.name}
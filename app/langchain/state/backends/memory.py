@@ -0,0 +1,143 @@
+"""
+In-memory storage backend.
+
+Keeps every session in a process-local dictionary. Nothing survives a
+restart and nothing is shared between worker processes, so it is meant for
+tests, benchmarks and load tests of the engine without a database.
+"""
+
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from ..codec import decode_game_state, encode_game_state, field_adapter
+from ..models import GameState, HISTORY_FIELDS
+from .base import (
+    StateBackend,
+    StateConflictError,
+    filter_summaries,
+    new_history_entries,
+    persisted_counts_after_save,
+    summary_from_snapshot,
+)
+
+
+class _StoredSession:
+    """One session held by InMemoryStateBackend."""
+
+    def __init__(self, snapshot: Dict[str, Any], now: datetime):
+        self.snapshot = snapshot
+        self.history: Dict[str, list] = {field: [] for field in HISTORY_FIELDS}
+        self.version = 0
+        self.created_at = now
+        self.updated_at = now
+
+    def summary(self, session_id: str) -> Dict[str, Any]:
+        counts = {field: len(entries) for field, entries in self.history.items()}
+        return summary_from_snapshot(session_id, self.snapshot, counts, self.created_at, self.updated_at)
+
+
+class InMemoryStateBackend(StateBackend):
+    """
+    Game state store in a dictionary.
+
+    Snapshots are kept encoded, so a loaded state never aliases the stored
+    one. History entries are copied once when appended and then shared by
+    every load, like the immutable rows of the SQLAlchemy backend.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._sessions: Dict[str, _StoredSession] = {}
+        self._lock = threading.Lock()
+        self.saves = 0
+        self.conflicts = 0
+
+    def save(self, game_state: GameState) -> None:
+        snapshot = encode_game_state(game_state)
+        new_entries = new_history_entries(game_state)
+        now = datetime.now(timezone.utc)
+
+        with self._lock:
+            stored = self._sessions.get(game_state.session_id)
+            if stored and game_state._version is not None and stored.version != game_state._version:
+                self.conflicts += 1
+                raise StateConflictError(
+                    f"Session {game_state.session_id} is at version {stored.version}, "
+                    f"state was loaded at version {game_state._version}"
+                )
+            if stored is None:
+                stored = _StoredSession(snapshot, now)
+                self._sessions[game_state.session_id] = stored
+            stored.snapshot = snapshot
+            stored.updated_at = now
+            for field, entries in new_entries.items():
+                stored.history[field].extend(entry.model_copy() for entry in entries)
+            stored.version += 1
+            self.saves += 1
+            version = stored.version
+
+        game_state._persisted_history_counts = persisted_counts_after_save(game_state)
+        game_state._version = version
+
+    def load(self, session_id: str) -> Optional[GameState]:
+        with self._lock:
+            stored = self._sessions.get(session_id)
+            if stored is None:
+                return None
+            snapshot = stored.snapshot
+            history = {field: list(entries) for field, entries in stored.history.items()}
+            version = stored.version
+
+        game_state = decode_game_state(snapshot)
+        game_state.defer_history(lambda: history)
+        game_state.load_history()
+        game_state._version = version
+        return game_state
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        encoded = {field: field_adapter(field).dump_python(value, mode="json") for field, value in fields.items()}
+        with self._lock:
+            stored = self._sessions.get(session_id)
+            if stored is None:
+                return None
+            stored.snapshot = {**stored.snapshot, **encoded}
+            stored.updated_at = datetime.now(timezone.utc)
+            stored.version += 1
+            return stored.version
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            stored = self._sessions.get(session_id)
+            return stored.version if stored else None
+
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            stored = self._sessions.get(session_id)
+            return stored.summary(session_id) if stored else None
+
+    def list_sessions(
+        self,
+        phase: Optional[str] = None,
+        act: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            summaries = [stored.summary(session_id) for session_id, stored in self._sessions.items()]
+        return filter_summaries(summaries, phase, act, limit, offset)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "sessions": len(self._sessions),
+                "saves": self.saves,
+                "conflicts": self.conflicts,
+            }
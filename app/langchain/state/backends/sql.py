@@ -0,0 +1,366 @@
+"""
+SQLAlchemy storage backend (the default).
+
+Stores the snapshot in the ``game_sessions.game_state`` JSON column, the
+history collections as one row per entry (see HistoryStore) and mirrors the
+summary fields into indexed GameSession columns. Saves are compare-and-swap
+on ``GameSession.version``.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.json_backend import dumps
+from app.database import get_db
+from app.models.database_models import GameSession
+from ..codec import decode_game_state, encode_game_state, field_adapter
+from ..history import HistoryStore
+from ..models import GameState, GamePhase, HISTORY_FIELDS
+from .base import (
+    StateBackend,
+    StateConflictError,
+    SUMMARY_COUNT_FIELDS,
+    as_iso,
+)
+
+logger = logging.getLogger(__name__)
+
+# GameState fields mirrored as-is into GameSession summary columns
+_SUMMARY_COLUMN_FIELDS = ("game_id", "current_act", "current_phase", "max_acts", "current_turn_index", "turn_order")
+
+
+class SQLAlchemyStateBackend(StateBackend):
+    """
+    Game state store on the application database.
+
+    Works on the given Session and leaves closing it to the caller; the
+    async StateManager methods run it inside ``AsyncSession.run_sync``.
+    """
+
+    name = "sqlalchemy"
+
+    def __init__(self, db_session: Optional[Session] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            db_session: Database session. If not provided, one is obtained through dependency injection.
+        """
+        self.db_session = db_session
+
+    def _get_db_session(self) -> Session:
+        """Get database session, using dependency injection if not provided."""
+        if self.db_session:
+            return self.db_session
+        return next(get_db())
+
+    def save(self, game_state: GameState) -> None:
+        db = self._get_db_session()
+        try:
+            # Find existing session or create new one; always read the current row
+            session = db.query(GameSession).filter(
+                GameSession.session_id == game_state.session_id
+            ).populate_existing().first()
+
+            if session and game_state._version is not None and session.version != game_state._version:
+                raise StateConflictError(
+                    f"Session {game_state.session_id} is at version {session.version}, "
+                    f"state was loaded at version {game_state._version}"
+                )
+
+            if not session:
+                # Create new session
+                session = GameSession(
+                    session_id=game_state.session_id,
+                    script_id=game_state.script_id,
+                    user_id=None,  # Will be set by the calling code if needed
+                    current_scene_index=0,  # Legacy field, keeping for compatibility
+                    game_state={}
+                )
+                db.add(session)
+
+            # Snapshot without history; the history goes to its own tables
+            session.game_state = encode_game_state(game_state)
+            session.updated_at = datetime.now(timezone.utc)
+
+            # Append only the history entries created since the last save
+            persisted_counts = HistoryStore(db).append_new_entries(game_state)
+            self._apply_summary_columns(session, game_state, persisted_counts)
+
+            try:
+                db.commit()
+            except StaleDataError as e:
+                # The row changed between the read above and the versioned UPDATE
+                raise StateConflictError(f"Session {game_state.session_id} was modified concurrently") from e
+        except Exception:
+            db.rollback()
+            raise
+
+        game_state._persisted_history_counts = persisted_counts
+        game_state._version = session.version
+
+    def load(self, session_id: str) -> Optional[GameState]:
+        db = self._get_db_session()
+
+        session = db.query(GameSession).filter(
+            GameSession.session_id == session_id
+        ).populate_existing().first()
+
+        if not session:
+            return None
+
+        # If game_state is empty or not in new format, create default state
+        if not session.game_state or 'game_id' not in session.game_state:
+            logger.info(f"Creating new game state for session {session_id}")
+            game_state = self._create_default_game_state(session)
+            game_state._version = session.version
+            return game_state
+
+        game_state = self._deserialize_game_state(session.game_state, session)
+        game_state._version = session.version
+        if not any(field in session.game_state for field in HISTORY_FIELDS):
+            # History lives in its own tables (legacy blobs still embed theirs;
+            # those entries are moved to the tables on the next save)
+            history_store = HistoryStore(db)
+            game_state.defer_history(lambda: history_store.load(session_id))
+        return game_state
+
+    def delete(self, session_id: str) -> bool:
+        db = self._get_db_session()
+        try:
+            session = db.query(GameSession).filter(
+                GameSession.session_id == session_id
+            ).first()
+
+            if not session:
+                return False
+            db.delete(session)
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+
+    def update_fields(self, session_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        """
+        Patch fields inside the stored snapshot.
+
+        On SQLite the fields are patched with a single
+        ``UPDATE ... SET game_state = json_set(...)`` statement; the blob is
+        never deserialized. Other databases fall back to load, patch and save.
+        """
+        db = self._get_db_session()
+        if db.get_bind().dialect.name != "sqlite":
+            return self._update_fields_full_round_trip(session_id, fields)
+
+        try:
+            # json_set(game_state, '$.a', json(:a), '$.b', json(:b), ...)
+            json_set_args = []
+            for field, value in fields.items():
+                encoded = field_adapter(field).dump_python(value, mode="json")
+                json_set_args.extend([f"$.{field}", func.json(dumps(encoded))])
+
+            column_values = {
+                "game_state": func.json_set(GameSession.game_state, *json_set_args),
+                "version": GameSession.version + 1,
+            }
+            for field, value in fields.items():
+                if field == "updated_at" or field in _SUMMARY_COLUMN_FIELDS:
+                    column_values[field] = value
+                elif field in SUMMARY_COUNT_FIELDS:
+                    column_values[SUMMARY_COUNT_FIELDS[field]] = len(value)
+
+            result = db.execute(
+                update(GameSession)
+                .where(GameSession.session_id == session_id)
+                .where(func.json_extract(GameSession.game_state, "$.game_id").isnot(None))
+                .values(**column_values)
+                .execution_options(synchronize_session=False)
+            )
+            new_version = db.query(GameSession.version).filter(
+                GameSession.session_id == session_id
+            ).scalar()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return new_version if result.rowcount else None
+
+    def _update_fields_full_round_trip(self, session_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        """Fallback for databases without SQLite JSON functions: load, patch and save."""
+        game_state = self.load(session_id)
+        if not game_state:
+            return None
+        for field, value in fields.items():
+            setattr(game_state, field, value)
+        self.save(game_state)
+        return game_state._version
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        db = self._get_db_session()
+        row = db.query(GameSession.version).filter(
+            GameSession.session_id == session_id
+        ).first()
+        return row.version if row else None
+
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read the summary from the GameSession summary columns.
+
+        The game_state JSON is only consulted for rows saved before the
+        columns existed.
+        """
+        db = self._get_db_session()
+
+        row = db.query(*_SUMMARY_QUERY_COLUMNS).filter(
+            GameSession.session_id == session_id
+        ).first()
+
+        if not row:
+            return None
+
+        if row.game_id is None:
+            return self._get_summary_from_snapshot(db, session_id)
+
+        return _summary_from_row(row)
+
+    def _get_summary_from_snapshot(self, db: Session, session_id: str) -> Optional[Dict[str, Any]]:
+        """Build the summary from the stored JSON for rows without summary columns."""
+        session = db.query(GameSession).filter(
+            GameSession.session_id == session_id
+        ).first()
+
+        if not session or not session.game_state:
+            return None
+
+        state_dict = session.game_state
+
+        return {
+            'game_id': state_dict.get('game_id'),
+            'script_id': state_dict.get('script_id'),
+            'current_act': state_dict.get('current_act', 1),
+            'current_phase': state_dict.get('current_phase', 'initialization'),
+            'player_count': len(state_dict.get('players', {})),
+            'character_count': len(state_dict.get('characters', {})),
+            'created_at': state_dict.get('created_at'),
+            'updated_at': state_dict.get('updated_at')
+        }
+
+    def list_sessions(
+        self,
+        phase: Optional[str] = None,
+        act: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Filter on the indexed summary columns, so no game_state JSON is read."""
+        db = self._get_db_session()
+
+        query = db.query(*_SUMMARY_QUERY_COLUMNS).filter(GameSession.game_id.isnot(None))
+        if phase is not None:
+            query = query.filter(GameSession.current_phase == phase)
+        if act is not None:
+            query = query.filter(GameSession.current_act == act)
+
+        rows = query.order_by(GameSession.updated_at.desc()).offset(offset).limit(limit).all()
+        return [_summary_from_row(row) for row in rows]
+
+    def _deserialize_game_state(self, state_dict: Dict[str, Any], session: GameSession) -> GameState:
+        """
+        Convert a stored snapshot to a GameState object.
+
+        Args:
+            state_dict: Dictionary representation of game state
+            session: Database row for additional context
+
+        Returns:
+            GameState object
+        """
+        # Ensure required fields are present
+        if 'session_id' not in state_dict or 'script_id' not in state_dict:
+            state_dict = dict(state_dict)
+            state_dict.setdefault('session_id', session.session_id)
+            state_dict.setdefault('script_id', session.script_id)
+
+        return decode_game_state(state_dict)
+
+    def _create_default_game_state(self, session: GameSession) -> GameState:
+        """
+        Create a default game state for a new session.
+
+        Args:
+            session: Database row of the session
+
+        Returns:
+            Default GameState object
+        """
+        return GameState(
+            game_id=f"game_{session.session_id}",
+            script_id=session.script_id,
+            session_id=session.session_id,
+            current_phase=GamePhase.INITIALIZATION
+        )
+
+    def _apply_summary_columns(self, session: GameSession, game_state: GameState, persisted_counts: Dict[str, int]) -> None:
+        """
+        Mirror the summary fields of a game state into the GameSession columns.
+
+        Args:
+            session: The GameSession row being saved
+            game_state: The GameState being saved
+            persisted_counts: Persisted history entry counts after this save
+        """
+        for field in _SUMMARY_COLUMN_FIELDS:
+            setattr(session, field, getattr(game_state, field))
+        session.player_count = len(game_state.players)
+        session.character_count = len(game_state.characters)
+        if game_state.history_loaded:
+            session.public_log_count = persisted_counts["public_log"]
+            session.qna_count = persisted_counts["qna_history"]
+            session.mission_count = persisted_counts["mission_submissions"]
+
+
+_SUMMARY_QUERY_COLUMNS = (
+    GameSession.session_id,
+    GameSession.script_id,
+    GameSession.game_id,
+    GameSession.current_act,
+    GameSession.current_phase,
+    GameSession.max_acts,
+    GameSession.current_turn_index,
+    GameSession.turn_order,
+    GameSession.player_count,
+    GameSession.character_count,
+    GameSession.public_log_count,
+    GameSession.qna_count,
+    GameSession.mission_count,
+    GameSession.created_at,
+    GameSession.updated_at,
+)
+
+
+def _summary_from_row(row: Any) -> Dict[str, Any]:
+    """Build a summary dictionary from a row of _SUMMARY_QUERY_COLUMNS."""
+    return {
+        'session_id': row.session_id,
+        'game_id': row.game_id,
+        'script_id': row.script_id,
+        'current_act': row.current_act,
+        'current_phase': row.current_phase,
+        'max_acts': row.max_acts,
+        'current_turn_index': row.current_turn_index,
+        'turn_order': row.turn_order or [],
+        'player_count': row.player_count,
+        'character_count': row.character_count,
+        'public_log_count': row.public_log_count,
+        'qna_count': row.qna_count,
+        'mission_count': row.mission_count,
+        'created_at': as_iso(row.created_at),
+        'updated_at': as_iso(row.updated_at)
+    }
@@ -0,0 +1,185 @@
+"""
+In-process cache of live GameState objects.
+
+This module provides the GameStateCache class, a bounded LRU cache with a TTL
+that sits in front of the database so that hot sessions (status polling in
+particular) do not re-parse the full game JSON on every request.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import GAME_STATE_CACHE_SIZE, GAME_STATE_CACHE_TTL_SECONDS
+from .models import GameState
+
+logger = logging.getLogger(__name__)
+
+
+class GameStateCache:
+    """
+    Bounded LRU/TTL cache of GameState objects keyed by session ID.
+
+    Entries are stored and returned as deep copies, so callers can mutate
+    the state they get without affecting the cache until they save it.
+    The cache is per-process: with several workers, the TTL bounds how
+    stale a cached session can be.
+    """
+
+    def __init__(self, maxsize: int = GAME_STATE_CACHE_SIZE, ttl_seconds: float = GAME_STATE_CACHE_TTL_SECONDS):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of sessions kept; 0 disables caching
+            ttl_seconds: Seconds an entry stays valid; 0 or less means no expiry
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, GameState]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything at all."""
+        return self.maxsize > 0
+
+    def get(self, session_id: str) -> Optional[GameState]:
+        """
+        Return a copy of the cached state for a session.
+
+        Args:
+            session_id: The session ID to look up
+
+        Returns:
+            GameState copy if cached and fresh, None otherwise
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, game_state = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[session_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+
+        return game_state.model_copy(deep=True)
+
+    def peek_version(self, session_id: str) -> Optional[int]:
+        """
+        Return the stored version of a cached session without copying it.
+
+        Args:
+            session_id: The session ID to look up
+
+        Returns:
+            Version of the cached state if cached and fresh, None otherwise
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            stored_at, game_state = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                return None
+            return game_state.version
+
+    def put(self, game_state: GameState) -> None:
+        """
+        Store a copy of a game state (write-through after a successful save).
+
+        States whose history has not been loaded yet are not cached.
+
+        Args:
+            game_state: The GameState to cache
+        """
+        if not self.enabled:
+            return
+
+        if not game_state.history_loaded:
+            # Only fully materialized states are cached; drop any stale copy
+            self.invalidate(game_state.session_id)
+            return
+
+        snapshot = game_state.model_copy(deep=True)
+        with self._lock:
+            self._entries[game_state.session_id] = (time.monotonic(), snapshot)
+            self._entries.move_to_end(game_state.session_id)
+            while len(self._entries) > self.maxsize:
+                evicted_id, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                logger.debug(f"Evicted session {evicted_id} from game state cache")
+
+    def apply_updates(self, session_id: str, field_updates: Dict[str, Any], version: Optional[int] = None) -> None:
+        """
+        Patch fields of a cached state in place after a partial update was committed.
+
+        Args:
+            session_id: The session ID to patch
+            field_updates: Already validated field values
+            version: New stored version of the session, if known
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            _, game_state = entry
+            for field, value in field_updates.items():
+                setattr(game_state, field, value)
+            if version is not None:
+                game_state._version = version
+
+    def invalidate(self, session_id: str) -> None:
+        """Drop a session from the cache."""
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def clear(self) -> None:
+        """Drop every cached session and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_game_state_cache: Optional[GameStateCache] = None
+
+
+def get_game_state_cache() -> GameStateCache:
+    """Return the process-wide GameState cache."""
+    global _game_state_cache
+    if _game_state_cache is None:
+        _game_state_cache = GameStateCache()
+    return _game_state_cache
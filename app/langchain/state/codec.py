@@ -0,0 +1,85 @@
+"""
+Serialization codec for GameState persistence.
+
+This module provides the functions that turn a GameState into the JSON snapshot
+stored in the database and back. It relies on Pydantic v2's compiled
+serializer/validator (``model_dump(mode="json")`` / ``model_validate``), so
+datetimes, enums and nested models are handled in a single pass without
+recursive Python walks. JSON text goes through app.core.json_backend (orjson
+when available).
+"""
+
+import logging
+from functools import lru_cache
+from typing import Annotated, Any, Dict, Union
+
+from pydantic import ConfigDict, TypeAdapter
+
+from app.core.json_backend import dumps_bytes
+from .models import GameState, HISTORY_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Version tag stored in every snapshot. Version 1 snapshots (no tag) embed
+# the history collections and are still readable.
+GAME_STATE_SCHEMA_VERSION = 2
+SCHEMA_VERSION_KEY = "schema_version"
+
+_SNAPSHOT_EXCLUDE = set(HISTORY_FIELDS)
+
+
+def encode_game_state(game_state: GameState) -> Dict[str, Any]:
+    """
+    Convert a GameState into its JSON-compatible snapshot.
+
+    The history collections are persisted separately (see HistoryStore)
+    and are not part of the snapshot.
+
+    Args:
+        game_state: The GameState to encode
+
+    Returns:
+        JSON-compatible dictionary tagged with the schema version
+    """
+    snapshot = game_state.model_dump(mode="json", exclude=_SNAPSHOT_EXCLUDE)
+    snapshot[SCHEMA_VERSION_KEY] = GAME_STATE_SCHEMA_VERSION
+    return snapshot
+
+
+def decode_game_state(snapshot: Dict[str, Any]) -> GameState:
+    """
+    Build a GameState from a stored snapshot.
+
+    Args:
+        snapshot: Dictionary read from the database
+
+    Returns:
+        GameState object
+    """
+    version = snapshot.get(SCHEMA_VERSION_KEY, 1)
+    if version > GAME_STATE_SCHEMA_VERSION:
+        logger.warning(
+            f"Game state snapshot has schema version {version}, "
+            f"newer than supported version {GAME_STATE_SCHEMA_VERSION}"
+        )
+    # The version tag is not a GameState field and is ignored by validation
+    return GameState.model_validate(snapshot)
+
+
+def encode_game_state_json(game_state: GameState) -> bytes:
+    """Encode a GameState snapshot straight to JSON bytes."""
+    return dumps_bytes(encode_game_state(game_state))
+
+
+def decode_game_state_json(data: Union[str, bytes]) -> GameState:
+    """Decode JSON produced by encode_game_state_json, parsing and validating in one pass."""
+    return GameState.model_validate_json(data)
+
+
+@lru_cache(maxsize=None)
+def field_adapter(field: str) -> TypeAdapter:
+    """Return a validator/serializer for a single GameState field, including its constraints."""
+    info = GameState.model_fields[field]
+    annotation = Annotated[(info.annotation, *info.metadata)] if info.metadata else info.annotation
+    # Match GameState's own config so enums are stored by value
+    return TypeAdapter(annotation, config=ConfigDict(use_enum_values=True))
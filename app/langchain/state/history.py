@@ -0,0 +1,186 @@
+"""
+Append-only persistence for the GameState history collections.
+
+This module provides the HistoryStore class that stores public_log, qna_history
+and mission_submissions as one row per entry in dedicated tables, so that saving
+a game only writes the entries created since the last save instead of rewriting
+the whole history inside the game_state JSON blob.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.models.database_models import PublicLogRecord, QnARecord, MissionSubmissionRecord
+from .models import GameState, PublicLogEntry, QnAEntry, MissionSubmission, HISTORY_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite drops tzinfo; stored timestamps are always UTC."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _log_entry_to_record(session_id: str, seq: int, entry: PublicLogEntry) -> PublicLogRecord:
+    return PublicLogRecord(
+        id=entry.id,
+        session_id=session_id,
+        seq=seq,
+        entry_type=entry.entry_type,
+        content=entry.content,
+        act_number=entry.act_number,
+        timestamp=entry.timestamp,
+        related_player_id=entry.related_player_id,
+        related_character_id=entry.related_character_id
+    )
+
+
+def _record_to_log_entry(record: PublicLogRecord) -> PublicLogEntry:
+    return PublicLogEntry(
+        id=record.id,
+        entry_type=record.entry_type,
+        content=record.content,
+        act_number=record.act_number,
+        timestamp=_as_utc(record.timestamp),
+        related_player_id=record.related_player_id,
+        related_character_id=record.related_character_id
+    )
+
+
+def _qna_entry_to_record(session_id: str, seq: int, entry: QnAEntry) -> QnARecord:
+    return QnARecord(
+        id=entry.id,
+        session_id=session_id,
+        seq=seq,
+        questioner_id=entry.questioner_id,
+        target_character_id=entry.target_character_id,
+        question=entry.question,
+        answer=entry.answer,
+        act_number=entry.act_number,
+        timestamp=entry.timestamp,
+        is_public=entry.is_public
+    )
+
+
+def _record_to_qna_entry(record: QnARecord) -> QnAEntry:
+    return QnAEntry(
+        id=record.id,
+        questioner_id=record.questioner_id,
+        target_character_id=record.target_character_id,
+        question=record.question,
+        answer=record.answer,
+        act_number=record.act_number,
+        timestamp=_as_utc(record.timestamp),
+        is_public=record.is_public
+    )
+
+
+def _submission_to_record(session_id: str, seq: int, submission: MissionSubmission) -> MissionSubmissionRecord:
+    return MissionSubmissionRecord(
+        id=submission.id,
+        session_id=session_id,
+        seq=seq,
+        player_id=submission.player_id,
+        mission_type=submission.mission_type,
+        content=submission.content,
+        status=submission.status,
+        act_number=submission.act_number,
+        timestamp=submission.timestamp,
+        review_notes=submission.review_notes
+    )
+
+
+def _record_to_submission(record: MissionSubmissionRecord) -> MissionSubmission:
+    return MissionSubmission(
+        id=record.id,
+        player_id=record.player_id,
+        mission_type=record.mission_type,
+        content=record.content,
+        status=record.status,
+        act_number=record.act_number,
+        timestamp=_as_utc(record.timestamp),
+        review_notes=record.review_notes
+    )
+
+
+# field name -> (record model, entry -> record, record -> entry)
+_COLLECTIONS = {
+    "public_log": (PublicLogRecord, _log_entry_to_record, _record_to_log_entry),
+    "qna_history": (QnARecord, _qna_entry_to_record, _record_to_qna_entry),
+    "mission_submissions": (MissionSubmissionRecord, _submission_to_record, _record_to_submission),
+}
+
+
+class HistoryStore:
+    """
+    Row-per-entry storage for the GameState history collections.
+
+    Entries are only ever appended. Which entries are new is tracked on the
+    GameState itself (``_persisted_history_counts``), so a save costs
+    O(new entries) rather than O(history). Entries are immutable once
+    persisted.
+    """
+
+    def __init__(self, db: Session):
+        """
+        Initialize the history store.
+
+        Args:
+            db: Database session used for reads and (uncommitted) writes
+        """
+        self.db = db
+
+    def append_new_entries(self, game_state: GameState) -> Dict[str, int]:
+        """
+        Add rows for entries created since the last save.
+
+        The caller is responsible for committing the transaction and then
+        recording the returned counts on the game state.
+
+        Args:
+            game_state: The GameState being saved
+
+        Returns:
+            Persisted entry counts per collection after this save
+        """
+        persisted = dict(game_state._persisted_history_counts)
+        if not game_state.history_loaded:
+            # Nothing was appended: any append would have loaded the history first
+            return persisted
+
+        for field, (_, to_record, _) in _COLLECTIONS.items():
+            entries: List[Any] = game_state.__dict__[field]
+            start = persisted.get(field, 0)
+            for seq in range(start, len(entries)):
+                self.db.add(to_record(game_state.session_id, seq, entries[seq]))
+            persisted[field] = len(entries)
+
+        return persisted
+
+    def load(self, session_id: str) -> Dict[str, list]:
+        """
+        Load all history collections for a session, in append order.
+
+        Args:
+            session_id: The session ID to load
+
+        Returns:
+            Dictionary of HISTORY_FIELDS lists
+        """
+        collections = {}
+        for field, (record_model, _, from_record) in _COLLECTIONS.items():
+            records = self.db.query(record_model).filter(
+                record_model.session_id == session_id
+            ).order_by(record_model.seq).all()
+            collections[field] = [from_record(record) for record in records]
+
+        logger.debug(
+            f"Loaded history for session {session_id}: "
+            + ", ".join(f"{field}={len(collections[field])}" for field in HISTORY_FIELDS)
+        )
+        return collections
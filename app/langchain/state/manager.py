@@ -1,131 +1,154 @@
 """
 State manager for handling game state persistence and retrieval.
 
-This module provides the StateManager class that handles serialization/deserialization
-of complex game state to/from the database, bridging the gap between the structured
-Pydantic models and the existing database schema.
+This module provides the StateManager class that persists the structured
+Pydantic game state. Storage itself is delegated to a StateBackend (see
+``backends``): the application database by default, or an in-memory or
+append-log store selected with ``GAME_STATE_BACKEND``. StateManager adds the
+state cache, field validation and error handling on top of the backend.
+
+The ``a``-prefixed methods are async versions for ``async def`` routes. With
+the database backend they run the same persistence logic on an AsyncSession
+(aiosqlite) through ``run_sync``, so sync and async callers share one
+implementation and one state cache.
 """
 
-import json
+import asyncio
 import logging
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, List, TypeVar
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models.database_models import GameSession
-from app.database import get_db
-from .models import GameState, PlayerState, CharacterState, GamePhase
+from app.database import AsyncSessionLocal
+from .models import GameState, HISTORY_FIELDS
+from .cache import GameStateCache, get_game_state_cache
+from .codec import field_adapter
+from .backends import (
+    InMemoryStateBackend,
+    SQLAlchemyStateBackend,
+    StateBackend,
+    StateConflictError,
+    get_state_backend,
+)
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class StateManager:
     """
     Manages game state persistence and retrieval.
     
-    This class handles the conversion between the structured GameState model
-    and the JSON storage format used in the database.
+    This class keeps the state cache in step with the storage backend and
+    turns storage errors into logged failures.
     """
     
-    def __init__(self, db_session: Optional[Session] = None):
+    def __init__(
+        self,
+        db_session: Optional[Session] = None,
+        cache: Optional[GameStateCache] = None,
+        async_db_session: Optional[AsyncSession] = None,
+        backend: Optional[StateBackend] = None
+    ):
         """
         Initialize the state manager.
         
         Args:
             db_session: Optional database session. If not provided, will use dependency injection.
+            cache: Optional GameState cache. Defaults to the process-wide cache.
+            async_db_session: Optional async database session used by the ``a``-prefixed
+                methods. If not provided, each async call opens its own session.
+            backend: Optional storage backend. Defaults to the one selected by ``GAME_STATE_BACKEND``.
         """
         self.db_session = db_session
-    
-    def _get_db_session(self) -> Session:
-        """Get database session, using dependency injection if not provided."""
-        if self.db_session:
-            return self.db_session
-        return next(get_db())
+        self.cache = cache if cache is not None else get_game_state_cache()
+        self.async_db_session = async_db_session
+        self.backend = backend if backend is not None else get_state_backend(db_session)
     
     def save_game_state(self, game_state: GameState) -> bool:
         """
-        Save game state to database.
+        Save game state.
+        
+        The save is a compare-and-swap on the session's stored version: if the
+        session changed since ``game_state`` was loaded, nothing is written
+        and StateConflictError is raised so the caller can reload and re-apply
+        its changes. Only the history entries created since the last save are
+        written.
         
         Args:
             game_state: The GameState object to save
             
         Returns:
             bool: True if successful, False otherwise
+            
+        Raises:
+            StateConflictError: If the session was modified concurrently
         """
         try:
-            db = self._get_db_session()
-            
-            # Find existing session or create new one
-            session = db.query(GameSession).filter(
-                GameSession.session_id == game_state.session_id
-            ).first()
-            
-            if not session:
-                # Create new session
-                session = GameSession(
-                    session_id=game_state.session_id,
-                    script_id=game_state.script_id,
-                    user_id=None,  # Will be set by the calling code if needed
-                    current_scene_index=0,  # Legacy field, keeping for compatibility
-                    game_state={}
-                )
-                db.add(session)
-            
-            # Convert GameState to JSON-serializable format
-            state_dict = self._serialize_game_state(game_state)
-            
-            # Update session with new state
-            session.game_state = state_dict
-            session.updated_at = datetime.now(timezone.utc)
-            
-            db.commit()
-            logger.info(f"Successfully saved game state for session {game_state.session_id}")
-            return True
-            
+            self.backend.save(game_state)
+        except StateConflictError as e:
+            logger.warning(f"Version conflict saving game state: {e}")
+            self.cache.invalidate(game_state.session_id)
+            raise
         except Exception as e:
             logger.error(f"Failed to save game state for session {game_state.session_id}: {e}")
-            if 'db' in locals():
-                db.rollback()
+            self.cache.invalidate(game_state.session_id)
             return False
+
+        # Write-through: the cache always mirrors the last committed state
+        self.cache.put(game_state)
+        logger.info(f"Successfully saved game state for session {game_state.session_id}")
+        return True
     
-    def load_game_state(self, session_id: str) -> Optional[GameState]:
+    def load_game_state(self, session_id: str, expected_version: Optional[int] = None) -> Optional[GameState]:
         """
-        Load game state from database.
+        Load game state.
         
         Args:
             session_id: The session ID to load
+            expected_version: Stored version just read with get_game_state_version. The
+                cached copy is only used when it has this version; it can be older when
+                another worker process saved the session.
             
         Returns:
             GameState object if found, None otherwise
         """
+        cached_state = self._get_cached(session_id, expected_version)
+        if cached_state is not None:
+            return cached_state
+
         try:
-            db = self._get_db_session()
-            
-            session = db.query(GameSession).filter(
-                GameSession.session_id == session_id
-            ).first()
-            
-            if not session:
-                logger.warning(f"No session found with ID {session_id}")
-                return None
-            
-            # If game_state is empty or not in new format, create default state
-            if not session.game_state or 'game_id' not in session.game_state:
-                logger.info(f"Creating new game state for session {session_id}")
-                return self._create_default_game_state(session)
-            
-            # Deserialize game state
-            game_state = self._deserialize_game_state(session.game_state, session)
-            logger.info(f"Successfully loaded game state for session {session_id}")
-            return game_state
-            
+            game_state = self.backend.load(session_id)
         except Exception as e:
             logger.error(f"Failed to load game state for session {session_id}: {e}")
             return None
+
+        if game_state is None:
+            logger.warning(f"No session found with ID {session_id}")
+            return None
+        if game_state.history_loaded:
+            # Nothing left to load lazily
+            self.cache.put(game_state)
+        logger.info(f"Successfully loaded game state for session {session_id}")
+        return game_state
     
+    def _get_cached(self, session_id: str, expected_version: Optional[int]) -> Optional[GameState]:
+        cached_state = self.cache.get(session_id)
+        if cached_state is None:
+            return None
+        if expected_version is not None and cached_state.version != expected_version:
+            logger.info(
+                f"Cached state of session {session_id} is at version {cached_state.version}, "
+                f"stored version is {expected_version}; reloading"
+            )
+            return None
+        return cached_state
+
     def delete_game_state(self, session_id: str) -> bool:
         """
-        Delete game state from database.
+        Delete game state.
         
         Args:
             session_id: The session ID to delete
@@ -133,139 +156,95 @@ class StateManager:
         Returns:
             bool: True if successful, False otherwise
         """
+        self.cache.invalidate(session_id)
+
         try:
-            db = self._get_db_session()
-            
-            session = db.query(GameSession).filter(
-                GameSession.session_id == session_id
-            ).first()
-            
-            if session:
-                db.delete(session)
-                db.commit()
+            if self.backend.delete(session_id):
                 logger.info(f"Successfully deleted game state for session {session_id}")
                 return True
-            else:
-                logger.warning(f"No session found with ID {session_id} to delete")
-                return False
-                
+            logger.warning(f"No session found with ID {session_id} to delete")
+            return False
         except Exception as e:
             logger.error(f"Failed to delete game state for session {session_id}: {e}")
-            if 'db' in locals():
-                db.rollback()
             return False
     
-    def _serialize_game_state(self, game_state: GameState) -> Dict[str, Any]:
-        """
-        Convert GameState object to JSON-serializable dictionary.
-        
-        Args:
-            game_state: The GameState object to serialize
-            
-        Returns:
-            Dictionary representation of the game state
-        """
-        # Use Pydantic's built-in serialization
-        state_dict = game_state.dict()
-        
-        # Convert datetime objects to ISO format strings
-        for key, value in state_dict.items():
-            if isinstance(value, datetime):
-                state_dict[key] = value.isoformat()
-        
-        # Handle nested datetime objects in lists and dicts
-        state_dict = self._convert_datetimes_recursive(state_dict)
-        
-        return state_dict
-    
-    def _deserialize_game_state(self, state_dict: Dict[str, Any], session: GameSession) -> GameState:
-        """
-        Convert dictionary to GameState object.
-        
-        Args:
-            state_dict: Dictionary representation of game state
-            session: Database session object for additional context
-            
-        Returns:
-            GameState object
-        """
-        # Convert ISO format strings back to datetime objects
-        state_dict = self._convert_iso_strings_recursive(state_dict)
-        
-        # Ensure required fields are present
-        if 'session_id' not in state_dict:
-            state_dict['session_id'] = session.session_id
-        if 'script_id' not in state_dict:
-            state_dict['script_id'] = session.script_id
-        
-        # Create GameState object from dictionary
-        return GameState(**state_dict)
-    
-    def _create_default_game_state(self, session: GameSession) -> GameState:
+    async def _arun(self, work: Callable[["StateManager"], T]) -> T:
         """
-        Create a default game state for a new session.
-        
-        Args:
-            session: Database session object
-            
-        Returns:
-            Default GameState object
+        Run sync persistence logic without blocking the event loop.
+
+        The SQLAlchemy backend runs it against the async session (in SQLAlchemy's
+        greenlet bridge). The in-memory backend only touches dictionaries and runs
+        inline; other backends do file I/O and wait on per-session locks, so they
+        run on a worker thread.
         """
-        return GameState(
-            game_id=f"game_{session.session_id}",
-            script_id=session.script_id,
-            session_id=session.session_id,
-            current_phase=GamePhase.INITIALIZATION
-        )
-    
-    def _convert_datetimes_recursive(self, obj: Any) -> Any:
+        if isinstance(self.backend, InMemoryStateBackend):
+            return work(self)
+        if not isinstance(self.backend, SQLAlchemyStateBackend):
+            return await asyncio.to_thread(work, self)
+
+        def run(session: Session) -> T:
+            return work(StateManager(session, cache=self.cache, backend=SQLAlchemyStateBackend(session)))
+
+        if self.async_db_session is not None:
+            return await self.async_db_session.run_sync(run)
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(run)
+
+    async def asave_game_state(self, game_state: GameState) -> bool:
         """
-        Recursively convert datetime objects to ISO format strings.
+        Async version of save_game_state.
         
-        Args:
-            obj: Object to process
-            
-        Returns:
-            Object with datetime objects converted to strings
+        Raises:
+            StateConflictError: If the session was modified concurrently
         """
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        elif isinstance(obj, dict):
-            return {key: self._convert_datetimes_recursive(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [self._convert_datetimes_recursive(item) for item in obj]
-        else:
-            return obj
-    
-    def _convert_iso_strings_recursive(self, obj: Any) -> Any:
+        return await self._arun(lambda manager: manager.save_game_state(game_state))
+
+    async def aload_game_state(self, session_id: str, expected_version: Optional[int] = None) -> Optional[GameState]:
         """
-        Recursively convert ISO format strings back to datetime objects.
+        Async version of load_game_state.
         
-        Args:
-            obj: Object to process
-            
-        Returns:
-            Object with ISO strings converted to datetime objects
+        The history collections are loaded right away rather than deferred,
+        because a deferred loader would run outside the async session; the
+        fully loaded state is cached, so later loads are served from memory.
         """
-        if isinstance(obj, str):
-            # Try to parse as ISO datetime
-            try:
-                if 'T' in obj and (obj.endswith('Z') or '+' in obj[-6:] or obj.endswith('+00:00')):
-                    return datetime.fromisoformat(obj.replace('Z', '+00:00'))
-            except ValueError:
-                pass
-            return obj
-        elif isinstance(obj, dict):
-            return {key: self._convert_iso_strings_recursive(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [self._convert_iso_strings_recursive(item) for item in obj]
-        else:
-            return obj
+        cached_state = self._get_cached(session_id, expected_version)
+        if cached_state is not None:
+            return cached_state
+
+        def load(manager: "StateManager") -> Optional[GameState]:
+            game_state = manager.load_game_state(session_id, expected_version)
+            if game_state is not None and not game_state.history_loaded:
+                game_state.load_history()
+                self.cache.put(game_state)
+            return game_state
+
+        try:
+            return await self._arun(load)
+        except Exception as e:
+            logger.error(f"Failed to load game state for session {session_id}: {e}")
+            return None
+
+    async def adelete_game_state(self, session_id: str) -> bool:
+        """Async version of delete_game_state."""
+        return await self._arun(lambda manager: manager.delete_game_state(session_id))
+
+    async def aget_game_state_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Async version of get_game_state_summary."""
+        return await self._arun(lambda manager: manager.get_game_state_summary(session_id))
+
+    async def aget_game_state_version(self, session_id: str) -> Optional[int]:
+        """Async version of get_game_state_version."""
+        return await self._arun(lambda manager: manager.get_game_state_version(session_id))
     
     def update_game_state_field(self, session_id: str, field_updates: Dict[str, Any]) -> bool:
         """
         Update specific fields in the game state without loading the entire state.
         
+        Values are validated against the GameState field types first, then
+        patched into the stored snapshot by the backend (on SQLite with a
+        single ``json_set`` UPDATE; the blob is never deserialized). History
+        fields cannot be patched (they are append-only).
+        
         Args:
             session_id: The session ID to update
             field_updates: Dictionary of field names and their new values
@@ -274,25 +253,54 @@ class StateManager:
             bool: True if successful, False otherwise
         """
         try:
-            # Load current state
-            game_state = self.load_game_state(session_id)
-            if not game_state:
-                return False
-            
-            # Update specified fields
+            validated = {}
             for field, value in field_updates.items():
-                if hasattr(game_state, field):
-                    setattr(game_state, field, value)
-                else:
-                    logger.warning(f"Field {field} not found in GameState model")
-            
-            # Save updated state
-            return self.save_game_state(game_state)
+                if field not in GameState.model_fields or field in HISTORY_FIELDS:
+                    logger.warning(f"Field {field} cannot be updated in place")
+                    continue
+                validated[field] = field_adapter(field).validate_python(value)
+
+            if not validated:
+                return False
+
+            validated["updated_at"] = datetime.now(timezone.utc)
+            new_version = self.backend.update_fields(session_id, validated)
+
+            if new_version is None:
+                logger.warning(f"No stored game state for session {session_id} to update")
+                self.cache.invalidate(session_id)
+                return False
+
+            self.cache.apply_updates(session_id, validated, version=new_version)
+            logger.info(f"Updated fields {list(validated)} for session {session_id}")
+            return True
             
         except Exception as e:
             logger.error(f"Failed to update game state fields for session {session_id}: {e}")
+            self.cache.invalidate(session_id)
             return False
     
+    def get_game_state_version(self, session_id: str) -> Optional[int]:
+        """
+        Get the current stored version of a session without loading its state.
+        
+        Used for conditional requests: the version changes on every save, so
+        an unchanged version means an unchanged state. The version is always
+        read from the backend (one indexed column on the database), never from
+        the per-process cache, which other worker processes do not update.
+        
+        Args:
+            session_id: The session ID to check
+            
+        Returns:
+            The version, None if the session is not found or cannot be read
+        """
+        try:
+            return self.backend.get_version(session_id)
+        except Exception as e:
+            logger.error(f"Failed to get game state version for session {session_id}: {e}")
+            return None
+    
     def get_game_state_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a summary of the game state without loading the full object.
@@ -304,28 +312,35 @@ class StateManager:
             Dictionary with summary information, None if not found
         """
         try:
-            db = self._get_db_session()
-            
-            session = db.query(GameSession).filter(
-                GameSession.session_id == session_id
-            ).first()
-            
-            if not session or not session.game_state:
-                return None
-            
-            state_dict = session.game_state
-            
-            return {
-                'game_id': state_dict.get('game_id'),
-                'script_id': state_dict.get('script_id'),
-                'current_act': state_dict.get('current_act', 1),
-                'current_phase': state_dict.get('current_phase', 'initialization'),
-                'player_count': len(state_dict.get('players', {})),
-                'character_count': len(state_dict.get('characters', {})),
-                'created_at': state_dict.get('created_at'),
-                'updated_at': state_dict.get('updated_at')
-            }
-            
+            return self.backend.get_summary(session_id)
         except Exception as e:
             logger.error(f"Failed to get game state summary for session {session_id}: {e}")
             return None
+    
+    def list_game_sessions(
+        self,
+        phase: Optional[str] = None,
+        act: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        List session summaries, most recently updated first.
+        
+        No game state is decoded (the database backend filters on the indexed
+        summary columns).
+        
+        Args:
+            phase: Only include sessions in this phase
+            act: Only include sessions in this act
+            limit: Maximum number of sessions returned
+            offset: Number of sessions to skip
+            
+        Returns:
+            List of summary dictionaries
+        """
+        try:
+            return self.backend.list_sessions(phase=phase, act=act, limit=limit, offset=offset)
+        except Exception as e:
+            logger.error(f"Failed to list game sessions: {e}")
+            return []
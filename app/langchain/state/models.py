@@ -7,11 +7,15 @@ replacing the simple JSON field approach with structured, validated models.
 
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field, validator
+from typing import Callable, Dict, List, Optional, Any
+from pydantic import BaseModel, Field, PrivateAttr, validator
 import uuid
 
 
+# GameState collections stored as append-only rows and loaded lazily
+HISTORY_FIELDS = ("public_log", "qna_history", "mission_submissions")
+
+
 class GamePhase(str, Enum):
     """Enumeration of possible game phases."""
     INITIALIZATION = "initialization"
@@ -51,6 +55,8 @@ class CharacterState(BaseModel):
     secrets_revealed: List[str] = Field(default_factory=list, description="List of revealed secrets")
     relationships: Dict[str, str] = Field(default_factory=dict, description="Relationships with other characters")
     custom_attributes: Dict[str, Any] = Field(default_factory=dict, description="Custom character attributes")
+    qna_summary: str = Field(default="", description="Rolling summary of the Q&A of finished acts")
+    qna_summary_act: int = Field(default=0, ge=0, description="Last act covered by qna_summary")
 
 
 class PlayerState(BaseModel):
@@ -141,12 +147,78 @@ class GameState(BaseModel):
     
     # Custom game data
     custom_data: Dict[str, Any] = Field(default_factory=dict, description="Custom game-specific data")
+
+    # Deferred loader for the history collections and the number of entries
+    # per collection that are already persisted (see StateManager)
+    _history_loader: Optional[Callable[[], Dict[str, list]]] = PrivateAttr(default=None)
+    _persisted_history_counts: Dict[str, int] = PrivateAttr(default_factory=dict)
+    # Version of the stored row this state was loaded from (None for unsaved states)
+    _version: Optional[int] = PrivateAttr(default=None)
     
     @validator('updated_at', pre=True, always=True)
     def set_updated_at(cls, v):
         """Always update the updated_at timestamp."""
         return datetime.now(timezone.utc)
     
+    def __getattr__(self, name: str) -> Any:
+        # History fields are absent from __dict__ until loaded; load them on first access
+        if name in HISTORY_FIELDS:
+            private = object.__getattribute__(self, "__pydantic_private__") or {}
+            if private.get("_history_loader") is not None:
+                self.load_history()
+                return self.__dict__[name]
+        return super().__getattr__(name)
+
+    @property
+    def version(self) -> Optional[int]:
+        """Version of the stored row this state was loaded from (None for unsaved states)."""
+        return self._version
+
+    @property
+    def history_loaded(self) -> bool:
+        """Whether the history collections are present in memory."""
+        return all(field in self.__dict__ for field in HISTORY_FIELDS)
+
+    def unsaved_history(self) -> Dict[str, list]:
+        """
+        Entries appended since the state was loaded or last saved.
+
+        Only collections already in memory are considered; a collection that
+        was never loaded cannot have new entries.
+        """
+        return {
+            field: self.__dict__[field][self._persisted_history_counts.get(field, 0):]
+            for field in HISTORY_FIELDS if field in self.__dict__
+        }
+
+    def defer_history(self, loader: Callable[[], Dict[str, list]]) -> None:
+        """
+        Drop the history collections and load them with ``loader`` on first access.
+
+        Args:
+            loader: Callable returning a dict of the HISTORY_FIELDS lists
+        """
+        for field in HISTORY_FIELDS:
+            self.__dict__.pop(field, None)
+        self._history_loader = loader
+
+    def load_history(self) -> None:
+        """Load deferred history collections, if any."""
+        loader = self._history_loader
+        if loader is None:
+            return
+        self._history_loader = None
+        collections = loader()
+        for field in HISTORY_FIELDS:
+            self.__dict__[field] = collections.get(field, [])
+        self._persisted_history_counts = {field: len(self.__dict__[field]) for field in HISTORY_FIELDS}
+
+    def model_dump(self, **kwargs) -> Dict[str, Any]:
+        exclude = kwargs.get("exclude") or ()
+        if not all(field in exclude for field in HISTORY_FIELDS):
+            self.load_history()
+        return super().model_dump(**kwargs)
+
     def get_current_player(self) -> Optional[PlayerState]:
         """Get the current player based on turn order."""
         if not self.turn_order or self.current_turn_index >= len(self.turn_order):
@@ -5,12 +5,21 @@ This module provides LangChain tools that wrap the Dify workflows as external AI
 allowing the game engine to call specific AI functions for character interactions.
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any, Type
+from typing import Optional, Dict, Any, AsyncIterator, Type
 from pydantic import BaseModel, Field, field_validator
 from langchain_core.tools import BaseTool
 
-from app.services.dify_service import call_monologue_workflow, call_qna_workflow, DifyServiceError
+from app.services.dify_service import (
+    call_monologue_workflow,
+    call_qna_workflow,
+    acall_monologue_workflow,
+    acall_qna_workflow,
+    astream_monologue_workflow,
+    astream_qna_workflow,
+    DifyServiceError,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,7 @@ class MonologueInput(BaseModel):
     act_num: int = Field(..., description="Act number (1-3)", ge=1, le=3)
     model_name: str = Field(default="gpt-3.5-turbo", description="AI model name to use")
     user_id: str = Field(..., description="User ID for the request")
+    script_id: Optional[str] = Field(default=None, description="Script ID, enables the monologue cache")
     
     @field_validator('char_id')
     @classmethod
@@ -37,6 +47,11 @@ class QnAInput(BaseModel):
     query: str = Field(..., description="Question to ask the character")
     model_name: str = Field(default="gpt-3.5-turbo", description="AI model name to use")
     user_id: str = Field(..., description="User ID for the request")
+    script_id: Optional[str] = Field(default=None, description="Script ID, enables the Q&A answer cache")
+    history: Optional[str] = Field(default=None, description="Game history context for the answer")
+    history_cacheable: bool = Field(
+        default=False, description="The history holds nothing about the character, so the answer may be cached"
+    )
     
     @field_validator('char_id')
     @classmethod
@@ -82,6 +97,8 @@ class DifyMonologueTool(BaseTool):
         act_num: int,
         model_name: str,
         user_id: str,
+        script_id: Optional[str] = None,
+        deadline: Optional[float] = None,
     ) -> str:
         """
         Execute the monologue generation.
@@ -91,6 +108,9 @@ class DifyMonologueTool(BaseTool):
             act_num: Act number
             model_name: AI model name
             user_id: User ID
+            script_id: Optional script ID; enables the monologue cache
+            deadline: Optional ``time.monotonic()`` deadline; the Dify call
+                stops waiting and retrying once it passes
             run_manager: Callback manager for tool execution
             
         Returns:
@@ -104,7 +124,9 @@ class DifyMonologueTool(BaseTool):
                 char_id=char_id,
                 act_num=act_num,
                 model_name=model_name,
-                user_id=user_id
+                user_id=user_id,
+                script_id=script_id,
+                deadline=deadline
             )
 
             logger.info(f"Successfully generated monologue for character {char_id}")
@@ -126,11 +148,76 @@ class DifyMonologueTool(BaseTool):
         act_num: int,
         model_name: str,
         user_id: str,
+        script_id: Optional[str] = None,
     ) -> str:
-        """Async version of the tool execution."""
-        # For now, just call the sync version
-        # In a production environment, you might want to implement true async calls
-        return self._run(char_id, act_num, model_name, user_id)
+        """
+        Async version of the tool execution.
+
+        Streams the answer from Dify over the shared async connection pool
+        without blocking the event loop. Cancelling the awaiting task (e.g.
+        when the HTTP client disconnects) closes the upstream stream.
+        """
+        try:
+            logger.info(f"Generating monologue (async) for character {char_id}, act {act_num}")
+
+            monologue = await acall_monologue_workflow(
+                char_id=char_id,
+                act_num=act_num,
+                model_name=model_name,
+                user_id=user_id,
+                script_id=script_id
+            )
+
+            logger.info(f"Successfully generated monologue for character {char_id}")
+            return monologue
+
+        except asyncio.CancelledError:
+            logger.info(f"Monologue generation for character {char_id} cancelled")
+            raise
+
+        except DifyServiceError as e:
+            logger.error(f"Dify service error for character {char_id}: {e}")
+            return f"抱歉，{char_id}暂时无法进行自我介绍。请稍后再试。"
+
+        except Exception as e:
+            logger.error(f"Unexpected error generating monologue for character {char_id}: {e}")
+            return f"抱歉，生成{char_id}的独白时发生了错误。"
+
+    async def astream_chunks(
+        self,
+        char_id: str,
+        act_num: int,
+        model_name: str,
+        user_id: str,
+        script_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the monologue text chunk by chunk as Dify produces it.
+
+        If the call fails before any text was produced, the usual fallback
+        message is yielded instead.
+        """
+        emitted = False
+        try:
+            async for chunk in astream_monologue_workflow(
+                char_id=char_id,
+                act_num=act_num,
+                model_name=model_name,
+                user_id=user_id,
+                script_id=script_id
+            ):
+                emitted = True
+                yield chunk
+
+        except DifyServiceError as e:
+            logger.error(f"Dify service error for character {char_id}: {e}")
+            if not emitted:
+                yield f"抱歉，{char_id}暂时无法进行自我介绍。请稍后再试。"
+
+        except Exception as e:
+            logger.error(f"Unexpected error streaming monologue for character {char_id}: {e}")
+            if not emitted:
+                yield f"抱歉，生成{char_id}的独白时发生了错误。"
 
 
 class DifyQnATool(BaseTool):
@@ -161,6 +248,10 @@ class DifyQnATool(BaseTool):
         query: str,
         model_name: str,
         user_id: str,
+        script_id: Optional[str] = None,
+        history: Optional[str] = None,
+        history_cacheable: bool = False,
+        deadline: Optional[float] = None,
     ) -> str:
         """
         Execute the Q&A interaction.
@@ -171,6 +262,12 @@ class DifyQnATool(BaseTool):
             query: Question to ask
             model_name: AI model name
             user_id: User ID
+            script_id: Optional script ID; enables the Q&A answer cache
+            history: Optional game history context (disables the answer cache)
+            history_cacheable: The history holds nothing about the character,
+                so the answer cache stays enabled
+            deadline: Optional ``time.monotonic()`` deadline; the Dify call
+                stops waiting and retrying once it passes
             run_manager: Callback manager for tool execution
             
         Returns:
@@ -185,7 +282,11 @@ class DifyQnATool(BaseTool):
                 act_num=act_num,
                 query=query,
                 model_name=model_name,
-                user_id=user_id
+                user_id=user_id,
+                history=history,
+                script_id=script_id,
+                history_cacheable=history_cacheable,
+                deadline=deadline
             )
 
             logger.info(f"Successfully got answer from character {char_id}")
@@ -208,11 +309,87 @@ class DifyQnATool(BaseTool):
         query: str,
         model_name: str,
         user_id: str,
+        script_id: Optional[str] = None,
+        history: Optional[str] = None,
+        history_cacheable: bool = False,
     ) -> str:
-        """Async version of the tool execution."""
-        # For now, just call the sync version
-        # In a production environment, you might want to implement true async calls
-        return self._run(char_id, act_num, query, model_name, user_id)
+        """
+        Async version of the tool execution.
+
+        Streams the answer from Dify over the shared async connection pool
+        without blocking the event loop. Cancelling the awaiting task (e.g.
+        when the HTTP client disconnects) closes the upstream stream.
+        """
+        try:
+            logger.info(f"Q&A (async) for character {char_id}, act {act_num}: {query[:100]}...")
+
+            answer = await acall_qna_workflow(
+                char_id=char_id,
+                act_num=act_num,
+                query=query,
+                model_name=model_name,
+                user_id=user_id,
+                history=history,
+                script_id=script_id,
+                history_cacheable=history_cacheable
+            )
+
+            logger.info(f"Successfully got answer from character {char_id}")
+            return answer
+
+        except asyncio.CancelledError:
+            logger.info(f"Q&A for character {char_id} cancelled")
+            raise
+
+        except DifyServiceError as e:
+            logger.error(f"Dify service error for character {char_id}: {e}")
+            return f"抱歉，{char_id}暂时无法回答这个问题。请稍后再试。"
+
+        except Exception as e:
+            logger.error(f"Unexpected error in Q&A for character {char_id}: {e}")
+            return f"抱歉，向{char_id}提问时发生了错误。"
+
+    async def astream_chunks(
+        self,
+        char_id: str,
+        act_num: int,
+        query: str,
+        model_name: str,
+        user_id: str,
+        script_id: Optional[str] = None,
+        history: Optional[str] = None,
+        history_cacheable: bool = False,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the answer text chunk by chunk as Dify produces it.
+
+        If the call fails before any text was produced, the usual fallback
+        message is yielded instead.
+        """
+        emitted = False
+        try:
+            async for chunk in astream_qna_workflow(
+                char_id=char_id,
+                act_num=act_num,
+                query=query,
+                model_name=model_name,
+                user_id=user_id,
+                history=history,
+                script_id=script_id,
+                history_cacheable=history_cacheable
+            ):
+                emitted = True
+                yield chunk
+
+        except DifyServiceError as e:
+            logger.error(f"Dify service error for character {char_id}: {e}")
+            if not emitted:
+                yield f"抱歉，{char_id}暂时无法回答这个问题。请稍后再试。"
+
+        except Exception as e:
+            logger.error(f"Unexpected error streaming Q&A for character {char_id}: {e}")
+            if not emitted:
+                yield f"抱歉，向{char_id}提问时发生了错误。"
 
 
 def create_dify_tools() -> list[BaseTool]:
@@ -3,10 +3,14 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.database import engine
 from app.models import database_models
+from app.models.schema_upgrade import upgrade_schema
 from app.routers import scripts, game_sessions, ai_dialogue, langchain_game
+from app.services.dify_client import close_dify_async_client
 from fastapi.staticfiles import StaticFiles
 # 创建数据库表（如果不存在）
 database_models.Base.metadata.create_all(bind=engine)
+# 为已有的表补齐新增的列和索引
+upgrade_schema(engine)
 
 # 创建 FastAPI 应用实例
 app = FastAPI(
@@ -34,6 +38,15 @@ app.include_router(game_sessions.router)  # 游戏会话相关路由
 app.include_router(ai_dialogue.router)  # AI对话相关路由
 app.include_router(langchain_game.router)  # LangChain游戏引擎相关路由
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
+
+
+@app.on_event("shutdown")
+async def shutdown_dify_client():
+    """
+    应用关闭时释放 Dify 异步连接池
+    """
+    await close_dify_async_client()
+
 @app.get("/", tags=["Root"])
 def read_root():
     """
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, JSON, Text, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy import event
@@ -46,6 +46,29 @@ class GameSession(Base):
     game_state = Column(JSON, default={})
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # 游戏状态摘要列：每次保存 game_state 时同步更新
+    # 查询摘要、按阶段/幕次筛选会话时无需解析 game_state JSON
+    game_id = Column(String, nullable=True)
+    current_act = Column(Integer, nullable=True, index=True)
+    current_phase = Column(String, nullable=True)
+    max_acts = Column(Integer, nullable=True)
+    current_turn_index = Column(Integer, nullable=True)
+    turn_order = Column(JSON, nullable=True)
+    player_count = Column(Integer, nullable=False, default=0)
+    character_count = Column(Integer, nullable=False, default=0)
+    public_log_count = Column(Integer, nullable=False, default=0)
+    qna_count = Column(Integer, nullable=False, default=0)
+    mission_count = Column(Integer, nullable=False, default=0)
+
+    # 乐观并发控制版本号：每次写入加一，保存时比较版本，防止并发写入互相覆盖
+    version = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_game_sessions_phase_act", "current_phase", "current_act"),
+        Index("ix_game_sessions_updated_at", "updated_at"),
+    )
+    __mapper_args__ = {"version_id_col": version}
     
     # 建立与 DialogueEntry 的一对多关系
     # 当我们访问一个 GameSession 对象的 .dialogue_history 属性时,
@@ -56,6 +79,23 @@ class GameSession(Base):
         order_by="DialogueEntry.timestamp",
         cascade="all, delete-orphan" # 当删除一个session时，自动删除所有关联的对话
     )
+
+    # LangChain 游戏引擎的历史记录（只追加写入，不随 game_state 整体重写）
+    public_log_records = relationship(
+        "PublicLogRecord",
+        order_by="PublicLogRecord.seq",
+        cascade="all, delete-orphan"
+    )
+    qna_records = relationship(
+        "QnARecord",
+        order_by="QnARecord.seq",
+        cascade="all, delete-orphan"
+    )
+    mission_submission_records = relationship(
+        "MissionSubmissionRecord",
+        order_by="MissionSubmissionRecord.seq",
+        cascade="all, delete-orphan"
+    )
 #新增的DialogueEntry 模型
 class DialogueEntry(Base):
     __tablename__ = "dialogue_entries"
@@ -72,4 +112,56 @@ class DialogueEntry(Base):
     diaglogue_metadata = Column(JSON, nullable=True)
     
     # 建立与 GameSession 的多对一关系
-    session = relationship("GameSession", back_populates="dialogue_history")
\ No newline at end of file
+    session = relationship("GameSession", back_populates="dialogue_history")
+
+
+# LangChain 游戏引擎的只追加历史记录表
+# 每条 PublicLogEntry / QnAEntry / MissionSubmission 对应一行，seq 为其在列表中的位置
+class PublicLogRecord(Base):
+    __tablename__ = "game_public_log"
+
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("game_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    entry_type = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    act_number = Column(Integer, nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    related_player_id = Column(String, nullable=True)
+    related_character_id = Column(String, nullable=True)
+
+    __table_args__ = (Index("ix_game_public_log_session_seq", "session_id", "seq", unique=True),)
+
+
+class QnARecord(Base):
+    __tablename__ = "game_qna_entries"
+
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("game_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    questioner_id = Column(String, nullable=False)
+    target_character_id = Column(String, nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    act_number = Column(Integer, nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    is_public = Column(Boolean, nullable=False, default=True)
+
+    __table_args__ = (Index("ix_game_qna_entries_session_seq", "session_id", "seq", unique=True),)
+
+
+class MissionSubmissionRecord(Base):
+    __tablename__ = "game_mission_submissions"
+
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("game_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    player_id = Column(String, nullable=False)
+    mission_type = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    status = Column(String, nullable=False)
+    act_number = Column(Integer, nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    review_notes = Column(Text, nullable=False, default="")
+
+    __table_args__ = (Index("ix_game_mission_submissions_session_seq", "session_id", "seq", unique=True),)
@@ -0,0 +1,102 @@
+"""
+数据库结构升级
+
+create_all 只会创建缺失的表，不会给已有的表增加列。本模块在启动时为已有的
+game_sessions 表补齐新增的摘要列和索引，并根据 game_state JSON 回填摘要数据。
+"""
+
+import logging
+
+from sqlalchemy import inspect, text, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models.database_models import (
+    GameSession,
+    PublicLogRecord,
+    QnARecord,
+    MissionSubmissionRecord,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    为已有数据库补齐 game_sessions 的摘要列与索引
+
+    Args:
+        engine: 数据库引擎
+    """
+    inspector = inspect(engine)
+    if GameSession.__tablename__ not in inspector.get_table_names():
+        return
+
+    existing = {column["name"] for column in inspector.get_columns(GameSession.__tablename__)}
+    missing = [column for column in GameSession.__table__.columns if column.name not in existing]
+
+    with engine.begin() as connection:
+        for column in missing:
+            column_type = column.type.compile(dialect=engine.dialect)
+            default = " NOT NULL DEFAULT 0" if not column.nullable else ""
+            connection.execute(text(
+                f"ALTER TABLE {GameSession.__tablename__} ADD COLUMN {column.name} {column_type}{default}"
+            ))
+            logger.info(f"Added column game_sessions.{column.name}")
+
+        for index in GameSession.__table__.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+    if missing:
+        backfill_session_summaries(engine)
+
+
+def backfill_session_summaries(engine: Engine) -> int:
+    """
+    根据 game_state JSON 与历史记录表回填摘要列
+
+    Args:
+        engine: 数据库引擎
+
+    Returns:
+        int: 回填的会话数量
+    """
+    with Session(engine) as db:
+        history_counts = {}
+        for column, record_model in (
+            ("public_log_count", PublicLogRecord),
+            ("qna_count", QnARecord),
+            ("mission_count", MissionSubmissionRecord),
+        ):
+            rows = db.query(record_model.session_id, func.count()).group_by(record_model.session_id).all()
+            history_counts[column] = dict(rows)
+
+        updated = 0
+        for session in db.query(GameSession).all():
+            state = session.game_state or {}
+            if "game_id" not in state:
+                continue
+            session.game_id = state.get("game_id")
+            session.current_act = state.get("current_act", 1)
+            session.current_phase = state.get("current_phase", "initialization")
+            session.max_acts = state.get("max_acts", 3)
+            session.current_turn_index = state.get("current_turn_index", 0)
+            session.turn_order = state.get("turn_order", [])
+            session.player_count = len(state.get("players", {}))
+            session.character_count = len(state.get("characters", {}))
+            # 旧格式的 game_state 仍内嵌历史记录
+            session.public_log_count = history_counts["public_log_count"].get(
+                session.session_id, len(state.get("public_log", []))
+            )
+            session.qna_count = history_counts["qna_count"].get(
+                session.session_id, len(state.get("qna_history", []))
+            )
+            session.mission_count = history_counts["mission_count"].get(
+                session.session_id, len(state.get("mission_submissions", []))
+            )
+            updated += 1
+
+        db.commit()
+
+    logger.info(f"Backfilled summary columns for {updated} game sessions")
+    return updated
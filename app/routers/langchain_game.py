@@ -6,15 +6,39 @@ offering a new API layer for advanced game orchestration while maintaining
 compatibility with the existing frontend.
 """
 
+import asyncio
+import hashlib
+import json
 import logging
-from typing import Dict, Any, List
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import (
+    APIRouter, Depends, Header, HTTPException, Path, Query, Request, Response, WebSocket, WebSocketDisconnect
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.core.config import GAME_EVENTS_HEARTBEAT_SECONDS
+from app.core.database_bootstrap import database_stats
+from app.database import engine, get_async_db, get_db
 from app.schemas import pydantic_schemas as schemas
-from app.langchain.engine.game_engine import GameEngine, GameEngineError
-from app.langchain.state.models import GamePhase
+from app.langchain.engine.game_engine import GameEngineError, get_game_engine
+from app.langchain.engine.action_queue import get_session_action_queue
+from app.langchain.engine.monologue_prefetch import get_monologue_prefetcher
+from app.langchain.engine.qna_context import get_qna_context_builder
+from app.langchain.engine.qna_summary import get_summary_refresher
+from app.langchain.state.backends import get_state_backend
+from app.langchain.state.models import GamePhase, GameState
+from app.langchain.state.cache import get_game_state_cache
+from app.services.dify_client import get_dify_async_client
+from app.services.dify_hedging import hedging_stats
+from app.services.dify_resilience import resilience_stats
+from app.services.dify_service import aprewarm_monologues
+from app.services.game_events import get_game_event_bus
+from app.services.monologue_cache import get_monologue_cache
+from app.services.qna_cache import get_qna_cache
+from app.models.database_models import Script
 from app.langchain.engine.nodes import GamePhaseNodes
 
 logger = logging.getLogger(__name__)
@@ -48,7 +72,7 @@ def start_new_game(
         logger.info(f"Starting new LangChain game with script {request.script_id}")
         
         # 创建游戏引擎实例
-        game_engine = GameEngine(db)
+        game_engine = get_game_engine(db)
         
         # 转换AI角色分配为字典列表
         ai_characters_dict = []
@@ -132,7 +156,7 @@ def join_game(
     try:
         logger.info(f"Player {request.player_id} joining game session {session_id}")
         
-        game_engine = GameEngine(db)
+        game_engine = get_game_engine(db)
         
         # 加载游戏状态
         game_state = game_engine.load_game(session_id)
@@ -192,23 +216,10 @@ def process_game_action(
     try:
         logger.info(f"Processing action {request.action_type} for session {session_id}")
         
-        game_engine = GameEngine(db)
+        game_engine = get_game_engine(db)
         
         # 构建动作字典
-        action = {
-            "action_type": request.action_type,
-            "player_id": request.player_id,
-            "character_id": request.character_id,
-            "question": request.question,
-            "questioner_id": request.questioner_id,
-            "content": request.content,
-            "mission_type": request.mission_type,
-            "target_phase": request.target_phase,
-            "model_name": request.model_name,
-            "user_id": request.user_id,
-            "is_public": request.is_public,
-            "tell_truth": request.tell_truth
-        }
+        action = _build_action_dict(request)
         
         # 处理动作
         result = game_engine.process_action(session_id, action)
@@ -254,32 +265,251 @@ def process_game_action(
         raise HTTPException(status_code=500, detail=f"Failed to process action: {e}")
 
 
+@router.post("/session/{session_id}/actions/batch", response_model=schemas.GameActionResponse)
+def process_game_actions_batch(
+    session_id: str = Path(..., description="游戏会话ID"),
+    request: schemas.BatchGameActionRequest = ...,
+    db: Session = Depends(get_db)
+):
+    """
+    批量处理 monologue / qna 动作
+
+    所有动作先统一校验（同一角色的提问次数在整批内累计），随后并发调用 Dify，
+    最后一次性保存游戏状态。data.results 按请求顺序给出每个动作的结果或错误。
+
+    Args:
+        session_id: 游戏会话ID
+        request: 批量动作请求
+        db: 数据库会话（依赖注入）
+
+    Returns:
+        GameActionResponse: 批量处理结果响应
+    """
+    try:
+        logger.info(f"Processing batch of {len(request.actions)} actions for session {session_id}")
+
+        game_engine = get_game_engine(db)
+        actions = [_build_action_dict(action) for action in request.actions]
+
+        result = game_engine.process_actions_batch(session_id, actions)
+
+        if "error" in result:
+            return schemas.GameActionResponse(
+                success=False,
+                error=result["error"]
+            )
+
+        updated_game_state = game_engine.load_game(session_id)
+        return schemas.GameActionResponse(
+            success=result["success"],
+            message=f"批量动作处理完成：成功 {result['succeeded']} 个，失败 {result['failed']} 个",
+            data=result,
+            game_state=_build_game_state_response(updated_game_state) if updated_game_state else None
+        )
+
+    except Exception as e:
+        logger.error(f"Error processing action batch for session {session_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to process actions: {e}")
+
+
+def _build_game_state_response(game_state: GameState) -> schemas.GameStateResponse:
+    """将游戏状态转换为响应模型"""
+    return schemas.GameStateResponse(
+        game_id=game_state.game_id,
+        script_id=game_state.script_id,
+        session_id=game_state.session_id,
+        current_act=game_state.current_act,
+        current_phase=game_state.current_phase,
+        max_acts=game_state.max_acts,
+        player_count=len(game_state.players),
+        character_count=len(game_state.characters),
+        created_at=game_state.created_at,
+        updated_at=game_state.updated_at,
+        started_at=game_state.started_at,
+        completed_at=game_state.completed_at
+    )
+
+
+@router.post("/session/{session_id}/action/stream")
+async def stream_game_action(
+    session_id: str = Path(..., description="游戏会话ID"),
+    request: schemas.GameActionRequest = ...,
+    db: Session = Depends(get_db)
+):
+    """
+    以 Server-Sent Events 流式处理 monologue / qna 动作
+
+    每收到 Dify 的一个 text_chunk 即推送一条 `chunk` 事件；
+    生成结束并保存游戏状态后推送 `done` 事件（数据与 /action 的 data 字段一致），
+    失败时推送 `error` 事件。客户端断开连接会取消上游 Dify 请求。
+
+    Args:
+        session_id: 游戏会话ID
+        request: 游戏动作请求（action_type 必须为 monologue 或 qna）
+        db: 数据库会话（依赖注入）
+
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    if request.action_type not in ("monologue", "qna"):
+        raise HTTPException(status_code=400, detail=f"Streaming not supported for action type: {request.action_type}")
+
+    logger.info(f"Streaming action {request.action_type} for session {session_id}")
+
+    game_engine = get_game_engine(db)
+    action = _build_action_dict(request)
+
+    async def event_stream():
+        async for event in game_engine.astream_action(session_id, action):
+            yield _format_sse_event(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _build_action_dict(request: schemas.GameActionRequest) -> Dict[str, Any]:
+    """将动作请求转换为游戏引擎使用的动作字典"""
+    return {
+        "action_type": request.action_type,
+        "player_id": request.player_id,
+        "character_id": request.character_id,
+        "question": request.question,
+        "questioner_id": request.questioner_id,
+        "content": request.content,
+        "mission_type": request.mission_type,
+        "target_phase": request.target_phase,
+        "model_name": request.model_name,
+        "user_id": request.user_id,
+        "is_public": request.is_public,
+        "tell_truth": request.tell_truth
+    }
+
+
+def _format_sse_event(event: Dict[str, Any]) -> str:
+    """将引擎流事件格式化为 SSE 文本帧"""
+    event_name = event.get("event", "message")
+    if event_name == "chunk":
+        payload = {"text": event.get("text", "")}
+    elif event_name == "done":
+        payload = jsonable_encoder(event.get("result", {}))
+    else:
+        payload = {"error": event.get("error", "")}
+    return f"event: {event_name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _status_etag(session_id: str, version: int, params: Dict[str, Any]) -> str:
+    """状态响应的 ETag：存储版本号 + 查询参数摘要（同一版本、不同参数的响应内容不同）"""
+    digest = hashlib.sha1(
+        json.dumps([session_id, params], sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（支持多个值、弱校验前缀 W/ 与 *）"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(
+        (value[2:] if value.startswith("W/") else value) == etag for value in candidates
+    )
+
+
+def _entries_after(entries: List[Any], cursor: Optional[str], limit: Optional[int]) -> Tuple[List[Any], bool, bool]:
+    """
+    取游标之后新增的条目（历史集合只追加，按追加顺序返回）
+
+    Args:
+        entries: 历史集合
+        cursor: 客户端已收到的最后一条记录ID，为空时从头开始
+        limit: 最多返回的条目数，为空时不限
+
+    Returns:
+        (条目列表, 是否还有更多, 游标是否已失效)；游标失效时从头开始
+    """
+    start = 0
+    resync = False
+    if cursor:
+        resync = True
+        # 游标通常指向末尾附近，从后往前找
+        for index in range(len(entries) - 1, -1, -1):
+            if entries[index].id == cursor:
+                start = index + 1
+                resync = False
+                break
+    end = len(entries) if limit is None else min(start + limit, len(entries))
+    return entries[start:end], end < len(entries), resync
+
+
+def _next_cursor(page: List[Any], cursor: Optional[str]) -> Optional[str]:
+    """本次响应之后客户端应带回的游标"""
+    return page[-1].id if page else cursor
+
+
 @router.get("/session/{session_id}/status", response_model=schemas.GameStatusResponse)
-def get_game_status(
+async def get_game_status(
+    response: Response,
     session_id: str = Path(..., description="游戏会话ID"),
     include_history: bool = Query(True, description="是否包含历史记录"),
     max_log_entries: int = Query(20, description="最大日志条目数", ge=1, le=100),
-    db: Session = Depends(get_db)
+    log_cursor: Optional[str] = Query(None, description="已收到的最后一条日志ID，只返回其后的日志"),
+    qna_cursor: Optional[str] = Query(None, description="已收到的最后一条问答ID，只返回其后的问答"),
+    mission_cursor: Optional[str] = Query(None, description="已收到的最后一条任务提交ID，只返回其后的提交"),
+    page_size: Optional[int] = Query(None, description="问答与任务提交每次最多返回的条数（默认不限）", ge=1, le=500),
+    if_none_match: Optional[str] = Header(None, description="上次响应的 ETag，状态未变化时返回 304"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取游戏状态总览
     
+    支持增量同步：客户端带回上次响应中的 cursors，只返回之后新增的日志、问答与任务提交
+    （带 log_cursor 时日志按时间正序分页，每次最多 max_log_entries 条）。游标失效
+    （如记录已不存在）时按无游标处理并返回 resync=true，客户端应丢弃本地历史。
+    响应带 ETag（存储版本号 + 查询参数），携带 If-None-Match 且状态未变化时返回 304，
+    不加载游戏状态。版本号总是从存储读取，多 worker 部署下不会因进程内缓存过期而返回错误的 304。
+    
     Args:
+        response: 响应对象（用于设置 ETag）
         session_id: 游戏会话ID
         include_history: 是否包含历史记录
         max_log_entries: 最大日志条目数
-        db: 数据库会话（依赖注入）
+        log_cursor: 日志游标
+        qna_cursor: 问答游标
+        mission_cursor: 任务提交游标
+        page_size: 问答与任务提交的分页大小
+        if_none_match: If-None-Match 请求头
+        db: 异步数据库会话（依赖注入）
     
     Returns:
-        GameStatusResponse: 游戏状态总览响应
+        GameStatusResponse: 游戏状态总览响应（或 304 空响应）
     """
     try:
         logger.info(f"Getting status for game session {session_id}")
         
-        game_engine = GameEngine(db)
+        game_engine = get_game_engine(async_db_session=db)
+        etag_params = {
+            "include_history": include_history,
+            "max_log_entries": max_log_entries,
+            "log_cursor": log_cursor,
+            "qna_cursor": qna_cursor,
+            "mission_cursor": mission_cursor,
+            "page_size": page_size,
+        }
         
-        # 加载游戏状态
-        game_state = game_engine.load_game(session_id)
+        # 先从存储读取版本号（单列索引查询）：进程内缓存可能落后于其他 worker 的提交
+        version = await game_engine.state_manager.aget_game_state_version(session_id)
+        
+        # 条件请求：只比较版本号，状态未变化时不加载游戏状态
+        if if_none_match and version is not None:
+            etag = _status_etag(session_id, version, etag_params)
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        
+        # 加载游戏状态（缓存副本仅在版本号一致时使用）
+        game_state = await game_engine.aload_game(session_id, expected_version=version)
         if not game_state:
             raise HTTPException(status_code=404, detail="Game session not found")
         
@@ -313,10 +543,22 @@ def get_game_status(
         recent_log_entries = []
         qna_history = []
         mission_submissions = []
+        cursors = None
+        has_more = False
+        resync = False
         
         if include_history:
-            # 最近的日志条目
-            recent_logs = game_state.public_log[-max_log_entries:] if game_state.public_log else []
+            # 日志：有游标时取其后的条目，无游标（或游标失效）时取最近的条目
+            recent_logs, logs_more, logs_resync = _entries_after(game_state.public_log, log_cursor, max_log_entries)
+            if not log_cursor or logs_resync:
+                recent_logs, logs_more = game_state.public_log[-max_log_entries:], False
+            qna_entries, qna_more, qna_resync = _entries_after(game_state.qna_history, qna_cursor, page_size)
+            submissions, missions_more, missions_resync = _entries_after(
+                game_state.mission_submissions, mission_cursor, page_size
+            )
+            has_more = logs_more or qna_more or missions_more
+            resync = logs_resync or qna_resync or missions_resync
+            
             recent_log_entries = [
                 schemas.PublicLogEntryResponse(
                     id=entry.id,
@@ -340,7 +582,7 @@ def get_game_status(
                     act_number=entry.act_number,
                     timestamp=entry.timestamp,
                     is_public=entry.is_public
-                ) for entry in game_state.qna_history
+                ) for entry in qna_entries
             ]
             
             # 任务提交
@@ -354,20 +596,34 @@ def get_game_status(
                     act_number=submission.act_number,
                     timestamp=submission.timestamp,
                     review_notes=submission.review_notes
-                ) for submission in game_state.mission_submissions
+                ) for submission in submissions
             ]
+            
+            cursors = schemas.StatusCursorsResponse(
+                log_cursor=_next_cursor(recent_logs, None if logs_resync else log_cursor),
+                qna_cursor=_next_cursor(qna_entries, None if qna_resync else qna_cursor),
+                mission_cursor=_next_cursor(submissions, None if missions_resync else mission_cursor)
+            )
         
-        response = schemas.GameStatusResponse(
+        status_response = schemas.GameStatusResponse(
             game_state=game_state_response,
             progress=progress_response,
             available_actions=available_actions,
             recent_log_entries=recent_log_entries,
             qna_history=qna_history,
-            mission_submissions=mission_submissions
+            mission_submissions=mission_submissions,
+            version=game_state.version,
+            cursors=cursors,
+            has_more=has_more,
+            resync=resync
         )
         
+        if game_state.version is not None:
+            response.headers["ETag"] = _status_etag(session_id, game_state.version, etag_params)
+            response.headers["Cache-Control"] = "no-cache"
+        
         logger.info(f"Successfully retrieved status for game session {session_id}")
-        return response
+        return status_response
         
     except HTTPException:
         raise
@@ -376,34 +632,183 @@ def get_game_status(
         raise HTTPException(status_code=500, detail="Failed to get game status")
 
 
-@router.get("/session/{session_id}/summary")
-def get_game_summary(
+# 空闲保活消息
+_PING_MESSAGE = '{"type":"ping"}'
+
+
+async def _session_exists(session_id: str, db: AsyncSession) -> bool:
+    """只查版本号判断会话是否存在，随后释放数据库连接（推送连接会长时间保持）"""
+    try:
+        version = await get_game_engine(async_db_session=db).state_manager.aget_game_state_version(session_id)
+        return version is not None
+    finally:
+        await db.close()
+
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    """读取并忽略客户端消息，直到连接断开"""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        return
+
+
+@router.websocket("/session/{session_id}/ws")
+async def game_events_websocket(
+    websocket: WebSocket,
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    对局事件推送（WebSocket）
+
+    该会话每次提交状态后推送一条 JSON 事件：
+    - {"type": "commit", "version", "current_act", "current_phase", ...}：附带本次新增的
+      public_log / qna_history / mission_submissions 条目（没有新增的集合不出现）
+    - {"type": "resync"}：客户端消费过慢，积压的事件已丢弃，应通过状态接口重新同步
+    - {"type": "ping"}：空闲 GAME_EVENTS_HEARTBEAT_SECONDS 秒后的保活消息
+    客户端发送的消息会被忽略；会话不存在时拒绝连接（关闭码 4404）。
+
+    Args:
+        websocket: WebSocket 连接
+        session_id: 游戏会话ID
+        db: 异步数据库会话（依赖注入，仅用于检查会话是否存在）
+    """
+    if not await _session_exists(session_id, db):
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    subscription = get_game_event_bus().subscribe(session_id)
+    disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+    logger.info(f"WebSocket subscriber connected to session {session_id}")
+    try:
+        while True:
+            receive = asyncio.create_task(subscription.get(GAME_EVENTS_HEARTBEAT_SECONDS))
+            done, _ = await asyncio.wait({receive, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if receive not in done:
+                receive.cancel()
+                break
+            message = receive.result()
+            await websocket.send_text(message if message is not None else _PING_MESSAGE)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+        disconnected.cancel()
+        logger.info(f"WebSocket subscriber disconnected from session {session_id}")
+
+
+@router.get("/session/{session_id}/events")
+async def game_events_stream(
+    request: Request,
     session_id: str = Path(..., description="游戏会话ID"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    对局事件推送（Server-Sent Events）
+
+    与 WebSocket 端点推送相同的事件，每条事件为一个 `data:` 帧；
+    空闲时发送 SSE 注释行保活。适用于无法使用 WebSocket 的客户端。
+
+    Args:
+        request: 请求对象（用于检测客户端断开）
+        session_id: 游戏会话ID
+        db: 异步数据库会话（依赖注入，仅用于检查会话是否存在）
+
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    if not await _session_exists(session_id, db):
+        raise HTTPException(status_code=404, detail="Game session not found")
+
+    subscription = get_game_event_bus().subscribe(session_id)
+
+    async def event_stream():
+        try:
+            while True:
+                message = await subscription.get(GAME_EVENTS_HEARTBEAT_SECONDS)
+                if message is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/sessions")
+def list_game_sessions(
+    phase: Optional[GamePhase] = Query(None, description="按游戏阶段筛选"),
+    act: Optional[int] = Query(None, description="按幕次筛选", ge=1),
+    limit: int = Query(50, description="最大返回数量", ge=1, le=500),
+    offset: int = Query(0, description="跳过的数量", ge=0),
     db: Session = Depends(get_db)
+):
+    """
+    按阶段/幕次列出游戏会话摘要（运维面板使用）
+    
+    只读取 game_sessions 的摘要列，不解析 game_state JSON。
+    
+    Args:
+        phase: 按游戏阶段筛选
+        act: 按幕次筛选
+        limit: 最大返回数量
+        offset: 跳过的数量
+        db: 数据库会话（依赖注入）
+    
+    Returns:
+        Dict: 会话摘要列表
+    """
+    game_engine = get_game_engine(db)
+    sessions = game_engine.state_manager.list_game_sessions(
+        phase=phase.value if phase else None,
+        act=act,
+        limit=limit,
+        offset=offset
+    )
+    return {"sessions": sessions, "count": len(sessions)}
+
+
+@router.get("/session/{session_id}/summary")
+async def get_game_summary(
+    session_id: str = Path(..., description="游戏会话ID"),
+    include_formatted: bool = Query(True, description="是否包含格式化摘要（需要加载完整游戏状态）"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取游戏摘要信息
     
     Args:
         session_id: 游戏会话ID
-        db: 数据库会话（依赖注入）
+        include_formatted: 是否包含格式化摘要
+        db: 异步数据库会话（依赖注入）
     
     Returns:
         Dict: 游戏摘要信息
     """
     try:
-        game_engine = GameEngine(db)
+        game_engine = get_game_engine(async_db_session=db)
         
         # 获取游戏状态摘要
-        summary = game_engine.get_game_status(session_id)
+        summary = await game_engine.aget_game_status(session_id)
         if not summary:
             raise HTTPException(status_code=404, detail="Game session not found")
         
         # 加载完整游戏状态以获取格式化摘要
-        game_state = game_engine.load_game(session_id)
-        if game_state:
-            formatted_summary = GamePhaseNodes.format_game_summary(game_state)
-            summary["formatted_summary"] = formatted_summary
+        if include_formatted:
+            game_state = await game_engine.aload_game(session_id)
+            if game_state:
+                formatted_summary = GamePhaseNodes.format_game_summary(game_state)
+                summary["formatted_summary"] = formatted_summary
         
         return summary
         
@@ -412,3 +817,60 @@ def get_game_summary(
     except Exception as e:
         logger.error(f"Error getting game summary for session {session_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to get game summary")
+
+
+@router.post("/scripts/{script_id}/monologues/prewarm")
+async def prewarm_script_monologues(
+    script_id: str = Path(..., description="剧本ID"),
+    acts: List[int] = Query([1], description="需要预生成的幕数"),
+    model_name: str = Query("gpt-3.5-turbo", description="生成独白使用的模型"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    预生成并缓存剧本中所有角色的独白（需开启 MONOLOGUE_CACHE_ENABLED）
+
+    Args:
+        script_id: 剧本ID
+        acts: 需要预生成的幕数
+        model_name: 生成独白使用的模型
+        db: 异步数据库会话（依赖注入），查询不阻塞事件循环
+
+    Returns:
+        Dict: 请求数量、已缓存数量与新生成数量
+    """
+    if not get_monologue_cache().enabled:
+        raise HTTPException(status_code=400, detail="Monologue cache is disabled")
+
+    script = await db.get(Script, script_id)
+    if not script:
+        raise HTTPException(status_code=404, detail="Script not found")
+
+    # 与游戏引擎一致，角色ID即剧本中的角色名
+    char_ids = [char.get("name") for char in (script.characters or []) if char.get("name")]
+    result = await aprewarm_monologues(script_id, char_ids, acts, model_name)
+    return {"script_id": script_id, **result}
+
+
+@router.get("/metrics")
+def get_engine_metrics():
+    """
+    获取游戏引擎运行指标
+
+    Returns:
+        Dict: 各子系统的运行计数（状态缓存命中率、Dify 连接池、Dify 熔断与重试预算、对冲请求、会话动作队列深度、独白预取、独白缓存、问答缓存、问答上下文、问答摘要、事件推送、数据库连接池、状态存储后端等）
+    """
+    return {
+        "state_cache": get_game_state_cache().stats(),
+        "dify_client": get_dify_async_client().stats(),
+        "dify_resilience": resilience_stats(),
+        "dify_hedging": hedging_stats(),
+        "action_queue": get_session_action_queue().stats(),
+        "monologue_prefetch": get_monologue_prefetcher().stats(),
+        "monologue_cache": get_monologue_cache().stats(),
+        "qna_cache": get_qna_cache().stats(),
+        "qna_context": get_qna_context_builder().stats(),
+        "qna_summary": get_summary_refresher().stats(),
+        "game_events": get_game_event_bus().stats(),
+        "database": database_stats(engine),
+        "state_backend": get_state_backend().stats(),
+    }
@@ -112,6 +112,10 @@ class GameActionRequest(BaseModel):
     is_public: Optional[bool] = Field(True, description="是否公开 (用于qna动作)")
     tell_truth: Optional[bool] = Field(None, description="用于 final_choice: 是否告知真相")
 
+class BatchGameActionRequest(BaseModel):
+    """批量游戏动作请求模型（仅支持 monologue 与 qna 动作）"""
+    actions: List[GameActionRequest] = Field(..., min_length=1, description="按顺序处理的动作列表")
+
 class PlayerJoinRequest(BaseModel):
     """玩家加入游戏请求模型"""
     player_id: str = Field(..., description="玩家ID")
@@ -191,6 +195,12 @@ class AvailableActionResponse(BaseModel):
     target_phase: Optional[str] = None
     remaining_questions: Optional[int] = None
 
+class StatusCursorsResponse(BaseModel):
+    """增量同步游标：各历史集合中客户端已收到的最后一条记录的ID，下次请求时原样带回"""
+    log_cursor: Optional[str] = None
+    qna_cursor: Optional[str] = None
+    mission_cursor: Optional[str] = None
+
 class GameStatusResponse(BaseModel):
     """游戏状态总览响应模型"""
     game_state: GameStateResponse
@@ -199,3 +209,7 @@ class GameStatusResponse(BaseModel):
     recent_log_entries: List[PublicLogEntryResponse]
     qna_history: List[QnAEntryResponse]
     mission_submissions: List[MissionSubmissionResponse]
+    version: Optional[int] = None
+    cursors: Optional[StatusCursorsResponse] = None
+    has_more: bool = False
+    resync: bool = False
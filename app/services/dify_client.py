@@ -0,0 +1,249 @@
+"""
+Dify HTTP 客户端子系统
+
+为所有 Dify 工作流调用提供共享的连接池：
+- 同步调用使用进程级 requests.Session（HTTP keep-alive，避免每次握手）
+- 异步调用使用进程级 httpx.AsyncClient，不阻塞事件循环
+- 按工作流限制并发请求数，防止单一工作流占满连接池
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import (
+    DIFY_WORKFLOW_API_URL,
+    DIFY_HTTP_MAX_CONNECTIONS,
+    DIFY_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    DIFY_HTTP_KEEPALIVE_EXPIRY,
+    DIFY_HTTP_TIMEOUT,
+    DIFY_QNA_MAX_CONCURRENCY,
+    DIFY_MONOLOGUE_MAX_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+# 工作流并发上限，键为 DifyWorkflowType 的取值
+DEFAULT_CONCURRENCY_LIMITS: Dict[str, int] = {
+    "qna_workflow": DIFY_QNA_MAX_CONCURRENCY,
+    "monologue_workflow": DIFY_MONOLOGUE_MAX_CONCURRENCY,
+}
+
+# 未在配置中出现的工作流使用的并发上限
+FALLBACK_CONCURRENCY_LIMIT = 8
+
+
+class DifyAsyncClient:
+    """
+    Pooled async HTTP client for Dify workflows.
+
+    One instance is shared by the whole process. The underlying httpx client
+    is bound to the running event loop, so it is recreated lazily if the loop
+    changes (e.g. between ``asyncio.run`` calls in scripts and tests).
+    """
+
+    def __init__(
+        self,
+        url: str = DIFY_WORKFLOW_API_URL,
+        max_connections: int = DIFY_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DIFY_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DIFY_HTTP_KEEPALIVE_EXPIRY,
+        timeout: float = DIFY_HTTP_TIMEOUT,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            url: Dify workflow endpoint
+            max_connections: Maximum number of open connections in the pool
+            max_keepalive_connections: Maximum number of idle keep-alive connections
+            keepalive_expiry: Seconds an idle connection is kept open
+            timeout: Default request timeout in seconds
+            concurrency_limits: Maximum in-flight requests per workflow type
+            transport: Optional custom transport (used by tests)
+        """
+        self.url = url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self.concurrency_limits = dict(concurrency_limits or DEFAULT_CONCURRENCY_LIMITS)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Return the pooled httpx client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            # 连接池与事件循环绑定，事件循环变化时重新创建
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self._transport,
+            )
+            self._loop = loop
+            self._semaphores = {}
+            logger.info(
+                f"Created pooled Dify async client (max_connections={self.limits.max_connections}, "
+                f"max_keepalive={self.limits.max_keepalive_connections})"
+            )
+        return self._client
+
+    def _get_semaphore(self, workflow: str) -> asyncio.Semaphore:
+        """Return the concurrency semaphore for a workflow type."""
+        semaphore = self._semaphores.get(workflow)
+        if semaphore is None:
+            limit = self.concurrency_limits.get(workflow, FALLBACK_CONCURRENCY_LIMIT)
+            semaphore = asyncio.Semaphore(limit)
+            self._semaphores[workflow] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def stream_workflow(
+        self,
+        workflow: str,
+        api_key: str,
+        body: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        Open a streaming POST to the Dify workflow endpoint.
+
+        The per-workflow concurrency slot is held until the context exits,
+        i.e. for the whole duration of the streamed answer.
+
+        Args:
+            workflow: Workflow type value, used for concurrency accounting
+            api_key: Workflow API key
+            body: JSON request body
+            timeout: Optional per-request timeout override
+
+        Yields:
+            httpx.Response with an unread streaming body
+        """
+        client = self._get_http_client()
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+        async with self._get_semaphore(workflow):
+            self._in_flight[workflow] = self._in_flight.get(workflow, 0) + 1
+            try:
+                async with client.stream(
+                    "POST",
+                    self.url,
+                    headers=headers,
+                    json=body,
+                    timeout=timeout if timeout is not None else self.timeout,
+                ) as response:
+                    yield response
+            finally:
+                self._in_flight[workflow] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool configuration and in-flight counts per workflow."""
+        return {
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "concurrency_limits": dict(self.concurrency_limits),
+            "in_flight": dict(self._in_flight),
+        }
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+        self._semaphores = {}
+
+
+_async_client: Optional[DifyAsyncClient] = None
+_sync_session: Optional[requests.Session] = None
+_sync_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_sync_lock = threading.Lock()
+
+
+def get_dify_async_client() -> DifyAsyncClient:
+    """Return the process-wide async Dify client."""
+    global _async_client
+    if _async_client is None:
+        _async_client = DifyAsyncClient()
+    return _async_client
+
+
+async def close_dify_async_client() -> None:
+    """Close the process-wide async Dify client (application shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def get_dify_http_session() -> requests.Session:
+    """
+    Return the process-wide requests session for sync Dify calls.
+
+    The session keeps connections alive between calls so that each AI turn
+    does not pay a fresh TCP+TLS handshake. All calls go to the single Dify
+    host, so the adapter needs one per-host pool (``pool_connections``) that
+    keeps up to ``DIFY_HTTP_MAX_CONNECTIONS`` connections (``pool_maxsize``).
+    urllib3 keeps every returned connection alive; the keep-alive count and
+    expiry settings apply to the async client only.
+    """
+    global _sync_session
+    if _sync_session is None:
+        with _sync_lock:
+            if _sync_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=DIFY_HTTP_MAX_CONNECTIONS,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sync_session = session
+    return _sync_session
+
+
+class WorkflowSlotTimeout(Exception):
+    """在给定时间内未等到工作流并发名额"""
+    pass
+
+
+@contextmanager
+def sync_workflow_slot(workflow: str, timeout: Optional[float] = None) -> Iterator[None]:
+    """
+    Hold a per-workflow concurrency slot for a sync Dify call.
+
+    Raises:
+        WorkflowSlotTimeout: If no slot became free within ``timeout`` seconds
+    """
+    semaphore = _sync_semaphores.get(workflow)
+    if semaphore is None:
+        with _sync_lock:
+            semaphore = _sync_semaphores.setdefault(
+                workflow,
+                threading.BoundedSemaphore(
+                    DEFAULT_CONCURRENCY_LIMITS.get(workflow, FALLBACK_CONCURRENCY_LIMIT)
+                ),
+            )
+    if not semaphore.acquire(timeout=timeout):
+        raise WorkflowSlotTimeout(f"No free {workflow} slot within {timeout:.1f}s")
+    try:
+        yield
+    finally:
+        semaphore.release()
@@ -0,0 +1,170 @@
+"""
+Dify 对冲请求策略
+
+Dify 的长尾延迟很高（p99 常为 p50 的 5–10 倍）。对冲请求在首个片段迟迟未到时
+再发一个相同请求，取先返回者并取消另一个，以少量额外请求换取更低的尾延迟。
+本模块提供：
+- 首片段耗时的滑动窗口统计，按百分位计算对冲延迟
+- 对冲比例上限（复用重试预算的滑动窗口计数）
+- 对冲次数与胜出情况的计数
+"""
+
+import logging
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import (
+    DIFY_QNA_HEDGING_ENABLED,
+    DIFY_HEDGE_PERCENTILE,
+    DIFY_HEDGE_MIN_DELAY_SECONDS,
+    DIFY_HEDGE_DEFAULT_DELAY_SECONDS,
+    DIFY_HEDGE_MIN_SAMPLES,
+    DIFY_HEDGE_SAMPLE_WINDOW,
+    DIFY_HEDGE_MAX_RATE,
+    DIFY_HEDGE_BUDGET_WINDOW_SECONDS,
+)
+from app.services.dify_resilience import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Sliding window of recent latency samples."""
+
+    def __init__(self, window: int = DIFY_HEDGE_SAMPLE_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Nearest-rank percentile of the window, or None when it is empty."""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+        return ordered[min(rank, len(ordered)) - 1]
+
+
+class HedgePolicy:
+    """
+    When and how often to hedge the requests of one workflow.
+
+    The hedge delay is the configured percentile of recent time-to-first-
+    chunk samples (never below ``min_delay``), so only the slowest few
+    percent of requests get a second copy. A ratio budget caps hedges
+    relative to traffic, which keeps a Dify slowdown from doubling its load.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        percentile: float = DIFY_HEDGE_PERCENTILE,
+        min_delay: float = DIFY_HEDGE_MIN_DELAY_SECONDS,
+        default_delay: float = DIFY_HEDGE_DEFAULT_DELAY_SECONDS,
+        min_samples: int = DIFY_HEDGE_MIN_SAMPLES,
+        max_rate: float = DIFY_HEDGE_MAX_RATE,
+        tracker: Optional[LatencyTracker] = None,
+        budget: Optional[RetryBudget] = None,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            enabled: Whether requests are hedged at all
+            percentile: Percentile of first-chunk latency used as the hedge delay
+            min_delay: Lower bound for the hedge delay in seconds
+            default_delay: Delay used until ``min_samples`` samples were seen
+            min_samples: Samples needed before the percentile is trusted
+            max_rate: Maximum hedges per request within the budget window
+            tracker: Latency sample window
+            budget: Hedge budget (a RetryBudget with no floor)
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.tracker = tracker or LatencyTracker()
+        self.budget = budget or RetryBudget(
+            ratio=max_rate, min_per_second=0.0, window_seconds=DIFY_HEDGE_BUDGET_WINDOW_SECONDS
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first chunk before hedging."""
+        if len(self.tracker) < self.min_samples:
+            return self.default_delay
+        return max(self.tracker.percentile(self.percentile), self.min_delay)
+
+    def record_request(self) -> None:
+        """Count a request that may be hedged."""
+        self.budget.record_request()
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self) -> bool:
+        """Reserve a hedge; False when the hedge rate limit is reached."""
+        allowed = self.budget.try_acquire()
+        with self._lock:
+            if allowed:
+                self.hedged += 1
+            else:
+                self.budget_denied += 1
+        return allowed
+
+    def record_first_chunk(self, seconds: float, hedge_won: bool = False) -> None:
+        """Record the winning stream's time to first chunk."""
+        self.tracker.record(seconds)
+        if hedge_won:
+            with self._lock:
+                self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hedge counters and the current delay."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hedge_delay": self.hedge_delay(),
+                "samples": len(self.tracker),
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "budget_denied": self.budget_denied,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            }
+
+
+_hedge_policies: Dict[str, HedgePolicy] = {}
+_registry_lock = threading.Lock()
+
+# 启用对冲的工作流（取值同 DifyWorkflowType）
+_HEDGED_WORKFLOWS = {"qna_workflow": DIFY_QNA_HEDGING_ENABLED}
+
+
+def get_hedge_policy(workflow: str) -> HedgePolicy:
+    """Return the process-wide hedge policy of a workflow type."""
+    policy = _hedge_policies.get(workflow)
+    if policy is None:
+        with _registry_lock:
+            policy = _hedge_policies.setdefault(
+                workflow, HedgePolicy(enabled=_HEDGED_WORKFLOWS.get(workflow, False))
+            )
+    return policy
+
+
+def hedging_stats() -> Dict[str, Any]:
+    """Return hedge statistics per workflow, for metrics."""
+    return {name: policy.stats() for name, policy in sorted(_hedge_policies.items())}
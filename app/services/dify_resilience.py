@@ -0,0 +1,293 @@
+"""
+Dify 调用的熔断与重试预算
+
+Dify 故障期间，每次调用都会重试并等待超时，长时间占用工作线程，进而拖垮无关接口。
+本模块提供：
+- 按工作流划分的熔断器（closed / open / half-open），连续失败后快速失败
+- 全局共享的重试预算，重试次数不超过近期请求数的一定比例
+- 带抖动的指数退避时长计算（由调用方决定同步或异步等待）
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.core.config import (
+    DIFY_CIRCUIT_FAILURE_THRESHOLD,
+    DIFY_CIRCUIT_RECOVERY_SECONDS,
+    DIFY_CIRCUIT_HALF_OPEN_MAX_CALLS,
+    DIFY_RETRY_BUDGET_RATIO,
+    DIFY_RETRY_BUDGET_MIN_PER_SECOND,
+    DIFY_RETRY_BUDGET_WINDOW_SECONDS,
+    DIFY_RETRY_BACKOFF_BASE_SECONDS,
+    DIFY_RETRY_BACKOFF_MAX_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one Dify workflow.
+
+    While closed, every call is allowed. After ``failure_threshold``
+    consecutive failures the circuit opens and calls are rejected without
+    touching the network. Once ``recovery_timeout`` seconds have passed, up
+    to ``half_open_max_calls`` trial calls are let through: a success closes
+    the circuit again, a failure re-opens it for another recovery period.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = DIFY_CIRCUIT_FAILURE_THRESHOLD,
+        recovery_timeout: float = DIFY_CIRCUIT_RECOVERY_SECONDS,
+        half_open_max_calls: int = DIFY_CIRCUIT_HALF_OPEN_MAX_CALLS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Workflow name, used in logs and metrics
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds the circuit stays open before a trial call
+            half_open_max_calls: Concurrent trial calls allowed while half-open
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CIRCUIT_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        """Current state; an open circuit reports half-open once it may be probed."""
+        with self._lock:
+            if self._state == CIRCUIT_OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+                return CIRCUIT_HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Whether a call may be made now.
+
+        Every allowed call must be followed by record_success or record_failure.
+        """
+        with self._lock:
+            if self._state == CIRCUIT_OPEN:
+                if self._clock() - self._opened_at < self.recovery_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = CIRCUIT_HALF_OPEN
+                self._trial_calls = 0
+                logger.info(f"Dify circuit {self.name} half-open, probing")
+
+            if self._state == CIRCUIT_HALF_OPEN:
+                if self._trial_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    return False
+                self._trial_calls += 1
+
+            return True
+
+    def record_success(self) -> None:
+        """Record a call that reached a healthy Dify."""
+        with self._lock:
+            if self._state != CIRCUIT_CLOSED:
+                logger.info(f"Dify circuit {self.name} closed")
+            self._state = CIRCUIT_CLOSED
+            self._consecutive_failures = 0
+            self._trial_calls = 0
+
+    def record_failure(self) -> None:
+        """Record a timeout, connection error or server-side failure."""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == CIRCUIT_HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != CIRCUIT_OPEN:
+                    self.times_opened += 1
+                    logger.warning(
+                        f"Dify circuit {self.name} opened after {self._consecutive_failures} consecutive failures"
+                    )
+                self._state = CIRCUIT_OPEN
+                self._opened_at = self._clock()
+                self._trial_calls = 0
+
+    def release(self) -> None:
+        """Give back a trial slot of a call abandoned before its outcome was known."""
+        with self._lock:
+            if self._state == CIRCUIT_HALF_OPEN and self._trial_calls > 0:
+                self._trial_calls -= 1
+
+    def reset(self) -> None:
+        """Close the circuit and clear the counters."""
+        with self._lock:
+            self._state = CIRCUIT_CLOSED
+            self._consecutive_failures = 0
+            self._trial_calls = 0
+            self.rejected = 0
+            self.times_opened = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the breaker state and counters."""
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+            }
+
+
+class RetryBudget:
+    """
+    Process-wide cap on retries relative to recent traffic.
+
+    Within a sliding window, retries are allowed up to ``ratio`` times the
+    number of first attempts plus a small floor (``min_per_second``), so a
+    healthy service still retries occasional blips while an outage cannot
+    multiply the load on Dify.
+    """
+
+    def __init__(
+        self,
+        ratio: float = DIFY_RETRY_BUDGET_RATIO,
+        min_per_second: float = DIFY_RETRY_BUDGET_MIN_PER_SECOND,
+        window_seconds: float = DIFY_RETRY_BUDGET_WINDOW_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the budget.
+
+        Args:
+            ratio: Retries allowed per first attempt in the window
+            min_per_second: Retries per second always allowed
+            window_seconds: Length of the sliding window
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self.exhausted = 0
+
+    def _trim(self, now: float) -> None:
+        horizon = now - self.window_seconds
+        while self._requests and self._requests[0] < horizon:
+            self._requests.popleft()
+        while self._retries and self._retries[0] < horizon:
+            self._retries.popleft()
+
+    def _allowance(self) -> float:
+        return self.min_per_second * self.window_seconds + self.ratio * len(self._requests)
+
+    def record_request(self) -> None:
+        """Count a first attempt (deposits into the budget)."""
+        with self._lock:
+            now = self._clock()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """Withdraw one retry; return False when the budget is exhausted."""
+        with self._lock:
+            now = self._clock()
+            self._trim(now)
+            if len(self._retries) >= self._allowance():
+                self.exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests.clear()
+            self._retries.clear()
+            self.exhausted = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return recent traffic and remaining retries."""
+        with self._lock:
+            self._trim(self._clock())
+            return {
+                "window_seconds": self.window_seconds,
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "remaining": max(int(self._allowance()) - len(self._retries), 0),
+                "exhausted": self.exhausted,
+            }
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = DIFY_RETRY_BACKOFF_BASE_SECONDS,
+    cap: float = DIFY_RETRY_BACKOFF_MAX_SECONDS,
+) -> float:
+    """
+    Full-jitter exponential backoff before retry number ``attempt + 1``.
+
+    Random delays keep callers that failed together from retrying together.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_retry_budget: Optional[RetryBudget] = None
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(workflow: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker of a workflow type."""
+    breaker = _circuit_breakers.get(workflow)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _circuit_breakers.setdefault(workflow, CircuitBreaker(workflow))
+    return breaker
+
+
+def get_retry_budget() -> RetryBudget:
+    """Return the retry budget shared by all Dify workflows."""
+    global _retry_budget
+    if _retry_budget is None:
+        with _registry_lock:
+            if _retry_budget is None:
+                _retry_budget = RetryBudget()
+    return _retry_budget
+
+
+def resilience_stats() -> Dict[str, Any]:
+    """Return breaker states per workflow and the retry budget, for metrics."""
+    return {
+        "circuits": {name: breaker.stats() for name, breaker in sorted(_circuit_breakers.items())},
+        "retry_budget": get_retry_budget().stats(),
+    }
+
+
+def reset_resilience() -> None:
+    """Forget every circuit breaker and the retry budget (used by tests)."""
+    global _retry_budget
+    with _registry_lock:
+        _circuit_breakers.clear()
+        _retry_budget = None
@@ -1,15 +1,38 @@
+import asyncio
 import requests
+import httpx
+import threading
 import time
 import logging
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional
 from enum import Enum
 from app.core.config import (
     DIFY_API_URL, DIFY_API_KEY,  # 向后兼容
     DIFY_WORKFLOW_API_URL,
     DIFY_QNA_WORKFLOW_API_KEY,
-    DIFY_MONOLOGUE_WORKFLOW_API_KEY
+    DIFY_MONOLOGUE_WORKFLOW_API_KEY,
+    DIFY_QNA_HISTORY_MAX_CHARS,
+    DIFY_QNA_MAX_CONCURRENCY,
 )
 from app.schemas.pydantic_schemas import DialogueRequest
+from app.services.dify_client import (
+    WorkflowSlotTimeout,
+    get_dify_async_client,
+    get_dify_http_session,
+    sync_workflow_slot,
+)
+from app.services.dify_resilience import (
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    backoff_delay,
+    get_circuit_breaker,
+    get_retry_budget,
+)
+from app.services.dify_hedging import HedgePolicy, get_hedge_policy
+from app.services.dify_stream import DifyStreamCollector, aiter_sse_events, iter_sse_events
+from app.services.monologue_cache import get_monologue_cache
+from app.services.qna_cache import get_qna_cache
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +48,23 @@ class DifyServiceError(Exception):
     pass
 
 
+# 解析失败时返回的兜底文本，不应被当作有效结果缓存
+_FALLBACK_RESPONSES = frozenset({
+    "抱歉，响应解析失败。",
+    "抱歉，未能获取到有效响应。",
+    "抱歉，无法解析AI响应。",
+})
+
+# 工作流调用失败时返回的兜底文本
+_QNA_FAILURE_RESPONSE = "抱歉，我暂时无法回答这个问题。"
+_MONOLOGUE_FAILURE_RESPONSE = "抱歉，我暂时无法生成角色独白。"
+
+
+def is_fallback_response(text: str) -> bool:
+    """判断文本是否为调用或解析失败时返回的兜底文本"""
+    return text in _FALLBACK_RESPONSES or text in (_QNA_FAILURE_RESPONSE, _MONOLOGUE_FAILURE_RESPONSE)
+
+
 def call_dify_chatflow(request: DialogueRequest, user_id: str, formatted_prompt: str = "") -> str:
     """
     调用 Dify AI 平台的聊天消息 API
@@ -52,8 +92,8 @@ def call_dify_chatflow(request: DialogueRequest, user_id: str, formatted_prompt:
     }
     
     try:
-        # 发送 POST 请求到 Dify API
-        response = requests.post(DIFY_API_URL, headers=headers, json=body)
+        # 发送 POST 请求到 Dify API（复用共享连接池）
+        response = get_dify_http_session().post(DIFY_API_URL, headers=headers, json=body)
         response.raise_for_status()  # 检查 HTTP 状态码，如有错误则抛出异常
 
         # 解析 JSON 响应
@@ -72,7 +112,10 @@ def call_dify_workflow(
     inputs: Dict[str, Any],
     user_id: str,
     max_retries: int = 3,
-    timeout: int = 30
+    timeout: int = 30,
+    on_text: Optional[Callable[[str], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+    deadline: Optional[float] = None
 ) -> str:
     """
     调用 Dify 工作流 API (支持流式响应)
@@ -83,6 +126,10 @@ def call_dify_workflow(
         user_id: 用户唯一标识符
         max_retries: 最大重试次数
         timeout: 请求超时时间（秒）
+        on_text: 可选回调，每收到一个文本片段调用一次
+        cancelled: 可选事件，置位后不再重试，并在下一个片段到达时停止读取（对冲落败的请求）
+        deadline: 可选截止时间（time.monotonic() 时刻）。等待并发名额、HTTP 超时、读取响应
+            与重试退避都不超过截止时间，调用方放弃等待后请求随之结束，不再占用工作线程
 
     Returns:
         str: 解析后的中文响应内容
@@ -90,21 +137,7 @@ def call_dify_workflow(
     Raises:
         DifyServiceError: 当 API 调用失败时
     """
-    # 根据工作流类型选择API密钥
-    if workflow_type == DifyWorkflowType.QNA_WORKFLOW:
-        api_key = DIFY_QNA_WORKFLOW_API_KEY
-    elif workflow_type == DifyWorkflowType.MONOLOGUE_WORKFLOW:
-        api_key = DIFY_MONOLOGUE_WORKFLOW_API_KEY
-    else:
-        raise DifyServiceError(f"Unsupported workflow type: {workflow_type}")
-
-    if not api_key:
-        raise DifyServiceError(f"API key not configured for workflow type: {workflow_type}")
-
-    # Validate and sanitize user_id to prevent 400 errors
-    if not user_id or not user_id.strip():
-        user_id = "anonymous_user"
-        logger.warning(f"Empty user_id provided, using fallback: {user_id}")
+    api_key = _resolve_workflow_api_key(workflow_type)
 
     # 设置请求头
     headers = {
@@ -113,16 +146,27 @@ def call_dify_workflow(
     }
 
     # 构建请求体 - 使用流式响应
-    body = {
-        "inputs": inputs,
-        "user": user_id.strip(),  # Ensure no leading/trailing whitespace
-        "response_mode": "streaming"
-    }
+    body = _build_workflow_body(inputs, user_id)
 
+    breaker = get_circuit_breaker(workflow_type.value)
+    get_retry_budget().record_request()
     last_exception = None
+    attempts = 0
+
+    def should_stop() -> bool:
+        return (cancelled is not None and cancelled.is_set()) or _remaining(deadline) == 0
 
-    # 重试逻辑
+    # 重试逻辑（受熔断器与全局重试预算约束，且不超过截止时间）
     for attempt in range(max_retries):
+        if cancelled is not None and cancelled.is_set():
+            raise DifyServiceError(f"Call to {workflow_type} cancelled after {attempts} attempts: {last_exception}")
+        remaining = _remaining(deadline)
+        if remaining == 0:
+            raise DifyServiceError(f"Deadline passed for {workflow_type} after {attempts} attempts: {last_exception}")
+        if not breaker.allow_request():
+            raise DifyServiceError(_circuit_open_message(workflow_type, last_exception))
+        attempts += 1
+
         try:
             logger.info(f"Calling Dify workflow {workflow_type}, attempt {attempt + 1}")
 
@@ -131,42 +175,57 @@ def call_dify_workflow(
             logger.info(f"Request headers: {headers}")
             logger.info(f"Request body: {body}")
 
-            # 发送流式请求
-            response = requests.post(
-                DIFY_WORKFLOW_API_URL,
-                headers=headers,
-                json=body,
-                timeout=timeout,
-                stream=True
-            )
-
-            # Log response details for debugging
-            logger.info(f"Response status code: {response.status_code}")
-            logger.info(f"Response headers: {dict(response.headers)}")
+            # 发送流式请求（复用共享连接池，并占用该工作流的并发名额）
+            with sync_workflow_slot(workflow_type.value, timeout=remaining):
+                remaining = _remaining(deadline)
+                response = get_dify_http_session().post(
+                    DIFY_WORKFLOW_API_URL,
+                    headers=headers,
+                    json=body,
+                    timeout=timeout if remaining is None else max(min(timeout, remaining), 0.001),
+                    stream=True
+                )
 
-            response.raise_for_status()
+                # Log response details for debugging
+                logger.info(f"Response status code: {response.status_code}")
+                logger.info(f"Response headers: {dict(response.headers)}")
 
-            # 设置UTF-8编码
-            response.encoding = 'utf-8'
-
-            # 解析流式响应
-            result_content = _parse_streaming_response(response)
+                response.raise_for_status()
 
+                # 解析流式响应
+                try:
+                    result_content = _parse_streaming_response(response, on_text, should_stop)
+                finally:
+                    response.close()
+
+            breaker.record_success()
+            if _remaining(deadline) == 0:
+                # 调用方已放弃等待，回答可能不完整
+                raise DifyServiceError(f"Deadline passed while reading {workflow_type} response")
             logger.info(f"Successfully called Dify workflow {workflow_type}")
             return result_content
 
+        except DifyServiceError:
+            raise
+
+        except WorkflowSlotTimeout as e:
+            # 未调用 Dify，不计入熔断，归还试探名额
+            breaker.release()
+            raise DifyServiceError(f"Deadline passed waiting for {workflow_type}: {e}")
+
         except requests.exceptions.Timeout as e:
             last_exception = e
+            breaker.record_failure()
             logger.warning(f"Timeout on attempt {attempt + 1} for {workflow_type}: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
 
         except requests.exceptions.RequestException as e:
             last_exception = e
             logger.error(f"Request error on attempt {attempt + 1} for {workflow_type}: {e}")
 
             # Log detailed error response if available
+            status_code = None
             if hasattr(e, 'response') and e.response is not None:
+                status_code = e.response.status_code
                 logger.error(f"Error response status: {e.response.status_code}")
                 logger.error(f"Error response headers: {dict(e.response.headers)}")
                 try:
@@ -175,16 +234,467 @@ def call_dify_workflow(
                 except:
                     logger.error("Could not read error response body")
 
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+            if not _is_transient_status(status_code):
+                # Dify 正常应答但拒绝了请求，重试无意义，也不计入熔断
+                breaker.record_success()
+                break
+            breaker.record_failure()
 
         except Exception as e:
             last_exception = e
+            breaker.record_failure()
             logger.error(f"Unexpected error on attempt {attempt + 1} for {workflow_type}: {e}")
             break  # Don't retry on unexpected errors
 
+        if not _may_retry(breaker, attempt, max_retries):
+            break
+        delay = backoff_delay(attempt)
+        remaining = _remaining(deadline)
+        if remaining is not None and delay >= remaining:
+            break
+        time.sleep(delay)
+
     # All retries failed
-    raise DifyServiceError(f"Failed to call {workflow_type} after {max_retries} attempts: {last_exception}")
+    raise DifyServiceError(f"Failed to call {workflow_type} after {attempts} attempts: {last_exception}")
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """距截止时间的剩余秒数（不小于 0）；没有截止时间时返回 None"""
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """阻塞式对冲调用的工作线程池（主请求与对冲请求各占一个线程）"""
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=DIFY_QNA_MAX_CONCURRENCY * 2,
+                    thread_name_prefix="dify-hedge"
+                )
+    return _hedge_executor
+
+
+def _call_hedged_workflow(
+    workflow_type: DifyWorkflowType,
+    inputs: Dict[str, Any],
+    user_id: str,
+    policy: Optional[HedgePolicy] = None,
+    deadline: Optional[float] = None
+) -> str:
+    """
+    带对冲的阻塞式工作流调用（同步 /action 路径使用）
+
+    策略同 _astream_hedged_workflow：主请求在对冲延迟内没有产出首个片段，且对冲预算允许时，
+    再发起一个相同请求；先产出首个片段（或未产出片段但先正常结束）的请求胜出，另一个请求
+    不再重试，并在收到下一个片段时停止读取。某一请求失败时继续等待另一个。
+    对冲未启用时等同于 call_dify_workflow。deadline 同 call_dify_workflow，两个请求共用。
+
+    Returns:
+        str: 胜出请求的完整回答
+
+    Raises:
+        DifyServiceError: 当所有请求都失败时
+    """
+    policy = policy or get_hedge_policy(workflow_type.value)
+    if not policy.enabled:
+        return call_dify_workflow(workflow_type, inputs, user_id, deadline=deadline)
+
+    policy.record_request()
+    started = time.monotonic()
+    lock = threading.Lock()
+    # 有请求产出片段或结束时置位，用于提前结束对冲等待
+    progress = threading.Event()
+    stops = [threading.Event(), threading.Event()]
+    winner: List[Optional[int]] = [None]
+
+    def claim(index: int) -> bool:
+        with lock:
+            if winner[0] is None:
+                winner[0] = index
+                policy.record_first_chunk(time.monotonic() - started, hedge_won=index > 0)
+                for other, stop in enumerate(stops):
+                    if other != index:
+                        stop.set()
+            return winner[0] == index
+
+    def attempt(index: int) -> str:
+        def on_text(_: str) -> None:
+            if winner[0] is None:
+                claim(index)
+            progress.set()
+
+        try:
+            return call_dify_workflow(
+                workflow_type, inputs, user_id, on_text=on_text, cancelled=stops[index], deadline=deadline
+            )
+        finally:
+            progress.set()
+
+    executor = _get_hedge_executor()
+    futures = [executor.submit(attempt, 0)]
+    try:
+        if not progress.wait(policy.hedge_delay()) and policy.try_hedge():
+            logger.info(f"Hedging slow {workflow_type} request after {time.monotonic() - started:.2f}s")
+            futures.append(executor.submit(attempt, 1))
+
+        last_exception: Optional[Exception] = None
+        for future in as_completed(futures):
+            index = futures.index(future)
+            if winner[0] is not None and winner[0] != index:
+                # 落败请求的部分结果
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                if winner[0] == index:
+                    raise
+                last_exception = e
+                continue
+            # 没有文本片段（仅 workflow_finished 输出）的请求在结束时参与竞争
+            if claim(index):
+                return result
+        raise last_exception
+    finally:
+        for stop in stops:
+            stop.set()
+
+
+async def acall_dify_workflow(
+    workflow_type: DifyWorkflowType,
+    inputs: Dict[str, Any],
+    user_id: str,
+    max_retries: int = 3,
+    timeout: Optional[float] = None
+) -> str:
+    """
+    异步调用 Dify 工作流 API（共享连接池，不阻塞事件循环）
+
+    Args:
+        workflow_type: 工作流类型
+        inputs: 输入参数字典
+        user_id: 用户唯一标识符
+        max_retries: 最大重试次数
+        timeout: 请求超时时间（秒），默认使用连接池配置
+
+    Returns:
+        str: 解析后的中文响应内容
+
+    Raises:
+        DifyServiceError: 当 API 调用失败时
+    """
+    api_key = _resolve_workflow_api_key(workflow_type)
+    body = _build_workflow_body(inputs, user_id)
+    client = get_dify_async_client()
+    breaker = get_circuit_breaker(workflow_type.value)
+    get_retry_budget().record_request()
+
+    last_exception = None
+    attempts = 0
+
+    for attempt in range(max_retries):
+        if not breaker.allow_request():
+            raise DifyServiceError(_circuit_open_message(workflow_type, last_exception))
+        attempts += 1
+
+        try:
+            logger.info(f"Calling Dify workflow {workflow_type} (async), attempt {attempt + 1}")
+
+            async with client.stream_workflow(workflow_type.value, api_key, body, timeout=timeout) as response:
+                logger.info(f"Response status code: {response.status_code}")
+                response.raise_for_status()
+                result_content = await _aparse_streaming_response(response)
+
+            breaker.record_success()
+            logger.info(f"Successfully called Dify workflow {workflow_type} (async)")
+            return result_content
+
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+
+        except httpx.TimeoutException as e:
+            last_exception = e
+            breaker.record_failure()
+            logger.warning(f"Timeout on attempt {attempt + 1} for {workflow_type}: {e}")
+
+        except httpx.HTTPError as e:
+            last_exception = e
+            logger.error(f"Request error on attempt {attempt + 1} for {workflow_type}: {e}")
+            status_code = None
+            if isinstance(e, httpx.HTTPStatusError):
+                status_code = e.response.status_code
+                logger.error(f"Error response status: {e.response.status_code}")
+            if not _is_transient_status(status_code):
+                breaker.record_success()
+                break
+            breaker.record_failure()
+
+        except Exception as e:
+            last_exception = e
+            breaker.record_failure()
+            logger.error(f"Unexpected error on attempt {attempt + 1} for {workflow_type}: {e}")
+            break  # Don't retry on unexpected errors
+
+        if not _may_retry(breaker, attempt, max_retries):
+            break
+        await asyncio.sleep(backoff_delay(attempt))
+
+    raise DifyServiceError(f"Failed to call {workflow_type} after {attempts} attempts: {last_exception}")
+
+
+async def astream_dify_workflow(
+    workflow_type: DifyWorkflowType,
+    inputs: Dict[str, Any],
+    user_id: str,
+    max_retries: int = 3,
+    timeout: Optional[float] = None,
+    on_complete: Optional[Callable[[bool], None]] = None
+) -> AsyncIterator[str]:
+    """
+    异步流式调用 Dify 工作流，逐个产出 text_chunk 文本片段
+
+    仅在尚未产出任何片段时重试；一旦开始向调用方转发内容，失败将直接抛出。
+    若整个流中没有 text_chunk 事件，则回退为产出 workflow_finished 中的输出。
+
+    Args:
+        workflow_type: 工作流类型
+        inputs: 输入参数字典
+        user_id: 用户唯一标识符
+        max_retries: 最大重试次数
+        timeout: 请求超时时间（秒），默认使用连接池配置
+        on_complete: 可选回调，流正常结束时调用一次，参数表示回答是否完整
+            （收到结束事件且未被截断）；连接提前关闭或回答被截断时为 False
+
+    Yields:
+        str: 文本片段
+
+    Raises:
+        DifyServiceError: 当 API 调用失败时
+    """
+    api_key = _resolve_workflow_api_key(workflow_type)
+    body = _build_workflow_body(inputs, user_id)
+    client = get_dify_async_client()
+    breaker = get_circuit_breaker(workflow_type.value)
+    get_retry_budget().record_request()
+
+    last_exception = None
+    emitted = False
+
+    for attempt in range(max_retries):
+        if not breaker.allow_request():
+            raise DifyServiceError(_circuit_open_message(workflow_type, last_exception))
+
+        try:
+            logger.info(f"Streaming Dify workflow {workflow_type}, attempt {attempt + 1}")
+
+            async with client.stream_workflow(workflow_type.value, api_key, body, timeout=timeout) as response:
+                response.raise_for_status()
+                collector = DifyStreamCollector()
+
+                async for event in aiter_sse_events(response.aiter_bytes()):
+                    text = collector.feed(event)
+                    if text:
+                        emitted = True
+                        yield text
+                    if collector.finished:
+                        break
+
+                # 没有收到任何 text_chunk 时，使用最终输出
+                if not emitted and collector.finished_output():
+                    emitted = True
+                    yield collector.finished_output()
+
+            breaker.record_success()
+            logger.info(f"Finished streaming Dify workflow {workflow_type}")
+            if on_complete is not None:
+                on_complete(collector.complete)
+            return
+
+        except (GeneratorExit, asyncio.CancelledError):
+            # 调用方提前停止读取，结果未知，归还试探名额
+            breaker.release()
+            raise
+
+        except (httpx.TimeoutException, httpx.HTTPError) as e:
+            last_exception = e
+            logger.warning(f"Stream error on attempt {attempt + 1} for {workflow_type}: {e}")
+            status_code = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            if not _is_transient_status(status_code):
+                breaker.record_success()
+                break
+            breaker.record_failure()
+            if emitted:
+                break  # 已转发部分内容，无法安全重试
+
+        if not _may_retry(breaker, attempt, max_retries):
+            break
+        await asyncio.sleep(backoff_delay(attempt))
+
+    raise DifyServiceError(f"Failed to stream {workflow_type}: {last_exception}")
+
+
+class _StreamCompletion:
+    """记录流式调用通过 on_complete 报告的回答是否完整（未报告即视为不完整）"""
+
+    def __init__(self):
+        self.complete = False
+
+    def __call__(self, complete: bool) -> None:
+        self.complete = complete
+
+
+async def _astream_hedged_workflow(
+    workflow_type: DifyWorkflowType,
+    inputs: Dict[str, Any],
+    user_id: str,
+    policy: Optional[HedgePolicy] = None,
+    on_complete: Optional[Callable[[bool], None]] = None
+) -> AsyncIterator[str]:
+    """
+    带对冲的流式工作流调用
+
+    若主请求在对冲延迟内没有产出首个片段，且对冲预算允许，则再发起一个相同请求；
+    先产出首个片段（或先正常结束）的请求胜出，另一个被取消。某一请求失败时继续
+    等待另一个。对冲未启用时等同于 astream_dify_workflow。on_complete 同
+    astream_dify_workflow，报告胜出请求的回答是否完整。
+
+    Yields:
+        str: 胜出请求的文本片段
+
+    Raises:
+        DifyServiceError: 当所有请求都失败时
+    """
+    policy = policy or get_hedge_policy(workflow_type.value)
+    if not policy.enabled:
+        async for chunk in astream_dify_workflow(workflow_type, inputs, user_id, on_complete=on_complete):
+            yield chunk
+        return
+
+    policy.record_request()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    # 各请求在独立任务中读取，片段以 (序号, 类型, 内容) 放入同一队列
+    queue: asyncio.Queue = asyncio.Queue()
+    # 各请求的回答是否完整
+    completions = [_StreamCompletion(), _StreamCompletion()]
+
+    async def pump(index: int) -> None:
+        stream = astream_dify_workflow(workflow_type, inputs, user_id, on_complete=completions[index])
+        try:
+            async for chunk in stream:
+                queue.put_nowait((index, "chunk", chunk))
+            queue.put_nowait((index, "end", None))
+        except Exception as e:
+            queue.put_nowait((index, "error", e))
+        finally:
+            await stream.aclose()
+
+    tasks = [asyncio.create_task(pump(0))]
+    winner = None
+    failures = 0
+
+    try:
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout=policy.hedge_delay())
+        except asyncio.TimeoutError:
+            if policy.try_hedge():
+                logger.info(f"Hedging slow {workflow_type} request after {loop.time() - started:.2f}s")
+                tasks.append(asyncio.create_task(pump(1)))
+            item = await queue.get()
+
+        while True:
+            index, kind, payload = item
+
+            if winner is None:
+                if kind == "error":
+                    failures += 1
+                    if failures >= len(tasks):
+                        raise payload
+                    item = await queue.get()
+                    continue
+
+                winner = index
+                policy.record_first_chunk(loop.time() - started, hedge_won=index > 0)
+                for other, task in enumerate(tasks):
+                    if other != winner:
+                        task.cancel()
+
+            if index == winner:
+                if kind == "end":
+                    if on_complete is not None:
+                        on_complete(completions[index].complete)
+                    return
+                if kind == "error":
+                    raise payload
+                yield payload
+
+            item = await queue.get()
+
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _is_transient_status(status_code: Optional[int]) -> bool:
+    """超时、连接错误（无状态码）、429 与 5xx 视为 Dify 侧的暂时性故障"""
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def _may_retry(breaker: CircuitBreaker, attempt: int, max_retries: int) -> bool:
+    """是否进行下一次重试：未达最大次数、熔断器未打开、且全局重试预算充足"""
+    if attempt >= max_retries - 1 or breaker.state == CIRCUIT_OPEN:
+        return False
+    return get_retry_budget().try_acquire()
+
+
+def _circuit_open_message(workflow_type: DifyWorkflowType, last_exception: Optional[Exception]) -> str:
+    message = f"Dify workflow {workflow_type.value} is unavailable (circuit open)"
+    if last_exception is not None:
+        message += f": {last_exception}"
+    return message
+
+
+def _resolve_workflow_api_key(workflow_type: DifyWorkflowType) -> str:
+    """
+    根据工作流类型选择API密钥
+
+    Raises:
+        DifyServiceError: 当工作流类型不支持或未配置密钥时
+    """
+    if workflow_type == DifyWorkflowType.QNA_WORKFLOW:
+        api_key = DIFY_QNA_WORKFLOW_API_KEY
+    elif workflow_type == DifyWorkflowType.MONOLOGUE_WORKFLOW:
+        api_key = DIFY_MONOLOGUE_WORKFLOW_API_KEY
+    else:
+        raise DifyServiceError(f"Unsupported workflow type: {workflow_type}")
+
+    if not api_key:
+        raise DifyServiceError(f"API key not configured for workflow type: {workflow_type}")
+
+    return api_key
+
+
+def _build_workflow_body(inputs: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    """构建流式工作流请求体"""
+    # Validate and sanitize user_id to prevent 400 errors
+    if not user_id or not user_id.strip():
+        user_id = "anonymous_user"
+        logger.warning(f"Empty user_id provided, using fallback: {user_id}")
+
+    return {
+        "inputs": inputs,
+        "user": user_id.strip(),  # Ensure no leading/trailing whitespace
+        "response_mode": "streaming"
+    }
 
 
 def call_qna_workflow(
@@ -192,7 +702,11 @@ def call_qna_workflow(
     act_num: int,
     query: str,
     model_name: str,
-    user_id: str
+    user_id: str,
+    history: Optional[str] = None,
+    script_id: Optional[str] = None,
+    history_cacheable: bool = False,
+    deadline: Optional[float] = None
 ) -> str:
     """
     调用查询并回答工作流
@@ -203,6 +717,10 @@ def call_qna_workflow(
         query: 查询问题
         model_name: 模型名称
         user_id: 用户ID
+        history: 可选的历史记录上下文
+        script_id: 剧本ID，提供时启用问答缓存（需开启 QNA_CACHE_ENABLED）
+        history_cacheable: 历史上下文中没有与该角色相关的内容，带上下文的回答仍可缓存
+        deadline: 可选截止时间（time.monotonic() 时刻），超过后不再等待或重试
 
     Returns:
         str: AI 生成的回答
@@ -210,49 +728,81 @@ def call_qna_workflow(
     Raises:
         DifyServiceError: 当工作流调用失败时
     """
-    # Validate required parameters to prevent 400 errors
-    if not user_id or not user_id.strip():
-        logger.warning("Empty user_id provided to call_qna_workflow")
-        user_id = "anonymous_user"
-
-    if not char_id or not char_id.strip():
-        logger.warning("Empty char_id provided to call_qna_workflow")
-        char_id = "unknown_character"
-
-    # Truncate history to meet Dify API requirements (max 256 characters)
-    processed_history = history or "没有历史记录。"
-    if len(processed_history) > 256:
-        # Smart truncation: try to keep the most recent and relevant information
-        processed_history = _truncate_history_smartly(processed_history, char_id)
-        logger.warning(f"History truncated from {len(history)} to {len(processed_history)} characters for Dify API")
+    cached = _get_cached_answer(script_id, char_id, act_num, model_name, query, history, history_cacheable)
+    if cached is not None:
+        return cached
 
-    inputs = {
-        "char_id": char_id.strip() if char_id else "unknown_character",
-        "act_num": act_num,
-        "query": query or "",  # Ensure query is never None
-        "model_name": model_name or "gpt-3.5-turbo",  # Default model
-        "history": processed_history  # Truncated history
-    }
+    inputs, user_id = _build_qna_inputs(char_id, act_num, query, model_name, user_id, history)
 
     try:
-        # 直接返回流式响应解析的结果
-        answer = call_dify_workflow(
+        # 直接返回流式响应解析的结果；启用对冲请求时，慢请求会由第二个请求竞速
+        answer = _call_hedged_workflow(
             DifyWorkflowType.QNA_WORKFLOW,
             inputs,
-            user_id
+            user_id,
+            deadline=deadline
         )
+        _cache_answer(script_id, char_id, act_num, model_name, query, history, history_cacheable, answer)
+        return answer
+
+    except DifyServiceError as e:
+        logger.error(f"QnA workflow failed: {e}")
+        return _QNA_FAILURE_RESPONSE
+
+
+async def acall_qna_workflow(
+    char_id: str,
+    act_num: int,
+    query: str,
+    model_name: str,
+    user_id: str,
+    history: Optional[str] = None,
+    script_id: Optional[str] = None,
+    history_cacheable: bool = False
+) -> str:
+    """
+    异步调用查询并回答工作流
+
+    参数与返回值同 call_qna_workflow。启用对冲请求时，慢请求会由第二个请求竞速。
+    """
+    cached = _get_cached_answer(script_id, char_id, act_num, model_name, query, history, history_cacheable)
+    if cached is not None:
+        return cached
+
+    inputs, user_id = _build_qna_inputs(char_id, act_num, query, model_name, user_id, history)
+
+    try:
+        if get_hedge_policy(DifyWorkflowType.QNA_WORKFLOW.value).enabled:
+            # 对冲依赖首片段到达时间，因此走流式接口
+            completion = _StreamCompletion()
+            parts = [chunk async for chunk in _astream_hedged_workflow(
+                DifyWorkflowType.QNA_WORKFLOW, inputs, user_id, on_complete=completion
+            )]
+            answer = _join_stream_parts(parts)
+            complete = completion.complete
+        else:
+            complete = True
+            answer = await acall_dify_workflow(
+                DifyWorkflowType.QNA_WORKFLOW,
+                inputs,
+                user_id
+            )
+        if complete:
+            _cache_answer(script_id, char_id, act_num, model_name, query, history, history_cacheable, answer)
         return answer
 
     except DifyServiceError as e:
         logger.error(f"QnA workflow failed: {e}")
-        return "抱歉，我暂时无法回答这个问题。"
+        return _QNA_FAILURE_RESPONSE
 
 
 def call_monologue_workflow(
     char_id: str,
     act_num: int,
     model_name: str,
-    user_id: str
+    user_id: str,
+    script_id: Optional[str] = None,
+    deadline: Optional[float] = None
 ) -> str:
     """
     调用简述自己的身世工作流
@@ -262,6 +812,8 @@ def call_monologue_workflow(
         act_num: 幕数
         model_name: 模型名称
         user_id: 用户ID
+        script_id: 剧本ID，提供时启用独白缓存（需开启 MONOLOGUE_CACHE_ENABLED）
+        deadline: 可选截止时间（time.monotonic() 时刻），超过后不再等待或重试
 
     Returns:
         str: AI 生成的角色独白
@@ -269,155 +821,375 @@ def call_monologue_workflow(
     Raises:
         DifyServiceError: 当工作流调用失败时
     """
-    # Validate required parameters to prevent 400 errors
-    if not user_id or not user_id.strip():
-        logger.warning("Empty user_id provided to call_monologue_workflow")
-        user_id = "anonymous_user"
-
-    if not char_id or not char_id.strip():
-        logger.warning("Empty char_id provided to call_monologue_workflow")
-        char_id = "unknown_character"
+    cached = _get_cached_monologue(script_id, char_id, act_num, model_name)
+    if cached is not None:
+        return cached
 
-    inputs = {
-        "char_id": char_id.strip() if char_id else "unknown_character",
-        "act_num": act_num,
-        "model_name": model_name or "gpt-3.5-turbo"  # Default model
-    }
+    inputs, user_id = _build_monologue_inputs(char_id, act_num, model_name, user_id)
 
     try:
         # 直接返回流式响应解析的结果
         monologue = call_dify_workflow(
+            DifyWorkflowType.MONOLOGUE_WORKFLOW,
+            inputs,
+            user_id,
+            deadline=deadline
+        )
+        _cache_monologue(script_id, char_id, act_num, model_name, monologue)
+        return monologue
+
+    except DifyServiceError as e:
+        logger.error(f"Monologue workflow failed: {e}")
+        return _MONOLOGUE_FAILURE_RESPONSE
+
+
+async def acall_monologue_workflow(
+    char_id: str,
+    act_num: int,
+    model_name: str,
+    user_id: str,
+    script_id: Optional[str] = None
+) -> str:
+    """
+    异步调用简述自己的身世工作流
+
+    参数与返回值同 call_monologue_workflow。
+    """
+    cached = _get_cached_monologue(script_id, char_id, act_num, model_name)
+    if cached is not None:
+        return cached
+
+    inputs, user_id = _build_monologue_inputs(char_id, act_num, model_name, user_id)
+
+    try:
+        monologue = await acall_dify_workflow(
             DifyWorkflowType.MONOLOGUE_WORKFLOW,
             inputs,
             user_id
         )
+        _cache_monologue(script_id, char_id, act_num, model_name, monologue)
         return monologue
 
     except DifyServiceError as e:
         logger.error(f"Monologue workflow failed: {e}")
-        return "抱歉，我暂时无法生成角色独白。"
+        return _MONOLOGUE_FAILURE_RESPONSE
 
 
+async def aprewarm_monologues(
+    script_id: str,
+    char_ids: List[str],
+    act_nums: List[int],
+    model_name: str = "gpt-3.5-turbo",
+    user_id: str = "monologue_prewarm"
+) -> Dict[str, int]:
+    """
+    预先生成并缓存剧本中角色的独白
+
+    已缓存的组合会被跳过；并发度受独白工作流的并发上限约束。
+
+    Args:
+        script_id: 剧本ID
+        char_ids: 角色ID列表
+        act_nums: 幕数列表
+        model_name: 模型名称
+        user_id: 调用 Dify 使用的用户ID
 
+    Returns:
+        Dict[str, int]: requested / already_cached / generated 计数
+    """
+    cache = get_monologue_cache()
+    combos = [(char_id, act_num) for char_id in char_ids for act_num in act_nums]
+    if not cache.enabled:
+        return {"requested": len(combos), "already_cached": 0, "generated": 0}
+
+    pending = [
+        (char_id, act_num) for char_id, act_num in combos
+        if not cache.contains(script_id, char_id, act_num, model_name)
+    ]
+    await asyncio.gather(*(
+        acall_monologue_workflow(char_id, act_num, model_name, user_id, script_id=script_id)
+        for char_id, act_num in pending
+    ))
+    generated = sum(
+        1 for char_id, act_num in pending
+        if cache.contains(script_id, char_id, act_num, model_name)
+    )
+
+    logger.info(f"Prewarmed {generated}/{len(pending)} monologues for script {script_id}")
+    return {
+        "requested": len(combos),
+        "already_cached": len(combos) - len(pending),
+        "generated": generated,
+    }
 
 
-def _truncate_history_smartly(history: str, char_id: str, max_length: int = 256) -> str:
+async def astream_qna_workflow(
+    char_id: str,
+    act_num: int,
+    query: str,
+    model_name: str,
+    user_id: str,
+    history: Optional[str] = None,
+    script_id: Optional[str] = None,
+    history_cacheable: bool = False
+) -> AsyncIterator[str]:
     """
-    智能截断历史记录，优先保留与当前角色相关的最新信息
+    流式调用查询并回答工作流，逐个产出回答片段
+
+    参数同 call_qna_workflow。命中缓存时一次性产出完整回答。
+
+    Raises:
+        DifyServiceError: 当工作流调用失败时
+    """
+    cached = _get_cached_answer(script_id, char_id, act_num, model_name, query, history, history_cacheable)
+    if cached is not None:
+        yield cached
+        return
+
+    inputs, user_id = _build_qna_inputs(char_id, act_num, query, model_name, user_id, history)
+    parts = []
+    completion = _StreamCompletion()
+    async for chunk in _astream_hedged_workflow(DifyWorkflowType.QNA_WORKFLOW, inputs, user_id, on_complete=completion):
+        parts.append(chunk)
+        yield chunk
+    # 只有完整接收的回答才写入缓存（被截断或连接提前关闭的不缓存）
+    if completion.complete:
+        _cache_answer(
+            script_id, char_id, act_num, model_name, query, history, history_cacheable, ''.join(parts).strip()
+        )
+
+
+async def astream_monologue_workflow(
+    char_id: str,
+    act_num: int,
+    model_name: str,
+    user_id: str,
+    script_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    流式调用简述自己的身世工作流，逐个产出独白片段
+
+    参数同 call_monologue_workflow。命中缓存时一次性产出完整独白。
+
+    Raises:
+        DifyServiceError: 当工作流调用失败时
+    """
+    cached = _get_cached_monologue(script_id, char_id, act_num, model_name)
+    if cached is not None:
+        yield cached
+        return
+
+    inputs, user_id = _build_monologue_inputs(char_id, act_num, model_name, user_id)
+    parts = []
+    completion = _StreamCompletion()
+    async for chunk in astream_dify_workflow(
+        DifyWorkflowType.MONOLOGUE_WORKFLOW, inputs, user_id, on_complete=completion
+    ):
+        parts.append(chunk)
+        yield chunk
+    # 只有完整接收的独白才写入缓存（被截断或连接提前关闭的不缓存）
+    if completion.complete:
+        _cache_monologue(script_id, char_id, act_num, model_name, ''.join(parts).strip())
+
+
+def _get_cached_monologue(script_id: Optional[str], char_id: str, act_num: int, model_name: str) -> Optional[str]:
+    """查询独白缓存；未提供剧本ID时不使用缓存"""
+    if script_id is None or not char_id:
+        return None
+    cached = get_monologue_cache().get(script_id, char_id, act_num, model_name)
+    if cached is not None:
+        logger.info(f"Monologue cache hit for script {script_id}, character {char_id}, act {act_num}")
+    return cached
+
+
+def _cache_monologue(script_id: Optional[str], char_id: str, act_num: int, model_name: str, monologue: str) -> None:
+    """缓存成功生成的独白（解析失败的兜底文本不缓存）"""
+    if script_id is None or not char_id or monologue in _FALLBACK_RESPONSES:
+        return
+    get_monologue_cache().put(script_id, char_id, act_num, model_name, monologue)
+
+
+def _get_cached_answer(
+    script_id: Optional[str],
+    char_id: str,
+    act_num: int,
+    model_name: str,
+    query: str,
+    history: Optional[str],
+    history_cacheable: bool = False
+) -> Optional[str]:
+    """查询问答缓存；上下文中有角色相关内容时答案依赖上下文，不使用缓存"""
+    if script_id is None or not char_id or (history and not history_cacheable):
+        return None
+    cached = get_qna_cache().get(script_id, char_id, act_num, model_name, query)
+    if cached is not None:
+        logger.info(f"QnA cache hit for script {script_id}, character {char_id}, act {act_num}")
+    return cached
+
+
+def _cache_answer(
+    script_id: Optional[str],
+    char_id: str,
+    act_num: int,
+    model_name: str,
+    query: str,
+    history: Optional[str],
+    history_cacheable: bool,
+    answer: str
+) -> None:
+    """缓存成功生成的回答（解析失败的兜底文本、依赖角色相关上下文的回答不缓存）"""
+    if script_id is None or not char_id or (history and not history_cacheable) or answer in _FALLBACK_RESPONSES:
+        return
+    get_qna_cache().put(script_id, char_id, act_num, model_name, query, answer)
+
+
+def _build_qna_inputs(
+    char_id: str,
+    act_num: int,
+    query: str,
+    model_name: str,
+    user_id: str,
+    history: Optional[str]
+) -> tuple[Dict[str, Any], str]:
+    """构建查询并回答工作流的输入参数，返回 (inputs, user_id)"""
+    # Validate required parameters to prevent 400 errors
+    if not user_id or not user_id.strip():
+        logger.warning("Empty user_id provided to call_qna_workflow")
+        user_id = "anonymous_user"
+
+    if not char_id or not char_id.strip():
+        logger.warning("Empty char_id provided to call_qna_workflow")
+        char_id = "unknown_character"
+
+    # 引擎传入的历史已按 token 预算构建；这里只保证不超过 Dify 变量的长度限制
+    processed_history = history or "没有历史记录。"
+    if len(processed_history) > DIFY_QNA_HISTORY_MAX_CHARS:
+        processed_history = _clip_history(processed_history, DIFY_QNA_HISTORY_MAX_CHARS)
+        logger.warning(f"History truncated from {len(history)} to {len(processed_history)} characters for Dify API")
+
+    inputs = {
+        "char_id": char_id.strip() if char_id else "unknown_character",
+        "act_num": act_num,
+        "query": query or "",  # Ensure query is never None
+        "model_name": model_name or "gpt-3.5-turbo",  # Default model
+        "history": processed_history  # Truncated history
+    }
+    return inputs, user_id
+
+
+def _build_monologue_inputs(
+    char_id: str,
+    act_num: int,
+    model_name: str,
+    user_id: str
+) -> tuple[Dict[str, Any], str]:
+    """构建简述身世工作流的输入参数，返回 (inputs, user_id)"""
+    # Validate required parameters to prevent 400 errors
+    if not user_id or not user_id.strip():
+        logger.warning("Empty user_id provided to call_monologue_workflow")
+        user_id = "anonymous_user"
+
+    if not char_id or not char_id.strip():
+        logger.warning("Empty char_id provided to call_monologue_workflow")
+        char_id = "unknown_character"
+
+    inputs = {
+        "char_id": char_id.strip() if char_id else "unknown_character",
+        "act_num": act_num,
+        "model_name": model_name or "gpt-3.5-turbo"  # Default model
+    }
+    return inputs, user_id
+
+
+def _clip_history(history: str, max_length: int) -> str:
+    """
+    截断历史记录，保留最新的完整行
 
     Args:
-        history: 原始历史记录
-        char_id: 当前角色ID
+        history: 原始历史记录（按时间顺序，每行一条）
         max_length: 最大长度限制
 
     Returns:
         str: 截断后的历史记录
     """
+    marker = "...(历史记录已截断)\n"
     if len(history) <= max_length:
         return history
+    if max_length <= len(marker):
+        return history[-max_length:]
 
-    # 保留一些空间给结尾标识符
-    target_length = max_length - 10
-
-    # 尝试按行分割，优先保留与当前角色相关的内容
-    lines = history.split('\n')
+    tail = history[len(history) - (max_length - len(marker)):]
+    # 丢弃被截断的首行
+    newline = tail.find("\n")
+    if 0 <= newline < len(tail) - 1:
+        tail = tail[newline + 1:]
+    return marker + tail
 
-    # 查找与当前角色相关的行
-    relevant_lines = []
-    other_lines = []
 
-    for line in lines:
-        if char_id in line:
-            relevant_lines.append(line)
-        else:
-            other_lines.append(line)
+def _parse_streaming_response(
+    response,
+    on_text: Optional[Callable[[str], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> str:
+    """
+    增量解析Dify流式响应，提取中文内容
 
-    # 构建截断后的历史记录
-    result_lines = []
-    current_length = 0
+    Args:
+        response: requests响应对象（stream=True）
+        on_text: 可选回调，每收到一个文本片段调用一次
+        should_stop: 可选检查，每个事件后调用，返回 True 时停止读取
 
-    # 首先添加与当前角色相关的最新内容
-    for line in reversed(relevant_lines):
-        if current_length + len(line) + 1 <= target_length:  # +1 for newline
-            result_lines.insert(0, line)
-            current_length += len(line) + 1
-        else:
-            break
+    Returns:
+        str: 解析后的中文内容
+    """
+    collector = DifyStreamCollector(on_text=on_text)
 
-    # 如果还有空间，添加其他最新内容
-    for line in reversed(other_lines):
-        if current_length + len(line) + 1 <= target_length:
-            result_lines.insert(0, line)
-            current_length += len(line) + 1
-        else:
-            break
+    try:
+        for event in iter_sse_events(response.iter_content(chunk_size=None)):
+            collector.feed(event)
+            if collector.finished or (should_stop is not None and should_stop()):
+                break
 
-    # 如果仍然太长，进行简单截断
-    result = '\n'.join(result_lines)
-    if len(result) > target_length:
-        result = result[:target_length]
+        return _join_stream_parts([collector.result()])
 
-    return result + "...(历史记录已截断)"
+    except Exception as e:
+        logger.error(f"Failed to parse streaming response: {e}")
+        return "抱歉，响应解析失败。"
 
 
-def _parse_streaming_response(response) -> str:
+async def _aparse_streaming_response(response: httpx.Response) -> str:
     """
-    解析Dify流式响应，提取中文内容
+    异步增量解析Dify流式响应，提取中文内容
 
     Args:
-        response: requests响应对象
+        response: httpx 流式响应对象
 
     Returns:
         str: 解析后的中文内容
     """
-    import json
-
-    result_parts = []
+    collector = DifyStreamCollector()
 
     try:
-        # 遍历响应的每一行
-        for line in response.iter_lines(decode_unicode=True):
-            # SSE 事件通常以 "data: " 开头
-            if line and line.startswith('data: '):
-                # 移除 "data: " 前缀
-                json_string = line[len('data: '):]
+        async for event in aiter_sse_events(response.aiter_bytes()):
+            collector.feed(event)
+            if collector.finished:
+                break
 
-                # 流结束标记
-                if json_string.strip() == '[DONE]':
-                    break
+        return _join_stream_parts([collector.result()])
 
-                try:
-                    # 解析JSON数据
-                    data = json.loads(json_string)
-
-                    # 提取文本内容
-                    if 'event' in data and data['event'] == 'text_chunk':
-                        if 'data' in data and 'text' in data['data']:
-                            result_parts.append(data['data']['text'])
-                    elif 'event' in data and data['event'] == 'workflow_finished':
-                        # 工作流完成，可能包含最终结果
-                        if 'data' in data and 'outputs' in data['data']:
-                            outputs = data['data']['outputs']
-                            # 尝试从outputs中提取结果
-                            for key, value in outputs.items():
-                                if isinstance(value, str) and value.strip():
-                                    result_parts.append(value)
-
-                except json.JSONDecodeError:
-                    # 忽略无效的JSON行
-                    continue
+    except Exception as e:
+        logger.error(f"Failed to parse streaming response: {e}")
+        return "抱歉，响应解析失败。"
 
-        # 合并所有文本片段
-        result = ''.join(result_parts).strip()
 
-        if not result:
-            return "抱歉，未能获取到有效响应。"
+def _join_stream_parts(result_parts: List[str]) -> str:
+    """合并所有文本片段"""
+    result = ''.join(result_parts).strip()
 
-        return result
+    if not result:
+        return "抱歉，未能获取到有效响应。"
 
-    except Exception as e:
-        logger.error(f"Failed to parse streaming response: {e}")
-        return "抱歉，响应解析失败。"
+    return result
 
 
 def _extract_answer_from_response(response: Dict[str, Any]) -> str:
@@ -0,0 +1,314 @@
+"""
+Dify 流式响应（SSE）增量解析
+
+按 SSE 规范逐块解析响应字节流，而不是逐行拼接后整体处理：
+- 支持 LF / CR / CRLF 换行、多行 data 字段、event / id 字段与注释行
+- 跨块的半行与被截断的 UTF-8 字符会缓冲到下一块
+- 单个事件与累计回答文本都有长度上限，异常的流不会无限占用内存
+
+DifyStreamCollector 在事件之上提取回答文本：只有整个流中没有 text_chunk 时
+才使用 workflow_finished 的输出，避免同一回答被重复累积。
+"""
+
+import codecs
+import logging
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Union
+)
+
+from app.core import json_backend
+from app.core.config import DIFY_STREAM_MAX_EVENT_CHARS, DIFY_STREAM_MAX_RESPONSE_CHARS
+
+logger = logging.getLogger(__name__)
+
+# 流结束标记
+_DONE_MARKER = "[DONE]"
+
+
+class SSEEvent:
+    """A dispatched server-sent event."""
+
+    __slots__ = ("event", "data", "id")
+
+    def __init__(self, data: str, event: str = "message", id: Optional[str] = None):
+        self.event = event
+        self.data = data
+        self.id = id
+
+    @property
+    def is_done(self) -> bool:
+        """Whether this is the ``[DONE]`` end-of-stream marker."""
+        return self.data.strip() == _DONE_MARKER
+
+    def json(self) -> Optional[Dict[str, Any]]:
+        """Decode the data field as a JSON object; None if it is not one."""
+        try:
+            payload = json_backend.loads(self.data)
+        except ValueError:
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    def __repr__(self) -> str:
+        return f"SSEEvent(event={self.event!r}, data={self.data!r}, id={self.id!r})"
+
+
+class SSEParser:
+    """
+    Incremental server-sent events parser.
+
+    Feed raw chunks (bytes or str) as they arrive from the network; each
+    call returns the events completed by that chunk. Call ``flush`` at the
+    end of the stream to dispatch a trailing event that was not followed by
+    a blank line. Events whose data exceeds ``max_event_chars`` are dropped
+    and counted in ``dropped_events``.
+    """
+
+    def __init__(self, max_event_chars: int = DIFY_STREAM_MAX_EVENT_CHARS):
+        """
+        Initialize the parser.
+
+        Args:
+            max_event_chars: Maximum size of a single event (or line) in characters
+        """
+        self.max_event_chars = max_event_chars
+        self.dropped_events = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial: List[str] = []
+        self._partial_size = 0
+        self._cr_pending = False
+        self._data: List[str] = []
+        self._data_size = 0
+        self._event_type = ""
+        self._last_id: Optional[str] = None
+        self._oversized = False
+
+    def feed(self, chunk: Union[bytes, str]) -> List[SSEEvent]:
+        """Parse the next chunk of the stream and return the completed events."""
+        text = self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        if self._cr_pending:
+            text = "\r" + text
+            self._cr_pending = False
+        if not text:
+            return []
+
+        if "\r" in text:
+            # 结尾的 CR 可能是被拆开的 CRLF，留到下一块再判断
+            if text.endswith("\r"):
+                text = text[:-1]
+                self._cr_pending = True
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+        lines = text.split("\n")
+        tail = lines.pop()
+        events: List[SSEEvent] = []
+
+        if lines:
+            if self._partial:
+                self._partial.append(lines[0])
+                lines[0] = "".join(self._partial)
+                self._partial = []
+                self._partial_size = 0
+            for line in lines:
+                # 常见情况（空行、"data: " 行）直接处理，其余交给 _process_line
+                if not line:
+                    self._dispatch(events)
+                elif line.startswith("data: ") and not self._oversized:
+                    value = line[6:]
+                    self._data.append(value)
+                    self._data_size += len(value) + 1
+                    if self._data_size > self.max_event_chars:
+                        self._oversized = True
+                else:
+                    self._process_line(line, events)
+
+        if tail:
+            self._append_partial(tail)
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        """Finish the stream and dispatch any pending event."""
+        events: List[SSEEvent] = []
+        remainder = self._decoder.decode(b"", final=True)
+        if remainder:
+            self._append_partial(remainder)
+        self._cr_pending = False
+        if self._partial:
+            line = "".join(self._partial)
+            self._partial = []
+            self._partial_size = 0
+            self._process_line(line, events)
+        self._dispatch(events)
+        return events
+
+    def _append_partial(self, text: str) -> None:
+        if self._oversized:
+            return
+        self._partial.append(text)
+        self._partial_size += len(text)
+        if self._partial_size > self.max_event_chars:
+            self._partial = []
+            self._partial_size = 0
+            self._oversized = True
+
+    def _process_line(self, line: str, events: List[SSEEvent]) -> None:
+        if not line:
+            self._dispatch(events)
+            return
+        if self._oversized or line[0] == ":":
+            return
+
+        field, separator, value = line.partition(":")
+        if separator and value.startswith(" "):
+            value = value[1:]
+
+        if field == "data":
+            self._data.append(value)
+            self._data_size += len(value) + 1
+            if self._data_size > self.max_event_chars:
+                self._oversized = True
+        elif field == "event":
+            self._event_type = value
+        elif field == "id" and "\0" not in value:
+            self._last_id = value
+
+    def _dispatch(self, events: List[SSEEvent]) -> None:
+        if self._oversized:
+            self.dropped_events += 1
+            logger.warning(f"Dropped SSE event larger than {self.max_event_chars} characters")
+        elif self._data:
+            events.append(SSEEvent("\n".join(self._data), self._event_type or "message", self._last_id))
+        self._data = []
+        self._data_size = 0
+        self._event_type = ""
+        self._oversized = False
+
+
+def iter_sse_events(chunks: Iterable[Union[bytes, str]], parser: Optional[SSEParser] = None) -> Iterator[SSEEvent]:
+    """Parse an iterable of raw chunks into events as they arrive."""
+    parser = parser or SSEParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.flush()
+
+
+async def aiter_sse_events(
+    chunks: AsyncIterable[Union[bytes, str]],
+    parser: Optional[SSEParser] = None
+) -> AsyncIterator[SSEEvent]:
+    """Parse an async iterable of raw chunks into events as they arrive."""
+    parser = parser or SSEParser()
+    async for chunk in chunks:
+        for event in parser.feed(chunk):
+            yield event
+    for event in parser.flush():
+        yield event
+
+
+class DifyStreamCollector:
+    """
+    Extracts the answer text from the events of a Dify workflow stream.
+
+    ``text_chunk`` events are accumulated (and passed to ``on_text``). The
+    ``workflow_finished`` outputs are only kept, and only used, when the
+    stream carried no text chunks. Once ``max_chars`` characters were
+    collected the answer is truncated and ``finished`` turns True so the
+    caller can stop reading. ``complete`` tells whether the whole answer
+    arrived, i.e. whether it is safe to cache.
+    """
+
+    def __init__(
+        self,
+        max_chars: int = DIFY_STREAM_MAX_RESPONSE_CHARS,
+        on_text: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Initialize the collector.
+
+        Args:
+            max_chars: Maximum answer length in characters
+            on_text: Optional callback invoked with every text chunk
+        """
+        self.max_chars = max_chars
+        self.on_text = on_text
+        self.done = False
+        self.truncated = False
+        self.workflow_finished = False
+        self._parts: List[str] = []
+        self._size = 0
+        self._finished_outputs: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        """Whether the stream ended or the size cap was reached."""
+        return self.done or self.truncated
+
+    @property
+    def complete(self) -> bool:
+        """Whether the workflow reported its end and the answer was not truncated."""
+        return (self.done or self.workflow_finished) and not self.truncated
+
+    @property
+    def has_text_chunks(self) -> bool:
+        return bool(self._parts)
+
+    def feed(self, event: SSEEvent) -> Optional[str]:
+        """
+        Consume one event.
+
+        Returns:
+            The text chunk carried by the event (possibly truncated), or None
+        """
+        if self.finished:
+            return None
+        if event.is_done:
+            self.done = True
+            return None
+
+        # 只解码可能有用的事件；其他事件（如 node_finished）可能很大，直接跳过
+        if '"text_chunk"' not in event.data and '"workflow_finished"' not in event.data:
+            return None
+
+        data = event.json()
+        if not data:
+            return None
+
+        kind = data.get("event")
+        payload = data.get("data") or {}
+        if kind == "text_chunk":
+            text = payload.get("text")
+            if isinstance(text, str) and text:
+                return self._append(text)
+        elif kind == "workflow_finished":
+            self.workflow_finished = True
+            if self._parts:
+                return None
+            outputs = payload.get("outputs") or {}
+            finished = ''.join(
+                value for value in outputs.values()
+                if isinstance(value, str) and value.strip()
+            )
+            if len(finished) > self.max_chars:
+                self.truncated = True
+                logger.warning(f"Dify workflow output exceeded {self.max_chars} characters, truncating")
+            self._finished_outputs = [finished[:self.max_chars]] if finished else []
+        return None
+
+    def _append(self, text: str) -> str:
+        room = self.max_chars - self._size
+        if len(text) > room:
+            text = text[:room]
+            self.truncated = True
+            logger.warning(f"Dify stream exceeded {self.max_chars} characters, truncating")
+        self._parts.append(text)
+        self._size += len(text)
+        if self.on_text is not None and text:
+            self.on_text(text)
+        return text
+
+    def result(self) -> str:
+        """The collected answer: text chunks, or the final outputs when there were none."""
+        return ''.join(self._parts or self._finished_outputs)
+
+    def finished_output(self) -> str:
+        """The final outputs, available only for streams without text chunks."""
+        return ''.join(self._finished_outputs)
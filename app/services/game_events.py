@@ -0,0 +1,230 @@
+"""
+对局事件推送（进程内发布/订阅）
+
+客户端原本需要轮询 /session/{id}/status 才能发现其他玩家的提问或幕次推进。
+游戏引擎在每次提交状态后向本模块发布一条紧凑的增量事件（新版本号、当前幕次/阶段
+以及本次新增的日志、问答与任务提交），WebSocket / SSE 端点把事件推送给该会话的
+所有订阅者：
+- 事件只序列化一次，扇出给所有订阅者
+- 每个订阅者有独立的有界队列；消费过慢导致队列满时丢弃积压事件，改为发送一条
+  resync 事件，客户端应通过状态接口（带游标）重新同步，发布方永远不会被阻塞
+- 发布可以在任意线程进行，事件通过订阅者所在的事件循环投递
+
+GameEventBus 定义发布/订阅接口，默认的 InMemoryEventBus 只在本进程内分发；
+多进程部署时可实现基于消息代理的版本，并通过 set_game_event_bus 替换。
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Set
+
+from app.core import json_backend
+from app.core.config import GAME_EVENTS_ENABLED, GAME_EVENTS_SUBSCRIBER_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def _resync_message(session_id: str) -> str:
+    return json_backend.dumps({"type": "resync", "session_id": session_id})
+
+
+class Subscription:
+    """
+    A subscriber's bounded queue of encoded events for one session.
+
+    Events are delivered on the event loop the subscription was created on.
+    When the queue is full, the backlog is dropped and replaced by a single
+    ``resync`` event.
+    """
+
+    def __init__(self, bus: "GameEventBus", session_id: str, max_queue: int,
+                 loop: asyncio.AbstractEventLoop):
+        """
+        Initialize the subscription.
+
+        Args:
+            bus: The bus the subscription belongs to
+            session_id: Game session ID
+            max_queue: Maximum number of undelivered events
+            loop: Event loop of the consumer
+        """
+        self.bus = bus
+        self.session_id = session_id
+        self.max_queue = max(max_queue, 1)
+        self.loop = loop
+        self.closed = False
+        self.dropped = 0
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+
+    def deliver(self, message: str) -> None:
+        """Queue an encoded event (must run on the subscription's loop)."""
+        if self.closed:
+            return
+        if self._queue.qsize() >= self.max_queue:
+            dropped = self._queue.qsize()
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self.dropped += dropped + 1
+            self.bus.record_overflow()
+            logger.warning(f"Event subscriber of session {self.session_id} fell behind, requesting resync")
+            self._queue.put_nowait(_resync_message(self.session_id))
+            return
+        self._queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Wait for the next encoded event.
+
+        Args:
+            timeout: Seconds to wait; None waits indefinitely
+
+        Returns:
+            The event JSON text, or None when the timeout passed
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def pending(self) -> int:
+        """Number of queued events."""
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        """Stop receiving events."""
+        if not self.closed:
+            self.closed = True
+            self.bus.unsubscribe(self)
+
+
+class GameEventBus:
+    """
+    Interface of the game event pub/sub layer.
+
+    ``publish`` may be called from any thread and must not block;
+    ``subscribe`` is called from the consumer's event loop.
+    """
+
+    def publish(self, session_id: str, event: Dict[str, Any]) -> int:
+        """Send an event to every subscriber of a session; returns the number of subscribers."""
+        raise NotImplementedError
+
+    def has_subscribers(self, session_id: str) -> bool:
+        """Whether anyone listens to a session (lets publishers skip building events)."""
+        raise NotImplementedError
+
+    def subscribe(self, session_id: str) -> Subscription:
+        """Subscribe the running event loop to a session's events."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription."""
+        raise NotImplementedError
+
+    def record_overflow(self) -> None:
+        """Count a subscriber whose queue overflowed."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Return bus counters."""
+        return {}
+
+
+class InMemoryEventBus(GameEventBus):
+    """In-process event bus: fans events out to the subscribers of this process."""
+
+    def __init__(self, enabled: bool = GAME_EVENTS_ENABLED,
+                 max_queue: int = GAME_EVENTS_SUBSCRIBER_QUEUE_SIZE):
+        """
+        Initialize the bus.
+
+        Args:
+            enabled: Whether events are published at all
+            max_queue: Per-subscriber queue size
+        """
+        self.enabled = enabled
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    def publish(self, session_id: str, event: Dict[str, Any]) -> int:
+        if not self.enabled:
+            return 0
+        with self._lock:
+            subscribers = list(self._subscribers.get(session_id, ()))
+            self.published += 1
+        if not subscribers:
+            return 0
+
+        message = json_backend.dumps(event)
+        delivered = 0
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+                delivered += 1
+            except RuntimeError:
+                # The consumer's loop is closed; the connection is gone
+                subscription.close()
+        with self._lock:
+            self.delivered += delivered
+        return delivered
+
+    def has_subscribers(self, session_id: str) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            return bool(self._subscribers.get(session_id))
+
+    def subscribe(self, session_id: str) -> Subscription:
+        subscription = Subscription(self, session_id, self.max_queue, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(session_id, set()).add(subscription)
+        logger.debug(f"New event subscriber for session {session_id}")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.session_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.session_id]
+
+    def record_overflow(self) -> None:
+        with self._lock:
+            self.overflows += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sessions": len(self._subscribers),
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+                "published": self.published,
+                "delivered": self.delivered,
+                "overflows": self.overflows,
+            }
+
+
+_game_event_bus: Optional[GameEventBus] = None
+_game_event_bus_lock = threading.Lock()
+
+
+def get_game_event_bus() -> GameEventBus:
+    """Return the process-wide game event bus."""
+    global _game_event_bus
+    if _game_event_bus is None:
+        with _game_event_bus_lock:
+            if _game_event_bus is None:
+                _game_event_bus = InMemoryEventBus()
+    return _game_event_bus
+
+
+def set_game_event_bus(bus: GameEventBus) -> None:
+    """Replace the process-wide game event bus (e.g. with a broker-backed implementation)."""
+    global _game_event_bus
+    with _game_event_bus_lock:
+        _game_event_bus = bus
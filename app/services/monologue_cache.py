@@ -0,0 +1,157 @@
+"""
+角色独白缓存
+
+独白工作流的输入只有剧本、角色、幕数和模型，同一剧本的每一桌对局都会重复生成
+相同的独白。本模块提供按 (script_id, char_id, act_num, model_name, 工作流版本)
+缓存独白文本的 LRU/TTL 缓存，默认关闭，通过 MONOLOGUE_CACHE_ENABLED 开启。
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import (
+    MONOLOGUE_CACHE_ENABLED,
+    MONOLOGUE_CACHE_SIZE,
+    MONOLOGUE_CACHE_TTL_SECONDS,
+    DIFY_MONOLOGUE_WORKFLOW_VERSION,
+)
+
+logger = logging.getLogger(__name__)
+
+MonologueKey = Tuple[str, str, int, str, str]
+
+
+class MonologueCache:
+    """
+    Bounded LRU/TTL cache of generated monologue texts.
+
+    Only successful generations should be stored; fallback messages
+    produced on errors must never be cached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = MONOLOGUE_CACHE_SIZE,
+        ttl_seconds: float = MONOLOGUE_CACHE_TTL_SECONDS,
+        enabled: bool = MONOLOGUE_CACHE_ENABLED,
+        workflow_version: str = DIFY_MONOLOGUE_WORKFLOW_VERSION,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of monologues kept
+            ttl_seconds: Seconds an entry stays valid; 0 or less means no expiry
+            enabled: Whether the cache is used at all
+            workflow_version: Monologue workflow version included in every key
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and maxsize > 0
+        self.workflow_version = workflow_version
+        self._entries: "OrderedDict[MonologueKey, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, script_id: str, char_id: str, act_num: int, model_name: str) -> MonologueKey:
+        """Build the cache key for a monologue request."""
+        return (str(script_id), char_id.strip(), int(act_num), model_name or "gpt-3.5-turbo", self.workflow_version)
+
+    def get(self, script_id: str, char_id: str, act_num: int, model_name: str) -> Optional[str]:
+        """
+        Return the cached monologue, if any.
+
+        Returns:
+            Monologue text if cached and fresh, None otherwise
+        """
+        if not self.enabled:
+            return None
+
+        key = self.make_key(script_id, char_id, act_num, model_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, text = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def contains(self, script_id: str, char_id: str, act_num: int, model_name: str) -> bool:
+        """Whether a fresh entry exists, without touching the counters or LRU order."""
+        if not self.enabled:
+            return False
+        key = self.make_key(script_id, char_id, act_num, model_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (
+                self.ttl_seconds <= 0 or time.monotonic() - entry[0] <= self.ttl_seconds
+            )
+
+    def put(self, script_id: str, char_id: str, act_num: int, model_name: str, text: str) -> None:
+        """Store a successfully generated monologue."""
+        if not self.enabled or not text or not text.strip():
+            return
+
+        key = self.make_key(script_id, char_id, act_num, model_name)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_script(self, script_id: str) -> int:
+        """Drop every cached monologue of a script; returns the number removed."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == str(script_id)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "workflow_version": self.workflow_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_monologue_cache: Optional[MonologueCache] = None
+
+
+def get_monologue_cache() -> MonologueCache:
+    """Return the process-wide monologue cache."""
+    global _monologue_cache
+    if _monologue_cache is None:
+        _monologue_cache = MonologueCache()
+    return _monologue_cache
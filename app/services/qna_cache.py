@@ -0,0 +1,330 @@
+"""
+问答答案缓存
+
+不同对局的玩家经常向同一角色提出几乎相同的问题（如“你昨晚在哪里？”）。
+本模块按 (script_id, char_id, act_num, model_name) 划分作用域缓存答案：
+- 先用规范化文本的哈希做精确匹配
+- 可选地再用本地向量 + NumPy 余弦相似度索引匹配相近的问题
+
+默认关闭，通过 QNA_CACHE_ENABLED 开启；可按剧本关闭。
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import (
+    QNA_CACHE_ENABLED,
+    QNA_CACHE_SIZE,
+    QNA_CACHE_TTL_SECONDS,
+    QNA_CACHE_BACKEND,
+    QNA_CACHE_SIMILARITY_THRESHOLD,
+    QNA_CACHE_DISABLED_SCRIPTS,
+    DIFY_QNA_WORKFLOW_VERSION,
+)
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅 embedding 后端需要
+    np = None
+
+logger = logging.getLogger(__name__)
+
+QnAScope = Tuple[str, str, int, str, str]
+QnAKey = Tuple[QnAScope, str]
+
+# 规范化时去除的空白与标点（含全角标点）
+_STRIP_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_question(question: str) -> str:
+    """
+    规范化问题文本：全角转半角、统一小写、去除空白与标点
+
+    "你昨晚在哪里？" 与 "你昨晚 在哪里?" 规范化后相同。
+    """
+    text = unicodedata.normalize("NFKC", question or "").lower()
+    return _STRIP_PATTERN.sub("", text)
+
+
+class HashingEmbedder:
+    """
+    Dependency-free local text embedder.
+
+    Hashes character n-grams of the normalized question into a fixed-size
+    vector, which is enough to match paraphrases that share most of their
+    wording. Any callable ``str -> numpy.ndarray`` can be used instead.
+    """
+
+    def __init__(self, dim: int = 512, ngram_sizes: Iterable[int] = (1, 2)):
+        self.dim = dim
+        self.ngram_sizes = tuple(ngram_sizes)
+
+    def __call__(self, text: str) -> "np.ndarray":
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for size in self.ngram_sizes:
+            for start in range(len(text) - size + 1):
+                digest = hashlib.blake2b(text[start:start + size].encode("utf-8"), digest_size=8).digest()
+                vector[int.from_bytes(digest, "little") % self.dim] += 1.0
+        return vector
+
+
+class NumpyCosineIndex:
+    """
+    Per-scope cosine-similarity index over question embeddings.
+
+    Vectors are L2-normalized on insert, so a search is one matrix-vector
+    product per scope.
+    """
+
+    def __init__(self, embed: Optional[Callable[[str], Any]] = None, threshold: float = QNA_CACHE_SIMILARITY_THRESHOLD):
+        """
+        Initialize the index.
+
+        Args:
+            embed: Text embedding function; defaults to HashingEmbedder
+            threshold: Minimum cosine similarity counted as a match
+        """
+        if np is None:
+            raise ImportError("numpy is required for the embedding Q&A cache backend")
+        self.embed = embed or HashingEmbedder()
+        self.threshold = threshold
+        self._keys: Dict[QnAScope, List[str]] = {}
+        self._matrices: Dict[QnAScope, "np.ndarray"] = {}
+
+    def _unit_vector(self, text: str) -> Optional["np.ndarray"]:
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def add(self, scope: QnAScope, key: str, text: str) -> None:
+        """Index ``text`` under ``key`` within a scope."""
+        vector = self._unit_vector(text)
+        if vector is None:
+            return
+        self.remove(scope, key)
+        keys = self._keys.setdefault(scope, [])
+        keys.append(key)
+        matrix = self._matrices.get(scope)
+        self._matrices[scope] = vector[None, :] if matrix is None else np.vstack([matrix, vector])
+
+    def remove(self, scope: QnAScope, key: str) -> None:
+        """Drop ``key`` from a scope, if indexed."""
+        keys = self._keys.get(scope)
+        if not keys or key not in keys:
+            return
+        row = keys.index(key)
+        keys.pop(row)
+        if keys:
+            self._matrices[scope] = np.delete(self._matrices[scope], row, axis=0)
+        else:
+            del self._keys[scope]
+            del self._matrices[scope]
+
+    def search(self, scope: QnAScope, text: str) -> Optional[Tuple[str, float]]:
+        """Return ``(key, similarity)`` of the closest question above the threshold."""
+        matrix = self._matrices.get(scope)
+        if matrix is None:
+            return None
+        vector = self._unit_vector(text)
+        if vector is None:
+            return None
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold:
+            return None
+        return self._keys[scope][best], score
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._matrices.clear()
+
+
+class QnACache:
+    """
+    Bounded LRU/TTL cache of Q&A answers with pluggable similarity lookup.
+
+    Lookups first try the hash of the normalized question; if that misses
+    and a semantic index is configured, the closest earlier question in the
+    same scope is used when it is similar enough.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = QNA_CACHE_SIZE,
+        ttl_seconds: float = QNA_CACHE_TTL_SECONDS,
+        enabled: bool = QNA_CACHE_ENABLED,
+        semantic_index: Optional[NumpyCosineIndex] = None,
+        disabled_scripts: Optional[Iterable[str]] = None,
+        workflow_version: str = DIFY_QNA_WORKFLOW_VERSION,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of answers kept
+            ttl_seconds: Seconds an entry stays valid; 0 or less means no expiry
+            enabled: Whether the cache is used at all
+            semantic_index: Optional similarity index used after a hash miss
+            disabled_scripts: Script IDs that never use the cache
+            workflow_version: Q&A workflow version included in every scope
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and maxsize > 0
+        self.semantic_index = semantic_index
+        self.disabled_scripts: Set[str] = set(disabled_scripts or ())
+        self.workflow_version = workflow_version
+        self._entries: "OrderedDict[QnAKey, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def is_enabled_for(self, script_id: Optional[str]) -> bool:
+        """Whether answers for a script may be cached."""
+        return self.enabled and script_id is not None and str(script_id) not in self.disabled_scripts
+
+    def disable_script(self, script_id: str) -> None:
+        """Opt a script out of the cache and drop its answers."""
+        with self._lock:
+            self.disabled_scripts.add(str(script_id))
+            for key in [key for key in self._entries if key[0][0] == str(script_id)]:
+                self._drop(key)
+
+    def enable_script(self, script_id: str) -> None:
+        """Undo disable_script."""
+        with self._lock:
+            self.disabled_scripts.discard(str(script_id))
+
+    def make_scope(self, script_id: str, char_id: str, act_num: int, model_name: str) -> QnAScope:
+        return (str(script_id), char_id.strip(), int(act_num), model_name or "gpt-3.5-turbo", self.workflow_version)
+
+    @staticmethod
+    def _question_key(question: str) -> str:
+        return hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+
+    def _drop(self, key: QnAKey) -> None:
+        self._entries.pop(key, None)
+        if self.semantic_index is not None:
+            self.semantic_index.remove(key[0], key[1])
+
+    def _fresh(self, key: QnAKey) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, answer = entry
+        if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def get(self, script_id: str, char_id: str, act_num: int, model_name: str, question: str) -> Optional[str]:
+        """
+        Return a cached answer for the question, or a near-identical one.
+
+        Returns:
+            Answer text if found, None otherwise
+        """
+        if not self.is_enabled_for(script_id) or not normalize_question(question):
+            return None
+
+        scope = self.make_scope(script_id, char_id, act_num, model_name)
+        with self._lock:
+            answer = self._fresh((scope, self._question_key(question)))
+            if answer is not None:
+                self.exact_hits += 1
+                return answer
+
+            if self.semantic_index is not None:
+                match = self.semantic_index.search(scope, normalize_question(question))
+                if match is not None:
+                    answer = self._fresh((scope, match[0]))
+                    if answer is not None:
+                        self.semantic_hits += 1
+                        logger.debug(f"Semantic Q&A cache hit (similarity {match[1]:.3f})")
+                        return answer
+
+            self.misses += 1
+            return None
+
+    def put(self, script_id: str, char_id: str, act_num: int, model_name: str, question: str, answer: str) -> None:
+        """Store a successfully generated answer."""
+        normalized = normalize_question(question)
+        if not self.is_enabled_for(script_id) or not normalized or not answer or not answer.strip():
+            return
+
+        scope = self.make_scope(script_id, char_id, act_num, model_name)
+        key = (scope, self._question_key(question))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), answer)
+            self._entries.move_to_end(key)
+            if self.semantic_index is not None:
+                self.semantic_index.add(scope, key[1], normalized)
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                if self.semantic_index is not None:
+                    self.semantic_index.remove(evicted[0], evicted[1])
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            if self.semantic_index is not None:
+                self.semantic_index.clear()
+            self.exact_hits = 0
+            self.semantic_hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and occupancy."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "backend": "embedding" if self.semantic_index is not None else "hash",
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "disabled_scripts": sorted(self.disabled_scripts),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+def _build_semantic_index() -> Optional[NumpyCosineIndex]:
+    """Create the configured similarity backend (None for plain hashing)."""
+    if QNA_CACHE_BACKEND != "embedding":
+        return None
+    if np is None:
+        logger.warning("QNA_CACHE_BACKEND=embedding requires numpy; falling back to hash matching")
+        return None
+    return NumpyCosineIndex(threshold=QNA_CACHE_SIMILARITY_THRESHOLD)
+
+
+_qna_cache: Optional[QnACache] = None
+
+
+def get_qna_cache() -> QnACache:
+    """Return the process-wide Q&A answer cache."""
+    global _qna_cache
+    if _qna_cache is None:
+        _qna_cache = QnACache(
+            semantic_index=_build_semantic_index(),
+            disabled_scripts=QNA_CACHE_DISABLED_SCRIPTS,
+        )
+    return _qna_cache
@@ -0,0 +1,147 @@
+"""
+SQLite 并发读写基准测试
+
+对比默认配置（回滚日志、默认 PRAGMA）与 app.core.database_bootstrap 的配置
+（WAL、synchronous=NORMAL、busy_timeout、mmap、cache_size、连接池）：
+多个写线程通过 StateManager 反复保存各自会话的游戏状态，同时读线程查询
+状态版本号（与 /status 的 304 判断相同的查询），统计写吞吐量与读延迟。
+
+运行方式:
+    python benchmarks/bench_sqlite_concurrency.py [--writers 8] [--readers 4] [--saves 50]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.database_bootstrap import create_database_engine  # noqa: E402
+from app.core.json_backend import dumps, loads  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.langchain.state.cache import GameStateCache  # noqa: E402
+from app.langchain.state.manager import StateManager  # noqa: E402
+from app.langchain.state.models import GameState, PlayerState  # noqa: E402
+from app.models import database_models  # noqa: E402,F401  (注册数据表)
+
+
+def default_engine(url: str):
+    """重构前 app.database 的引擎配置"""
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        json_serializer=dumps,
+        json_deserializer=loads
+    )
+
+
+def build_state(session_id: str) -> GameState:
+    state = GameState(game_id="bench_game", script_id="1", session_id=session_id)
+    for i in range(6):
+        state.players[f"player_{i}"] = PlayerState(player_id=f"player_{i}", notes="玩家笔记" * 20)
+    return state
+
+
+def writer(session_factory, session_id: str, saves: int, errors: list) -> None:
+    """反复修改并保存同一个会话"""
+    db = session_factory()
+    manager = StateManager(db, cache=GameStateCache(maxsize=0))
+    state = build_state(session_id)
+    try:
+        for i in range(saves):
+            state.add_public_log_entry("system", f"第{i}条日志" * 5)
+            if not manager.save_game_state(state):
+                errors.append(session_id)
+    finally:
+        db.close()
+
+
+def reader(session_factory, session_ids: list, stop: threading.Event, latencies: list) -> None:
+    """持续查询会话版本号，记录每次查询耗时"""
+    db = session_factory()
+    manager = StateManager(db, cache=GameStateCache(maxsize=0))
+    i = 0
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            manager.get_game_state_version(session_ids[i % len(session_ids)])
+            db.commit()
+            latencies.append((time.perf_counter() - start) * 1000)
+            i += 1
+    finally:
+        db.close()
+
+
+def run(engine, writers: int, readers: int, saves: int) -> dict:
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session_ids = [f"bench_session_{i}" for i in range(writers)]
+    errors: list = []
+    latencies: list = []
+    stop = threading.Event()
+
+    reader_threads = [
+        threading.Thread(target=reader, args=(session_factory, session_ids, stop, latencies))
+        for _ in range(readers)
+    ]
+    writer_threads = [
+        threading.Thread(target=writer, args=(session_factory, session_id, saves, errors))
+        for session_id in session_ids
+    ]
+    for thread in reader_threads:
+        thread.start()
+    start = time.perf_counter()
+    for thread in writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in reader_threads:
+        thread.join()
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        "writes_per_second": writers * saves / elapsed,
+        "failed_saves": len(errors),
+        "reads": len(latencies),
+        "read_p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "read_p99_ms": latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0,
+        "read_max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite concurrency benchmark")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--saves", type=int, default=50)
+    args = parser.parse_args()
+
+    # StateManager 每次保存都会输出 info 日志
+    logging.disable(logging.WARNING)
+
+    print(f"writers={args.writers} readers={args.readers} saves/writer={args.saves}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, factory in (("default", default_engine), ("tuned", create_database_engine)):
+            url = f"sqlite:///{os.path.join(directory, name + '.db')}"
+            result = run(factory(url), args.writers, args.readers, args.saves)
+            print(
+                f"{name:<8} {result['writes_per_second']:8.1f} writes/s  "
+                f"failed={result['failed_saves']:<4} reads={result['reads']:<6} "
+                f"read p50={result['read_p50_ms']:.2f}ms p99={result['read_p99_ms']:.2f}ms "
+                f"max={result['read_max_ms']:.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Dify 流式响应解析基准测试
+
+对比旧的逐行解析（iter_lines + 每行 json 解析 + 列表拼接，workflow_finished 输出会重复累积）
+与新的增量 SSE 解析器（SSEParser + DifyStreamCollector）。
+
+默认使用合成的 Dify 工作流流（workflow_started / node_* / text_chunk / workflow_finished），
+也可以用 --file 回放录制的原始响应体（例如 curl -N 保存的输出）。
+
+运行方式:
+    python benchmarks/bench_sse_parser.py [--chunks 400] [--chunk-size 512] [--rounds 200]
+    python benchmarks/bench_sse_parser.py --file recorded_stream.txt
+"""
+
+import argparse
+import codecs
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.dify_stream import DifyStreamCollector, iter_sse_events  # noqa: E402
+
+
+def build_stream(chunks: int) -> bytes:
+    """构造一个与 Dify 工作流响应结构相同的 SSE 响应体"""
+    events = [
+        {"event": "workflow_started", "workflow_run_id": "run", "data": {"id": "run", "inputs": {"query": "你昨晚在哪里？"}}},
+        {"event": "node_started", "data": {"id": "node-1", "node_type": "llm", "title": "LLM"}},
+    ]
+    answer = []
+    for i in range(chunks):
+        text = f"第{i}段回答，"
+        answer.append(text)
+        events.append({"event": "text_chunk", "workflow_run_id": "run", "data": {"text": text, "from_variable_selector": ["llm", "text"]}})
+    events.append({"event": "node_finished", "data": {"id": "node-1", "outputs": {"text": "".join(answer)}}})
+    events.append({"event": "workflow_finished", "data": {"id": "run", "outputs": {"answer": "".join(answer)}}})
+    body = "".join(f"data: {json.dumps(event, ensure_ascii=False)}\n\n" for event in events)
+    return body.encode("utf-8")
+
+
+def split(payload: bytes, size: int):
+    """按固定大小切分，模拟网络分块（会切断行与 UTF-8 字符）"""
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+
+# ---- 旧路径（重构前 _parse_streaming_response 的实现） ----
+
+def _legacy_iter_lines(chunks):
+    """requests.iter_lines(decode_unicode=True) 的等价实现"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = None
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if pending is not None:
+            text = pending + text
+        lines = text.splitlines()
+        if lines and text and lines[-1] and text[-1] == lines[-1][-1]:
+            pending = lines.pop()
+        else:
+            pending = None
+        yield from lines
+    if pending is not None:
+        yield pending
+
+
+def legacy_parse(chunks) -> str:
+    parts = []
+    for line in _legacy_iter_lines(chunks):
+        if not line or not line.startswith('data: '):
+            continue
+        json_string = line[len('data: '):]
+        if json_string.strip() == '[DONE]':
+            break
+        try:
+            data = json.loads(json_string)
+        except json.JSONDecodeError:
+            continue
+        if data.get('event') == 'text_chunk':
+            parts.append(data['data']['text'])
+        elif data.get('event') == 'workflow_finished':
+            for value in data['data']['outputs'].values():
+                if isinstance(value, str) and value.strip():
+                    parts.append(value)
+    return ''.join(parts).strip()
+
+
+def incremental_parse(chunks) -> str:
+    collector = DifyStreamCollector()
+    for event in iter_sse_events(chunks):
+        collector.feed(event)
+        if collector.finished:
+            break
+    return collector.result().strip()
+
+
+def timeit(func, chunks, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(chunks)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def peak_memory(func, chunks) -> int:
+    tracemalloc.start()
+    func(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dify SSE parser benchmark")
+    parser.add_argument("--file", help="recorded raw Dify response body to replay")
+    parser.add_argument("--chunks", type=int, default=400, help="text_chunk events in the synthetic stream")
+    parser.add_argument("--chunk-size", type=int, default=512, help="network chunk size in bytes")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            payload = f.read()
+    else:
+        payload = build_stream(args.chunks)
+    chunks = split(payload, args.chunk_size)
+
+    legacy_result = legacy_parse(chunks)
+    new_result = incremental_parse(chunks)
+
+    print(f"stream={len(payload)}B network_chunks={len(chunks)} rounds={args.rounds}")
+    print(f"answer length: legacy={len(legacy_result)} incremental={len(new_result)}"
+          f"{'  (legacy duplicates workflow_finished outputs)' if len(legacy_result) != len(new_result) else ''}")
+    for name, func in (("legacy line parser", legacy_parse), ("incremental SSE parser", incremental_parse)):
+        ms = timeit(func, chunks, args.rounds)
+        print(f"{name:<24} {ms:8.3f} ms/op  peak {peak_memory(func, chunks) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+游戏状态存储后端基准测试
+
+对比 sqlalchemy（SQLite 文件，WAL）、memory 与 append_log 三种后端：
+多个线程各自反复修改并保存一个会话（每次追加一条日志），统计保存吞吐量，
+随后统计不经过状态缓存的完整加载（含历史记录）耗时。
+
+运行方式:
+    python benchmarks/bench_state_backends.py [--sessions 8] [--saves 100] [--history 500]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.database_bootstrap import create_database_engine  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.langchain.state.backends import (  # noqa: E402
+    AppendLogStateBackend,
+    InMemoryStateBackend,
+    SQLAlchemyStateBackend,
+)
+from app.langchain.state.cache import GameStateCache  # noqa: E402
+from app.langchain.state.manager import StateManager  # noqa: E402
+from app.langchain.state.models import GameState, PlayerState  # noqa: E402
+from app.models import database_models  # noqa: E402,F401  (注册数据表)
+
+
+def build_state(session_id: str, history: int) -> GameState:
+    state = GameState(game_id="bench_game", script_id="1", session_id=session_id)
+    for i in range(6):
+        state.players[f"player_{i}"] = PlayerState(player_id=f"player_{i}", notes="玩家笔记" * 20)
+    for i in range(history):
+        state.add_public_log_entry("monologue", f"第{i}条独白内容" * 5)
+    return state
+
+
+def run(backend_factory, sessions: int, saves: int, history: int, load_rounds: int) -> dict:
+    """backend_factory() 返回一个后端；SQLAlchemy 后端每个线程一个（各自的数据库会话）"""
+    session_ids = [f"bench_session_{i}" for i in range(sessions)]
+
+    def writer(session_id: str) -> None:
+        manager = StateManager(cache=GameStateCache(maxsize=0), backend=backend_factory())
+        state = build_state(session_id, history)
+        manager.save_game_state(state)
+        for i in range(saves):
+            state.add_public_log_entry("system", f"第{i}条日志" * 5)
+            manager.save_game_state(state)
+
+    threads = [threading.Thread(target=writer, args=(session_id,)) for session_id in session_ids]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    save_seconds = time.perf_counter() - start
+
+    manager = StateManager(cache=GameStateCache(maxsize=0), backend=backend_factory())
+    start = time.perf_counter()
+    for i in range(load_rounds):
+        state = manager.load_game_state(session_ids[i % sessions])
+        state.load_history()
+    load_ms = (time.perf_counter() - start) / load_rounds * 1000
+
+    return {"saves_per_second": sessions * saves / save_seconds, "load_ms": load_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Game state backend benchmark")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--saves", type=int, default=100)
+    parser.add_argument("--history", type=int, default=500, help="每个会话的初始日志条数")
+    parser.add_argument("--load-rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    # StateManager 每次保存都会输出 info 日志
+    logging.disable(logging.WARNING)
+
+    print(f"sessions={args.sessions} saves/session={args.saves} history={args.history}")
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        memory_backend = InMemoryStateBackend()
+        log_backend = AppendLogStateBackend(os.path.join(directory, "logs"))
+
+        backends = (
+            ("sqlalchemy", lambda: SQLAlchemyStateBackend(session_factory())),
+            ("memory", lambda: memory_backend),
+            ("append_log", lambda: log_backend),
+        )
+        for name, factory in backends:
+            result = run(factory, args.sessions, args.saves, args.history, args.load_rounds)
+            print(f"{name:<12} {result['saves_per_second']:10.1f} saves/s   full load {result['load_ms']:8.3f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
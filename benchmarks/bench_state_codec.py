@@ -0,0 +1,142 @@
+"""
+GameState 编解码基准测试
+
+对比旧的持久化路径（.dict() + 递归 datetime 转换 + 标准库 json）
+与新的编解码器（model_dump(mode="json") + orjson + model_validate_json）。
+
+运行方式:
+    python benchmarks/bench_state_codec.py [--players 8] [--entries 500] [--rounds 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.langchain.state.codec import (  # noqa: E402
+    encode_game_state_json,
+    decode_game_state_json,
+)
+from app.langchain.state.models import (  # noqa: E402
+    GameState,
+    PlayerState,
+    CharacterState,
+    PublicLogEntry,
+    QnAEntry,
+)
+
+
+def build_state(players: int, entries: int) -> GameState:
+    """构造一个包含大量历史记录的游戏状态"""
+    state = GameState(game_id="bench_game", script_id="1", session_id="bench_session")
+    for i in range(players):
+        player_id = f"player_{i}"
+        character_id = f"Character_{i}"
+        state.players[player_id] = PlayerState(
+            player_id=player_id,
+            character_id=character_id,
+            notes=f"玩家笔记{i}" * 20
+        )
+        state.characters[character_id] = CharacterState(
+            character_id=character_id,
+            name=f"角色{i}",
+            avatar=f"/static/avatars/{i}.png",
+            description="很长的角色介绍" * 20
+        )
+    for i in range(entries):
+        state.public_log.append(PublicLogEntry(
+            entry_type="monologue",
+            content=f"第{i}条独白内容" * 10,
+            act_number=1 + i % 3
+        ))
+        state.qna_history.append(QnAEntry(
+            questioner_id=f"player_{i % max(players, 1)}",
+            target_character_id=f"Character_{(i + 1) % max(players, 1)}",
+            question=f"问题{i}",
+            answer=f"回答{i}" * 10,
+            act_number=1 + i % 3
+        ))
+    return state
+
+
+# ---- 旧路径（重构前 StateManager 的实现） ----
+
+def _convert_datetimes_recursive(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, dict):
+        return {key: _convert_datetimes_recursive(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_convert_datetimes_recursive(item) for item in obj]
+    return obj
+
+
+def _convert_iso_strings_recursive(obj):
+    if isinstance(obj, str):
+        try:
+            if 'T' in obj and (obj.endswith('Z') or '+' in obj[-6:] or obj.endswith('+00:00')):
+                return datetime.fromisoformat(obj.replace('Z', '+00:00'))
+        except ValueError:
+            pass
+        return obj
+    if isinstance(obj, dict):
+        return {key: _convert_iso_strings_recursive(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_convert_iso_strings_recursive(item) for item in obj]
+    return obj
+
+
+def legacy_encode(state: GameState) -> str:
+    return json.dumps(_convert_datetimes_recursive(state.dict()))
+
+
+def legacy_decode(data: str) -> GameState:
+    return GameState(**_convert_iso_strings_recursive(json.loads(data)))
+
+
+def full_encode(state: GameState) -> bytes:
+    """新编解码器，但包含历史字段，与旧路径对比同等数据量"""
+    import orjson
+    return orjson.dumps(state.model_dump(mode="json"))
+
+
+def timeit(func, arg, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(arg)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GameState codec benchmark")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    state = build_state(args.players, args.entries)
+    legacy_blob = legacy_encode(state)
+    full_blob = full_encode(state)
+    snapshot_blob = encode_game_state_json(state)
+
+    results = [
+        ("legacy encode (full state)", timeit(legacy_encode, state, args.rounds)),
+        ("codec encode (full state)", timeit(full_encode, state, args.rounds)),
+        ("codec encode (snapshot)", timeit(encode_game_state_json, state, args.rounds)),
+        ("legacy decode (full state)", timeit(legacy_decode, legacy_blob, args.rounds)),
+        ("codec decode (full state)", timeit(decode_game_state_json, full_blob, args.rounds)),
+        ("codec decode (snapshot)", timeit(decode_game_state_json, snapshot_blob, args.rounds)),
+    ]
+
+    print(f"players={args.players} entries={args.entries} rounds={args.rounds}")
+    print(f"blob size: legacy={len(legacy_blob)}B full={len(full_blob)}B snapshot={len(snapshot_blob)}B")
+    for name, ms in results:
+        print(f"{name:<30} {ms:8.3f} ms/op")
+
+
+if __name__ == "__main__":
+    main()
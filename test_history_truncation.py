@@ -17,7 +17,8 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-from app.services.dify_service import call_qna_workflow, _truncate_history_smartly
+from app.core.config import DIFY_QNA_HISTORY_MAX_CHARS
+from app.services.dify_service import call_qna_workflow, _clip_history
 
 def test_history_truncation():
     """Test that long history is properly truncated."""
@@ -39,8 +40,8 @@ def test_history_truncation():
     
     print(f"Original history length: {len(long_history)} characters")
     
-    # Test the smart truncation function
-    truncated = _truncate_history_smartly(long_history, "朱大强")
+    # Test the truncation function (keeps the newest lines within the Dify limit)
+    truncated = _clip_history(long_history, DIFY_QNA_HISTORY_MAX_CHARS)
     print(f"Truncated history length: {len(truncated)} characters")
     print(f"Truncated history preview: {truncated[:100]}...")
     
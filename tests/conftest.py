@@ -0,0 +1,19 @@
+"""
+Shared pytest fixtures.
+"""
+
+import pytest
+
+from app.services.dify_resilience import reset_resilience
+
+
+@pytest.fixture(autouse=True)
+def _fresh_dify_resilience():
+    """Start every test with closed circuits and an empty retry budget.
+
+    The breakers are process-wide, so a test that calls an unreachable Dify
+    would otherwise leave a circuit open for the tests that run after it.
+    """
+    reset_resilience()
+    yield
+    reset_resilience()
@@ -0,0 +1,215 @@
+"""
+Unit tests for per-session action serialization.
+
+Tests FIFO ordering, cross-session parallelism, wait timeouts and metrics
+of SessionActionQueue, and its use by GameEngine.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from unittest.mock import Mock, patch
+
+from app.langchain.engine import game_engine as game_engine_module
+from app.langchain.engine.action_queue import SessionActionQueue, ActionQueueTimeout
+from app.langchain.engine.game_engine import GameEngine, SESSION_BUSY_ERROR
+from app.langchain.state.models import GameState
+
+
+class TestSessionActionQueue:
+    """Test cases for SessionActionQueue."""
+
+    def test_same_session_runs_in_arrival_order(self):
+        """Test that actions of one session run one at a time, FIFO."""
+        queue = SessionActionQueue(wait_timeout=5)
+        order = []
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def action(index):
+            nonlocal active, peak
+            with queue.session_turn("s1"):
+                with lock:
+                    active += 1
+                    peak = max(peak, active)
+                order.append(index)
+                time.sleep(0.01)
+                with lock:
+                    active -= 1
+
+        threads = []
+        with queue.session_turn("s1"):
+            # Queue up waiters in a known order behind the current holder
+            for index in range(5):
+                thread = threading.Thread(target=action, args=(index,))
+                thread.start()
+                threads.append(thread)
+                while queue.depth("s1") < index + 2:
+                    time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+
+        assert order == [0, 1, 2, 3, 4]
+        assert peak == 1
+        assert queue.depth("s1") == 0
+
+    def test_different_sessions_run_in_parallel(self):
+        """Test that a busy session does not block another one."""
+        queue = SessionActionQueue(wait_timeout=5)
+        entered = threading.Event()
+
+        with queue.session_turn("s1"):
+            def other():
+                with queue.session_turn("s2"):
+                    entered.set()
+
+            thread = threading.Thread(target=other)
+            thread.start()
+            assert entered.wait(1)
+            thread.join()
+
+    def test_wait_timeout(self):
+        """Test that a waiter gives up after the timeout and leaves the queue intact."""
+        queue = SessionActionQueue(wait_timeout=5)
+
+        with queue.session_turn("s1"):
+            with pytest.raises(ActionQueueTimeout):
+                with queue.session_turn("s1", timeout=0.05):
+                    pass
+            assert queue.depth("s1") == 1
+
+        # The lane is usable again afterwards
+        with queue.session_turn("s1", timeout=0.1):
+            pass
+        assert queue.stats()["timeouts"] == 1
+        assert queue.stats()["active_sessions"] == 0
+
+    def test_stats_report_depth(self):
+        """Test that queue depth and waits show up in the metrics."""
+        queue = SessionActionQueue(wait_timeout=5)
+        released = threading.Event()
+
+        def waiter():
+            with queue.session_turn("s1"):
+                released.set()
+
+        with queue.session_turn("s1"):
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            while queue.depth("s1") < 2:
+                time.sleep(0.001)
+            stats = queue.stats()
+            assert stats["active_sessions"] == 1
+            assert stats["queued_actions_now"] == 1
+            assert stats["max_depth_now"] == 2
+        thread.join()
+
+        stats = queue.stats()
+        assert released.is_set()
+        assert stats["total_actions"] == 2
+        assert stats["queued_actions"] == 1
+        assert stats["peak_depth"] == 2
+
+    @pytest.mark.asyncio
+    async def test_async_turn_serializes_with_sync(self):
+        """Test that async holders share the same FIFO as sync ones."""
+        queue = SessionActionQueue(wait_timeout=5)
+        order = []
+
+        async def async_action(name):
+            async with queue.asession_turn("s1"):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(async_action("a"), async_action("b"))
+
+        assert sorted(order) == ["a", "b"]
+        assert queue.depth("s1") == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_async_waiter_releases_lane(self):
+        """Test that cancelling a queued async waiter does not leave the session busy."""
+        queue = SessionActionQueue(wait_timeout=5)
+        entered = []
+
+        async def waiter():
+            async with queue.asession_turn("s1"):
+                entered.append(True)
+
+        with queue.session_turn("s1"):
+            task = asyncio.create_task(waiter())
+            while queue.depth("s1") < 2:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        # The waiting thread gets the lane after the holder finished and hands it on
+        deadline = time.monotonic() + 2
+        while queue.depth("s1") and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert queue.depth("s1") == 0
+        assert not entered
+        async with queue.asession_turn("s1", timeout=0.5):
+            pass
+
+
+class TestEngineActionQueue:
+    """Test cases for GameEngine integration with the action queue."""
+
+    def setup_method(self):
+        self.game_engine = GameEngine(Mock())
+        self.game_engine.action_queue = SessionActionQueue(wait_timeout=0.05)
+        self.game_state = GameState(game_id="g", script_id="s", session_id="session_1")
+        self.game_engine.load_game = Mock(return_value=self.game_state)
+        self.game_engine.state_manager.save_game_state = Mock(return_value=True)
+
+    def test_busy_session_returns_error(self):
+        """Test that an action which cannot get its turn fails fast."""
+        with self.game_engine.action_queue.session_turn("session_1"):
+            result = self.game_engine.process_action("session_1", {
+                "action_type": "advance_phase", "target_phase": "qna"
+            })
+
+        assert result == {"error": SESSION_BUSY_ERROR}
+
+    def test_slow_ai_call_is_bounded(self):
+        """Test that a hung Dify call is abandoned after the deadline."""
+        release = threading.Event()
+        self.game_engine.monologue_tool._run = Mock(side_effect=lambda **kwargs: release.wait(5) and "太慢了")
+
+        with patch.object(game_engine_module, "DIFY_ACTION_TIMEOUT_SECONDS", 0.05):
+            result = self.game_engine.process_action("session_1", {
+                "action_type": "monologue", "character_id": "Butler"
+            })
+        release.set()
+
+        assert "timed out" in result["error"]
+        self.game_engine.state_manager.save_game_state.assert_not_called()
+        # The session's turn was released
+        assert self.game_engine.action_queue.depth("session_1") == 0
+        # The tool got the deadline, so the Dify call itself stops too
+        deadline = self.game_engine.monologue_tool._run.call_args.kwargs["deadline"]
+        assert deadline <= time.monotonic()
+
+    @pytest.mark.asyncio
+    async def test_stream_times_out(self):
+        """Test that a stalled stream ends with an error event."""
+        async def stalled_chunks(**kwargs):
+            yield "开始"
+            await asyncio.sleep(5)
+            yield "永远不会到达"
+
+        with patch.object(type(self.game_engine.monologue_tool), "astream_chunks", side_effect=stalled_chunks), \
+             patch.object(game_engine_module, "DIFY_ACTION_TIMEOUT_SECONDS", 0.05):
+            events = [event async for event in self.game_engine.astream_action(
+                "session_1", {"action_type": "monologue", "character_id": "Butler"}
+            )]
+
+        assert events[0] == {"event": "chunk", "text": "开始"}
+        assert events[-1]["event"] == "error"
+        assert "timed out" in events[-1]["error"]
+        assert self.game_engine.action_queue.depth("session_1") == 0
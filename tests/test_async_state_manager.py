@@ -0,0 +1,109 @@
+"""
+Tests for the async StateManager methods.
+
+Verifies that the ``a``-prefixed methods save, load, summarize and delete
+game states through an aiosqlite AsyncSession, and that async loads come
+back with their history already loaded.
+"""
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.langchain.state.cache import GameStateCache
+from app.langchain.state.manager import StateManager
+from app.langchain.state.models import GameState, PlayerState
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    """File database with all tables (aiosqlite cannot share an in-memory database)."""
+    path = tmp_path / "async_state.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return path
+
+
+@pytest_asyncio.fixture
+async def async_db(database_path):
+    """AsyncSession bound to the test database."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    async with session_factory() as session:
+        yield session
+    await engine.dispose()
+
+
+def _manager(async_db) -> StateManager:
+    """StateManager with caching disabled so every load hits the database."""
+    return StateManager(async_db_session=async_db, cache=GameStateCache(maxsize=0))
+
+
+def _new_state() -> GameState:
+    state = GameState(game_id="game_1", script_id="script_1", session_id="session_1")
+    state.players["player1"] = PlayerState(player_id="player1")
+    state.add_public_log_entry("system", "游戏开始")
+    state.add_qna_entry("player1", "Butler", "你昨晚在哪？", "在书房。")
+    return state
+
+
+class TestAsyncStateManager:
+    """Test cases for the async persistence methods."""
+
+    @pytest.mark.asyncio
+    async def test_save_and_load_round_trip(self, async_db):
+        """Test that an async save can be read back by an async load."""
+        manager = _manager(async_db)
+
+        assert await manager.asave_game_state(_new_state()) is True
+        loaded = await manager.aload_game_state("session_1")
+
+        assert loaded.game_id == "game_1"
+        assert "player1" in loaded.players
+        assert loaded.version == 1
+        assert loaded.history_loaded
+        assert [entry.content for entry in loaded.public_log] == ["游戏开始"]
+        assert loaded.qna_history[0].answer == "在书房。"
+
+    @pytest.mark.asyncio
+    async def test_load_missing_session(self, async_db):
+        """Test that loading an unknown session returns None."""
+        assert await _manager(async_db).aload_game_state("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_summary_and_version(self, async_db):
+        """Test that the summary and version are read without loading the state."""
+        manager = _manager(async_db)
+        await manager.asave_game_state(_new_state())
+
+        summary = await manager.aget_game_state_summary("session_1")
+
+        assert summary["game_id"] == "game_1"
+        assert summary["player_count"] == 1
+        assert await manager.aget_game_state_version("session_1") == 1
+        assert await manager.aget_game_state_version("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_delete(self, async_db):
+        """Test that an async delete removes the session."""
+        manager = _manager(async_db)
+        await manager.asave_game_state(_new_state())
+
+        assert await manager.adelete_game_state("session_1") is True
+        assert await manager.aload_game_state("session_1") is None
+
+    @pytest.mark.asyncio
+    async def test_loaded_state_is_cached(self, async_db):
+        """Test that an async load fills the cache with the fully loaded state."""
+        cache = GameStateCache(maxsize=4)
+        await _manager(async_db).asave_game_state(_new_state())
+        manager = StateManager(async_db_session=async_db, cache=cache)
+
+        await manager.aload_game_state("session_1")
+
+        cached = cache.get("session_1")
+        assert cached is not None
+        assert len(cached.qna_history) == 1
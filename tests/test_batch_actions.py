@@ -0,0 +1,142 @@
+"""
+Unit tests for batch action processing.
+
+Tests GameEngine.process_actions_batch: up-front validation of Q&A limits
+across the batch, concurrent Dify calls, and a single state save.
+"""
+
+import threading
+
+from unittest.mock import Mock, patch
+
+from app.langchain.engine import game_engine as game_engine_module
+from app.langchain.engine.action_queue import SessionActionQueue
+from app.langchain.engine.game_engine import GameEngine
+from app.langchain.engine.monologue_prefetch import MonologuePrefetcher
+from app.langchain.state.models import GameState, GamePhase
+
+
+def _qna(character_id: str, question: str = "你昨晚在哪里？") -> dict:
+    return {
+        "action_type": "qna",
+        "character_id": character_id,
+        "question": question,
+        "questioner_id": "player1",
+        "user_id": "u1"
+    }
+
+
+class TestBatchActions:
+    """Test cases for GameEngine.process_actions_batch."""
+
+    def setup_method(self):
+        self.game_engine = GameEngine(Mock())
+        self.game_engine.action_queue = SessionActionQueue()
+        self.game_engine.monologue_prefetcher = MonologuePrefetcher(enabled=False)
+        self.game_state = GameState(
+            game_id="g", script_id="script_1", session_id="session_1",
+            current_phase=GamePhase.QNA, max_qna_per_character_per_act=2
+        )
+        self.game_engine.load_game = Mock(return_value=self.game_state)
+        self.game_engine.state_manager.save_game_state = Mock(return_value=True)
+
+    def test_questions_run_concurrently_with_one_save(self):
+        """Test that independent questions call Dify in parallel and save once."""
+        barrier = threading.Barrier(3, timeout=2)
+
+        def answer(char_id, **kwargs):
+            # Only completes if all three calls are in flight together
+            barrier.wait()
+            return f"{char_id}的回答"
+
+        self.game_engine.qna_tool._run = Mock(side_effect=answer)
+
+        result = self.game_engine.process_actions_batch("session_1", [
+            _qna("Butler"), _qna("Maid"), _qna("Gardener")
+        ])
+
+        assert result["success"] is True
+        assert result["succeeded"] == 3
+        assert [r["answer"] for r in result["results"]] == ["Butler的回答", "Maid的回答", "Gardener的回答"]
+        assert len(self.game_state.qna_history) == 3
+        self.game_engine.load_game.assert_called_once_with("session_1")
+        self.game_engine.state_manager.save_game_state.assert_called_once_with(self.game_state)
+
+    def test_limits_are_counted_across_the_batch(self):
+        """Test that questions beyond the per-act limit are rejected before any call."""
+        self.game_state.qna_counts = {"Butler": {"1": 1}}
+        self.game_engine.qna_tool._run = Mock(return_value="回答")
+
+        result = self.game_engine.process_actions_batch("session_1", [
+            _qna("Butler", "问题一"), _qna("Butler", "问题二"), _qna("Maid")
+        ])
+
+        assert "error" not in result["results"][0]
+        assert result["results"][1] == {"error": "已达到角色 Butler 在第1幕的提问上限"}
+        assert "error" not in result["results"][2]
+        assert self.game_engine.qna_tool._run.call_count == 2
+        assert result["failed"] == 1
+
+    def test_mixed_monologue_and_qna(self):
+        """Test that monologues can be batched with questions."""
+        self.game_engine.qna_tool._run = Mock(return_value="回答")
+        self.game_engine.monologue_tool._run = Mock(return_value="管家的独白")
+
+        result = self.game_engine.process_actions_batch("session_1", [
+            {"action_type": "monologue", "character_id": "Butler"},
+            _qna("Maid")
+        ])
+
+        assert result["results"][0]["monologue_sentences"] == ["管家的独白"]
+        assert result["results"][1]["answer"] == "回答"
+        self.game_engine.state_manager.save_game_state.assert_called_once()
+
+    def test_unsupported_action_type(self):
+        """Test that state-only actions are rejected per item."""
+        self.game_engine.qna_tool._run = Mock(return_value="回答")
+
+        result = self.game_engine.process_actions_batch("session_1", [
+            {"action_type": "advance_act"}, _qna("Maid")
+        ])
+
+        assert "not supported in a batch" in result["results"][0]["error"]
+        assert result["succeeded"] == 1
+
+    def test_nothing_valid_skips_save(self):
+        """Test that a batch without valid actions does not call Dify or save."""
+        self.game_engine.qna_tool._run = Mock()
+
+        result = self.game_engine.process_actions_batch("session_1", [
+            {"action_type": "qna", "character_id": "Butler"}
+        ])
+
+        assert result["success"] is False
+        self.game_engine.qna_tool._run.assert_not_called()
+        self.game_engine.state_manager.save_game_state.assert_not_called()
+
+    def test_slow_call_times_out_without_blocking_others(self):
+        """Test that one hung call fails alone after the shared deadline."""
+        release = threading.Event()
+
+        def answer(char_id, **kwargs):
+            if char_id == "Butler":
+                release.wait(5)
+            return "回答"
+
+        self.game_engine.qna_tool._run = Mock(side_effect=answer)
+
+        with patch.object(game_engine_module, "DIFY_ACTION_TIMEOUT_SECONDS", 0.1):
+            result = self.game_engine.process_actions_batch("session_1", [_qna("Butler"), _qna("Maid")])
+        release.set()
+
+        assert "timed out" in result["results"][0]["error"]
+        assert result["results"][1]["answer"] == "回答"
+        assert len(self.game_state.qna_history) == 1
+
+    def test_batch_size_limit(self):
+        """Test that oversized batches are rejected outright."""
+        with patch.object(game_engine_module, "BATCH_ACTION_MAX_SIZE", 2):
+            result = self.game_engine.process_actions_batch("session_1", [_qna("A"), _qna("B"), _qna("C")])
+
+        assert "maximum is 2" in result["error"]
+        self.game_engine.load_game.assert_not_called()
@@ -0,0 +1,129 @@
+"""
+Tests for the database engine bootstrap.
+
+Verifies the per-connection SQLite pragmas, the pool class chosen for file
+and in-memory databases, and that in WAL mode a write commits while a read
+transaction is open.
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from unittest.mock import patch
+
+from app.core import database_bootstrap
+from app.core.database_bootstrap import (
+    create_async_database_engine,
+    create_database_engine,
+    is_memory_database,
+    sqlite_pragmas,
+)
+
+
+def _pragma(connection, name):
+    return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+
+class TestSqlitePragmas:
+    """Test cases for the pragmas set on every connection."""
+
+    def test_file_database_pragmas(self, tmp_path):
+        """Test that a file database is opened in WAL mode with the configured pragmas."""
+        engine = create_database_engine(f"sqlite:///{tmp_path / 'game.db'}")
+
+        with engine.connect() as connection:
+            assert _pragma(connection, "journal_mode") == "wal"
+            assert _pragma(connection, "synchronous") == 1  # NORMAL
+            assert _pragma(connection, "busy_timeout") == database_bootstrap.SQLITE_BUSY_TIMEOUT_MS
+            assert _pragma(connection, "cache_size") == -database_bootstrap.SQLITE_CACHE_SIZE_KB
+        assert isinstance(engine.pool, QueuePool)
+        engine.dispose()
+
+    def test_memory_database_uses_static_pool(self):
+        """Test that an in-memory database shares one connection across threads."""
+        engine = create_database_engine("sqlite://")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE t (x INTEGER)"))
+            connection.execute(text("INSERT INTO t VALUES (1)"))
+
+        counts = []
+
+        def count():
+            with engine.connect() as connection:
+                counts.append(connection.execute(text("SELECT COUNT(*) FROM t")).scalar())
+
+        thread = threading.Thread(target=count)
+        thread.start()
+        thread.join()
+
+        assert isinstance(engine.pool, StaticPool)
+        assert counts == [1]
+
+    def test_memory_database_skips_wal_and_mmap(self):
+        """Test that pragmas unsupported by in-memory databases are left out."""
+        pragmas = sqlite_pragmas(in_memory=True)
+
+        assert "journal_mode" not in pragmas
+        assert "mmap_size" not in pragmas
+        assert is_memory_database("sqlite://")
+        assert is_memory_database("sqlite+aiosqlite:///:memory:")
+        assert not is_memory_database("sqlite:///./game_database.db")
+
+    def test_invalid_synchronous_falls_back(self):
+        """Test that an unknown synchronous level is never interpolated into SQL."""
+        with patch.object(database_bootstrap, "SQLITE_SYNCHRONOUS", "NORMAL; DROP TABLE x"):
+            assert sqlite_pragmas()["synchronous"] == "NORMAL"
+
+    def test_wal_can_be_disabled(self):
+        """Test that SQLITE_WAL_ENABLED=false keeps the default journal mode."""
+        with patch.object(database_bootstrap, "SQLITE_WAL_ENABLED", False):
+            assert "journal_mode" not in sqlite_pragmas()
+
+    @pytest.mark.asyncio
+    async def test_async_engine_pragmas(self, tmp_path):
+        """Test that the async engine applies the same pragmas."""
+        engine = create_async_database_engine(f"sqlite+aiosqlite:///{tmp_path / 'game.db'}")
+
+        async with engine.connect() as connection:
+            assert (await connection.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await connection.execute(text("PRAGMA synchronous"))).scalar() == 1
+        assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+        await engine.dispose()
+
+
+class TestConcurrentAccess:
+    """Test cases for writes while a read transaction is open."""
+
+    def _commit_during_read(self, path):
+        with patch.object(database_bootstrap, "SQLITE_BUSY_TIMEOUT_MS", 0):
+            engine = create_database_engine(f"sqlite:///{path}")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE t (x INTEGER)"))
+            connection.execute(text("INSERT INTO t VALUES (1)"))
+
+        reader = engine.raw_connection()
+        try:
+            cursor = reader.cursor()
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT COUNT(*) FROM t").fetchone()
+            with engine.begin() as writer:
+                writer.execute(text("INSERT INTO t VALUES (2)"))
+            # The reader keeps its snapshot
+            return cursor.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+        finally:
+            reader.rollback()
+            reader.close()
+            engine.dispose()
+
+    def test_commit_does_not_wait_for_readers(self, tmp_path):
+        """Test that in WAL mode a write commits while a read transaction is open."""
+        assert self._commit_during_read(tmp_path / "wal.db") == 1
+
+    def test_rollback_journal_blocks_commit(self, tmp_path):
+        """Test that without WAL the same commit fails on the reader's lock."""
+        with patch.object(database_bootstrap, "SQLITE_WAL_ENABLED", False):
+            with pytest.raises(OperationalError):
+                self._commit_during_read(tmp_path / "delete.db")
@@ -0,0 +1,157 @@
+"""
+Unit tests for the pooled Dify HTTP client and async workflow calls.
+
+Uses httpx.MockTransport so no network access is required.
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import DIFY_HTTP_MAX_CONNECTIONS
+from app.services.dify_client import DifyAsyncClient
+from app.services import dify_client, dify_service
+from app.services.dify_service import DifyWorkflowType, DifyServiceError
+
+
+def _sse_body(*texts: str) -> bytes:
+    """Build a Dify-style SSE stream with text_chunk events."""
+    lines = []
+    for text in texts:
+        event = {"event": "text_chunk", "data": {"text": text}}
+        lines.append(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+    return "".join(lines).encode("utf-8")
+
+
+def _make_client(handler, **kwargs) -> DifyAsyncClient:
+    return DifyAsyncClient(
+        url="https://dify.test/v1/workflows/run",
+        transport=httpx.MockTransport(handler),
+        **kwargs
+    )
+
+
+class TestDifyAsyncClient:
+    """Test cases for DifyAsyncClient."""
+
+    @pytest.mark.asyncio
+    async def test_stream_workflow_sends_request(self):
+        """Test that the client posts the body with the workflow API key."""
+        seen = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen["auth"] = request.headers["Authorization"]
+            seen["body"] = json.loads(request.content)
+            return httpx.Response(200, content=_sse_body("你好"))
+
+        client = _make_client(handler)
+        async with client.stream_workflow("qna_workflow", "key-1", {"inputs": {}}) as response:
+            assert response.status_code == 200
+            await response.aread()
+
+        assert seen["auth"] == "Bearer key-1"
+        assert seen["body"] == {"inputs": {}}
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_per_workflow_concurrency_limit(self):
+        """Test that in-flight requests never exceed the workflow limit."""
+        active = 0
+        peak = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return httpx.Response(200, content=_sse_body("ok"))
+
+        client = _make_client(handler, concurrency_limits={"qna_workflow": 2})
+
+        async def one_call():
+            async with client.stream_workflow("qna_workflow", "key", {}) as response:
+                await response.aread()
+
+        await asyncio.gather(*(one_call() for _ in range(6)))
+
+        assert peak <= 2
+        assert client.stats()["in_flight"]["qna_workflow"] == 0
+        await client.aclose()
+
+    def test_client_recreated_for_new_event_loop(self):
+        """Test that the pooled client is rebuilt when the event loop changes."""
+        client = _make_client(lambda request: httpx.Response(200, content=b""))
+
+        async def get_http_client():
+            return client._get_http_client()
+
+        first = asyncio.run(get_http_client())
+        second = asyncio.run(get_http_client())
+
+        assert first is not second
+
+
+class TestSyncSession:
+    """Test cases for the shared requests session."""
+
+    def test_adapter_pools_connections_to_the_dify_host(self):
+        """Test that one host pool holds up to DIFY_HTTP_MAX_CONNECTIONS connections."""
+        with patch.object(dify_client, "_sync_session", None):
+            session = dify_client.get_dify_http_session()
+
+        adapter = session.get_adapter("https://api.dify.ai/v1/workflows/run")
+        assert adapter._pool_connections == 1
+        assert adapter._pool_maxsize == DIFY_HTTP_MAX_CONNECTIONS
+
+
+class TestAsyncWorkflowCalls:
+    """Test cases for the awaitable Dify workflow helpers."""
+
+    @pytest.mark.asyncio
+    async def test_acall_qna_workflow(self):
+        """Test async Q&A call joins streamed text chunks."""
+        client = _make_client(lambda request: httpx.Response(200, content=_sse_body("我昨晚", "在书房。")))
+
+        with patch.object(dify_service, "get_dify_async_client", return_value=client), \
+             patch.object(dify_service, "DIFY_QNA_WORKFLOW_API_KEY", "test-key"):
+            answer = await dify_service.acall_qna_workflow(
+                char_id="Butler",
+                act_num=1,
+                query="你昨晚在哪里？",
+                model_name="gpt-3.5-turbo",
+                user_id="user_1"
+            )
+
+        assert answer == "我昨晚在书房。"
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_acall_monologue_workflow_fallback_on_error(self):
+        """Test async monologue call returns the fallback text on HTTP errors."""
+        client = _make_client(lambda request: httpx.Response(500, content=b"error"))
+
+        with patch.object(dify_service, "get_dify_async_client", return_value=client), \
+             patch.object(dify_service, "DIFY_MONOLOGUE_WORKFLOW_API_KEY", "test-key"), \
+             patch.object(dify_service.asyncio, "sleep", new=AsyncMock()):
+            result = await dify_service.acall_monologue_workflow(
+                char_id="Butler",
+                act_num=1,
+                model_name="gpt-3.5-turbo",
+                user_id="user_1"
+            )
+
+        assert result == "抱歉，我暂时无法生成角色独白。"
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_acall_dify_workflow_missing_api_key(self):
+        """Test that a missing API key raises DifyServiceError."""
+        with patch.object(dify_service, "DIFY_QNA_WORKFLOW_API_KEY", ""):
+            with pytest.raises(DifyServiceError, match="API key not configured"):
+                await dify_service.acall_dify_workflow(
+                    DifyWorkflowType.QNA_WORKFLOW, {}, "user_1"
+                )
@@ -0,0 +1,268 @@
+"""
+Unit tests for hedged Dify requests.
+
+Tests the HedgePolicy delay and rate accounting, and how the hedged Q&A
+stream and blocking call race a duplicate request against a slow primary.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from unittest.mock import patch
+
+from app.services import dify_service
+from app.services.dify_hedging import HedgePolicy, LatencyTracker
+from app.services.dify_resilience import RetryBudget
+from app.services.dify_service import DifyServiceError, DifyWorkflowType
+
+
+def _policy(**kwargs) -> HedgePolicy:
+    options = dict(enabled=True, percentile=95, min_delay=0.01, default_delay=0.05, min_samples=3)
+    options.update(kwargs)
+    return HedgePolicy(**options)
+
+
+class FakeStreams:
+    """Replacement for astream_dify_workflow serving scripted streams in call order."""
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.calls = 0
+        self.closed = []
+
+    def __call__(self, workflow_type, inputs, user_id, on_complete=None):
+        index = self.calls
+        self.calls += 1
+        return self._stream(index, self.scripts[index], on_complete)
+
+    async def _stream(self, index, script, on_complete):
+        try:
+            for delay, chunk in script:
+                await asyncio.sleep(delay)
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+            if on_complete is not None:
+                on_complete(True)
+        finally:
+            self.closed.append(index)
+
+
+class FakeCalls:
+    """Replacement for call_dify_workflow serving scripted blocking calls in call order."""
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.calls = 0
+        self.stopped = []
+        self._lock = threading.Lock()
+
+    def __call__(self, workflow_type, inputs, user_id, on_text=None, cancelled=None, deadline=None):
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+        parts = []
+        for delay, chunk in self.scripts[index]:
+            time.sleep(delay)
+            if cancelled is not None and cancelled.is_set():
+                self.stopped.append(index)
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            on_text(chunk)
+            parts.append(chunk)
+        return "".join(parts)
+
+
+def _call(policy, calls):
+    with patch.object(dify_service, "call_dify_workflow", new=calls):
+        return dify_service._call_hedged_workflow(DifyWorkflowType.QNA_WORKFLOW, {}, "u1", policy=policy)
+
+
+async def _collect(policy, streams):
+    with patch.object(dify_service, "astream_dify_workflow", new=streams):
+        return [chunk async for chunk in dify_service._astream_hedged_workflow(
+            DifyWorkflowType.QNA_WORKFLOW, {}, "u1", policy=policy
+        )]
+
+
+class TestHedgePolicy:
+    """Test cases for HedgePolicy."""
+
+    def test_default_delay_until_enough_samples(self):
+        """Test that the configured default is used while samples are scarce."""
+        policy = _policy(default_delay=3, min_delay=0.5, min_samples=3)
+        policy.record_first_chunk(1.0)
+
+        assert policy.hedge_delay() == 3
+
+    def test_delay_tracks_percentile(self):
+        """Test that the delay follows the latency percentile with a lower bound."""
+        policy = _policy(percentile=90, min_delay=0.5, min_samples=3, tracker=LatencyTracker(window=100))
+        for seconds in range(1, 11):
+            policy.record_first_chunk(float(seconds))
+        assert policy.hedge_delay() == 9.0
+
+        fast = _policy(percentile=90, min_delay=0.5, min_samples=3)
+        for _ in range(5):
+            fast.record_first_chunk(0.1)
+        assert fast.hedge_delay() == 0.5
+
+    def test_hedge_rate_is_capped(self):
+        """Test that hedges are limited to a share of recent requests."""
+        policy = _policy(budget=RetryBudget(ratio=0.1, min_per_second=0.0, window_seconds=60))
+        for _ in range(20):
+            policy.record_request()
+
+        assert [policy.try_hedge() for _ in range(3)] == [True, True, False]
+        assert policy.stats()["budget_denied"] == 1
+        assert policy.stats()["hedge_rate"] == 0.1
+
+
+class TestHedgedStream:
+    """Test cases for _astream_hedged_workflow."""
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_is_not_hedged(self):
+        """Test that a request answering within the delay sends no duplicate."""
+        policy = _policy(default_delay=0.5)
+        streams = FakeStreams([(0, "快"), (0, "答")], [(0, "unused")])
+
+        assert await _collect(policy, streams) == ["快", "答"]
+        assert streams.calls == 1
+        assert policy.stats()["hedged"] == 0
+
+    @pytest.mark.asyncio
+    async def test_winner_completion_is_reported(self):
+        """Test that on_complete reports whether the winning stream ended completely."""
+        reported = []
+        streams = FakeStreams([(0, "答")])
+
+        with patch.object(dify_service, "astream_dify_workflow", new=streams):
+            chunks = [chunk async for chunk in dify_service._astream_hedged_workflow(
+                DifyWorkflowType.QNA_WORKFLOW, {}, "u1", policy=_policy(default_delay=0.5),
+                on_complete=reported.append
+            )]
+
+        assert chunks == ["答"]
+        assert reported == [True]
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_over_slow_primary(self):
+        """Test that a duplicate request answers for a stalled primary."""
+        policy = _policy(default_delay=0.05)
+        streams = FakeStreams([(5, "慢")], [(0, "对冲"), (0, "回答")])
+
+        result = await asyncio.wait_for(_collect(policy, streams), timeout=2)
+
+        assert result == ["对冲", "回答"]
+        assert streams.calls == 2
+        assert 0 in streams.closed  # the slow primary was cancelled
+        stats = policy.stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_primary_can_still_win(self):
+        """Test that a primary answering before the hedge keeps the race."""
+        policy = _policy(default_delay=0.05)
+        streams = FakeStreams([(0.1, "主"), (0, "请求")], [(1, "对冲")])
+
+        assert await asyncio.wait_for(_collect(policy, streams), timeout=2) == ["主", "请求"]
+        assert 1 in streams.closed
+        assert policy.stats()["hedge_wins"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_hedge_falls_back_to_primary(self):
+        """Test that one failing request does not fail the call."""
+        policy = _policy(default_delay=0.05)
+        streams = FakeStreams([(0.2, "主请求")], [(0, DifyServiceError("boom"))])
+
+        assert await asyncio.wait_for(_collect(policy, streams), timeout=2) == ["主请求"]
+
+    @pytest.mark.asyncio
+    async def test_all_failures_raise(self):
+        """Test that the error surfaces when every request fails."""
+        policy = _policy(default_delay=0.05)
+        streams = FakeStreams([(0.1, DifyServiceError("one"))], [(0.1, DifyServiceError("two"))])
+
+        with pytest.raises(DifyServiceError):
+            await asyncio.wait_for(_collect(policy, streams), timeout=2)
+
+    @pytest.mark.asyncio
+    async def test_exhausted_budget_waits_for_primary(self):
+        """Test that no duplicate is sent when the hedge budget is spent."""
+        policy = _policy(default_delay=0.05, budget=RetryBudget(ratio=0.0, min_per_second=0.0))
+        streams = FakeStreams([(0.1, "主请求")], [(0, "unused")])
+
+        assert await _collect(policy, streams) == ["主请求"]
+        assert streams.calls == 1
+        assert policy.stats()["budget_denied"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_policy_streams_directly(self):
+        """Test that a disabled policy never races requests."""
+        policy = _policy(enabled=False, default_delay=0.01)
+        streams = FakeStreams([(0.1, "回答")], [(0, "unused")])
+
+        assert await _collect(policy, streams) == ["回答"]
+        assert streams.calls == 1
+
+
+class TestHedgedCall:
+    """Test cases for _call_hedged_workflow (the blocking /action path)."""
+
+    def test_fast_primary_is_not_hedged(self):
+        """Test that a request answering within the delay sends no duplicate."""
+        policy = _policy(default_delay=0.5)
+        calls = FakeCalls([(0, "快"), (0, "答")], [(0, "unused")])
+
+        assert _call(policy, calls) == "快答"
+        assert calls.calls == 1
+        assert policy.stats()["hedged"] == 0
+
+    def test_hedge_wins_over_slow_primary(self):
+        """Test that a duplicate request answers for a stalled primary, which then stops."""
+        policy = _policy(default_delay=0.05)
+        calls = FakeCalls([(0.3, "慢"), (0, "回答")], [(0, "对冲"), (0, "回答")])
+
+        started = time.monotonic()
+        assert _call(policy, calls) == "对冲回答"
+        assert time.monotonic() - started < 0.3
+        stats = policy.stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+
+        deadline = time.monotonic() + 2
+        while not calls.stopped and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert calls.stopped == [0]
+
+    def test_failed_hedge_falls_back_to_primary(self):
+        """Test that one failing request does not fail the call."""
+        policy = _policy(default_delay=0.05)
+        calls = FakeCalls([(0.2, "主请求")], [(0, DifyServiceError("boom"))])
+
+        assert _call(policy, calls) == "主请求"
+
+    def test_all_failures_raise(self):
+        """Test that the error surfaces when every request fails."""
+        policy = _policy(default_delay=0.05)
+        calls = FakeCalls([(0.1, DifyServiceError("one"))], [(0.1, DifyServiceError("two"))])
+
+        with pytest.raises(DifyServiceError):
+            _call(policy, calls)
+
+    def test_qna_workflow_is_hedged(self):
+        """Test that the blocking Q&A call used by /action goes through the hedged path."""
+        policy = _policy(default_delay=0.05)
+        calls = FakeCalls([(1, "慢")], [(0, "对冲")])
+
+        with patch.object(dify_service, "get_hedge_policy", return_value=policy), \
+                patch.object(dify_service, "call_dify_workflow", new=calls):
+            answer = dify_service.call_qna_workflow("Butler", 1, "问题", "gpt-4", "u1")
+
+        assert answer == "对冲"
+        assert policy.stats()["hedge_wins"] == 1
@@ -0,0 +1,249 @@
+"""
+Unit tests for the Dify circuit breaker and retry budget.
+
+Tests the CircuitBreaker state machine and RetryBudget accounting with a
+fake clock, and how the Dify workflow calls use them to fail fast.
+"""
+
+import threading
+import time
+
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+import httpx
+import requests
+
+from app.services import dify_service
+from app.services.dify_client import DifyAsyncClient
+from app.services.dify_resilience import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    RetryBudget,
+    backoff_delay,
+)
+from app.services.dify_service import DifyServiceError, DifyWorkflowType
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    """Isolated breaker and budget installed for the Dify calls."""
+    breaker = CircuitBreaker("qna_workflow", failure_threshold=2, recovery_timeout=30, clock=clock)
+    budget = RetryBudget(ratio=0.0, min_per_second=1.0, window_seconds=10, clock=clock)
+    with patch.object(dify_service, "get_circuit_breaker", return_value=breaker), \
+         patch.object(dify_service, "get_retry_budget", return_value=budget), \
+         patch.object(dify_service, "DIFY_QNA_WORKFLOW_API_KEY", "test-key"), \
+         patch.object(dify_service.time, "sleep"):
+        yield breaker
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker."""
+
+    def test_opens_after_consecutive_failures(self, clock):
+        """Test that the circuit opens at the failure threshold and rejects calls."""
+        breaker = CircuitBreaker("w", failure_threshold=3, recovery_timeout=30, clock=clock)
+        for _ in range(2):
+            assert breaker.allow_request()
+            breaker.record_failure()
+        assert breaker.state == CIRCUIT_CLOSED
+
+        breaker.record_failure()
+
+        assert breaker.state == CIRCUIT_OPEN
+        assert breaker.allow_request() is False
+        assert breaker.stats()["rejected"] == 1
+
+    def test_success_resets_failure_count(self, clock):
+        """Test that only consecutive failures count."""
+        breaker = CircuitBreaker("w", failure_threshold=2, recovery_timeout=30, clock=clock)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == CIRCUIT_CLOSED
+
+    def test_half_open_allows_one_trial(self, clock):
+        """Test that after the recovery timeout a single probe is let through."""
+        breaker = CircuitBreaker("w", failure_threshold=1, recovery_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 31
+
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+
+        breaker.record_success()
+        assert breaker.state == CIRCUIT_CLOSED
+
+    def test_failed_probe_reopens(self, clock):
+        """Test that a failing probe opens the circuit for another period."""
+        breaker = CircuitBreaker("w", failure_threshold=1, recovery_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 31
+        breaker.allow_request()
+
+        breaker.record_failure()
+
+        assert breaker.state == CIRCUIT_OPEN
+        clock.now += 10
+        assert breaker.allow_request() is False
+
+    def test_release_returns_trial_slot(self, clock):
+        """Test that an abandoned probe does not block later probes."""
+        breaker = CircuitBreaker("w", failure_threshold=1, recovery_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 31
+        breaker.allow_request()
+
+        breaker.release()
+
+        assert breaker.allow_request() is True
+
+
+class TestRetryBudget:
+    """Test cases for RetryBudget."""
+
+    def test_budget_scales_with_traffic(self, clock):
+        """Test that retries are capped by the floor plus a share of requests."""
+        budget = RetryBudget(ratio=0.5, min_per_second=0.1, window_seconds=10, clock=clock)
+        for _ in range(4):
+            budget.record_request()
+
+        # 0.1/s * 10s + 0.5 * 4 requests = 3 retries
+        assert [budget.try_acquire() for _ in range(4)] == [True, True, True, False]
+        assert budget.stats()["exhausted"] == 1
+
+    def test_window_slides(self, clock):
+        """Test that old retries leave the window."""
+        budget = RetryBudget(ratio=0.0, min_per_second=0.1, window_seconds=10, clock=clock)
+        assert budget.try_acquire() is True
+        assert budget.try_acquire() is False
+
+        clock.now += 11
+
+        assert budget.try_acquire() is True
+
+    def test_backoff_is_jittered_and_capped(self):
+        """Test that backoff delays stay within the exponential cap."""
+        delays = [backoff_delay(5, base=0.5, cap=4) for _ in range(50)]
+
+        assert all(0 <= delay <= 4 for delay in delays)
+        assert len(set(delays)) > 1
+
+
+class TestWorkflowCalls:
+    """Test cases for breaker and budget use in the Dify workflow calls."""
+
+    def _session(self, side_effect):
+        session = Mock()
+        session.post.side_effect = side_effect
+        return session
+
+    def test_open_circuit_fails_fast(self, breaker):
+        """Test that an outage opens the circuit and later calls skip the network."""
+        session = self._session(requests.exceptions.ConnectionError("down"))
+
+        with patch.object(dify_service, "get_dify_http_session", return_value=session):
+            with pytest.raises(DifyServiceError):
+                dify_service.call_dify_workflow(DifyWorkflowType.QNA_WORKFLOW, {}, "u1")
+            assert breaker.state == CIRCUIT_OPEN
+            calls_before = session.post.call_count
+
+            with pytest.raises(DifyServiceError, match="circuit open"):
+                dify_service.call_dify_workflow(DifyWorkflowType.QNA_WORKFLOW, {}, "u1")
+
+        assert calls_before == 2
+        assert session.post.call_count == calls_before
+
+    def test_client_errors_are_not_retried(self, breaker):
+        """Test that a 4xx answer is neither retried nor counted as an outage."""
+        response = Mock(status_code=400, headers={}, text="bad request")
+        error = requests.exceptions.HTTPError("400", response=response)
+        session = self._session(error)
+
+        with patch.object(dify_service, "get_dify_http_session", return_value=session):
+            with pytest.raises(DifyServiceError):
+                dify_service.call_dify_workflow(DifyWorkflowType.QNA_WORKFLOW, {}, "u1")
+
+        assert session.post.call_count == 1
+        assert breaker.state == CIRCUIT_CLOSED
+
+    def test_retry_budget_limits_retries(self, breaker):
+        """Test that an exhausted budget stops retrying before max_retries."""
+        breaker.failure_threshold = 100
+        session = self._session(requests.exceptions.Timeout("slow"))
+
+        with patch.object(dify_service, "get_dify_http_session", return_value=session), \
+             patch.object(dify_service.get_retry_budget(), "try_acquire", return_value=False):
+            with pytest.raises(DifyServiceError, match="after 1 attempts"):
+                dify_service.call_dify_workflow(DifyWorkflowType.QNA_WORKFLOW, {}, "u1", max_retries=3)
+
+        assert session.post.call_count == 1
+
+    def test_deadline_caps_timeout_and_retries(self, breaker):
+        """Test that a call stops retrying once the caller's deadline has passed."""
+        breaker.failure_threshold = 100
+
+        def slow_timeout(*args, **kwargs):
+            # time.sleep is patched by the fixture
+            threading.Event().wait(0.06)
+            raise requests.exceptions.Timeout("slow")
+
+        session = self._session(slow_timeout)
+        deadline = time.monotonic() + 0.05
+
+        with patch.object(dify_service, "get_dify_http_session", return_value=session):
+            with pytest.raises(DifyServiceError, match="after 1 attempts"):
+                dify_service.call_dify_workflow(
+                    DifyWorkflowType.QNA_WORKFLOW, {}, "u1", max_retries=3, timeout=30, deadline=deadline
+                )
+
+        assert session.post.call_count == 1
+        assert session.post.call_args.kwargs["timeout"] <= 0.05
+
+    def test_passed_deadline_skips_the_network(self, breaker):
+        """Test that a call whose caller already gave up is never sent."""
+        session = self._session(AssertionError("should not be called"))
+
+        with patch.object(dify_service, "get_dify_http_session", return_value=session):
+            with pytest.raises(DifyServiceError, match="Deadline passed"):
+                dify_service.call_dify_workflow(
+                    DifyWorkflowType.QNA_WORKFLOW, {}, "u1", deadline=time.monotonic() - 1
+                )
+
+        assert session.post.call_count == 0
+        assert breaker.state == CIRCUIT_CLOSED
+
+    @pytest.mark.asyncio
+    async def test_async_call_records_failures(self, breaker):
+        """Test that async 5xx responses count toward opening the circuit."""
+        client = DifyAsyncClient(
+            url="https://dify.test/v1/workflows/run",
+            transport=httpx.MockTransport(lambda request: httpx.Response(503, content=b"busy"))
+        )
+
+        with patch.object(dify_service, "get_dify_async_client", return_value=client), \
+             patch.object(dify_service.asyncio, "sleep", new=AsyncMock()):
+            with pytest.raises(DifyServiceError):
+                await dify_service.acall_dify_workflow(DifyWorkflowType.QNA_WORKFLOW, {}, "u1")
+
+        assert breaker.state == CIRCUIT_OPEN
+        await client.aclose()
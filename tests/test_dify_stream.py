@@ -0,0 +1,172 @@
+"""
+Unit tests for the incremental Dify SSE parser.
+
+Tests SSEParser framing across arbitrary chunk boundaries, the size caps,
+and how DifyStreamCollector extracts answers without duplicating the
+workflow_finished outputs.
+"""
+
+import json
+
+import pytest
+from unittest.mock import Mock
+
+from app.services import dify_service
+from app.services.dify_stream import (
+    DifyStreamCollector,
+    SSEEvent,
+    SSEParser,
+    aiter_sse_events,
+    iter_sse_events,
+)
+
+
+def _event(kind: str, **data) -> str:
+    return f"data: {json.dumps({'event': kind, 'data': data}, ensure_ascii=False)}\n\n"
+
+
+def _split(payload: bytes, size: int):
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+
+DIFY_STREAM = (
+    _event("workflow_started", id="run-1")
+    + _event("text_chunk", text="我昨晚")
+    + _event("text_chunk", text="在书房。")
+    + _event("workflow_finished", outputs={"answer": "我昨晚在书房。"})
+).encode("utf-8")
+
+
+class TestSSEParser:
+    """Test cases for SSEParser."""
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 4096])
+    def test_chunk_boundaries_do_not_matter(self, size):
+        """Test that any split of the byte stream (even inside UTF-8 characters) parses the same."""
+        events = list(iter_sse_events(_split(DIFY_STREAM, size)))
+
+        assert [event.json()["event"] for event in events] == [
+            "workflow_started", "text_chunk", "text_chunk", "workflow_finished"
+        ]
+        assert events[1].json()["data"]["text"] == "我昨晚"
+
+    def test_multiline_data_and_fields(self):
+        """Test event types, ids, comments and multi-line data fields."""
+        parser = SSEParser()
+        events = parser.feed(": keep-alive\r\nevent: ping\r\nid: 7\r\ndata: first\r\ndata:second\r\n\r\n")
+
+        assert len(events) == 1
+        assert events[0].event == "ping"
+        assert events[0].id == "7"
+        assert events[0].data == "first\nsecond"
+
+    def test_split_crlf(self):
+        """Test that a CRLF split across chunks is a single line break."""
+        parser = SSEParser()
+        events = parser.feed("data: a\r") + parser.feed("\n\r") + parser.feed("\n")
+
+        assert [event.data for event in events] == ["a"]
+
+    def test_trailing_event_is_flushed(self):
+        """Test that an event without a final blank line is dispatched at the end."""
+        parser = SSEParser()
+        assert parser.feed("data: [DONE]") == []
+
+        events = parser.flush()
+
+        assert events[0].is_done
+
+    def test_oversized_event_is_dropped(self):
+        """Test that events beyond the size cap are skipped without buffering them."""
+        parser = SSEParser(max_event_chars=16)
+        events = []
+        for chunk in ["data: " + "x" * 10, "x" * 10, "x" * 10, "\n\n", "data: ok\n\n"]:
+            events.extend(parser.feed(chunk))
+
+        assert [event.data for event in events] == ["ok"]
+        assert parser.dropped_events == 1
+
+    @pytest.mark.asyncio
+    async def test_async_iteration(self):
+        """Test that aiter_sse_events yields events as chunks arrive."""
+        async def chunks():
+            for chunk in _split(DIFY_STREAM, 5):
+                yield chunk
+
+        events = [event async for event in aiter_sse_events(chunks())]
+
+        assert len(events) == 4
+
+
+class TestDifyStreamCollector:
+    """Test cases for DifyStreamCollector."""
+
+    def test_finished_outputs_are_not_appended_to_chunks(self):
+        """Test that an answer streamed as chunks is not duplicated by the final outputs."""
+        collector = DifyStreamCollector()
+        for event in iter_sse_events([DIFY_STREAM]):
+            collector.feed(event)
+
+        assert collector.result() == "我昨晚在书房。"
+
+    def test_finished_outputs_without_chunks(self):
+        """Test that the final outputs are used when no chunks were streamed."""
+        collector = DifyStreamCollector()
+        collector.feed(SSEEvent(json.dumps({"event": "workflow_finished", "data": {"outputs": {"a": "回答", "n": 1}}})))
+
+        assert collector.result() == "回答"
+
+    def test_answer_is_capped(self):
+        """Test that collection stops at the configured size."""
+        seen = []
+        collector = DifyStreamCollector(max_chars=5, on_text=seen.append)
+        for text in ["一二三", "四五六", "七"]:
+            collector.feed(SSEEvent(json.dumps({"event": "text_chunk", "data": {"text": text}})))
+
+        assert collector.result() == "一二三四五"
+        assert collector.truncated and collector.finished
+        assert seen == ["一二三", "四五"]
+
+    def test_complete_only_when_the_workflow_ended_untruncated(self):
+        """Test that complete needs an end event and an answer under the size cap."""
+        collector = DifyStreamCollector()
+        for event in iter_sse_events([DIFY_STREAM]):
+            collector.feed(event)
+        assert collector.complete
+
+        cut_off = DifyStreamCollector()
+        cut_off.feed(SSEEvent(json.dumps({"event": "text_chunk", "data": {"text": "我昨晚"}})))
+        assert not cut_off.complete
+
+        capped = DifyStreamCollector(max_chars=2)
+        for event in iter_sse_events([DIFY_STREAM]):
+            capped.feed(event)
+        assert capped.truncated and not capped.complete
+
+    def test_done_marker_finishes(self):
+        """Test that [DONE] ends collection and invalid JSON is ignored."""
+        collector = DifyStreamCollector()
+        collector.feed(SSEEvent("not json"))
+        collector.feed(SSEEvent("[DONE]"))
+
+        assert collector.finished
+        assert collector.result() == ""
+
+
+class TestParseStreamingResponse:
+    """Test cases for the requests-based response parser."""
+
+    def test_parses_raw_chunks(self):
+        """Test that the sync parser reads raw network chunks."""
+        response = Mock()
+        response.iter_content.return_value = iter(_split(DIFY_STREAM, 11))
+
+        assert dify_service._parse_streaming_response(response) == "我昨晚在书房。"
+        response.iter_content.assert_called_once_with(chunk_size=None)
+
+    def test_empty_stream_falls_back(self):
+        """Test that a stream without text returns the fallback text."""
+        response = Mock()
+        response.iter_content.return_value = iter([b"data: [DONE]\n\n"])
+
+        assert dify_service._parse_streaming_response(response) == "抱歉，未能获取到有效响应。"
@@ -5,8 +5,9 @@ Tests the LangChain custom tools that wrap Dify workflows,
 including input validation, error handling, and tool execution.
 """
 
+import asyncio
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from pydantic import ValidationError
 
 from app.langchain.tools.dify_tools import (
@@ -181,7 +182,9 @@ class TestDifyMonologueTool:
             char_id="test_char",
             act_num=1,
             model_name="gpt-3.5-turbo",
-            user_id="test_user"
+            user_id="test_user",
+            script_id=None,
+            deadline=None
         )
     
     @patch('app.langchain.tools.dify_tools.call_monologue_workflow')
@@ -285,7 +288,11 @@ class TestDifyQnATool:
             act_num=1,
             query="What is your name?",
             model_name="gpt-3.5-turbo",
-            user_id="test_user"
+            user_id="test_user",
+            history=None,
+            script_id=None,
+            history_cacheable=False,
+            deadline=None
         )
     
     @patch('app.langchain.tools.dify_tools.call_qna_workflow')
@@ -331,6 +338,71 @@ class TestDifyQnATool:
         assert "test_char" in result
 
 
+class TestAsyncToolExecution:
+    """Test cases for the non-blocking _arun implementations."""
+
+    @pytest.mark.asyncio
+    @patch('app.langchain.tools.dify_tools.acall_monologue_workflow', new_callable=AsyncMock)
+    async def test_monologue_arun_uses_async_workflow(self, mock_acall):
+        """Test that _arun awaits the async workflow instead of the sync one."""
+        mock_acall.return_value = "Async monologue"
+
+        with patch('app.langchain.tools.dify_tools.call_monologue_workflow') as mock_sync:
+            result = await DifyMonologueTool()._arun(
+                char_id="test_char",
+                act_num=1,
+                model_name="gpt-3.5-turbo",
+                user_id="test_user"
+            )
+
+        assert result == "Async monologue"
+        mock_acall.assert_awaited_once()
+        mock_sync.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('app.langchain.tools.dify_tools.acall_qna_workflow', new_callable=AsyncMock)
+    async def test_qna_arun_error_fallback(self, mock_acall):
+        """Test that _arun keeps the error-string fallbacks."""
+        mock_acall.side_effect = DifyServiceError("API error")
+
+        result = await DifyQnATool()._arun(
+            char_id="test_char",
+            act_num=1,
+            query="What is your name?",
+            model_name="gpt-3.5-turbo",
+            user_id="test_user"
+        )
+
+        assert "暂时无法回答这个问题" in result
+        assert "test_char" in result
+
+    @pytest.mark.asyncio
+    @patch('app.langchain.tools.dify_tools.acall_qna_workflow')
+    async def test_qna_arun_cancellation_propagates(self, mock_acall):
+        """Test that cancelling the task is not swallowed by the fallbacks."""
+        started = asyncio.Event()
+
+        async def slow_answer(**kwargs):
+            started.set()
+            await asyncio.sleep(10)
+            return "never"
+
+        mock_acall.side_effect = slow_answer
+
+        task = asyncio.create_task(DifyQnATool()._arun(
+            char_id="test_char",
+            act_num=1,
+            query="What is your name?",
+            model_name="gpt-3.5-turbo",
+            user_id="test_user"
+        ))
+        await started.wait()
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+
 class TestToolUtilities:
     """Test cases for tool utility functions."""
     
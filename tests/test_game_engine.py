@@ -5,11 +5,14 @@ Tests the main game orchestration logic, including game creation,
 player management, action processing, and state persistence.
 """
 
+import threading
+
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime, timezone
 
-from app.langchain.engine.game_engine import GameEngine, GameEngineError
+from app.langchain.engine.game_engine import GameEngine, GameEngineError, get_game_engine
+from app.langchain.engine.monologue_prefetch import MonologuePrefetcher
 from app.langchain.state.models import GameState, GamePhase, PlayerState
 from app.models.database_models import Script
 
@@ -21,6 +24,7 @@ class TestGameEngine:
         """Setup for each test method."""
         self.mock_db = Mock()
         self.game_engine = GameEngine(self.mock_db)
+        self.game_engine.monologue_prefetcher = MonologuePrefetcher(enabled=False)
     
     @patch('app.langchain.engine.game_engine.get_db')
     def test_game_engine_initialization(self, mock_get_db):
@@ -34,6 +38,19 @@ class TestGameEngine:
         assert engine.monologue_tool is not None
         assert engine.qna_tool is not None
     
+    def test_get_game_engine_shares_components(self):
+        """Test that the factory reuses the compiled graph and tools per process."""
+        db_a, db_b = Mock(), Mock()
+
+        engine_a = get_game_engine(db_a)
+        engine_b = get_game_engine(db_b)
+
+        assert engine_a.graph is engine_b.graph
+        assert engine_a.qna_tool is engine_b.qna_tool
+        assert engine_a.monologue_tool is engine_b.monologue_tool
+        assert engine_a.state_manager.db_session is db_a
+        assert engine_b.state_manager.db_session is db_b
+    
     def test_start_new_game_success(self):
         """Test successful game creation."""
         # Mock script
@@ -352,5 +369,101 @@ class TestGameEngine:
         assert status["mission_count"] == 1
 
 
+class TestGameEngineStreaming:
+    """Test cases for streamed monologue and Q&A actions."""
+
+    def setup_method(self):
+        """Setup for each test method."""
+        self.game_engine = GameEngine(Mock())
+        self.game_state = GameState(
+            game_id="test_game",
+            script_id="test_script",
+            session_id="test_session"
+        )
+        self.game_state.players["player1"] = PlayerState(player_id="player1")
+        self.game_engine.load_game = Mock(return_value=self.game_state)
+        self.game_engine.state_manager.save_game_state = Mock(return_value=True)
+
+    async def _collect(self, action):
+        return [event async for event in self.game_engine.astream_action("test_session", action)]
+
+    @pytest.mark.asyncio
+    async def test_stream_qna_forwards_chunks_and_persists(self):
+        """Test that chunks are forwarded and the final entry is saved once."""
+        async def fake_chunks(**kwargs):
+            for chunk in ["I am ", "Detective ", "Smith."]:
+                yield chunk
+
+        with patch.object(type(self.game_engine.qna_tool), "astream_chunks", side_effect=fake_chunks):
+            events = await self._collect({
+                "action_type": "qna",
+                "character_id": "test_char",
+                "question": "What is your name?",
+                "questioner_id": "player1"
+            })
+
+        assert [e["text"] for e in events if e["event"] == "chunk"] == ["I am ", "Detective ", "Smith."]
+        assert events[-1]["event"] == "done"
+        assert events[-1]["result"]["answer"] == "I am Detective Smith."
+        assert len(self.game_state.qna_history) == 1
+        assert self.game_state.qna_history[0].answer == "I am Detective Smith."
+        self.game_engine.state_manager.save_game_state.assert_called_once_with(self.game_state)
+
+    @pytest.mark.asyncio
+    async def test_stream_database_work_runs_off_the_event_loop(self):
+        """Test that loading and saving the state do not block the event loop thread."""
+        loop_thread = threading.get_ident()
+        threads = []
+
+        def load_game(session_id):
+            threads.append(threading.get_ident())
+            return self.game_state
+
+        def save_game_state(state):
+            threads.append(threading.get_ident())
+            return True
+
+        async def fake_chunks(**kwargs):
+            yield "Smith."
+
+        self.game_engine.load_game = Mock(side_effect=load_game)
+        self.game_engine.state_manager.save_game_state = Mock(side_effect=save_game_state)
+        with patch.object(type(self.game_engine.qna_tool), "astream_chunks", side_effect=fake_chunks):
+            events = await self._collect({
+                "action_type": "qna",
+                "character_id": "test_char",
+                "question": "What is your name?",
+                "questioner_id": "player1"
+            })
+
+        assert events[-1]["event"] == "done"
+        assert len(threads) == 3
+        assert loop_thread not in threads
+
+    @pytest.mark.asyncio
+    async def test_stream_qna_limit_reached(self):
+        """Test that the Q&A limit is checked before calling Dify."""
+        self.game_state.max_qna_per_character_per_act = 1
+        self.game_state.qna_counts = {"test_char": {"1": 1}}
+
+        events = await self._collect({
+            "action_type": "qna",
+            "character_id": "test_char",
+            "question": "What is your name?",
+            "questioner_id": "player1"
+        })
+
+        assert events == [{"event": "error", "error": "已达到角色 test_char 在第1幕的提问上限"}]
+        self.game_engine.state_manager.save_game_state.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stream_unsupported_action(self):
+        """Test that only monologue and Q&A actions can be streamed."""
+        events = await self._collect({"action_type": "advance_act"})
+
+        assert events[0]["event"] == "error"
+        assert "not supported" in events[0]["error"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,178 @@
+"""
+Unit tests for game event push.
+
+Tests the in-process event bus (cross-thread delivery, fan-out and the
+resync on overflow), the commit events published by GameEngine and the
+WebSocket endpoint.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from unittest.mock import AsyncMock, Mock, patch
+
+from app.core import json_backend
+from app.database import get_async_db
+from app.langchain.engine.action_queue import SessionActionQueue
+from app.langchain.engine.game_engine import GameEngine
+from app.langchain.engine.monologue_prefetch import MonologuePrefetcher
+from app.langchain.state.models import GamePhase, GameState
+from app.main import app
+from app.services import game_events
+from app.services.game_events import InMemoryEventBus
+
+
+async def _mock_async_db():
+    yield AsyncMock()
+
+
+class TestInMemoryEventBus:
+    """Test cases for InMemoryEventBus."""
+
+    @pytest.mark.asyncio
+    async def test_fan_out_from_another_thread(self):
+        """Test that an event published from a worker thread reaches every subscriber."""
+        bus = InMemoryEventBus(enabled=True)
+        first = bus.subscribe("s1")
+        second = bus.subscribe("s1")
+
+        thread = threading.Thread(target=bus.publish, args=("s1", {"type": "commit", "version": 2}))
+        thread.start()
+        thread.join()
+
+        for subscription in (first, second):
+            assert json_backend.loads(await subscription.get(timeout=1)) == {"type": "commit", "version": 2}
+
+    @pytest.mark.asyncio
+    async def test_sessions_are_isolated(self):
+        """Test that subscribers only receive their own session's events."""
+        bus = InMemoryEventBus(enabled=True)
+        subscription = bus.subscribe("s1")
+
+        assert bus.publish("s2", {"type": "commit"}) == 0
+        assert await subscription.get(timeout=0.05) is None
+
+    @pytest.mark.asyncio
+    async def test_overflow_requests_resync(self):
+        """Test that a slow subscriber's backlog is replaced by one resync event."""
+        bus = InMemoryEventBus(enabled=True, max_queue=2)
+        subscription = bus.subscribe("s1")
+
+        for version in range(3):
+            bus.publish("s1", {"type": "commit", "version": version})
+        await asyncio.sleep(0)
+
+        assert subscription.pending() == 1
+        assert json_backend.loads(await subscription.get(timeout=1))["type"] == "resync"
+        assert bus.stats()["overflows"] == 1
+
+    @pytest.mark.asyncio
+    async def test_close_unsubscribes(self):
+        """Test that closing the last subscription removes the session."""
+        bus = InMemoryEventBus(enabled=True)
+        subscription = bus.subscribe("s1")
+        assert bus.has_subscribers("s1")
+
+        subscription.close()
+
+        assert not bus.has_subscribers("s1")
+        assert bus.stats()["sessions"] == 0
+
+    def test_disabled_bus_publishes_nothing(self):
+        """Test that a disabled bus reports no subscribers."""
+        bus = InMemoryEventBus(enabled=False)
+
+        assert not bus.has_subscribers("s1")
+        assert bus.publish("s1", {"type": "commit"}) == 0
+
+
+class TestCommitEvents:
+    """Test cases for the events published by GameEngine."""
+
+    def setup_method(self):
+        self.engine = GameEngine(Mock())
+        self.engine.action_queue = SessionActionQueue()
+        self.engine.monologue_prefetcher = MonologuePrefetcher(enabled=False)
+        self.engine.event_bus = Mock()
+        self.state = GameState(game_id="g", script_id="s", session_id="session_1", current_phase=GamePhase.QNA)
+        self.state.add_public_log_entry("system", "旧日志")
+        self.state._persisted_history_counts = {"public_log": 1, "qna_history": 0, "mission_submissions": 0}
+        self.engine.state_manager.save_game_state = Mock(return_value=True)
+
+    def test_commit_publishes_new_entries(self):
+        """Test that only the entries added by the commit are pushed."""
+        self.engine.event_bus.has_subscribers.return_value = True
+
+        def mutate(state):
+            state.add_public_log_entry("system", "新日志")
+            return {"success": True}
+
+        self.engine._commit_action("session_1", self.state, mutate)
+
+        session_id, event = self.engine.event_bus.publish.call_args.args
+        assert session_id == "session_1"
+        assert event["type"] == "commit"
+        assert event["current_phase"] == "qna"
+        assert [entry["content"] for entry in event["public_log"]] == ["新日志"]
+        assert "qna_history" not in event
+
+    def test_no_event_without_subscribers(self):
+        """Test that nothing is built or published when nobody listens."""
+        self.engine.event_bus.has_subscribers.return_value = False
+
+        self.engine._commit_action("session_1", self.state, lambda state: {"success": True})
+
+        self.engine.event_bus.publish.assert_not_called()
+
+
+class TestEventsWebSocket:
+    """Test cases for the WebSocket push endpoint."""
+
+    def setup_method(self):
+        self.bus = InMemoryEventBus(enabled=True)
+        self.previous_bus = game_events._game_event_bus
+        game_events.set_game_event_bus(self.bus)
+        self.previous_db = app.dependency_overrides.get(get_async_db)
+        app.dependency_overrides[get_async_db] = _mock_async_db
+        self.engine = Mock()
+        self.engine.state_manager.aget_game_state_version = AsyncMock()
+        self.engine_patch = patch("app.routers.langchain_game.get_game_engine", return_value=self.engine)
+        self.engine_patch.start()
+
+    def teardown_method(self):
+        self.engine_patch.stop()
+        game_events.set_game_event_bus(self.previous_bus)
+        if self.previous_db is None:
+            app.dependency_overrides.pop(get_async_db, None)
+        else:
+            app.dependency_overrides[get_async_db] = self.previous_db
+
+    def _wait_for_subscriber(self):
+        deadline = time.monotonic() + 2
+        while not self.bus.has_subscribers("session_1"):
+            assert time.monotonic() < deadline, "subscriber never registered"
+            time.sleep(0.01)
+
+    def test_commit_events_are_pushed(self):
+        """Test that a published event reaches the connected client."""
+        self.engine.state_manager.aget_game_state_version.return_value = 1
+
+        with TestClient(app).websocket_connect("/api/v1/langchain-game/session/session_1/ws") as websocket:
+            self._wait_for_subscriber()
+            self.bus.publish("session_1", {"type": "commit", "version": 2})
+
+            assert websocket.receive_json() == {"type": "commit", "version": 2}
+
+    def test_unknown_session_is_rejected(self):
+        """Test that connecting to a missing session is refused."""
+        self.engine.state_manager.aget_game_state_version.return_value = None
+
+        with pytest.raises(WebSocketDisconnect) as error:
+            with TestClient(app).websocket_connect("/api/v1/langchain-game/session/missing/ws"):
+                pass
+
+        assert error.value.code == 4404
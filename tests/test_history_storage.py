@@ -0,0 +1,134 @@
+"""
+Tests for append-only history storage.
+
+Verifies that StateManager stores public_log, qna_history and
+mission_submissions as rows, writes only new entries on each save,
+and loads the collections lazily.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.database_models import GameSession, PublicLogRecord, QnARecord, MissionSubmissionRecord
+from app.langchain.state.cache import GameStateCache
+from app.langchain.state.manager import StateManager
+from app.langchain.state.models import GameState, PlayerState
+
+
+@pytest.fixture
+def db():
+    """In-memory database with all tables."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def manager(db):
+    """StateManager with caching disabled so every load hits the database."""
+    return StateManager(db, cache=GameStateCache(maxsize=0))
+
+
+def _new_state() -> GameState:
+    state = GameState(game_id="game_1", script_id="script_1", session_id="session_1")
+    state.players["player1"] = PlayerState(player_id="player1")
+    return state
+
+
+class TestHistoryStorage:
+    """Test cases for row-per-entry history persistence."""
+
+    def test_history_not_in_snapshot(self, db, manager):
+        """Test that the game_state blob no longer embeds the collections."""
+        state = _new_state()
+        state.add_public_log_entry("game_start", "开始")
+        assert manager.save_game_state(state)
+
+        blob = db.query(GameSession).one().game_state
+        assert "public_log" not in blob
+        assert "qna_history" not in blob
+        assert db.query(PublicLogRecord).count() == 1
+
+    def test_only_new_entries_are_written(self, db, manager):
+        """Test that each save appends only entries created since the last one."""
+        state = _new_state()
+        state.add_qna_entry("player1", "butler", "你昨晚在哪里？", "在书房。")
+        assert manager.save_game_state(state)
+
+        loaded = manager.load_game_state("session_1")
+        loaded.add_qna_entry("player1", "butler", "谁能证明？", "管家。")
+        loaded.add_mission_submission("player1", "evidence", "刀")
+        assert manager.save_game_state(loaded)
+
+        assert db.query(QnARecord).count() == 2
+        assert db.query(MissionSubmissionRecord).count() == 1
+        seqs = [r.seq for r in db.query(QnARecord).order_by(QnARecord.seq)]
+        assert seqs == [0, 1]
+
+    def test_history_loaded_lazily(self, manager):
+        """Test that collections are only read when first accessed."""
+        state = _new_state()
+        state.add_public_log_entry("game_start", "开始")
+        state.add_qna_entry("player1", "butler", "问题", "回答")
+        assert manager.save_game_state(state)
+
+        loaded = manager.load_game_state("session_1")
+        assert not loaded.history_loaded
+        assert loaded.current_act == 1
+
+        assert loaded.qna_history[0].answer == "回答"
+        assert loaded.history_loaded
+        assert loaded.public_log[0].timestamp.tzinfo is not None
+
+    def test_save_without_loading_history(self, db, manager):
+        """Test that saving a state whose history was never loaded writes no rows."""
+        state = _new_state()
+        state.add_public_log_entry("game_start", "开始")
+        assert manager.save_game_state(state)
+
+        loaded = manager.load_game_state("session_1")
+        loaded.current_turn_index = 0
+        assert manager.save_game_state(loaded)
+
+        assert not loaded.history_loaded
+        assert db.query(PublicLogRecord).count() == 1
+
+    def test_legacy_blob_is_migrated(self, db, manager):
+        """Test that history embedded in an old blob moves to rows on save."""
+        legacy = _new_state()
+        legacy.add_public_log_entry("game_start", "开始")
+        db.add(GameSession(
+            session_id="session_1",
+            script_id="script_1",
+            game_state=legacy.model_dump(mode="json")
+        ))
+        db.commit()
+
+        loaded = manager.load_game_state("session_1")
+        assert len(loaded.public_log) == 1
+        assert manager.save_game_state(loaded)
+
+        assert db.query(PublicLogRecord).count() == 1
+        assert "public_log" not in db.query(GameSession).one().game_state
+
+    def test_delete_removes_rows(self, db, manager):
+        """Test that deleting a session deletes its history rows."""
+        state = _new_state()
+        state.add_public_log_entry("game_start", "开始")
+        assert manager.save_game_state(state)
+
+        assert manager.delete_game_state("session_1")
+        assert db.query(PublicLogRecord).count() == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -8,11 +8,12 @@ database integration, and game flow orchestration.
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from unittest.mock import patch, Mock
 
 from app.main import app
-from app.database import get_db, Base
+from app.database import get_async_db, get_db, Base
 from app.models.database_models import Script
 from app.schemas.pydantic_schemas import GameStartRequest, GameActionRequest, PlayerJoinRequest
 
@@ -21,6 +22,8 @@ from app.schemas.pydantic_schemas import GameStartRequest, GameActionRequest, Pl
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 
 def override_get_db():
@@ -32,7 +35,14 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    """Override async database dependency for testing."""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 
 @pytest.fixture(scope="module")
@@ -0,0 +1,190 @@
+"""
+Unit tests for the monologue response cache.
+
+Tests MonologueCache keying, TTL and eviction, and its use by the Dify
+monologue workflow calls, including pre-warming.
+"""
+
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, Mock, patch
+
+from app.database import get_async_db
+from app.main import app
+from app.services import dify_service
+from app.services.dify_client import DifyAsyncClient
+from app.services.dify_service import DifyServiceError
+from app.services.monologue_cache import MonologueCache
+
+
+@pytest.fixture
+def cache():
+    """Enabled cache installed as the process-wide instance."""
+    cache = MonologueCache(maxsize=8, ttl_seconds=60, enabled=True, workflow_version="1")
+    with patch.object(dify_service, "get_monologue_cache", return_value=cache):
+        yield cache
+
+
+class TestMonologueCache:
+    """Test cases for MonologueCache."""
+
+    def test_key_includes_all_inputs(self):
+        """Test that script, character, act, model and version all separate entries."""
+        cache = MonologueCache(maxsize=8, ttl_seconds=60, enabled=True, workflow_version="1")
+        cache.put("s1", "Butler", 1, "gpt-4", "管家的独白")
+
+        assert cache.get("s1", "Butler", 1, "gpt-4") == "管家的独白"
+        assert cache.get("s2", "Butler", 1, "gpt-4") is None
+        assert cache.get("s1", "Maid", 1, "gpt-4") is None
+        assert cache.get("s1", "Butler", 2, "gpt-4") is None
+        assert cache.get("s1", "Butler", 1, "gpt-3.5-turbo") is None
+
+        cache.workflow_version = "2"
+        assert cache.get("s1", "Butler", 1, "gpt-4") is None
+
+    def test_disabled_by_default_flag(self):
+        """Test that a disabled cache never stores anything."""
+        cache = MonologueCache(maxsize=8, ttl_seconds=60, enabled=False)
+        cache.put("s1", "Butler", 1, "gpt-4", "独白")
+
+        assert cache.get("s1", "Butler", 1, "gpt-4") is None
+        assert cache.stats()["size"] == 0
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL."""
+        cache = MonologueCache(maxsize=8, ttl_seconds=10, enabled=True)
+        with patch("app.services.monologue_cache.time.monotonic", return_value=100.0):
+            cache.put("s1", "Butler", 1, "gpt-4", "独白")
+        with patch("app.services.monologue_cache.time.monotonic", return_value=111.0):
+            assert cache.get("s1", "Butler", 1, "gpt-4") is None
+
+    def test_lru_eviction(self):
+        """Test that the size bound evicts the least recently used entry."""
+        cache = MonologueCache(maxsize=2, ttl_seconds=60, enabled=True)
+        cache.put("s1", "A", 1, "m", "a")
+        cache.put("s1", "B", 1, "m", "b")
+        cache.get("s1", "A", 1, "m")
+        cache.put("s1", "C", 1, "m", "c")
+
+        assert cache.get("s1", "B", 1, "m") is None
+        assert cache.get("s1", "A", 1, "m") == "a"
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_script(self):
+        """Test dropping every monologue of one script."""
+        cache = MonologueCache(maxsize=8, ttl_seconds=60, enabled=True)
+        cache.put("s1", "A", 1, "m", "a")
+        cache.put("s1", "B", 2, "m", "b")
+        cache.put("s2", "A", 1, "m", "c")
+
+        assert cache.invalidate_script("s1") == 2
+        assert cache.get("s2", "A", 1, "m") == "c"
+
+
+class TestCachedMonologueWorkflow:
+    """Test cases for cache use in the monologue workflow calls."""
+
+    def test_second_call_served_from_cache(self, cache):
+        """Test that a repeated monologue does not call Dify again."""
+        with patch.object(dify_service, "call_dify_workflow", return_value="我是管家。") as mock_call:
+            first = dify_service.call_monologue_workflow("Butler", 1, "gpt-4", "u1", script_id="s1")
+            second = dify_service.call_monologue_workflow("Butler", 1, "gpt-4", "u2", script_id="s1")
+
+        assert first == second == "我是管家。"
+        assert mock_call.call_count == 1
+
+    def test_no_cache_without_script_id(self, cache):
+        """Test that calls without a script ID bypass the cache."""
+        with patch.object(dify_service, "call_dify_workflow", return_value="我是管家。") as mock_call:
+            dify_service.call_monologue_workflow("Butler", 1, "gpt-4", "u1")
+            dify_service.call_monologue_workflow("Butler", 1, "gpt-4", "u1")
+
+        assert mock_call.call_count == 2
+
+    def test_failures_are_not_cached(self, cache):
+        """Test that fallback texts are never cached."""
+        with patch.object(dify_service, "call_dify_workflow", side_effect=DifyServiceError("down")):
+            result = dify_service.call_monologue_workflow("Butler", 1, "gpt-4", "u1", script_id="s1")
+        assert result == "抱歉，我暂时无法生成角色独白。"
+
+        with patch.object(dify_service, "call_dify_workflow", return_value="抱歉，未能获取到有效响应。"):
+            dify_service.call_monologue_workflow("Butler", 1, "gpt-4", "u1", script_id="s1")
+
+        assert cache.stats()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_hit_yields_full_text(self, cache):
+        """Test that a streamed monologue is cached and replayed in one chunk."""
+        async def fake_stream(*args, **kwargs):
+            for chunk in ("我是", "管家。"):
+                yield chunk
+            kwargs["on_complete"](True)
+
+        with patch.object(dify_service, "astream_dify_workflow", side_effect=fake_stream) as mock_stream:
+            first = [c async for c in dify_service.astream_monologue_workflow("Butler", 1, "gpt-4", "u1", script_id="s1")]
+            second = [c async for c in dify_service.astream_monologue_workflow("Butler", 1, "gpt-4", "u1", script_id="s1")]
+
+        assert first == ["我是", "管家。"]
+        assert second == ["我是管家。"]
+        assert mock_stream.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_incomplete_stream_is_not_cached(self, cache):
+        """Test that a stream closed before workflow_finished is passed on but not cached."""
+        body = "".join(
+            f"data: {json.dumps({'event': 'text_chunk', 'data': {'text': text}}, ensure_ascii=False)}\n\n"
+            for text in ("我是", "管")
+        ).encode("utf-8")
+        client = DifyAsyncClient(
+            url="https://dify.test/v1/workflows/run",
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+        )
+
+        with patch.object(dify_service, "get_dify_async_client", return_value=client), \
+             patch.object(dify_service, "DIFY_MONOLOGUE_WORKFLOW_API_KEY", "test-key"):
+            chunks = [c async for c in dify_service.astream_monologue_workflow("Butler", 1, "gpt-4", "u1", script_id="s1")]
+
+        assert chunks == ["我是", "管"]
+        assert cache.get("s1", "Butler", 1, "gpt-4") is None
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_prewarm_skips_cached_entries(self, cache):
+        """Test that pre-warming only generates missing monologues."""
+        cache.put("s1", "Butler", 1, "gpt-4", "已缓存")
+
+        with patch.object(dify_service, "acall_dify_workflow", new=AsyncMock(return_value="新独白")) as mock_call:
+            result = await dify_service.aprewarm_monologues("s1", ["Butler", "Maid"], [1, 2], "gpt-4")
+
+        assert result == {"requested": 4, "already_cached": 1, "generated": 3}
+        assert mock_call.await_count == 3
+        assert cache.get("s1", "Maid", 2, "gpt-4") == "新独白"
+
+    def test_prewarm_route_loads_script_with_async_session(self, cache):
+        """Test that the pre-warm endpoint reads the script through the async session."""
+        db = AsyncMock()
+        db.get.return_value = Mock(characters=[{"name": "Butler"}, {"name": "Maid"}, {}])
+
+        async def async_db():
+            yield db
+
+        previous = app.dependency_overrides.get(get_async_db)
+        app.dependency_overrides[get_async_db] = async_db
+        try:
+            with patch("app.routers.langchain_game.get_monologue_cache", return_value=cache), \
+                 patch("app.routers.langchain_game.aprewarm_monologues",
+                       new=AsyncMock(return_value={"requested": 2})) as mock_prewarm:
+                response = TestClient(app).post("/api/v1/langchain-game/scripts/s1/monologues/prewarm")
+        finally:
+            if previous is None:
+                app.dependency_overrides.pop(get_async_db, None)
+            else:
+                app.dependency_overrides[get_async_db] = previous
+
+        assert response.status_code == 200
+        assert response.json() == {"script_id": "s1", "requested": 2}
+        db.get.assert_awaited_once()
+        mock_prewarm.assert_awaited_once_with("s1", ["Butler", "Maid"], [1], "gpt-3.5-turbo")
@@ -0,0 +1,207 @@
+"""
+Unit tests for parallel monologue prefetching.
+
+Tests MonologuePrefetcher scheduling, hand-out and eviction, and its use by
+GameEngine when a game starts, when an act advances and when monologue
+actions are processed.
+"""
+
+import threading
+
+import pytest
+from unittest.mock import Mock
+
+from app.langchain.engine.action_queue import SessionActionQueue
+from app.langchain.engine.game_engine import GameEngine
+from app.langchain.engine.monologue_prefetch import MonologuePrefetcher
+from app.langchain.state.models import GameState, CharacterState, GamePhase
+from app.models.database_models import Script
+
+
+def _character(name: str, model_name: str = None) -> CharacterState:
+    return CharacterState(character_id=name, name=name, avatar="", description="", model_name=model_name)
+
+
+class TestMonologuePrefetcher:
+    """Test cases for MonologuePrefetcher."""
+
+    def test_generations_run_concurrently(self):
+        """Test that an act's monologues are generated in parallel."""
+        prefetcher = MonologuePrefetcher(enabled=True, max_entries=16, max_workers=4)
+        barrier = threading.Barrier(3, timeout=2)
+
+        def generate(char_id, act_num, model_name, **kwargs):
+            # Only completes if all three generations are in flight together
+            barrier.wait()
+            return f"{char_id}-{act_num}-{model_name}"
+
+        scheduled = prefetcher.prefetch("s1", 1, {"A": "m", "B": "m", "C": "gpt-4"}, generate)
+
+        assert scheduled == 3
+        assert prefetcher.take("s1", 1, "C", "gpt-4").result(timeout=2) == "C-1-gpt-4"
+        assert prefetcher.take("s1", 1, "A", "m").result(timeout=2) == "A-1-m"
+
+    def test_result_is_handed_out_once(self):
+        """Test that a prefetched monologue is consumed by the first action."""
+        prefetcher = MonologuePrefetcher(enabled=True, max_entries=16, max_workers=1)
+        prefetcher.prefetch("s1", 1, {"A": "m"}, lambda **kwargs: "独白")
+
+        assert prefetcher.take("s1", 1, "A", "m").result(timeout=2) == "独白"
+        assert prefetcher.take("s1", 1, "A", "m") is None
+        assert prefetcher.stats()["hits"] == 1
+        assert prefetcher.stats()["misses"] == 1
+
+    def test_model_and_act_must_match(self):
+        """Test that a prefetch for another model or act is not used."""
+        prefetcher = MonologuePrefetcher(enabled=True, max_entries=16, max_workers=1)
+        prefetcher.prefetch("s1", 1, {"A": "m"}, lambda **kwargs: "独白")
+
+        assert prefetcher.take("s1", 1, "A", "gpt-4") is None
+        assert prefetcher.take("s1", 2, "A", "m") is None
+
+    def test_new_act_discards_previous_act(self):
+        """Test that unused monologues of an earlier act are dropped."""
+        prefetcher = MonologuePrefetcher(enabled=True, max_entries=16, max_workers=1)
+        prefetcher.prefetch("s1", 1, {"A": "m"}, lambda **kwargs: "第一幕")
+        prefetcher.prefetch("s1", 2, {"A": "m"}, lambda **kwargs: "第二幕")
+
+        assert prefetcher.take("s1", 1, "A", "m") is None
+        assert prefetcher.take("s1", 2, "A", "m").result(timeout=2) == "第二幕"
+
+    def test_bounded_size(self):
+        """Test that the oldest entries are evicted beyond max_entries."""
+        prefetcher = MonologuePrefetcher(enabled=True, max_entries=2, max_workers=1)
+        prefetcher.prefetch("s1", 1, {"A": "m"}, lambda **kwargs: "a")
+        prefetcher.prefetch("s2", 1, {"B": "m"}, lambda **kwargs: "b")
+        prefetcher.prefetch("s3", 1, {"C": "m"}, lambda **kwargs: "c")
+
+        assert prefetcher.take("s1", 1, "A", "m") is None
+        assert prefetcher.stats()["discarded"] == 1
+
+    def test_disabled_prefetcher(self):
+        """Test that a disabled prefetcher schedules nothing."""
+        prefetcher = MonologuePrefetcher(enabled=False)
+        generate = Mock()
+
+        assert prefetcher.prefetch("s1", 1, {"A": "m"}, generate) == 0
+        assert prefetcher.take("s1", 1, "A", "m") is None
+        generate.assert_not_called()
+
+
+class TestEnginePrefetch:
+    """Test cases for GameEngine integration with the prefetcher."""
+
+    def setup_method(self):
+        self.mock_db = Mock()
+        self.game_engine = GameEngine(self.mock_db)
+        self.game_engine.action_queue = SessionActionQueue()
+        self.game_engine.monologue_prefetcher = MonologuePrefetcher(enabled=True, max_entries=16, max_workers=4)
+        self.game_state = GameState(
+            game_id="g", script_id="script_1", session_id="session_1",
+            current_phase=GamePhase.MONOLOGUE
+        )
+        self.game_state.characters = {
+            "Butler": _character("Butler"),
+            "Maid": _character("Maid", model_name="gpt-4"),
+        }
+        self.game_engine.load_game = Mock(return_value=self.game_state)
+        self.game_engine.state_manager.save_game_state = Mock(return_value=True)
+
+    def test_act_advance_prefetches_every_character(self):
+        """Test that advancing an act starts all monologues of the new act."""
+        self.game_engine.monologue_tool._run = Mock(return_value="独白")
+
+        result = self.game_engine.process_action("session_1", {"action_type": "advance_act", "user_id": "u1"})
+
+        assert result["success"] is True
+        prefetcher = self.game_engine.monologue_prefetcher
+        assert prefetcher.take("session_1", 2, "Butler", "gpt-3.5-turbo").result(timeout=2) == "独白"
+        assert prefetcher.take("session_1", 2, "Maid", "gpt-4").result(timeout=2) == "独白"
+        self.game_engine.monologue_tool._run.assert_any_call(
+            char_id="Maid", act_num=2, model_name="gpt-4", user_id="u1", script_id="script_1"
+        )
+
+    def test_start_new_game_prefetches_act_one(self):
+        """Test that a new game starts generating the act 1 monologues."""
+        mock_script = Mock(spec=Script)
+        mock_script.title = "Test Mystery"
+        mock_script.characters = [
+            {"name": "Detective", "avatar": "/img/detective.jpg", "description": "A skilled detective"},
+        ]
+        self.mock_db.query.return_value.filter.return_value.first.return_value = mock_script
+        self.game_engine.monologue_tool._run = Mock(return_value="侦探的独白")
+
+        game_state = self.game_engine.start_new_game("test_script", "test_user")
+
+        future = self.game_engine.monologue_prefetcher.take(
+            game_state.session_id, 1, "Detective", "gpt-3.5-turbo"
+        )
+        assert future.result(timeout=2) == "侦探的独白"
+
+    def test_monologue_action_uses_prefetched_text(self):
+        """Test that a monologue action returns the prefetched text without a new call."""
+        self.game_engine.monologue_tool._run = Mock(return_value="预取的独白")
+        self.game_engine._prefetch_monologues(self.game_state, 1, "system")
+
+        result = self.game_engine.process_action("session_1", {
+            "action_type": "monologue", "character_id": "Butler"
+        })
+
+        assert result["monologue_sentences"] == ["预取的独白"]
+        # One background call per character, none for the action itself
+        self.game_engine.monologue_prefetcher.take("session_1", 1, "Maid", "gpt-4").result(timeout=2)
+        assert self.game_engine.monologue_tool._run.call_count == 2
+
+    def test_failed_prefetch_falls_back_to_live_call(self):
+        """Test that a fallback text from the background call is not served."""
+        self.game_engine.monologue_tool._run = Mock(return_value="抱歉，我暂时无法生成角色独白。")
+        self.game_engine._prefetch_monologues(self.game_state, 1, "system")
+        self.game_engine.monologue_prefetcher.take("session_1", 1, "Maid", "gpt-4").result(timeout=2)
+        self.game_engine.monologue_tool._run = Mock(return_value="重新生成的独白")
+
+        result = self.game_engine.process_action("session_1", {
+            "action_type": "monologue", "character_id": "Butler"
+        })
+
+        assert result["monologue_sentences"] == ["重新生成的独白"]
+        self.game_engine.monologue_tool._run.assert_called_once()
+
+    def test_finished_game_releases_session_data(self):
+        """Test that committing the end of a game drops its prefetched monologues and context buffers."""
+        self.game_engine.monologue_tool._run = Mock(return_value="独白")
+        self.game_engine._prefetch_monologues(self.game_state, 1, "system")
+        self.game_engine.qna_context_builder.build(self.game_state, "Butler")
+
+        def finish(state):
+            state.current_phase = GamePhase.COMPLETED
+            return {"success": True}
+
+        assert "error" not in self.game_engine._commit_action("session_1", self.game_state, finish)
+
+        assert self.game_engine.monologue_prefetcher.take("session_1", 1, "Butler", "gpt-3.5-turbo") is None
+        assert self.game_engine.monologue_prefetcher.stats()["size"] == 0
+        assert "session_1" not in self.game_engine.qna_context_builder._sessions
+
+    def test_delete_game_releases_session_data(self):
+        """Test that deleting a game drops its prefetched monologues."""
+        self.game_engine.monologue_tool._run = Mock(return_value="独白")
+        self.game_engine._prefetch_monologues(self.game_state, 1, "system")
+        self.game_engine.state_manager.delete_game_state = Mock(return_value=True)
+
+        assert self.game_engine.delete_game("session_1")
+
+        self.game_engine.state_manager.delete_game_state.assert_called_once_with("session_1")
+        assert self.game_engine.monologue_prefetcher.stats()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_uses_prefetched_text(self):
+        """Test that a streamed monologue replays the prefetched text in one chunk."""
+        self.game_engine.monologue_tool._run = Mock(return_value="预取的独白")
+        self.game_engine._prefetch_monologues(self.game_state, 1, "system")
+
+        events = [event async for event in self.game_engine.astream_action(
+            "session_1", {"action_type": "monologue", "character_id": "Butler"}
+        )]
+
+        assert events[0] == {"event": "chunk", "text": "预取的独白"}
+        assert events[-1]["event"] == "done"
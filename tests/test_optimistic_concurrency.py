@@ -0,0 +1,166 @@
+"""
+Tests for optimistic concurrency control on game sessions.
+
+Verifies that saves are compare-and-swap on GameSession.version and that
+GameEngine re-applies state mutations, without repeating Dify calls,
+when a concurrent save wins the race.
+"""
+
+import pytest
+from unittest.mock import Mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.database_models import GameSession
+from app.langchain.engine.action_queue import SessionActionQueue
+from app.langchain.engine.game_engine import GameEngine
+from app.langchain.state.cache import GameStateCache
+from app.langchain.state.manager import StateManager, StateConflictError
+from app.langchain.state.models import GameState, GamePhase, PlayerState, CharacterState
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """File-backed database so that separate sessions behave like separate workers."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'concurrency.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _manager(db) -> StateManager:
+    return StateManager(db, cache=GameStateCache(maxsize=0))
+
+
+def _seed(db) -> None:
+    state = GameState(
+        game_id="game_1",
+        script_id="script_1",
+        session_id="session_1",
+        current_phase=GamePhase.QNA,
+        max_qna_per_character_per_act=5
+    )
+    for player_id in ("p1", "p2"):
+        state.players[player_id] = PlayerState(player_id=player_id)
+    state.characters["Butler"] = CharacterState(
+        character_id="Butler", name="管家", avatar="", description=""
+    )
+    assert _manager(db).save_game_state(state)
+
+
+class TestVersionedSaves:
+    """Test cases for compare-and-swap saves in StateManager."""
+
+    def test_version_increments_on_save(self, session_factory):
+        """Test that every save bumps the stored version."""
+        db = session_factory()
+        _seed(db)
+        manager = _manager(db)
+
+        state = manager.load_game_state("session_1")
+        version = state._version
+        state.current_act = 2
+        assert manager.save_game_state(state)
+
+        assert state._version == version + 1
+        assert db.query(GameSession).one().version == version + 1
+        db.close()
+
+    def test_stale_save_raises_conflict(self, session_factory):
+        """Test that a save based on an outdated version is rejected."""
+        db_a, db_b = session_factory(), session_factory()
+        _seed(db_a)
+
+        state_a = _manager(db_a).load_game_state("session_1")
+        state_b = _manager(db_b).load_game_state("session_1")
+
+        state_a.add_public_log_entry("system", "A")
+        assert _manager(db_a).save_game_state(state_a)
+
+        state_b.add_public_log_entry("system", "B")
+        with pytest.raises(StateConflictError):
+            _manager(db_b).save_game_state(state_b)
+
+        reloaded = _manager(db_b).load_game_state("session_1")
+        assert [entry.content for entry in reloaded.public_log] == ["A"]
+        db_a.close()
+        db_b.close()
+
+    def test_partial_update_bumps_version(self, session_factory):
+        """Test that in-place field updates also invalidate older loads."""
+        db = session_factory()
+        _seed(db)
+        manager = _manager(db)
+
+        state = manager.load_game_state("session_1")
+        assert manager.update_game_state_field("session_1", {"current_turn_index": 1})
+
+        with pytest.raises(StateConflictError):
+            manager.save_game_state(state)
+        db.close()
+
+
+class TestEngineConflictRetry:
+    """Test cases for GameEngine retrying mutations after conflicts."""
+
+    def _engine(self, db) -> GameEngine:
+        """Engine standing in for a separate worker process (own cache and action queue)."""
+        engine = GameEngine(db)
+        engine.state_manager = _manager(db)
+        engine.action_queue = SessionActionQueue()
+        return engine
+
+    def test_concurrent_qna_keeps_both_updates(self, session_factory):
+        """Test that two interleaved Q&A actions both land, each calling Dify once."""
+        db_a, db_b = session_factory(), session_factory()
+        _seed(db_a)
+        engine_a = self._engine(db_a)
+        engine_b = self._engine(db_b)
+
+        engine_b.qna_tool._run = Mock(return_value="回答B")
+
+        def answer_while_b_commits(**kwargs):
+            # Player 2's action completes while player 1 waits for Dify
+            result_b = engine_b.process_action("session_1", {
+                "action_type": "qna", "character_id": "Butler",
+                "question": "问题B", "questioner_id": "p2"
+            })
+            assert result_b["success"]
+            return "回答A"
+
+        engine_a.qna_tool._run = Mock(side_effect=answer_while_b_commits)
+
+        result_a = engine_a.process_action("session_1", {
+            "action_type": "qna", "character_id": "Butler",
+            "question": "问题A", "questioner_id": "p1"
+        })
+
+        assert result_a["success"]
+        assert engine_a.qna_tool._run.call_count == 1
+        assert engine_b.qna_tool._run.call_count == 1
+
+        final = _manager(session_factory()).load_game_state("session_1")
+        assert [entry.question for entry in final.qna_history] == ["问题B", "问题A"]
+        assert final.get_qna_count_for_character_act("Butler", 1) == 2
+        assert final.players["p1"].total_qna_count == 1
+        assert final.players["p2"].total_qna_count == 1
+        db_a.close()
+        db_b.close()
+
+    def test_gives_up_after_max_retries(self):
+        """Test that persistent conflicts end with an error instead of looping."""
+        engine = GameEngine(Mock())
+        state = GameState(game_id="g", script_id="s", session_id="session_1")
+        engine.load_game = Mock(return_value=state)
+        engine.state_manager.save_game_state = Mock(side_effect=StateConflictError("busy"))
+
+        result = engine.process_action("session_1", {
+            "action_type": "advance_phase", "target_phase": "qna"
+        })
+
+        assert "error" in result
+        assert engine.state_manager.save_game_state.call_count > 1
@@ -0,0 +1,118 @@
+"""
+Tests for in-place partial updates of the stored game state.
+
+Verifies that StateManager.update_game_state_field patches the snapshot
+with json_set instead of round-tripping the full GameState.
+"""
+
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.database_models import GameSession
+from app.langchain.state.cache import GameStateCache
+from app.langchain.state.manager import StateManager
+from app.langchain.state.models import GameState, GamePhase, PlayerState
+
+
+@pytest.fixture
+def db():
+    """In-memory database with all tables."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def saved_state(db):
+    """A game state persisted through a cache-less StateManager."""
+    state = GameState(game_id="game_1", script_id="script_1", session_id="session_1")
+    state.players["player1"] = PlayerState(player_id="player1")
+    assert StateManager(db, cache=GameStateCache(maxsize=0)).save_game_state(state)
+    return state
+
+
+class TestPartialUpdates:
+    """Test cases for update_game_state_field."""
+
+    def test_updates_fields_without_full_round_trip(self, db, saved_state):
+        """Test that fields are patched in the blob without load/save."""
+        manager = StateManager(db, cache=GameStateCache(maxsize=0))
+
+        with patch.object(manager, "load_game_state") as mock_load, \
+             patch.object(manager, "save_game_state") as mock_save:
+            assert manager.update_game_state_field(
+                "session_1",
+                {"current_phase": GamePhase.QNA, "current_act": 2, "current_turn_index": 1}
+            )
+            mock_load.assert_not_called()
+            mock_save.assert_not_called()
+
+        db.expire_all()
+        blob = db.query(GameSession).one().game_state
+        assert blob["current_phase"] == "qna"
+        assert blob["current_act"] == 2
+        assert blob["current_turn_index"] == 1
+        # Untouched fields are preserved
+        assert "player1" in blob["players"]
+
+        loaded = manager.load_game_state("session_1")
+        assert loaded.current_phase == GamePhase.QNA
+        assert loaded.current_act == 2
+
+    def test_updates_structured_values(self, db, saved_state):
+        """Test that dict and datetime values are stored as JSON, not strings."""
+        manager = StateManager(db, cache=GameStateCache(maxsize=0))
+
+        assert manager.update_game_state_field(
+            "session_1",
+            {"custom_data": {"clue": ["钥匙", "信件"]}, "started_at": "2024-01-01T10:00:00+00:00"}
+        )
+
+        db.expire_all()
+        blob = db.query(GameSession).one().game_state
+        assert blob["custom_data"] == {"clue": ["钥匙", "信件"]}
+        assert manager.load_game_state("session_1").started_at.year == 2024
+
+    def test_invalid_value_rejected(self, db, saved_state):
+        """Test that values violating field constraints are not written."""
+        manager = StateManager(db, cache=GameStateCache(maxsize=0))
+
+        assert manager.update_game_state_field("session_1", {"current_act": 0}) is False
+
+        db.expire_all()
+        assert db.query(GameSession).one().game_state["current_act"] == 1
+
+    def test_unknown_and_history_fields_ignored(self, db, saved_state):
+        """Test that unknown fields and history collections are skipped."""
+        manager = StateManager(db, cache=GameStateCache(maxsize=0))
+
+        assert manager.update_game_state_field("session_1", {"no_such_field": 1, "public_log": []}) is False
+
+    def test_missing_session(self, db):
+        """Test that updating an unknown session fails."""
+        manager = StateManager(db, cache=GameStateCache(maxsize=0))
+
+        assert manager.update_game_state_field("missing", {"current_act": 2}) is False
+
+    def test_cached_state_is_patched(self, db, saved_state):
+        """Test that a cached state reflects the update without a reload."""
+        cache = GameStateCache(maxsize=4, ttl_seconds=60)
+        manager = StateManager(db, cache=cache)
+        state = manager.load_game_state("session_1")
+        state.load_history()
+        cache.put(state)
+
+        assert manager.update_game_state_field("session_1", {"current_phase": "qna"})
+
+        cached = cache.get("session_1")
+        assert cached.current_phase == "qna"
@@ -0,0 +1,214 @@
+"""
+Unit tests for the Q&A answer cache.
+
+Tests question normalization, QnACache scoping, TTL, eviction and per-script
+opt-out, the optional NumPy similarity index, and the cache's use by the
+Dify Q&A workflow calls.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services import dify_service
+from app.services.dify_service import DifyServiceError
+from app.services.qna_cache import NumpyCosineIndex, QnACache, normalize_question
+
+
+@pytest.fixture
+def cache():
+    """Enabled hash-only cache installed as the process-wide instance."""
+    cache = QnACache(maxsize=8, ttl_seconds=60, enabled=True, workflow_version="1")
+    with patch.object(dify_service, "get_qna_cache", return_value=cache):
+        yield cache
+
+
+class TestNormalizeQuestion:
+    """Test cases for normalize_question."""
+
+    def test_ignores_case_whitespace_and_punctuation(self):
+        """Test that formatting differences normalize to the same text."""
+        assert normalize_question("你昨晚在哪里？") == normalize_question(" 你昨晚 在哪里? ")
+        assert normalize_question("Where WERE you?") == normalize_question("where were you")
+
+    def test_full_width_characters(self):
+        """Test that full-width letters are folded to half-width."""
+        assert normalize_question("ＡＢＣ") == "abc"
+
+
+class TestQnACache:
+    """Test cases for QnACache."""
+
+    def test_scope_includes_all_inputs(self):
+        """Test that script, character, act, model and version all separate entries."""
+        cache = QnACache(maxsize=8, ttl_seconds=60, enabled=True, workflow_version="1")
+        cache.put("s1", "Butler", 1, "gpt-4", "你昨晚在哪里？", "在书房。")
+
+        assert cache.get("s1", "Butler", 1, "gpt-4", "你昨晚在哪里") == "在书房。"
+        assert cache.get("s2", "Butler", 1, "gpt-4", "你昨晚在哪里") is None
+        assert cache.get("s1", "Maid", 1, "gpt-4", "你昨晚在哪里") is None
+        assert cache.get("s1", "Butler", 2, "gpt-4", "你昨晚在哪里") is None
+        assert cache.get("s1", "Butler", 1, "gpt-3.5-turbo", "你昨晚在哪里") is None
+
+        cache.workflow_version = "2"
+        assert cache.get("s1", "Butler", 1, "gpt-4", "你昨晚在哪里") is None
+
+    def test_disabled_cache_stores_nothing(self):
+        """Test that a disabled cache never stores anything."""
+        cache = QnACache(maxsize=8, ttl_seconds=60, enabled=False)
+        cache.put("s1", "Butler", 1, "gpt-4", "问题", "回答")
+
+        assert cache.get("s1", "Butler", 1, "gpt-4", "问题") is None
+        assert cache.stats()["size"] == 0
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL."""
+        cache = QnACache(maxsize=8, ttl_seconds=10, enabled=True)
+        with patch("app.services.qna_cache.time.monotonic", return_value=100.0):
+            cache.put("s1", "Butler", 1, "gpt-4", "问题", "回答")
+        with patch("app.services.qna_cache.time.monotonic", return_value=111.0):
+            assert cache.get("s1", "Butler", 1, "gpt-4", "问题") is None
+
+    def test_lru_eviction(self):
+        """Test that the size bound evicts the least recently used entry."""
+        cache = QnACache(maxsize=2, ttl_seconds=60, enabled=True)
+        cache.put("s1", "A", 1, "m", "问题一", "a")
+        cache.put("s1", "A", 1, "m", "问题二", "b")
+        cache.get("s1", "A", 1, "m", "问题一")
+        cache.put("s1", "A", 1, "m", "问题三", "c")
+
+        assert cache.get("s1", "A", 1, "m", "问题二") is None
+        assert cache.get("s1", "A", 1, "m", "问题一") == "a"
+        assert cache.stats()["evictions"] == 1
+
+    def test_disabled_script_opt_out(self):
+        """Test that opted-out scripts are neither served nor stored."""
+        cache = QnACache(maxsize=8, ttl_seconds=60, enabled=True, disabled_scripts=["s2"])
+        cache.put("s2", "A", 1, "m", "问题", "回答")
+        assert cache.get("s2", "A", 1, "m", "问题") is None
+
+        cache.put("s1", "A", 1, "m", "问题", "回答")
+        cache.disable_script("s1")
+        assert cache.get("s1", "A", 1, "m", "问题") is None
+        assert cache.stats()["size"] == 0
+
+    def test_hit_rate_stats(self):
+        """Test that exact hits and misses feed the hit rate."""
+        cache = QnACache(maxsize=8, ttl_seconds=60, enabled=True)
+        cache.put("s1", "A", 1, "m", "问题", "回答")
+        cache.get("s1", "A", 1, "m", "问题")
+        cache.get("s1", "A", 1, "m", "别的问题")
+
+        stats = cache.stats()
+        assert stats["exact_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+
+class TestSemanticIndex:
+    """Test cases for the NumPy cosine similarity backend."""
+
+    def _cache(self, threshold: float = 0.85) -> QnACache:
+        return QnACache(
+            maxsize=8, ttl_seconds=60, enabled=True,
+            semantic_index=NumpyCosineIndex(threshold=threshold)
+        )
+
+    def test_near_identical_question_hits(self):
+        """Test that a wording with an extra particle reuses the answer."""
+        cache = self._cache()
+        cache.put("s1", "Butler", 1, "m", "你昨晚在哪里？", "在书房。")
+
+        assert cache.get("s1", "Butler", 1, "m", "你昨晚在哪里呀") == "在书房。"
+        assert cache.stats()["semantic_hits"] == 1
+
+    def test_different_question_misses(self):
+        """Test that a question about a different night does not match."""
+        cache = self._cache()
+        cache.put("s1", "Butler", 1, "m", "你昨晚在哪里？", "在书房。")
+
+        assert cache.get("s1", "Butler", 1, "m", "你今晚在哪里？") is None
+        assert cache.get("s1", "Maid", 1, "m", "你昨晚在哪里呀") is None
+
+    def test_evicted_entries_leave_the_index(self):
+        """Test that LRU eviction also removes the indexed vector."""
+        cache = QnACache(
+            maxsize=1, ttl_seconds=60, enabled=True,
+            semantic_index=NumpyCosineIndex(threshold=0.85)
+        )
+        cache.put("s1", "Butler", 1, "m", "你昨晚在哪里？", "在书房。")
+        cache.put("s1", "Butler", 1, "m", "凶器是什么？", "不知道。")
+
+        assert cache.get("s1", "Butler", 1, "m", "你昨晚在哪里呀") is None
+
+
+class TestCachedQnAWorkflow:
+    """Test cases for cache use in the Q&A workflow calls."""
+
+    def test_repeated_question_served_from_cache(self, cache):
+        """Test that the same question does not call Dify again."""
+        with patch.object(dify_service, "call_dify_workflow", return_value="在书房。") as mock_call:
+            first = dify_service.call_qna_workflow("Butler", 1, "你昨晚在哪里？", "gpt-4", "u1", script_id="s1")
+            second = dify_service.call_qna_workflow("Butler", 1, "你昨晚在哪里", "gpt-4", "u2", script_id="s1")
+
+        assert first == second == "在书房。"
+        assert mock_call.call_count == 1
+
+    def test_history_bypasses_cache(self, cache):
+        """Test that questions with history context are never cached."""
+        with patch.object(dify_service, "call_dify_workflow", return_value="在书房。") as mock_call:
+            dify_service.call_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", history="上文", script_id="s1")
+            dify_service.call_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", history="上文", script_id="s1")
+
+        assert mock_call.call_count == 2
+        assert cache.stats()["size"] == 0
+
+    def test_failures_are_not_cached(self, cache):
+        """Test that fallback texts are never cached."""
+        with patch.object(dify_service, "call_dify_workflow", side_effect=DifyServiceError("down")):
+            result = dify_service.call_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", script_id="s1")
+        assert result == "抱歉，我暂时无法回答这个问题。"
+
+        with patch.object(dify_service, "call_dify_workflow", return_value="抱歉，未能获取到有效响应。"):
+            dify_service.call_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", script_id="s1")
+
+        assert cache.stats()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_async_call_uses_cache(self, cache):
+        """Test that the awaitable call reads and writes the cache."""
+        with patch.object(dify_service, "acall_dify_workflow", new=AsyncMock(return_value="在书房。")) as mock_call:
+            await dify_service.acall_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", script_id="s1")
+            answer = await dify_service.acall_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", script_id="s1")
+
+        assert answer == "在书房。"
+        assert mock_call.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_hit_yields_full_text(self, cache):
+        """Test that a streamed answer is cached and replayed in one chunk."""
+        async def fake_stream(*args, **kwargs):
+            for chunk in ("在", "书房。"):
+                yield chunk
+            kwargs["on_complete"](True)
+
+        with patch.object(dify_service, "astream_dify_workflow", side_effect=fake_stream) as mock_stream:
+            first = [c async for c in dify_service.astream_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", script_id="s1")]
+            second = [c async for c in dify_service.astream_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", script_id="s1")]
+
+        assert first == ["在", "书房。"]
+        assert second == ["在书房。"]
+        assert mock_stream.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_truncated_stream_is_not_cached(self, cache):
+        """Test that an answer reported incomplete (e.g. cut at the size cap) is not cached."""
+        async def fake_stream(*args, **kwargs):
+            yield "在书"
+            kwargs["on_complete"](False)
+
+        with patch.object(dify_service, "astream_dify_workflow", side_effect=fake_stream) as mock_stream:
+            for _ in range(2):
+                chunks = [c async for c in dify_service.astream_qna_workflow("Butler", 1, "问题", "gpt-4", "u1", script_id="s1")]
+
+        assert chunks == ["在书"]
+        assert mock_stream.call_count == 2
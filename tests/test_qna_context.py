@@ -0,0 +1,230 @@
+"""
+Unit tests for the token-budgeted Q&A history context.
+
+Tests QnAContextBuilder ranking, budgets, visibility of private Q&A and
+incremental ingestion, and how GameEngine passes the context to Dify.
+"""
+
+from unittest.mock import Mock, patch
+
+from app.langchain.engine import qna_context
+from app.langchain.engine.action_queue import SessionActionQueue
+from app.langchain.engine.game_engine import GameEngine
+from app.langchain.engine.monologue_prefetch import MonologuePrefetcher
+from app.langchain.engine.qna_context import QnAContextBuilder, count_tokens
+from app.langchain.state.models import CharacterState, GamePhase, GameState
+from app.services import dify_service
+from app.services.qna_cache import QnACache
+
+
+def _state(session_id: str = "session_1") -> GameState:
+    state = GameState(game_id="g", script_id="s", session_id=session_id, current_phase=GamePhase.QNA)
+    for name in ("Butler", "Maid", "Gardener"):
+        state.characters[name] = CharacterState(character_id=name, name=name, avatar="", description="")
+    return state
+
+
+def _builder(**kwargs) -> QnAContextBuilder:
+    options = dict(enabled=True, token_budget=1000, max_chars=1000, max_entry_chars=200)
+    options.update(kwargs)
+    return QnAContextBuilder(**options)
+
+
+class TestQnAContextBuilder:
+    """Test cases for QnAContextBuilder."""
+
+    def test_empty_history(self):
+        """Test that no context is built for a game without history."""
+        assert _builder().build(_state(), "Butler", "你昨晚在哪里？") is None
+
+    def test_own_entries_rank_first(self):
+        """Test that the questioned character's own Q&A wins a tight budget."""
+        state = _state()
+        state.add_qna_entry("p1", "Maid", "你喜欢花园吗？", "喜欢。")
+        state.add_qna_entry("p1", "Butler", "你几点睡的？", "十点。")
+        state.add_qna_entry("p1", "Gardener", "你见过谁？", "没有。")
+        own = "[第1幕]p1问Butler：你几点睡的？ 答：十点。"
+
+        context = _builder(max_chars=len(own)).build(state, "Butler", "")
+
+        assert context == own
+
+    def test_mentions_outrank_unrelated_entries(self):
+        """Test that entries mentioning the character beat unrelated ones."""
+        state = _state()
+        state.add_qna_entry("p1", "Maid", "Butler昨晚在哪？", "在书房。")
+        state.add_qna_entry("p1", "Gardener", "天气如何？", "下雨。")
+
+        context = _builder(max_chars=35).build(state, "Butler", "")
+
+        assert "Butler昨晚在哪" in context
+        assert "天气" not in context
+
+    def test_question_overlap_breaks_ties(self):
+        """Test that entries sharing words with the question are preferred."""
+        state = _state()
+        state.add_public_log_entry("monologue", "花园里的玫瑰开了。")
+        state.add_public_log_entry("monologue", "书房的灯一直亮着。")
+
+        context = _builder(max_chars=16).build(state, "Butler", "书房的灯为什么亮着？")
+
+        assert "书房" in context
+
+    def test_token_budget_is_respected(self):
+        """Test that the selected entries fit the token budget."""
+        state = _state()
+        for i in range(30):
+            state.add_qna_entry("p1", "Butler", f"第{i}个问题？", "这是一个很长的回答。" * 3)
+
+        context = _builder(token_budget=100).build(state, "Butler", "问题")
+
+        lines = context.split("\n")
+        assert sum(count_tokens(line) for line in lines) + len(lines) - 1 <= 100
+        assert len(lines) < 30
+
+    def test_output_is_chronological(self):
+        """Test that selected entries keep their original order."""
+        state = _state()
+        state.add_qna_entry("p1", "Butler", "第一问", "一")
+        state.add_qna_entry("p1", "Butler", "第二问", "二")
+
+        context = _builder().build(state, "Butler", "")
+
+        assert context.index("第一问") < context.index("第二问")
+
+    def test_private_qna_is_only_visible_to_its_character(self):
+        """Test that another character's private Q&A is not leaked."""
+        state = _state()
+        state.add_qna_entry("p1", "Maid", "秘密问题", "秘密回答", is_public=False)
+
+        builder = _builder()
+        assert builder.build(state, "Butler", "") is None
+        assert "秘密回答" in builder.build(state, "Maid", "")
+
+    def test_qna_log_entries_are_not_duplicated(self):
+        """Test that the public log copy of a Q&A is skipped."""
+        state = _state()
+        state.add_qna_entry("p1", "Butler", "你好", "你好")
+        state.add_public_log_entry("qna", "【问】你好\n【Butler答】你好", related_character_id="Butler")
+
+        assert _builder().build(state, "Butler", "").count("你好") == 2
+
+    def test_entries_are_ingested_incrementally(self):
+        """Test that only new history entries are processed on later calls."""
+        state = _state()
+        state.add_qna_entry("p1", "Butler", "问题一", "回答一")
+        builder = _builder()
+        builder.build(state, "Butler", "")
+
+        state.add_qna_entry("p1", "Butler", "问题二", "回答二")
+        with patch.object(qna_context, "_terms", wraps=qna_context._terms) as terms:
+            context = builder.build(state, "Butler", "")
+
+        assert "回答二" in context
+        # Only the new entry is converted
+        assert terms.call_count == 1
+        assert builder.stats()["rebuilds"] == 0
+
+    def test_replaced_history_is_rebuilt(self):
+        """Test that a different history for the same session is re-ingested."""
+        builder = _builder()
+        first = _state()
+        first.add_qna_entry("p1", "Butler", "旧问题", "旧回答")
+        builder.build(first, "Butler", "")
+
+        second = _state()
+        second.add_qna_entry("p1", "Butler", "新问题", "新回答")
+        context = builder.build(second, "Butler", "")
+
+        assert "新回答" in context and "旧回答" not in context
+        assert builder.stats()["rebuilds"] == 1
+
+    def test_sessions_are_bounded(self):
+        """Test that the least recently used session buffers are dropped."""
+        builder = _builder(max_sessions=1)
+        for session_id in ("a", "b"):
+            state = _state(session_id)
+            state.add_qna_entry("p1", "Butler", "问", "答")
+            builder.build(state, "Butler", "")
+
+        assert builder.stats()["sessions"] == 1
+
+
+class TestEngineContext:
+    """Test cases for the context passed by GameEngine."""
+
+    def test_qna_action_sends_history(self):
+        """Test that a Q&A action passes the built context to the tool."""
+        engine = GameEngine(Mock())
+        engine.action_queue = SessionActionQueue()
+        engine.monologue_prefetcher = MonologuePrefetcher(enabled=False)
+        engine.qna_context_builder = _builder()
+        state = _state()
+        state.add_public_log_entry("monologue", "【Butler】我整晚都在书房。", related_character_id="Butler")
+        engine.load_game = Mock(return_value=state)
+        engine.state_manager.save_game_state = Mock(return_value=True)
+        engine.qna_tool._run = Mock(return_value="回答")
+
+        engine.process_action("session_1", {
+            "action_type": "qna", "character_id": "Butler", "question": "你在哪？", "questioner_id": "p1"
+        })
+
+        history = engine.qna_tool._run.call_args.kwargs["history"]
+        assert history == "[第1幕]【Butler】我整晚都在书房。"
+
+    def test_repeated_question_hits_answer_cache(self):
+        """Test that a context with only general public events keeps the Q&A cache in use."""
+        engine = self._engine()
+        states = {}
+        for session_id in ("session_1", "session_2"):
+            states[session_id] = _state(session_id)
+            states[session_id].add_public_log_entry("player_joined", f"玩家 {session_id} 加入游戏")
+        engine.load_game = Mock(side_effect=lambda session_id: states[session_id])
+        cache = QnACache(maxsize=8, ttl_seconds=60, enabled=True, workflow_version="1")
+
+        with patch.object(dify_service, "get_qna_cache", return_value=cache), \
+                patch.object(dify_service, "call_dify_workflow", return_value="在书房。") as mock_call:
+            for session_id in states:
+                result = engine.process_action(session_id, {
+                    "action_type": "qna", "character_id": "Butler", "question": "你昨晚在哪里？", "questioner_id": "p1"
+                })
+                assert result["success"]
+
+        assert mock_call.call_count == 1
+        assert cache.stats()["exact_hits"] == 1
+
+    def test_context_about_character_bypasses_answer_cache(self):
+        """Test that answers depending on the character's own history are not cached."""
+        engine = self._engine()
+        state = _state()
+        state.add_public_log_entry("monologue", "【Butler】我整晚都在书房。", related_character_id="Butler")
+        engine.load_game = Mock(return_value=state)
+        cache = QnACache(maxsize=8, ttl_seconds=60, enabled=True, workflow_version="1")
+
+        with patch.object(dify_service, "get_qna_cache", return_value=cache), \
+                patch.object(dify_service, "call_dify_workflow", return_value="在书房。") as mock_call:
+            engine.process_action("session_1", {
+                "action_type": "qna", "character_id": "Butler", "question": "你昨晚在哪里？", "questioner_id": "p1"
+            })
+
+        assert mock_call.call_count == 1
+        assert cache.stats()["size"] == 0
+
+    @staticmethod
+    def _engine() -> GameEngine:
+        engine = GameEngine(Mock())
+        engine.action_queue = SessionActionQueue()
+        engine.monologue_prefetcher = MonologuePrefetcher(enabled=False)
+        engine.qna_context_builder = _builder()
+        engine.state_manager.save_game_state = Mock(return_value=True)
+        return engine
+
+    def test_long_history_is_clipped_to_dify_limit(self):
+        """Test that externally supplied history keeps the newest lines within the limit."""
+        history = "\n".join(f"第{i}条记录" for i in range(100))
+
+        with patch.object(dify_service, "DIFY_QNA_HISTORY_MAX_CHARS", 50):
+            inputs, _ = dify_service._build_qna_inputs("Butler", 1, "问题", "m", "u1", history)
+
+        assert len(inputs["history"]) <= 50
+        assert inputs["history"].endswith("第99条记录")
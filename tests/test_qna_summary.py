@@ -0,0 +1,181 @@
+"""
+Unit tests for the rolling per-character Q&A summaries.
+
+Tests the extractive summarizer's size limit, SummaryRefresher scheduling,
+how GameEngine folds finished acts into CharacterState and how the Q&A
+context uses the summary instead of the summarized exchanges.
+"""
+
+from unittest.mock import Mock
+
+from app.langchain.engine.action_queue import SessionActionQueue
+from app.langchain.engine.game_engine import GameEngine
+from app.langchain.engine.monologue_prefetch import MonologuePrefetcher
+from app.langchain.engine.qna_context import QnAContextBuilder
+from app.langchain.engine.qna_summary import ExtractiveSummarizer, SummaryRefresher
+from app.langchain.state.models import CharacterState, GamePhase, GameState, QnAEntry
+
+
+def _state() -> GameState:
+    state = GameState(game_id="g", script_id="s", session_id="session_1", current_phase=GamePhase.QNA)
+    for name in ("Butler", "Maid"):
+        state.characters[name] = CharacterState(character_id=name, name=name, avatar="", description="")
+    return state
+
+
+def _entry(question: str, answer: str, act: int = 1) -> QnAEntry:
+    return QnAEntry(questioner_id="p1", target_character_id="Butler", question=question,
+                    answer=answer, act_number=act)
+
+
+def _engine(refresher: SummaryRefresher) -> GameEngine:
+    engine = GameEngine(Mock())
+    engine.action_queue = SessionActionQueue()
+    engine.monologue_prefetcher = MonologuePrefetcher(enabled=False)
+    engine.summary_refresher = refresher
+    return engine
+
+
+class TestExtractiveSummarizer:
+    """Test cases for ExtractiveSummarizer."""
+
+    def test_keeps_question_and_first_sentence(self):
+        """Test that each exchange keeps its question and the first answer sentence."""
+        summary = ExtractiveSummarizer(max_chars=200)("Butler", "", [
+            _entry("你昨晚在哪？", "我在书房。后来去了厨房。")
+        ])
+
+        assert summary == "第1幕：问你昨晚在哪？答我在书房。"
+
+    def test_rolls_over_previous_summary(self):
+        """Test that new acts are appended as new lines after the previous summary."""
+        summary = ExtractiveSummarizer(max_chars=200)("Butler", "第1幕：问A答B", [_entry("问题", "回答", act=2)])
+
+        assert summary.split("\n") == ["第1幕：问A答B", "第2幕：问问题答回答"]
+
+    def test_summary_size_is_bounded(self):
+        """Test that long histories are shortened to the size limit."""
+        summarizer = ExtractiveSummarizer(max_chars=60)
+        summary = ""
+        for act in range(1, 6):
+            entries = [_entry(f"第{i}个很长很长的问题？", "这是一个很长很长很长很长的回答。" * 3, act) for i in range(8)]
+            summary = summarizer("Butler", summary, entries)
+            assert len(summary) <= 60
+
+        # The newest act is kept
+        assert summary.split("\n")[-1].startswith("第5幕")
+
+
+class TestSummaryRefresher:
+    """Test cases for SummaryRefresher."""
+
+    def test_runs_job_in_background(self):
+        """Test that scheduled jobs run and are counted."""
+        refresher = SummaryRefresher(enabled=True)
+        job = Mock(return_value=2)
+
+        refresher.schedule("session_1", 1, job).result(timeout=5)
+
+        job.assert_called_once_with("session_1", 1)
+        assert refresher.stats()["completed"] == 1
+        assert refresher.stats()["characters_updated"] == 2
+
+    def test_failures_are_counted(self):
+        """Test that a failing job is logged and counted, not raised."""
+        refresher = SummaryRefresher(enabled=True)
+
+        assert refresher.schedule("session_1", 1, Mock(side_effect=RuntimeError("db"))).result(timeout=5) == 0
+        assert refresher.stats()["failed"] == 1
+
+    def test_disabled(self):
+        """Test that nothing is scheduled when disabled or before the first act ends."""
+        assert SummaryRefresher(enabled=False).schedule("session_1", 1, Mock()) is None
+        assert SummaryRefresher(enabled=True).schedule("session_1", 0, Mock()) is None
+
+
+class TestEngineSummaries:
+    """Test cases for the summaries maintained by GameEngine."""
+
+    def test_finished_acts_are_summarized(self):
+        """Test that a character's Q&A up to the finished act is folded into its summary."""
+        state = _state()
+        state.add_qna_entry("p1", "Butler", "你昨晚在哪？", "在书房。")
+        state.current_act = 2
+        state.add_qna_entry("p1", "Butler", "第二幕的问题", "第二幕的回答。")
+        engine = _engine(SummaryRefresher(enabled=True, summarizer=ExtractiveSummarizer(max_chars=200)))
+        engine.load_game = Mock(return_value=state)
+        engine.state_manager.save_game_state = Mock(return_value=True)
+
+        assert engine._update_character_summaries("session_1", 1) == 1
+
+        butler = state.characters["Butler"]
+        assert butler.qna_summary == "第1幕：问你昨晚在哪？答在书房。"
+        assert butler.qna_summary_act == 1
+        assert state.characters["Maid"].qna_summary == ""
+        engine.state_manager.save_game_state.assert_called_once()
+
+    def test_up_to_date_summaries_are_not_saved(self):
+        """Test that a repeated refresh does not save the state again."""
+        state = _state()
+        state.add_qna_entry("p1", "Butler", "问题", "回答")
+        state.characters["Butler"].qna_summary = "第1幕：问问题答回答"
+        state.characters["Butler"].qna_summary_act = 1
+        engine = _engine(SummaryRefresher(enabled=True))
+        engine.load_game = Mock(return_value=state)
+        engine.state_manager.save_game_state = Mock(return_value=True)
+
+        assert engine._update_character_summaries("session_1", 1) == 0
+        engine.state_manager.save_game_state.assert_not_called()
+
+    def test_advance_act_schedules_refresh(self):
+        """Test that a successful act advance schedules the refresh of the finished act."""
+        refresher = Mock()
+        engine = _engine(refresher)
+        engine.load_game = Mock(return_value=_state())
+        engine._commit_action = Mock(return_value={"success": True, "new_act": 2})
+
+        engine.process_action("session_1", {"action_type": "advance_act"})
+
+        refresher.schedule.assert_called_once_with("session_1", 1, engine._refresh_character_summaries)
+
+
+class TestSummaryContext:
+    """Test cases for the summary in the Q&A context."""
+
+    def test_context_uses_summary_and_recent_exchanges(self):
+        """Test that summarized exchanges are replaced by the summary and only recent ones are kept."""
+        state = _state()
+        state.add_qna_entry("p1", "Butler", "第一幕旧问题", "旧回答")
+        state.current_act = 2
+        for i in range(4):
+            state.add_qna_entry("p1", "Butler", f"新问题{i}", f"新回答{i}")
+        state.characters["Butler"].qna_summary = "第1幕：问旧问题答旧回答"
+        state.characters["Butler"].qna_summary_act = 1
+        builder = QnAContextBuilder(enabled=True, token_budget=1000, max_chars=1000,
+                                    max_entry_chars=200, recent_exchanges=2)
+
+        context = builder.build(state, "Butler", "")
+
+        lines = context.split("\n")
+        assert lines[0] == "[前情摘要]第1幕：问旧问题答旧回答"
+        assert "第一幕旧问题" not in context
+        assert "新回答0" not in context and "新回答1" not in context
+        assert "新回答2" in context and "新回答3" in context
+
+    def test_context_size_stays_flat(self):
+        """Test that a summarized long game yields the same context size as a short one."""
+        builder = QnAContextBuilder(enabled=True, token_budget=1000, max_chars=1000,
+                                    max_entry_chars=200, recent_exchanges=2)
+        sizes = []
+        for acts in (3, 9):
+            state = _state()
+            state.session_id = f"session_{acts}"
+            for act in range(1, acts + 1):
+                state.current_act = act
+                for i in range(3):
+                    state.add_qna_entry("p1", "Butler", f"问题{i}", f"回答{i}")
+            state.characters["Butler"].qna_summary = "摘要"
+            state.characters["Butler"].qna_summary_act = acts - 1
+            sizes.append(len(builder.build(state, "Butler", "")))
+
+        assert sizes[0] == sizes[1]
@@ -0,0 +1,160 @@
+"""
+Tests for the materialized session summary columns.
+
+Verifies that StateManager keeps the GameSession summary columns in sync
+on every save, serves summaries and session listings from them, and that
+existing databases are upgraded and backfilled.
+"""
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.database_models import GameSession
+from app.models.schema_upgrade import upgrade_schema
+from app.langchain.state.cache import GameStateCache
+from app.langchain.state.manager import StateManager
+from app.langchain.state.models import GameState, GamePhase, PlayerState
+
+
+@pytest.fixture
+def engine():
+    """In-memory database engine with all tables."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def manager(db):
+    return StateManager(db, cache=GameStateCache(maxsize=0))
+
+
+def _new_state(session_id: str = "session_1", phase: GamePhase = GamePhase.INITIALIZATION, act: int = 1) -> GameState:
+    state = GameState(
+        game_id=f"game_{session_id}",
+        script_id="script_1",
+        session_id=session_id,
+        current_phase=phase,
+        current_act=act
+    )
+    state.players["player1"] = PlayerState(player_id="player1")
+    state.turn_order = ["player1"]
+    return state
+
+
+class TestSessionSummary:
+    """Test cases for summary columns and queries."""
+
+    def test_save_updates_summary_columns(self, db, manager):
+        """Test that saving a state mirrors its summary into columns."""
+        state = _new_state(phase=GamePhase.QNA, act=2)
+        state.add_public_log_entry("system", "开始")
+        state.add_qna_entry("player1", "Butler", "问题", "回答")
+        assert manager.save_game_state(state)
+
+        row = db.query(GameSession).one()
+        assert row.game_id == "game_session_1"
+        assert row.current_phase == "qna"
+        assert row.current_act == 2
+        assert row.player_count == 1
+        assert row.turn_order == ["player1"]
+        assert row.public_log_count == 1
+        assert row.qna_count == 1
+        assert row.mission_count == 0
+
+    def test_summary_does_not_read_json(self, db, manager):
+        """Test that the summary is served from the columns only."""
+        assert manager.save_game_state(_new_state())
+        # Corrupt the blob: the summary must not depend on it
+        db.execute(text("UPDATE game_sessions SET game_state = '{}'"))
+        db.commit()
+
+        summary = manager.get_game_state_summary("session_1")
+
+        assert summary["game_id"] == "game_session_1"
+        assert summary["current_phase"] == "initialization"
+        assert summary["player_count"] == 1
+        assert summary["public_log_count"] == 0
+
+    def test_summary_missing_session(self, manager):
+        """Test that an unknown session has no summary."""
+        assert manager.get_game_state_summary("missing") is None
+
+    def test_list_sessions_filters(self, manager):
+        """Test listing sessions by phase and act."""
+        assert manager.save_game_state(_new_state("s1", GamePhase.QNA, 1))
+        assert manager.save_game_state(_new_state("s2", GamePhase.QNA, 2))
+        assert manager.save_game_state(_new_state("s3", GamePhase.MONOLOGUE, 2))
+
+        assert {s["session_id"] for s in manager.list_game_sessions(phase="qna")} == {"s1", "s2"}
+        assert {s["session_id"] for s in manager.list_game_sessions(act=2)} == {"s2", "s3"}
+        assert [s["session_id"] for s in manager.list_game_sessions(phase="qna", act=2)] == ["s2"]
+        assert len(manager.list_game_sessions(limit=1)) == 1
+
+    def test_partial_update_syncs_columns(self, db, manager):
+        """Test that in-place field updates keep the columns in sync."""
+        assert manager.save_game_state(_new_state())
+
+        assert manager.update_game_state_field("session_1", {"current_phase": "qna", "current_act": 3})
+
+        db.expire_all()
+        row = db.query(GameSession).one()
+        assert row.current_phase == "qna"
+        assert row.current_act == 3
+
+
+class TestSchemaUpgrade:
+    """Test cases for upgrading an existing game_sessions table."""
+
+    def test_adds_columns_and_backfills(self):
+        """Test that an old table gets the summary columns and data."""
+        engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE game_sessions ("
+                "session_id VARCHAR PRIMARY KEY, script_id VARCHAR, user_id VARCHAR, "
+                "current_scene_index INTEGER, game_state JSON, "
+                "created_at DATETIME, updated_at DATETIME)"
+            ))
+            connection.execute(text(
+                "INSERT INTO game_sessions (session_id, script_id, game_state) VALUES "
+                "('old', 's', '{\"game_id\": \"g\", \"current_act\": 2, \"current_phase\": \"qna\", "
+                "\"players\": {\"p1\": {}, \"p2\": {}}, \"public_log\": [{}, {}, {}]}')"
+            ))
+        Base.metadata.create_all(bind=engine)
+
+        upgrade_schema(engine)
+
+        columns = {column["name"] for column in inspect(engine).get_columns("game_sessions")}
+        assert {"current_phase", "current_act", "player_count", "qna_count"} <= columns
+        indexes = {index["name"] for index in inspect(engine).get_indexes("game_sessions")}
+        assert "ix_game_sessions_phase_act" in indexes
+
+        db = sessionmaker(bind=engine)()
+        summary = StateManager(db, cache=GameStateCache(maxsize=0)).get_game_state_summary("old")
+        assert summary["current_phase"] == "qna"
+        assert summary["current_act"] == 2
+        assert summary["player_count"] == 2
+        assert summary["public_log_count"] == 3
+        db.close()
+
+        # Running it again is a no-op
+        upgrade_schema(engine)
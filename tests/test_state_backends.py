@@ -0,0 +1,247 @@
+"""
+Tests for the pluggable StateManager storage backends.
+
+Runs the same persistence contract (round trip, compare-and-swap saves,
+append-only history, partial updates, summaries, deletion) against the
+SQLAlchemy, in-memory and append-log backends, then checks the append-log
+file handling (reopening, torn records, compaction) and backend selection.
+"""
+
+import os
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.langchain.state.backends import (
+    AppendLogStateBackend,
+    InMemoryStateBackend,
+    SQLAlchemyStateBackend,
+    get_state_backend,
+)
+from app.langchain.state.cache import GameStateCache
+from app.langchain.state.manager import StateManager, StateConflictError
+from app.langchain.state.models import GamePhase, GameState, PlayerState
+
+
+def _sqlalchemy_backend(tmp_path):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return SQLAlchemyStateBackend(sessionmaker(bind=engine)())
+
+
+BACKENDS = {
+    "sqlalchemy": _sqlalchemy_backend,
+    "memory": lambda tmp_path: InMemoryStateBackend(),
+    "append_log": lambda tmp_path: AppendLogStateBackend(str(tmp_path / "logs"), compact_records=0),
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request, tmp_path):
+    return BACKENDS[request.param](tmp_path)
+
+
+def _manager(backend) -> StateManager:
+    """StateManager with caching disabled so every load hits the backend."""
+    return StateManager(cache=GameStateCache(maxsize=0), backend=backend)
+
+
+def _new_state(session_id: str = "session_1") -> GameState:
+    state = GameState(game_id=f"game_{session_id}", script_id="script_1", session_id=session_id)
+    state.players["player1"] = PlayerState(player_id="player1")
+    state.add_public_log_entry("system", "游戏开始")
+    return state
+
+
+class TestBackendContract:
+    """Test cases every backend must pass."""
+
+    def test_round_trip(self, backend):
+        """Test that a saved state loads back with its history and version."""
+        manager = _manager(backend)
+        state = _new_state()
+        state.add_qna_entry("player1", "Butler", "你昨晚在哪？", "在书房。")
+
+        assert manager.save_game_state(state)
+        loaded = manager.load_game_state("session_1")
+
+        assert loaded.version == 1
+        assert "player1" in loaded.players
+        assert [entry.content for entry in loaded.public_log] == ["游戏开始"]
+        assert loaded.qna_history[0].answer == "在书房。"
+        assert manager.load_game_state("missing") is None
+
+    def test_history_is_appended(self, backend):
+        """Test that later saves add only their new entries."""
+        manager = _manager(backend)
+        manager.save_game_state(_new_state())
+
+        state = manager.load_game_state("session_1")
+        state.add_public_log_entry("system", "第二条")
+        assert manager.save_game_state(state)
+        state.add_public_log_entry("system", "第三条")
+        assert manager.save_game_state(state)
+
+        loaded = manager.load_game_state("session_1")
+        assert [entry.content for entry in loaded.public_log] == ["游戏开始", "第二条", "第三条"]
+        assert loaded.version == 3
+
+    def test_stale_save_raises_conflict(self, backend):
+        """Test that a save based on an outdated version is rejected."""
+        manager = _manager(backend)
+        manager.save_game_state(_new_state())
+        state_a = manager.load_game_state("session_1")
+        state_b = manager.load_game_state("session_1")
+
+        state_a.add_public_log_entry("system", "A")
+        assert manager.save_game_state(state_a)
+        state_b.add_public_log_entry("system", "B")
+        with pytest.raises(StateConflictError):
+            manager.save_game_state(state_b)
+
+        assert [entry.content for entry in manager.load_game_state("session_1").public_log] == ["游戏开始", "A"]
+
+    def test_update_fields(self, backend):
+        """Test that partial updates are stored and bump the version."""
+        manager = _manager(backend)
+        manager.save_game_state(_new_state())
+        stale = manager.load_game_state("session_1")
+
+        assert manager.update_game_state_field("session_1", {"current_phase": GamePhase.QNA, "current_act": 2})
+        assert not manager.update_game_state_field("missing", {"current_act": 2})
+
+        loaded = manager.load_game_state("session_1")
+        assert loaded.current_phase == GamePhase.QNA
+        assert loaded.current_act == 2
+        assert manager.get_game_state_version("session_1") == 2
+        with pytest.raises(StateConflictError):
+            manager.save_game_state(stale)
+
+    def test_summaries(self, backend):
+        """Test summaries and filtered listing."""
+        manager = _manager(backend)
+        for session_id, act in (("s1", 1), ("s2", 2), ("s3", 2)):
+            state = _new_state(session_id)
+            state.current_act = act
+            manager.save_game_state(state)
+
+        summary = manager.get_game_state_summary("s2")
+        assert summary["game_id"] == "game_s2"
+        assert summary["player_count"] == 1
+        assert summary["public_log_count"] == 1
+        assert manager.get_game_state_summary("missing") is None
+        assert {s["session_id"] for s in manager.list_game_sessions(act=2)} == {"s2", "s3"}
+        assert len(manager.list_game_sessions(limit=1)) == 1
+
+    def test_delete(self, backend):
+        """Test that a deleted session is gone."""
+        manager = _manager(backend)
+        manager.save_game_state(_new_state())
+
+        assert manager.delete_game_state("session_1")
+        assert manager.load_game_state("session_1") is None
+        assert manager.get_game_state_version("session_1") is None
+        assert not manager.delete_game_state("session_1")
+
+
+class TestAppendLogBackend:
+    """Test cases for the append-log file handling."""
+
+    def test_reopen_restores_sessions(self, tmp_path):
+        """Test that a new backend instance rebuilds its index from the files."""
+        directory = str(tmp_path / "logs")
+        manager = _manager(AppendLogStateBackend(directory, compact_records=0))
+        state = _new_state()
+        manager.save_game_state(state)
+        state.add_public_log_entry("system", "第二条")
+        manager.save_game_state(state)
+
+        reopened = _manager(AppendLogStateBackend(directory))
+
+        loaded = reopened.load_game_state("session_1")
+        assert loaded.version == 2
+        assert [entry.content for entry in loaded.public_log] == ["游戏开始", "第二条"]
+        assert [s["session_id"] for s in reopened.list_game_sessions()] == ["session_1"]
+
+    def test_torn_record_is_discarded(self, tmp_path):
+        """Test that a partially written last record is ignored and overwritten."""
+        directory = str(tmp_path / "logs")
+        _manager(AppendLogStateBackend(directory)).save_game_state(_new_state())
+        path = os.path.join(directory, "session_1.log")
+        with open(path, "ab") as file:
+            file.write(b"\x40\x00\x00\x00garbage")
+
+        backend = AppendLogStateBackend(directory)
+        manager = _manager(backend)
+        state = manager.load_game_state("session_1")
+        state.add_public_log_entry("system", "第二条")
+        assert manager.save_game_state(state)
+
+        assert backend.stats()["torn_records"] == 1
+        reloaded = _manager(AppendLogStateBackend(directory)).load_game_state("session_1")
+        assert [entry.content for entry in reloaded.public_log] == ["游戏开始", "第二条"]
+
+    def test_compaction_keeps_history(self, tmp_path):
+        """Test that compacting a file keeps the full history and version."""
+        directory = str(tmp_path / "logs")
+        backend = AppendLogStateBackend(directory, compact_records=3)
+        manager = _manager(backend)
+        state = _new_state()
+        for i in range(5):
+            state.add_public_log_entry("system", f"日志{i}")
+            manager.save_game_state(state)
+
+        assert backend.stats()["compactions"] == 2
+        loaded = _manager(AppendLogStateBackend(directory)).load_game_state("session_1")
+        assert loaded.version == 5
+        assert len(loaded.public_log) == 6
+
+
+class TestBackendSelection:
+    """Test cases for get_state_backend."""
+
+    def test_shared_backends_are_singletons(self):
+        """Test that the in-memory store is shared by every StateManager."""
+        assert get_state_backend(name="memory") is get_state_backend(name="memory")
+
+    def test_sqlalchemy_backend_uses_the_session(self):
+        """Test that the database backend is bound to the given session, and is the fallback."""
+        db = object()
+
+        assert get_state_backend(db, name="sqlalchemy").db_session is db
+        assert isinstance(get_state_backend(db, name="unknown"), SQLAlchemyStateBackend)
+
+    @pytest.mark.asyncio
+    async def test_async_methods_without_database(self):
+        """Test that the async methods work on a backend without a database."""
+        manager = StateManager(cache=GameStateCache(maxsize=0), backend=InMemoryStateBackend())
+
+        assert await manager.asave_game_state(_new_state())
+        loaded = await manager.aload_game_state("session_1")
+
+        assert loaded.history_loaded
+        assert await manager.aget_game_state_version("session_1") == 1
+
+    @pytest.mark.asyncio
+    async def test_async_methods_run_file_backends_off_the_event_loop(self, tmp_path):
+        """Test that append-log I/O runs on a worker thread, not the event loop thread."""
+        backend = AppendLogStateBackend(str(tmp_path / "logs"))
+        manager = StateManager(cache=GameStateCache(maxsize=0), backend=backend)
+        loop_thread = threading.get_ident()
+        threads = []
+        save = backend.save
+
+        def recording_save(game_state):
+            threads.append(threading.get_ident())
+            save(game_state)
+
+        backend.save = recording_save
+        assert await manager.asave_game_state(_new_state())
+        loaded = await manager.aload_game_state("session_1")
+
+        assert threads and loop_thread not in threads
+        assert [entry.content for entry in loaded.public_log] == ["游戏开始"]
@@ -0,0 +1,123 @@
+"""
+Unit tests for the in-process GameState cache.
+
+Tests LRU/TTL behaviour of GameStateCache and its write-through
+integration with StateManager.
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+
+from app.langchain.state.cache import GameStateCache
+from app.langchain.state.manager import StateManager
+from app.langchain.state.models import GameState, GamePhase
+
+
+def _make_state(session_id: str) -> GameState:
+    return GameState(
+        game_id=f"game_{session_id}",
+        script_id="test_script",
+        session_id=session_id
+    )
+
+
+class TestGameStateCache:
+    """Test cases for GameStateCache."""
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted."""
+        cache = GameStateCache(maxsize=4, ttl_seconds=60)
+
+        assert cache.get("s1") is None
+        cache.put(_make_state("s1"))
+        assert cache.get("s1").game_id == "game_s1"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_returns_independent_copies(self):
+        """Test that mutating a returned state does not change the cache."""
+        cache = GameStateCache(maxsize=4, ttl_seconds=60)
+        state = _make_state("s1")
+        cache.put(state)
+
+        state.current_act = 2
+        loaded = cache.get("s1")
+        loaded.current_phase = GamePhase.QNA
+
+        fresh = cache.get("s1")
+        assert fresh.current_act == 1
+        assert fresh.current_phase == GamePhase.INITIALIZATION
+
+    def test_lru_eviction(self):
+        """Test that the least recently used session is evicted first."""
+        cache = GameStateCache(maxsize=2, ttl_seconds=60)
+        cache.put(_make_state("s1"))
+        cache.put(_make_state("s2"))
+        cache.get("s1")
+        cache.put(_make_state("s3"))
+
+        assert cache.get("s2") is None
+        assert cache.get("s1") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are treated as misses."""
+        cache = GameStateCache(maxsize=4, ttl_seconds=10)
+
+        with patch("app.langchain.state.cache.time.monotonic", return_value=100.0):
+            cache.put(_make_state("s1"))
+        with patch("app.langchain.state.cache.time.monotonic", return_value=111.0):
+            assert cache.get("s1") is None
+
+    def test_disabled_cache(self):
+        """Test that maxsize=0 disables caching."""
+        cache = GameStateCache(maxsize=0)
+        cache.put(_make_state("s1"))
+
+        assert cache.get("s1") is None
+        assert cache.stats()["size"] == 0
+
+
+class TestStateManagerCaching:
+    """Test cases for StateManager cache integration."""
+
+    def setup_method(self):
+        """Setup for each test method."""
+        self.mock_db = Mock()
+        self.cache = GameStateCache(maxsize=8, ttl_seconds=60)
+        self.manager = StateManager(self.mock_db, cache=self.cache)
+
+    def test_save_writes_through(self):
+        """Test that a successful save populates the cache."""
+        self.mock_db.query.return_value.filter.return_value.first.return_value = Mock()
+
+        assert self.manager.save_game_state(_make_state("s1")) is True
+
+        loaded = self.manager.load_game_state("s1")
+        assert loaded.game_id == "game_s1"
+        # Served from cache: only the save touched the database
+        assert self.mock_db.query.call_count == 1
+
+    def test_failed_save_invalidates(self):
+        """Test that a failed save drops the cached entry."""
+        self.cache.put(_make_state("s1"))
+        self.mock_db.commit.side_effect = Exception("disk full")
+        self.mock_db.query.return_value.filter.return_value.first.return_value = Mock()
+
+        assert self.manager.save_game_state(_make_state("s1")) is False
+        assert self.cache.get("s1") is None
+
+    def test_delete_invalidates(self):
+        """Test that deleting a session drops the cached entry."""
+        self.cache.put(_make_state("s1"))
+        self.mock_db.query.return_value.filter.return_value.first.return_value = Mock()
+
+        assert self.manager.delete_game_state("s1") is True
+        assert self.cache.get("s1") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,128 @@
+"""
+Unit tests for the GameState persistence codec.
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core import json_backend
+from app.langchain.state.codec import (
+    GAME_STATE_SCHEMA_VERSION,
+    SCHEMA_VERSION_KEY,
+    encode_game_state,
+    decode_game_state,
+    encode_game_state_json,
+    decode_game_state_json,
+)
+from app.langchain.state.models import GameState, GamePhase, PlayerState, PublicLogEntry
+
+
+def _make_state() -> GameState:
+    state = GameState(
+        game_id="game_1",
+        script_id="script_1",
+        session_id="session_1",
+        current_phase=GamePhase.QNA
+    )
+    state.players["p1"] = PlayerState(player_id="p1", character_id="Butler", notes="管家")
+    return state
+
+
+class TestStateCodec:
+    """Test cases for encode/decode of GameState snapshots."""
+
+    def test_snapshot_is_json_compatible_and_tagged(self):
+        """Test that the snapshot carries the schema version and plain JSON types."""
+        snapshot = encode_game_state(_make_state())
+
+        assert snapshot[SCHEMA_VERSION_KEY] == GAME_STATE_SCHEMA_VERSION
+        assert snapshot["current_phase"] == "qna"
+        assert isinstance(snapshot["created_at"], str)
+        # Must survive the standard library encoder unchanged
+        assert json.loads(json.dumps(snapshot)) == snapshot
+
+    def test_snapshot_excludes_history(self):
+        """Test that history collections are not part of the snapshot."""
+        state = _make_state()
+        state.public_log.append(PublicLogEntry(entry_type="system", content="开始", act_number=1))
+
+        snapshot = encode_game_state(state)
+
+        assert "public_log" not in snapshot
+        assert "qna_history" not in snapshot
+        assert "mission_submissions" not in snapshot
+
+    def test_round_trip(self):
+        """Test that decode(encode(state)) restores the state."""
+        state = _make_state()
+
+        restored = decode_game_state(encode_game_state(state))
+
+        assert restored.session_id == state.session_id
+        assert restored.current_phase == GamePhase.QNA
+        assert restored.created_at == state.created_at
+        assert restored.created_at.tzinfo is not None
+        assert restored.players["p1"].notes == "管家"
+
+    def test_json_round_trip(self):
+        """Test the bytes-level encode/decode helpers."""
+        state = _make_state()
+
+        restored = decode_game_state_json(encode_game_state_json(state))
+
+        # updated_at is refreshed by the model validator on every load
+        assert restored.created_at == state.created_at
+        assert restored.players["p1"].last_activity == state.players["p1"].last_activity
+
+    def test_decode_legacy_v1_snapshot(self):
+        """Test that untagged snapshots with embedded history still load."""
+        legacy = {
+            "game_id": "game_1",
+            "script_id": "script_1",
+            "session_id": "session_1",
+            "current_phase": "initialization",
+            "created_at": "2024-01-01T10:00:00+00:00",
+            "public_log": [{
+                "id": "log_1",
+                "entry_type": "system",
+                "content": "旧日志",
+                "act_number": 1,
+                "timestamp": "2024-01-01T10:00:00+00:00"
+            }]
+        }
+
+        state = decode_game_state(legacy)
+
+        assert state.created_at == datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+        assert state.public_log[0].content == "旧日志"
+
+
+class TestJsonBackend:
+    """Test cases for the shared JSON backend."""
+
+    def test_dumps_returns_text(self):
+        """Test that dumps returns str and keeps non-ASCII characters."""
+        text = json_backend.dumps({"name": "管家"})
+
+        assert isinstance(text, str)
+        assert json_backend.loads(text) == {"name": "管家"}
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_non_string_keys(self, monkeypatch, use_orjson):
+        """Test that int keys become strings with and without orjson, as json.dumps does."""
+        if not use_orjson:
+            monkeypatch.setattr(json_backend, "orjson", None)
+        elif json_backend.orjson is None:
+            pytest.skip("orjson is not installed")
+
+        assert json_backend.loads(json_backend.dumps({1: "第一幕", "a": 2})) == {"1": "第一幕", "a": 2}
+        assert json_backend.loads(json_backend.dumps_bytes({2: [1]})) == {"2": [1]}
+
+    def test_fallback_without_orjson(self, monkeypatch):
+        """Test that the standard library is used when orjson is unavailable."""
+        monkeypatch.setattr(json_backend, "orjson", None)
+
+        assert json_backend.loads(json_backend.dumps({"a": 1})) == {"a": 1}
+        assert json_backend.dumps_bytes({"a": "管家"}) == '{"a": "管家"}'.encode("utf-8")
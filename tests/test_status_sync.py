@@ -0,0 +1,191 @@
+"""
+Unit tests for the status endpoint's delta sync.
+
+Tests cursor-based incremental history, pagination, cursor resync and
+ETag / If-None-Match handling of GET /session/{session_id}/status.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, Mock, patch
+
+from app.database import get_async_db
+from app.langchain.state.backends import InMemoryStateBackend
+from app.langchain.state.cache import GameStateCache
+from app.langchain.state.manager import StateManager
+from app.langchain.state.models import GamePhase, GameState
+from app.main import app
+
+STATUS_URL = "/api/v1/langchain-game/session/session_1/status"
+
+
+async def _mock_async_db():
+    yield AsyncMock()
+
+
+@pytest.fixture
+def game_state():
+    state = GameState(game_id="g", script_id="s", session_id="session_1", current_phase=GamePhase.QNA)
+    for i in range(5):
+        state.add_qna_entry("p1", "Butler", f"问题{i}", f"回答{i}")
+        state.add_public_log_entry("monologue", f"日志{i}")
+    state._version = 7
+    return state
+
+
+@pytest.fixture
+def engine(game_state):
+    engine = Mock()
+    engine.aload_game = AsyncMock(return_value=game_state)
+    engine.state_manager.aget_game_state_version = AsyncMock(return_value=7)
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    previous = app.dependency_overrides.get(get_async_db)
+    app.dependency_overrides[get_async_db] = _mock_async_db
+    with patch("app.routers.langchain_game.get_game_engine", return_value=engine):
+        yield TestClient(app)
+    if previous is None:
+        app.dependency_overrides.pop(get_async_db, None)
+    else:
+        app.dependency_overrides[get_async_db] = previous
+
+
+class TestStatusDeltaSync:
+    """Test cases for cursor-based status sync."""
+
+    def test_full_status_returns_cursors(self, client, game_state):
+        """Test that a status without cursors returns everything and the cursors to continue from."""
+        data = client.get(STATUS_URL).json()
+
+        assert len(data["qna_history"]) == 5
+        assert data["version"] == 7
+        assert data["cursors"]["qna_cursor"] == game_state.qna_history[-1].id
+        assert data["cursors"]["log_cursor"] == game_state.public_log[-1].id
+        assert data["cursors"]["mission_cursor"] is None
+
+    def test_cursor_returns_only_new_entries(self, client, game_state):
+        """Test that only entries after the cursors are returned."""
+        data = client.get(STATUS_URL, params={
+            "qna_cursor": game_state.qna_history[2].id,
+            "log_cursor": game_state.public_log[3].id,
+        }).json()
+
+        assert [entry["question"] for entry in data["qna_history"]] == ["问题3", "问题4"]
+        assert [entry["content"] for entry in data["recent_log_entries"]] == ["日志4"]
+        assert data["resync"] is False
+
+    def test_up_to_date_cursor_keeps_position(self, client, game_state):
+        """Test that a cursor at the end returns nothing and is echoed back."""
+        cursor = game_state.qna_history[-1].id
+
+        data = client.get(STATUS_URL, params={"qna_cursor": cursor}).json()
+
+        assert data["qna_history"] == []
+        assert data["cursors"]["qna_cursor"] == cursor
+
+    def test_pagination(self, client, game_state):
+        """Test that page_size pages forward through the Q&A history."""
+        first = client.get(STATUS_URL, params={"page_size": 2}).json()
+        second = client.get(STATUS_URL, params={
+            "page_size": 2, "qna_cursor": first["cursors"]["qna_cursor"]
+        }).json()
+
+        assert [entry["question"] for entry in first["qna_history"]] == ["问题0", "问题1"]
+        assert first["has_more"] is True
+        assert [entry["question"] for entry in second["qna_history"]] == ["问题2", "问题3"]
+
+    def test_log_cursor_pages_with_max_log_entries(self, client, game_state):
+        """Test that log entries after a cursor come oldest first, up to max_log_entries."""
+        data = client.get(STATUS_URL, params={
+            "log_cursor": game_state.public_log[0].id, "max_log_entries": 2
+        }).json()
+
+        assert [entry["content"] for entry in data["recent_log_entries"]] == ["日志1", "日志2"]
+        assert data["has_more"] is True
+
+    def test_unknown_cursor_resyncs(self, client):
+        """Test that an unknown cursor returns the full history flagged for resync."""
+        data = client.get(STATUS_URL, params={"qna_cursor": "missing"}).json()
+
+        assert len(data["qna_history"]) == 5
+        assert data["resync"] is True
+
+
+class TestStatusETag:
+    """Test cases for conditional status requests."""
+
+    def test_unchanged_state_returns_304(self, client, engine):
+        """Test that a matching If-None-Match returns 304 without loading the state."""
+        etag = client.get(STATUS_URL).headers["ETag"]
+        engine.aload_game.reset_mock()
+
+        response = client.get(STATUS_URL, headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        engine.aload_game.assert_not_called()
+
+    def test_new_version_returns_200(self, client, engine, game_state):
+        """Test that a save (new version) invalidates the ETag."""
+        etag = client.get(STATUS_URL).headers["ETag"]
+        engine.state_manager.aget_game_state_version.return_value = 8
+        game_state._version = 8
+
+        response = client.get(STATUS_URL, headers={"If-None-Match": f"W/{etag}"})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_etag_depends_on_query(self, client):
+        """Test that responses to different cursors have different ETags."""
+        assert client.get(STATUS_URL).headers["ETag"] != \
+            client.get(STATUS_URL, params={"qna_cursor": "x"}).headers["ETag"]
+
+
+class TestStateVersionPeek:
+    """Test cases for reading a cached version without copying the state."""
+
+    def test_peek_version(self, game_state):
+        """Test that the cache reports the version of a cached session."""
+        cache = GameStateCache(maxsize=4)
+        game_state.load_history()
+        cache.put(game_state)
+
+        assert cache.peek_version("session_1") == 7
+        assert cache.peek_version("other") is None
+
+
+class TestVersionAcrossWorkers:
+    """Test cases for versions and cached states when another process saves the session."""
+
+    def test_version_is_read_from_the_backend(self, game_state):
+        """Test that a worker sees another worker's commit although it has the session cached."""
+        backend = InMemoryStateBackend()
+        worker_a = StateManager(cache=GameStateCache(maxsize=4), backend=backend)
+        worker_b = StateManager(cache=GameStateCache(maxsize=4), backend=backend)
+        game_state._version = None
+        worker_a.save_game_state(game_state)
+        worker_a.load_game_state("session_1")
+
+        state = worker_b.load_game_state("session_1")
+        state.add_public_log_entry("system", "另一个进程的提交")
+        worker_b.save_game_state(state)
+
+        version = worker_a.get_game_state_version("session_1")
+        assert version == 2
+        assert worker_a.load_game_state("session_1").version == 1  # stale cached copy
+        fresh = worker_a.load_game_state("session_1", expected_version=version)
+        assert fresh.version == 2
+        assert fresh.public_log[-1].content == "另一个进程的提交"
+        # The reloaded state replaced the stale cache entry
+        assert worker_a.load_game_state("session_1").version == 2
+
+    def test_status_loads_with_the_stored_version(self, client, engine):
+        """Test that the status route passes the stored version to the load."""
+        client.get(STATUS_URL)
+
+        engine.state_manager.aget_game_state_version.assert_awaited_once_with("session_1")
+        engine.aload_game.assert_awaited_once_with("session_1", expected_version=7)